@@ -1,8 +1,29 @@
 import json
 from decimal import Decimal
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 class CustomEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
             return float(obj)
-        return json.JSONEncoder.default(self, obj)
\ No newline at end of file
+        return json.JSONEncoder.default(self, obj)
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        if obj == obj.to_integral_value():
+            # orjson rejects integers outside int64
+            return int(obj) if -2 ** 63 <= obj < 2 ** 63 else str(int(obj))
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj):
+    """Serialize DynamoDB items to a JSON string, using orjson when packaged"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj, default=_default, separators=(',', ':'))
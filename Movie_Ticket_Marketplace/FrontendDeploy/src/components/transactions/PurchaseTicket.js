@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { FiX, FiShoppingCart } from 'react-icons/fi';
-import { transactionAPI } from '../../services/api';
+import { seatAPI, transactionAPI } from '../../services/api';
 import toast from 'react-hot-toast';
 
 const PurchaseTicket = ({ onClose, onSuccess }) => {
@@ -11,6 +11,8 @@ const PurchaseTicket = ({ onClose, onSuccess }) => {
         payment_method: 'credit_card'
     });
     const [isSubmitting, setIsSubmitting] = useState(false);
+    // The seat hold taken when a seat is selected: { holdId, userId, theatreSeat }
+    const [hold, setHold] = useState(null);
 
     const paymentMethods = [
         { value: 'credit_card', label: 'Credit Card' },
@@ -19,6 +21,41 @@ const PurchaseTicket = ({ onClose, onSuccess }) => {
         { value: 'digital_wallet', label: 'Digital Wallet' }
     ];
 
+    const releaseHold = (current = hold) => {
+        if (!current) return;
+        setHold(null);
+        // Holds expire on their own, so a failed release only delays the seat reopening
+        seatAPI.releaseSeats(current.holdId, [current.theatreSeat])
+            .catch(error => console.error('Release seat hold error:', error));
+    };
+
+    const holdSeat = async () => {
+        const userId = formData.user_id.trim();
+        const theatreSeat = formData.theatre_seat.trim();
+        if (!userId || !theatreSeat) return null;
+        if (hold && hold.userId === userId && hold.theatreSeat === theatreSeat) return hold;
+
+        releaseHold();
+        const response = await seatAPI.holdSeats(userId, [theatreSeat]);
+        const taken = { holdId: response.data.hold_id, userId, theatreSeat };
+        setHold(taken);
+        return taken;
+    };
+
+    const handleSeatSelected = async () => {
+        try {
+            await holdSeat();
+        } catch (error) {
+            console.error('Hold seat error:', error);
+            toast.error(error.response?.data?.detail?.message || 'Seat is not available');
+        }
+    };
+
+    const handleClose = () => {
+        releaseHold();
+        onClose();
+    };
+
     const handleSubmit = async (e) => {
         e.preventDefault();
 
@@ -28,18 +65,26 @@ const PurchaseTicket = ({ onClose, onSuccess }) => {
         }
 
         setIsSubmitting(true);
+        let currentHold = null;
         try {
+            // Normally taken when the seat was selected; reused here unless the seat or user changed
+            currentHold = await holdSeat();
             await transactionAPI.purchaseTicket({
                 user_id: formData.user_id,
                 theatre_seat: formData.theatre_seat,
                 purchase_price: parseInt(formData.purchase_price, 10),
-                payment_method: formData.payment_method
+                payment_method: formData.payment_method,
+                hold_id: currentHold.holdId
             });
 
+            // The purchase consumed the hold
+            setHold(null);
             toast.success('Ticket purchased successfully');
             onSuccess();
         } catch (error) {
             console.error('Purchase ticket error:', error);
+            // Give the seat back rather than keeping it held until the hold expires
+            releaseHold(currentHold);
 
             // Properly extract error message - NEVER render objects
             let errorMessage = 'Failed to purchase ticket';
@@ -59,6 +104,9 @@ const PurchaseTicket = ({ onClose, onSuccess }) => {
                     errorMessage = messages.length > 0 ? messages.join(', ') : 'Validation failed';
                 } else if (typeof error.response.data.detail === 'string') {
                     errorMessage = error.response.data.detail;
+                } else if (typeof error.response.data.detail.message === 'string') {
+                    // Seat conflicts come back as { message, unavailable_seats }
+                    errorMessage = error.response.data.detail.message;
                 }
             } else if (error.response?.data?.message) {
                 errorMessage = error.response.data.message;
@@ -90,14 +138,14 @@ const PurchaseTicket = ({ onClose, onSuccess }) => {
     };
 
     return (
-        <div className="modal-overlay" onClick={onClose}>
+        <div className="modal-overlay" onClick={handleClose}>
             <div className="modal-content large" onClick={(e) => e.stopPropagation()}>
                 <div className="modal-header">
                     <h2>
                         <FiShoppingCart size={24} />
                         Purchase Ticket
                     </h2>
-                    <button className="modal-close" onClick={onClose}>
+                    <button className="modal-close" onClick={handleClose}>
                         <FiX size={20} />
                     </button>
                 </div>
@@ -123,6 +171,7 @@ const PurchaseTicket = ({ onClose, onSuccess }) => {
                             name="theatre_seat"
                             value={formData.theatre_seat}
                             onChange={handleChange}
+                            onBlur={handleSeatSelected}
                             placeholder="e.g., A1, B5, C10"
                             className="form-input"
                             required
@@ -165,7 +214,7 @@ const PurchaseTicket = ({ onClose, onSuccess }) => {
                         <button
                             type="button"
                             className="btn btn-secondary"
-                            onClick={onClose}
+                            onClick={handleClose}
                         >
                             Cancel
                         </button>
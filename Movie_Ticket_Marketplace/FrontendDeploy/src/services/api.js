@@ -81,7 +81,9 @@ export const transactionAPI = {
             user_id: purchaseData.user_id,
             theatre_seat: purchaseData.theatre_seat,
             purchase_price: parseInt(purchaseData.purchase_price, 10),
-            payment_method: purchaseData.payment_method
+            payment_method: purchaseData.payment_method,
+            // From seatAPI.holdSeats, taken when the seat was selected
+            hold_id: purchaseData.hold_id
         };
 
         console.log('Purchase ticket payload:', payload);
@@ -98,10 +100,26 @@ export const transactionAPI = {
         console.log('Sell ticket payload:', payload);
         return api.post('/sell-ticket', payload);
     },
-    getUserTransactions: (userId, limit = 50) =>
-        api.get(`/user-transactions/${userId}?limit=${limit}`),
+    getUserTransactions: (userId, limit = 50, cursor = null) =>
+        api.get(`/user-transactions/${userId}`, {
+            params: cursor ? { limit, cursor } : { limit }
+        }),
     getTransactionDetails: (transactionId) =>
         api.get(`/transaction/${transactionId}`)
 };
 
+// Seat hold API calls
+export const seatAPI = {
+    holdSeats: (userId, theatreSeats, holdMinutes = 10) => api.post('/seats/hold', {
+        user_id: userId,
+        theatre_seats: theatreSeats,
+        hold_minutes: holdMinutes
+    }),
+    releaseSeats: (holdId, theatreSeats) => api.post('/seats/release', {
+        hold_id: holdId,
+        theatre_seats: theatreSeats
+    }),
+    getTheatreHolds: (theatreId) => api.get(`/seats/holds?theatre_id=${theatreId}`)
+};
+
 export default api;
@@ -4,21 +4,37 @@ from mangum import Mangum
 import os
 import logging
 
+# These register botocore hooks, so they must precede modules that create boto3 clients
+from utils.metrics import MetricsMiddleware, metrics_response
+from utils.tracing import TracingMiddleware
+
 from handlers.movies import router as movies_router
 from handlers.tickets import router as tickets_router
 from handlers.events import router as events_router
 from handlers.transactions import router as transactions_router
 from handlers.users import router as users_router
+from handlers.seats import router as seats_router
+from utils.compression_middleware import CompressionMiddleware
+from utils.json_response import FastJSONResponse
+from utils.profiling import ProfilingMiddleware
+from utils.lazy_router import LazyRouter
+from utils.structured_logging import RequestLoggingMiddleware, configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Single-line JSON log records; level from LOG_LEVEL
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Rarely used routers are imported on first request inside Lambda to shorten init
+DEFER_ROUTER_IMPORTS = os.environ.get(
+    'DEFER_ROUTER_IMPORTS', 'true' if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') else 'false'
+).lower() == 'true'
+
 # Create FastAPI application
 app = FastAPI(
     title="Movie Booking API with Transaction Tracking",
     description="Serverless movie ticket booking CRUD API with event-driven architecture and user transaction tracking",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -28,14 +44,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# gzip/brotli for large list payloads; Mangum base64-encodes the compressed body for API Gateway
+app.add_middleware(CompressionMiddleware)
+
+# One sampled JSON line per request (LOG_SAMPLE_RATE / LOG_SAMPLE_RATES); 5xx always logged
+app.add_middleware(RequestLoggingMiddleware)
+
+# Per-route latency and DynamoDB/SNS usage, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Stack-sampling profile of requests sent with X-Profile: $PROFILE_TOKEN or picked by PROFILE_SAMPLE_RATE
+app.add_middleware(ProfilingMiddleware)
+
+# Server span per request, continuing an incoming traceparent (TRACE_EXPORTER)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(movies_router, prefix="/api", tags=["movies"])
 app.include_router(tickets_router, prefix="/api", tags=["tickets"])
 app.include_router(events_router, prefix="/api", tags=["events"])
 app.include_router(transactions_router, prefix="/api", tags=["transactions"])
 app.include_router(users_router, prefix="/api", tags=["users"])
+app.include_router(seats_router, prefix="/api", tags=["seats"])
+
+if DEFER_ROUTER_IMPORTS:
+    app.router.routes.append(LazyRouter("/api/reports", "handlers.reports", tags=["reports"]))
+else:
+    from handlers.reports import router as reports_router
+    app.include_router(reports_router, prefix="/api", tags=["reports"])
 
 @app.get("/")
 async def root():
@@ -46,10 +85,17 @@ async def root():
             "Movie ticket booking",
             "User transaction tracking",
             "Payroll management",
+            "Time-limited seat holds",
+            "Revenue reports",
             "Event-driven architecture"
         ]
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this process's request and AWS call metrics"""
+    return metrics_response()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "movie-booking-api-v2"}
@@ -0,0 +1,24 @@
+import argparse
+import json
+import logging
+
+from services.rollup_service import RollupService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def handler(event, context):
+    """Lambda entry point: rebuild revenue rollups from the transaction history"""
+    total_segments = int((event or {}).get('totalSegments', 8))
+    result = RollupService().rebuild_from_history(total_segments)
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild revenue rollups from user-transactions")
+    parser.add_argument("--segments", type=int, default=8, help="Parallel scan segments")
+    args = parser.parse_args()
+
+    print(json.dumps(RollupService().rebuild_from_history(args.segments), indent=2))
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from utils.tracing import start_span, traceparent_from_sqs
+from handlers.events import get_derived_writes, handle_price_change_event as process_price_change_event
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+def handle_price_change_event(event, context):
+    """SQS entry point for price change events published through SNS.
+
+    Only the events module is imported here, not the FastAPI app, and AWS
+    clients are created on first use, which keeps this function's init short.
+    """
+    records = event.get('Records', [])
+    logger.info(f"Received {len(records)} price change records")
+
+    for record in records:
+        body = json.loads(record['body'])
+        # SNS deliveries wrap the event in an envelope; direct SQS sends do not
+        message = json.loads(body['Message']) if 'Message' in body else body
+
+        # Continues the trace of the PATCH that published the event
+        with start_span('price_change.process', kind='consumer', traceparent=traceparent_from_sqs(record, body),
+                        **{'messaging.system': 'aws_sqs', 'messaging.message_id': record.get('messageId'),
+                           'price_change.theatre_seat': message.get('theatreSeat')}) as span:
+            if span is not None:
+                _record_propagation(span, record, message)
+            asyncio.run(process_price_change_event(message))
+
+    # Records only stage their writes; store them before SQS deletes the batch. Raising leaves it to be retried.
+    with start_span('price_change.flush', **{'write_behind.staged': len(records)}):
+        get_derived_writes().flush(strict=True)
+
+    return {'processed': len(records)}
+
+def _record_propagation(span, record, message):
+    """How long the event took to arrive, from the PATCH and from the SQS send"""
+    now_ms = time.time() * 1000
+    sent_ms = (record.get('attributes') or {}).get('SentTimestamp')
+    if sent_ms:
+        span.set_attribute('messaging.queue_wait_ms', round(now_ms - int(sent_ms), 1))
+    try:
+        # Published as a naive UTC timestamp by PATCH /api/ticket
+        published = datetime.fromisoformat(message['timestamp']).replace(tzinfo=timezone.utc)
+        span.set_attribute('price_change.propagation_ms', round(now_ms - published.timestamp() * 1000, 1))
+    except (KeyError, TypeError, ValueError):
+        pass
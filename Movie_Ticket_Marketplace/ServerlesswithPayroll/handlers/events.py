@@ -1,99 +1,97 @@
 from fastapi import APIRouter, HTTPException
-import boto3
 import json
 import os
 import logging
 from decimal import Decimal
 from datetime import datetime
-from utils.database import get_table
+from functools import lru_cache
+from utils.clients import get_sns_client
+from utils.database import get_table, get_thread_table
 from utils.encoder import CustomEncoder
+from utils.structured_logging import redact
+from utils.write_behind import WriteBehindBuffer
+from services.version_service import TICKETS, VersionService
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# SNS setup
-sns = boto3.client('sns')
+# SNS setup; the client itself is created on first publish
 topic_arn = os.environ.get('PRICE_CHANGE_TOPIC_ARN')
 
+@lru_cache(maxsize=None)
+def get_derived_writes() -> WriteBehindBuffer:
+    """Write-behind buffer for the ticket attributes price changes derive, created on first use"""
+    return WriteBehindBuffer(get_table(), 'Theatre-Seat', on_flushed=_price_changes_written)
+
+def price_change_attributes(old_price, new_price) -> dict:
+    """The attributes a price change sets on its ticket"""
+    attributes = {
+        'LastPriceChangeTimestamp': datetime.utcnow().isoformat(),
+        'PreviousPrice': Decimal(str(old_price)) if old_price else None,
+    }
+
+    # Calculate discount if price decreased
+    if old_price and new_price < old_price:
+        discount_percentage = round(((old_price - new_price) / old_price) * 100, 2)
+        attributes['DiscountPercentage'] = Decimal(str(discount_percentage))
+        attributes['IsDiscounted'] = True
+    else:
+        attributes['DiscountPercentage'] = Decimal('0')
+        attributes['IsDiscounted'] = False
+    return attributes
+
 async def handle_price_change_event(event_data: dict):
-    """Handle price change events"""
-    logger.info(f"Processing price change event: {json.dumps(event_data)}")
+    """Handle price change events.
+
+    The derived attributes are staged in the write-behind buffer, so repeated
+    changes to one seat cost a single write; the completion event is
+    published once that write lands.
+    """
+    logger.info("Processing price change event", extra={'fields': {'event': redact(event_data)}})
     
     try:
-        table = get_table()
-        
-        # Extract event details
-        event_type = event_data.get('eventType')
-        theatre_seat = event_data.get('theatreSeat')
-        movie = event_data.get('movie')
-        old_price = event_data.get('oldPrice')
-        new_price = event_data.get('newPrice')
-        
         # Only process initial price change events
-        if event_type == 'PriceChangeInitiated':
-            additional_updates = {}
-            additional_updates['LastPriceChangeTimestamp'] = datetime.utcnow().isoformat()
-            additional_updates['PreviousPrice'] = Decimal(str(old_price)) if old_price else None
-            
-            # Calculate discount if price decreased
-            if old_price and new_price < old_price:
-                discount_percentage = round(((old_price - new_price) / old_price) * 100, 2)
-                additional_updates['DiscountPercentage'] = Decimal(str(discount_percentage))
-                additional_updates['IsDiscounted'] = True
-            else:
-                additional_updates['DiscountPercentage'] = Decimal('0')
-                additional_updates['IsDiscounted'] = False
-            
-            # Update the ticket with additional metadata
-            update_expression_parts = []
-            expression_attribute_names = {}
-            expression_attribute_values = {}
-            
-            for key, value in additional_updates.items():
-                update_expression_parts.append(f'#{key} = :{key}')
-                expression_attribute_names[f'#{key}'] = key
-                expression_attribute_values[f':{key}'] = value
-            
-            if update_expression_parts:
-                update_expression = 'SET ' + ', '.join(update_expression_parts)
-                
-                response = table.update_item(
-                    Key={'Theatre-Seat': theatre_seat},
-                    UpdateExpression=update_expression,
-                    ExpressionAttributeNames=expression_attribute_names,
-                    ExpressionAttributeValues=expression_attribute_values,
-                    ReturnValues='ALL_NEW'
-                )
-                
-                updated_item = response.get('Attributes', {})
-                logger.info(f"Added price change metadata for {theatre_seat}")
-                
-                # Publish completion event
-                completion_event = {
-                    'eventType': 'PriceChangeProcessed',
-                    'theatreSeat': theatre_seat,
-                    'movie': movie,
-                    'finalPrice': new_price,
-                    'priceChangeTimestamp': additional_updates['LastPriceChangeTimestamp'],
-                    'isDiscounted': additional_updates['IsDiscounted'],
-                    'discountPercentage': float(additional_updates['DiscountPercentage']),
-                    'processedAt': datetime.utcnow().isoformat(),
-                    'updatedItem': updated_item
-                }
-                
-                if topic_arn:
-                    try:
-                        sns.publish(
-                            TopicArn=topic_arn,
-                            Message=json.dumps(completion_event, cls=CustomEncoder),
-                            Subject=f'Price Change Processed for {theatre_seat}'
-                        )
-                        logger.info(f"Published price change completion event for {theatre_seat}")
-                    except Exception as sns_error:
-                        logger.error(f"Failed to publish completion event: {str(sns_error)}")
+        if event_data.get('eventType') == 'PriceChangeInitiated':
+            theatre_seat = event_data.get('theatreSeat')
+            get_derived_writes().stage(
+                theatre_seat, price_change_attributes(event_data.get('oldPrice'), event_data.get('newPrice'))
+            )
+            logger.info("Staged price change metadata for %s", theatre_seat)
         
         return {"message": "Price change event processed successfully"}
         
     except Exception as e:
         logger.error(f"Error processing price change event: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to process price change event")
+
+def _price_changes_written(items: dict):
+    """After a flush: bump the tickets' versions and publish a completion event per ticket.
+
+    Runs on whichever thread flushed, which can be one running an event loop
+    (stage() flushes inline once the buffer is full), so nothing here awaits.
+    """
+    VersionService(get_thread_table).bump_items_sync(TICKETS, list(items))
+    if not topic_arn:
+        return
+
+    for theatre_seat, updated_item in items.items():
+        completion_event = {
+            'eventType': 'PriceChangeProcessed',
+            'theatreSeat': theatre_seat,
+            'movie': updated_item.get('Movie'),
+            'finalPrice': updated_item.get('Price'),
+            'priceChangeTimestamp': updated_item.get('LastPriceChangeTimestamp'),
+            'isDiscounted': updated_item.get('IsDiscounted', False),
+            'discountPercentage': float(updated_item.get('DiscountPercentage', 0)),
+            'processedAt': datetime.utcnow().isoformat(),
+            'updatedItem': updated_item
+        }
+        try:
+            get_sns_client().publish(
+                TopicArn=topic_arn,
+                Message=json.dumps(completion_event, cls=CustomEncoder),
+                Subject=f'Price Change Processed for {theatre_seat}'
+            )
+            logger.info("Published price change completion event for %s", theatre_seat)
+        except Exception as sns_error:
+            logger.error(f"Failed to publish completion event: {str(sns_error)}")
@@ -1,19 +1,27 @@
-from fastapi import APIRouter, HTTPException
-import boto3
+from fastapi import APIRouter, HTTPException, Request
 import os
 import logging
 from utils.database import get_table
+from utils.json_response import FastJSONResponse
+from utils.conditional import cache_headers, make_etag, not_modified
+from services.version_service import TICKETS, VersionService
 from typing import List
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.get("/movies", response_model=dict)
-async def get_movies():
+async def get_movies(request: Request):
     """Retrieve all unique movies from tickets"""
-    logger.info("Retrieving all unique movies")
+    logger.debug("Retrieving all unique movies")
     
     try:
+        # Movies are derived from tickets, so they share the tickets table version
+        etag = make_etag('movies', VersionService().get_version(TICKETS))
+        cached = not_modified(request, 'movies', etag)
+        if cached:
+            return cached
+        
         table = get_table()
         response = table.scan()
         items = response.get('Items', [])
@@ -26,7 +34,7 @@ async def get_movies():
         # Extract unique movie names
         unique_movies = list({item.get('Movie') for item in items if item.get('Movie')})
         
-        return {"movies": unique_movies}
+        return FastJSONResponse({"movies": unique_movies}, headers=cache_headers('movies', etag))
         
     except Exception as e:
         logger.error(f"Error retrieving movies: {str(e)}")
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from datetime import datetime, timedelta
+import logging
+
+from services.rollup_service import RollupService
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+MONTH_PATTERN = r"^\d{4}-\d{2}$"
+
+@router.get("/reports/revenue")
+async def get_revenue_report(
+    movie: Optional[str] = None,
+    from_date: Optional[str] = Query(None, alias="from", regex=DATE_PATTERN),
+    to_date: Optional[str] = Query(None, alias="to", regex=DATE_PATTERN)
+):
+    """Daily ticket revenue for a movie, or all movies, from precomputed rollups"""
+    to_date = to_date or datetime.utcnow().date().isoformat()
+    from_date = from_date or (datetime.fromisoformat(to_date) - timedelta(days=30)).date().isoformat()
+    logger.info(f"Retrieving revenue report for {movie or 'all movies'} from {from_date} to {to_date}")
+    
+    try:
+        rollup_service = RollupService()
+        return await rollup_service.get_revenue_report(movie, from_date, to_date)
+        
+    except Exception as e:
+        logger.error(f"Error retrieving revenue report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reports/users/{user_id}")
+async def get_user_report(
+    user_id: str,
+    from_month: Optional[str] = Query(None, alias="from", regex=MONTH_PATTERN),
+    to_month: Optional[str] = Query(None, alias="to", regex=MONTH_PATTERN)
+):
+    """Monthly spending and earnings for a user from precomputed rollups"""
+    to_month = to_month or datetime.utcnow().strftime("%Y-%m")
+    from_month = from_month or f"{int(to_month[:4]) - 1}{to_month[4:]}"
+    logger.info(f"Retrieving monthly report for user {user_id} from {from_month} to {to_month}")
+    
+    try:
+        rollup_service = RollupService()
+        return await rollup_service.get_user_report(user_id, from_month, to_month)
+        
+    except Exception as e:
+        logger.error(f"Error retrieving user report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import List
+import time
+import logging
+
+from services.seat_hold_service import SeatHoldService, SeatUnavailableError
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class SeatHoldRequest(BaseModel):
+    user_id: str
+    theatre_seats: List[str]
+    hold_minutes: int = 10
+
+class SeatReleaseRequest(BaseModel):
+    hold_id: str
+    theatre_seats: List[str]
+
+@router.post("/seats/hold", status_code=201)
+async def hold_seats(request: SeatHoldRequest):
+    """Reserve seats for a few minutes while the user checks out"""
+    logger.info(f"Holding {len(request.theatre_seats)} seats for user {request.user_id}")
+    
+    try:
+        seat_hold_service = SeatHoldService()
+        hold = await seat_hold_service.hold_seats(
+            user_id=request.user_id,
+            theatre_seats=request.theatre_seats,
+            hold_minutes=request.hold_minutes
+        )
+        
+        return {
+            "message": "Seats held successfully",
+            **hold
+        }
+        
+    except SeatUnavailableError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "unavailable_seats": e.theatre_seats})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error holding seats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/seats/release")
+async def release_seats(request: SeatReleaseRequest):
+    """Release seats from a hold before it expires"""
+    logger.info(f"Releasing seats from hold {request.hold_id}")
+    
+    try:
+        seat_hold_service = SeatHoldService()
+        released = await seat_hold_service.release_hold(request.hold_id, request.theatre_seats)
+        
+        return {
+            "message": "Seats released",
+            "hold_id": request.hold_id,
+            "released_seats": released
+        }
+        
+    except Exception as e:
+        logger.error(f"Error releasing seats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/seats/holds")
+async def get_theatre_holds(theatre_id: str):
+    """List seats currently held in a theatre"""
+    logger.info(f"Retrieving active holds for theatre {theatre_id}")
+    
+    try:
+        seat_hold_service = SeatHoldService()
+        holds = await seat_hold_service.get_active_holds(theatre_id)
+        
+        return {
+            "theatre_id": theatre_id,
+            "held_seats": holds,
+            "total_held": len(holds),
+            "as_of": int(time.time())
+        }
+        
+    except Exception as e:
+        logger.error(f"Error retrieving seat holds: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
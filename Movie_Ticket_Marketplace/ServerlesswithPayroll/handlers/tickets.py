@@ -1,18 +1,26 @@
-from fastapi import APIRouter, HTTPException, Query, Body
-from pydantic import BaseModel
-from typing import Optional, Any, Dict
-import boto3
+from fastapi import APIRouter, HTTPException, Query, Body, Request
+from pydantic import BaseModel, Field
+from typing import Optional, Any, Dict, Iterator, List
 import json
 import os
+import asyncio
 import logging
 from decimal import Decimal
 from datetime import datetime
+from utils.clients import get_sns_client
 from utils.database import get_table
 from utils.encoder import CustomEncoder
+from utils.json_response import FastJSONResponse
+from utils.conditional import cache_headers, make_etag, not_modified
+from utils.negotiation import negotiated_response, streaming_msgpack_response, wants_msgpack
+from services.version_service import TICKETS, VersionService
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# BatchGetItem reads at most 100 keys per call
+BATCH_LOOKUP_LIMIT = 100
+
 # Pydantic models
 class TicketCreate(BaseModel):
     theatre_seat: str = Body(..., alias="Theatre-Seat")
@@ -30,27 +38,34 @@ class TicketUpdate(BaseModel):
     class Config:
         populate_by_name = True
 
+class TicketBatchRequest(BaseModel):
+    theatre_seats: List[str] = Field(..., min_length=1, max_length=BATCH_LOOKUP_LIMIT)
+
 class TicketDelete(BaseModel):
     theatre_seat: str = Body(..., alias="Theatre-Seat")
     
     class Config:
         populate_by_name = True
 
-# SNS setup
-sns = boto3.client('sns')
+# SNS setup; the client itself is created on first publish
 topic_arn = os.environ.get('PRICE_CHANGE_TOPIC_ARN')
 
 @router.get("/ticket")
-async def get_ticket(theatre_seat: str = Query(..., alias="Theatre-Seat")):
+async def get_ticket(request: Request, theatre_seat: str = Query(..., alias="Theatre-Seat")):
     """Retrieve a specific ticket by Theatre-Seat ID"""
-    logger.info(f"Retrieving ticket: {theatre_seat}")
+    logger.debug("Retrieving ticket: %s", theatre_seat)
     
     try:
+        etag = make_etag('ticket', VersionService().get_version(TICKETS, theatre_seat))
+        cached = not_modified(request, 'ticket', etag)
+        if cached:
+            return cached
+        
         table = get_table()
         response = table.get_item(Key={'Theatre-Seat': theatre_seat})
         
         if 'Item' in response:
-            return response['Item']
+            return FastJSONResponse(response['Item'], headers=cache_headers('ticket', etag))
         else:
             raise HTTPException(status_code=404, detail="Ticket not found")
             
@@ -61,30 +76,80 @@ async def get_ticket(theatre_seat: str = Query(..., alias="Theatre-Seat")):
         raise HTTPException(status_code=500, detail="Failed to retrieve ticket")
 
 @router.get("/tickets")
-async def get_all_tickets():
-    """Retrieve all tickets"""
-    logger.info("Retrieving all tickets")
+async def get_all_tickets(request: Request):
+    """Retrieve all tickets.
+
+    With `Accept: application/msgpack` the tickets are streamed as a sequence
+    of MessagePack objects, one per ticket, as each scan page arrives.
+    """
+    logger.debug("Retrieving all tickets")
     
     try:
-        table = get_table()
-        response = table.scan()
-        items = response.get('Items', [])
+        msgpack_requested = wants_msgpack(request)
+        etag = make_etag('tickets', VersionService().get_version(TICKETS), 'msgpack' if msgpack_requested else None)
+        cached = not_modified(request, 'tickets', etag)
+        if cached:
+            return cached
         
-        # Handle pagination
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            items.extend(response.get('Items', []))
+        if msgpack_requested:
+            return streaming_msgpack_response(_scan_tickets(), headers=cache_headers('tickets', etag))
         
-        return {"tickets": items}
+        items = list(_scan_tickets())
+        return FastJSONResponse({"tickets": items}, headers={**cache_headers('tickets', etag), 'Vary': 'Accept'})
         
     except Exception as e:
         logger.error(f"Error retrieving all tickets: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve tickets")
 
+def _scan_tickets() -> Iterator[Dict]:
+    """Yield every ticket, one scan page at a time"""
+    table = get_table()
+    scan_params = {}
+    
+    while True:
+        response = table.scan(**scan_params)
+        yield from response.get('Items', [])
+        
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+@router.post("/tickets/batch")
+async def batch_get_tickets(batch: TicketBatchRequest, request: Request):
+    """Look up many tickets by Theatre-Seat in one request"""
+    logger.debug("Batch lookup of %d tickets", len(batch.theatre_seats))
+    
+    try:
+        seats = list(dict.fromkeys(batch.theatre_seats))
+        table = get_table()
+        request_items = {table.name: {'Keys': [{'Theatre-Seat': seat} for seat in seats]}}
+        tickets = []
+        
+        # Retry throttled keys until DynamoDB has returned every one
+        for attempt in range(5):
+            response = table.meta.client.batch_get_item(RequestItems=request_items)
+            tickets.extend(response.get('Responses', {}).get(table.name, []))
+            request_items = response.get('UnprocessedKeys') or {}
+            if not request_items:
+                break
+            await asyncio.sleep(0.05 * 2 ** attempt)
+        else:
+            raise Exception("Batch lookup throttled; retry the request")
+        
+        found = {ticket['Theatre-Seat'] for ticket in tickets}
+        return negotiated_response(request, {
+            "tickets": tickets,
+            "missing": [seat for seat in seats if seat not in found]
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in batch ticket lookup: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve tickets")
+
 @router.post("/ticket", status_code=201)
 async def create_ticket(ticket: TicketCreate):
     """Create a new ticket booking"""
-    logger.info(f"Creating ticket: {ticket.theatre_seat}")
+    logger.info("Creating ticket: %s", ticket.theatre_seat)
     
     try:
         table = get_table()
@@ -100,6 +165,7 @@ async def create_ticket(ticket: TicketCreate):
         
         # Save ticket to DynamoDB
         table.put_item(Item=ticket_data)
+        await VersionService().bump(TICKETS, ticket.theatre_seat)
         
         response_body = {
             'message': 'Ticket created successfully',
@@ -107,7 +173,7 @@ async def create_ticket(ticket: TicketCreate):
             'Movie': ticket.movie
         }
         
-        logger.info(f"Successfully created ticket: {ticket.theatre_seat}")
+        logger.info("Successfully created ticket: %s", ticket.theatre_seat)
         return response_body
         
     except Exception as e:
@@ -117,7 +183,7 @@ async def create_ticket(ticket: TicketCreate):
 @router.patch("/ticket")
 async def update_ticket(ticket_update: TicketUpdate):
     """Update an existing ticket"""
-    logger.info(f"Updating ticket: {ticket_update.theatre_seat}")
+    logger.info("Updating ticket: %s", ticket_update.theatre_seat)
     
     try:
         table = get_table()
@@ -166,6 +232,7 @@ async def update_ticket(ticket_update: TicketUpdate):
         )
         
         updated_item = response.get('Attributes', {})
+        await VersionService().bump(TICKETS, ticket_update.theatre_seat)
         
         # Publish price change event if applicable
         if is_price_change and topic_arn:
@@ -183,12 +250,12 @@ async def update_ticket(ticket_update: TicketUpdate):
             }
             
             try:
-                sns.publish(
+                get_sns_client().publish(
                     TopicArn=topic_arn,
                     Message=json.dumps(event_message, cls=CustomEncoder),
                     Subject=f'Price Change Event for {ticket_update.theatre_seat}'
                 )
-                logger.info(f"Published price change event for {ticket_update.theatre_seat}")
+                logger.info("Published price change event for %s", ticket_update.theatre_seat)
             except Exception as sns_error:
                 logger.error(f"Failed to publish price change event: {str(sns_error)}")
         
@@ -201,7 +268,7 @@ async def update_ticket(ticket_update: TicketUpdate):
             'priceChangeEventPublished': is_price_change and topic_arn is not None
         }
         
-        logger.info(f"Successfully updated ticket: {ticket_update.theatre_seat}")
+        logger.info("Successfully updated ticket: %s", ticket_update.theatre_seat)
         return response_body
         
     except HTTPException:
@@ -213,7 +280,7 @@ async def update_ticket(ticket_update: TicketUpdate):
 @router.delete("/ticket")
 async def delete_ticket(ticket_delete: TicketDelete):
     """Delete a ticket booking"""
-    logger.info(f"Deleting ticket: {ticket_delete.theatre_seat}")
+    logger.info("Deleting ticket: %s", ticket_delete.theatre_seat)
     
     try:
         table = get_table()
@@ -224,12 +291,13 @@ async def delete_ticket(ticket_delete: TicketDelete):
         )
         
         if 'Attributes' in response:
+            await VersionService().bump(TICKETS, ticket_delete.theatre_seat)
             response_body = {
                 'message': 'Ticket deleted successfully',
                 'Theatre-Seat': ticket_delete.theatre_seat,
                 'deletedItem': response['Attributes']
             }
-            logger.info(f"Successfully deleted ticket: {ticket_delete.theatre_seat}")
+            logger.info("Successfully deleted ticket: %s", ticket_delete.theatre_seat)
             return response_body
         else:
             raise HTTPException(status_code=404, detail="Ticket not found")
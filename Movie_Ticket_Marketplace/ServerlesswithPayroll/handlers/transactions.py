@@ -1,20 +1,34 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable, Iterator
+import csv
+import io
+import json
 import logging
 from datetime import datetime
 
 from services.transaction_service import TransactionService
+from services.idempotency_service import IdempotencyService, IdempotencyInProgressError, IdempotencyKeyReuseError
+from services.seat_hold_service import SeatHoldRequiredError, SeatUnavailableError
 from utils.encoder import CustomEncoder
+from utils.negotiation import MSGPACK_AVAILABLE, MSGPACK_MEDIA_TYPE, msgpack_stream, negotiated_response, wants_msgpack
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Column order for CSV ledger exports
+EXPORT_FIELDS = [
+    'transactionId', 'timestamp', 'transactionType', 'theatreSeat', 'movie',
+    'amount', 'paymentMethod', 'buyerId', 'sellerId', 'status', 'description'
+]
+
 class TicketPurchaseRequest(BaseModel):
     user_id: str
     theatre_seat: str
     purchase_price: float
     payment_method: str = "credit_card"
+    hold_id: Optional[str] = None
 
 class TicketSaleRequest(BaseModel):
     user_id: str
@@ -29,17 +43,23 @@ class TicketTransferRequest(BaseModel):
     transfer_price: float
 
 @router.post("/purchase-ticket", status_code=201)
-async def purchase_ticket(request: TicketPurchaseRequest):
+async def purchase_ticket(
+    request: TicketPurchaseRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Purchase a ticket and record transaction"""
     logger.info(f"Processing ticket purchase for user {request.user_id}")
     
-    try:
+    async def purchase(commit_step):
         transaction_service = TransactionService()
         result = await transaction_service.process_ticket_purchase(
             user_id=request.user_id,
             theatre_seat=request.theatre_seat,
             purchase_price=request.purchase_price,
-            payment_method=request.payment_method
+            payment_method=request.payment_method,
+            hold_id=request.hold_id,
+            commit_step=commit_step
         )
         
         return {
@@ -48,23 +68,44 @@ async def purchase_ticket(request: TicketPurchaseRequest):
             "user_balance": result["user_balance"],
             "ticket_details": result["ticket_details"]
         }
+    
+    try:
+        body, replayed = await IdempotencyService().run(
+            "purchase-ticket", idempotency_key, request.model_dump(), purchase
+        )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return body
         
+    except IdempotencyInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IdempotencyKeyReuseError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except SeatHoldRequiredError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except SeatUnavailableError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "unavailable_seats": e.theatre_seats})
     except Exception as e:
         logger.error(f"Error processing ticket purchase: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/sell-ticket", status_code=201)
-async def sell_ticket(request: TicketSaleRequest):
+async def sell_ticket(
+    request: TicketSaleRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Sell a ticket to another user and record transaction"""
     logger.info(f"Processing ticket sale from {request.user_id} to {request.buyer_id}")
     
-    try:
+    async def sell(commit_step):
         transaction_service = TransactionService()
         result = await transaction_service.process_ticket_sale(
             seller_id=request.user_id,
             buyer_id=request.buyer_id,
             theatre_seat=request.theatre_seat,
-            sale_price=request.sale_price
+            sale_price=request.sale_price,
+            commit_step=commit_step
         )
         
         return {
@@ -74,7 +115,19 @@ async def sell_ticket(request: TicketSaleRequest):
             "seller_balance": result["seller_balance"],
             "buyer_balance": result["buyer_balance"]
         }
+    
+    try:
+        body, replayed = await IdempotencyService().run(
+            "sell-ticket", idempotency_key, request.model_dump(), sell
+        )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return body
         
+    except IdempotencyInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IdempotencyKeyReuseError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing ticket sale: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -82,32 +135,99 @@ async def sell_ticket(request: TicketSaleRequest):
 @router.get("/user-transactions/{user_id}")
 async def get_user_transactions(
     user_id: str,
+    request: Request,
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None
 ):
-    """Get transaction history for a user"""
+    """Get transaction history for a user, one page at a time"""
     logger.info(f"Retrieving transactions for user {user_id}")
     
     try:
         transaction_service = TransactionService()
-        transactions = await transaction_service.get_user_transactions(
+        transactions, next_cursor = await transaction_service.get_user_transactions_page(
             user_id=user_id,
             limit=limit,
+            cursor=cursor,
             start_date=start_date,
             end_date=end_date
         )
         
-        return {
+        return negotiated_response(request, {
             "user_id": user_id,
             "transactions": transactions,
-            "total_transactions": len(transactions)
-        }
+            "total_transactions": len(transactions),
+            "next_cursor": next_cursor
+        })
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving user transactions: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/user-transactions/{user_id}/export")
+async def export_user_transactions(
+    user_id: str,
+    request: Request,
+    format: Optional[str] = Query(None, regex="^(csv|ndjson|msgpack)$"),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    """Stream a user's full ledger as CSV, NDJSON or MessagePack, oldest first.
+
+    Without `format`, `Accept: application/msgpack` selects MessagePack and
+    anything else NDJSON.
+    """
+    if format is None:
+        format = "msgpack" if wants_msgpack(request) else "ndjson"
+    if format == "msgpack" and not MSGPACK_AVAILABLE:
+        raise HTTPException(status_code=406, detail="MessagePack export is not available")
+    logger.info(f"Exporting transactions for user {user_id} as {format}")
+    
+    transaction_service = TransactionService()
+    transactions = transaction_service.iter_user_transactions(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date
+    )
+    
+    if format == "csv":
+        content, media_type = _csv_lines(transactions), "text/csv"
+    elif format == "msgpack":
+        content, media_type = msgpack_stream(transactions), MSGPACK_MEDIA_TYPE
+    else:
+        content, media_type = _ndjson_lines(transactions), "application/x-ndjson"
+    
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{user_id}-transactions.{format}"',
+            "Vary": "Accept"
+        }
+    )
+
+def _ndjson_lines(transactions: Iterable[Dict]) -> Iterator[str]:
+    for transaction in transactions:
+        yield json.dumps(transaction, cls=CustomEncoder) + "\n"
+
+def _csv_lines(transactions: Iterable[Dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    
+    for transaction in transactions:
+        writer.writerow({field: transaction.get(field) for field in EXPORT_FIELDS})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    
+    # Header only when the ledger is empty
+    if buffer.tell():
+        yield buffer.getvalue()
+
 @router.get("/transaction/{transaction_id}")
 async def get_transaction_details(transaction_id: str):
     """Get details of a specific transaction"""
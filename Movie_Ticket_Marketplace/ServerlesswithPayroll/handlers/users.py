@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Header, Request, Response
 from pydantic import BaseModel
 from typing import Optional
 import logging
 
 from services.user_service import UserService
+from utils.json_response import FastJSONResponse
+from utils.conditional import cache_headers, make_etag, not_modified
+from services.version_service import USERS, VersionService
+from services.idempotency_service import IdempotencyService, IdempotencyInProgressError, IdempotencyKeyReuseError
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -15,17 +19,22 @@ class UserCreate(BaseModel):
     initial_balance: Optional[float] = 0.0
 
 @router.post("/users", status_code=201)
-async def create_user(user: UserCreate):
+async def create_user(
+    user: UserCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Create a new user with payroll tracking"""
     logger.info(f"Creating user: {user.user_id}")
     
-    try:
+    async def create(commit_step):
         user_service = UserService()
         result = await user_service.create_user(
             user_id=user.user_id,
             email=user.email,
             name=user.name,
-            initial_balance=user.initial_balance
+            initial_balance=user.initial_balance,
+            commit_step=commit_step
         )
         
         return {
@@ -33,24 +42,41 @@ async def create_user(user: UserCreate):
             "user_id": user.user_id,
             "payroll": result
         }
+    
+    try:
+        body, replayed = await IdempotencyService().run(
+            "create-user", idempotency_key, user.model_dump(), create
+        )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return body
         
+    except IdempotencyInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IdempotencyKeyReuseError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating user: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/users/{user_id}/payroll")
-async def get_user_payroll(user_id: str):
+async def get_user_payroll(user_id: str, request: Request):
     """Get user's current payroll status"""
     logger.info(f"Retrieving payroll for user: {user_id}")
     
     try:
+        etag = make_etag('payroll', VersionService().get_version(USERS, user_id))
+        cached = not_modified(request, 'payroll', etag)
+        if cached:
+            return cached
+        
         user_service = UserService()
         payroll = await user_service.get_user_payroll(user_id)
         
         if not payroll:
             raise HTTPException(status_code=404, detail="User not found")
             
-        return payroll
+        return FastJSONResponse(payroll, headers=cache_headers('payroll', etag))
         
     except HTTPException:
         raise
@@ -59,18 +85,23 @@ async def get_user_payroll(user_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/users/{user_id}/summary")
-async def get_user_summary(user_id: str):
+async def get_user_summary(user_id: str, request: Request):
     """Get comprehensive user summary including payroll and recent transactions"""
     logger.info(f"Retrieving summary for user: {user_id}")
     
     try:
+        etag = make_etag('summary', VersionService().get_version(USERS, user_id))
+        cached = not_modified(request, 'summary', etag)
+        if cached:
+            return cached
+        
         user_service = UserService()
         summary = await user_service.get_user_summary(user_id)
         
         if not summary:
             raise HTTPException(status_code=404, detail="User not found")
             
-        return summary
+        return FastJSONResponse(summary, headers=cache_headers('summary', etag))
         
     except HTTPException:
         raise
@@ -81,20 +112,46 @@ async def get_user_summary(user_id: str):
 @router.get("/users/leaderboard")
 async def get_payroll_leaderboard(
     limit: int = Query(10, ge=1, le=50),
-    order: str = Query("desc", regex="^(asc|desc)$")
+    order: str = Query("desc", regex="^(asc|desc)$"),
+    offset: int = Query(0, ge=0)
 ):
     """Get leaderboard of users by net payroll"""
     logger.info("Retrieving payroll leaderboard")
     
     try:
         user_service = UserService()
-        leaderboard = await user_service.get_payroll_leaderboard(limit, order)
+        leaderboard = await user_service.get_payroll_leaderboard(limit, order, offset)
         
-        return {
+        return FastJSONResponse({
             "leaderboard": leaderboard,
-            "total_users": len(leaderboard)
-        }
+            "total_users": len(leaderboard),
+            "total_ranked_users": await user_service.get_leaderboard_size(),
+            "offset": offset
+        })
         
     except Exception as e:
         logger.error(f"Error retrieving leaderboard: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/users/{user_id}/rank")
+async def get_user_rank(
+    user_id: str,
+    order: str = Query("desc", regex="^(asc|desc)$")
+):
+    """Get a user's position on the payroll leaderboard"""
+    logger.info(f"Retrieving leaderboard rank for user: {user_id}")
+    
+    try:
+        user_service = UserService()
+        entry = await user_service.get_user_rank(user_id, order)
+        
+        if not entry:
+            raise HTTPException(status_code=404, detail="User not found")
+            
+        return entry
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving user rank: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
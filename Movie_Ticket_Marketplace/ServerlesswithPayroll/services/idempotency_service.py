@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utils.database import get_table
+from utils.encoder import CustomEncoder, dumps
+
+logger = logging.getLogger(__name__)
+
+# Completed responses are kept this long; expiresAt is the table's TTL attribute
+RECORD_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 60 * 60)))
+# An in-flight claim older than this is assumed abandoned (e.g. a timed-out Lambda)
+LOCK_TIMEOUT_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT_SECONDS', '60'))
+# Attempts at storing a completed response, doubling the delay after each failure
+COMPLETION_ATTEMPTS = int(os.environ.get('IDEMPOTENCY_COMPLETION_ATTEMPTS', '4'))
+COMPLETION_RETRY_DELAY_SECONDS = float(os.environ.get('IDEMPOTENCY_COMPLETION_RETRY_DELAY_SECONDS', '0.05'))
+
+
+class IdempotencyInProgressError(Exception):
+    """Another request with the same key is still being processed, or committed without a stored response"""
+
+
+class IdempotencyKeyReuseError(Exception):
+    """The key was already used for a request with a different payload"""
+
+
+class IdempotencyService:
+    def __init__(self):
+        self.idempotency_table = get_table(os.environ.get('IDEMPOTENCY_TABLE', 'idempotency-keys'))
+
+    async def run(self, scope: str, idempotency_key: Optional[str], payload: Dict,
+                  operation: Callable[[Optional[Dict]], Awaitable[Dict]]) -> Tuple[Dict, bool]:
+        """Run `operation` at most once per key and return (response, replayed).
+
+        Without a key the operation simply runs. A completed key is answered
+        from the stored response with a single read.
+
+        `operation` receives a commit step (None without a key) to add to the
+        TransactWriteItems that makes its first durable change. It marks the
+        claim COMMITTED in the same transaction, so from then on the key can
+        no longer be reclaimed and the operation can never run twice, even if
+        storing the response fails.
+        """
+
+        if not idempotency_key:
+            return await operation(None), False
+
+        record_key = f"{scope}#{idempotency_key}"
+        request_hash = self._hash_payload(payload)
+
+        existing = self.idempotency_table.get_item(Key={'idempotencyKey': record_key}).get('Item')
+        if existing:
+            replay = self._replay(existing, request_hash)
+            if replay is not None:
+                return replay, True
+
+        claim_id = self._claim(record_key, request_hash)
+
+        try:
+            response = await operation(self.commit_step(record_key, claim_id))
+        except Exception:
+            # Release the claim so the client can retry a failed request, unless it got as far as committing
+            self._release(record_key, claim_id)
+            raise
+
+        # Serialized as the app's responses are, and returned decoded on this path as well as on
+        # replay, so a retry gets exactly the first response (100, not 100.0, for a whole Decimal)
+        response_body = dumps(response).decode('utf-8')
+        await self._complete(record_key, request_hash, response_body)
+
+        return json.loads(response_body), False
+
+    def commit_step(self, record_key: str, claim_id: str) -> Dict:
+        """TransactWriteItems step marking this claim COMMITTED; cancels the transaction if the claim was lost"""
+
+        return {
+            'Update': {
+                'TableName': self.idempotency_table.name,
+                'Key': {'idempotencyKey': record_key},
+                'UpdateExpression': 'SET #status = :committed',
+                'ConditionExpression': 'claimId = :claim_id AND #status = :in_progress',
+                'ExpressionAttributeNames': {'#status': 'status'},
+                'ExpressionAttributeValues': {
+                    ':committed': 'COMMITTED',
+                    ':claim_id': claim_id,
+                    ':in_progress': 'IN_PROGRESS'
+                }
+            }
+        }
+
+    async def _complete(self, record_key: str, request_hash: str, response_body: str) -> None:
+        """Store the response for replays, retrying transient failures with exponential backoff"""
+
+        for attempt in range(COMPLETION_ATTEMPTS):
+            try:
+                now = int(time.time())
+                self.idempotency_table.put_item(Item={
+                    'idempotencyKey': record_key,
+                    'status': 'COMPLETED',
+                    'requestHash': request_hash,
+                    'responseBody': response_body,
+                    'completedAt': datetime.utcnow().isoformat(),
+                    'expiresAt': now + RECORD_TTL_SECONDS
+                })
+                return
+            except Exception as e:
+                if attempt + 1 == COMPLETION_ATTEMPTS:
+                    # The operation committed, so the caller still gets its response; the claim
+                    # stays COMMITTED and retries with this key are refused rather than rerun
+                    logger.error(f"Failed to store the response for idempotency key {record_key}: {str(e)}")
+                    return
+                await asyncio.sleep(COMPLETION_RETRY_DELAY_SECONDS * 2 ** attempt)
+
+    def _release(self, record_key: str, claim_id: str) -> None:
+        try:
+            self.idempotency_table.delete_item(
+                Key={'idempotencyKey': record_key},
+                ConditionExpression='claimId = :claim_id AND #status = :in_progress',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':claim_id': claim_id, ':in_progress': 'IN_PROGRESS'}
+            )
+        except self.idempotency_table.meta.client.exceptions.ConditionalCheckFailedException:
+            logger.warning(f"Kept idempotency key {record_key}: its operation committed before failing")
+        except Exception as e:
+            # The claim lapses after LOCK_TIMEOUT_SECONDS
+            logger.error(f"Failed to release idempotency key {record_key}: {str(e)}")
+
+    def _replay(self, record: Dict, request_hash: str) -> Optional[Dict]:
+        """Return the stored response, or None if the record can be reclaimed"""
+
+        if record.get('requestHash') != request_hash:
+            raise IdempotencyKeyReuseError("Idempotency-Key was already used with a different request")
+
+        now = int(time.time())
+        if record.get('status') == 'COMPLETED' and int(record.get('expiresAt', 0)) > now:
+            return json.loads(record['responseBody'])
+
+        if record.get('status') == 'IN_PROGRESS' and int(record.get('lockExpiresAt', 0)) > now:
+            raise IdempotencyInProgressError("A request with this Idempotency-Key is already in progress")
+
+        if record.get('status') == 'COMMITTED' and int(record.get('expiresAt', 0)) > now:
+            raise IdempotencyInProgressError(
+                "A request with this Idempotency-Key was already processed, but its response is unavailable"
+            )
+
+        return None
+
+    def _claim(self, record_key: str, request_hash: str) -> str:
+        """Atomically mark the key as in flight, failing if someone else holds it; returns the claim id"""
+
+        now = int(time.time())
+        claim_id = str(uuid.uuid4())
+        try:
+            self.idempotency_table.put_item(
+                Item={
+                    'idempotencyKey': record_key,
+                    'status': 'IN_PROGRESS',
+                    'claimId': claim_id,
+                    'requestHash': request_hash,
+                    'lockExpiresAt': now + LOCK_TIMEOUT_SECONDS,
+                    'expiresAt': now + RECORD_TTL_SECONDS
+                },
+                ConditionExpression='attribute_not_exists(idempotencyKey) OR expiresAt < :now OR (#status = :in_progress AND lockExpiresAt < :now)',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':now': now, ':in_progress': 'IN_PROGRESS'}
+            )
+        except self.idempotency_table.meta.client.exceptions.ConditionalCheckFailedException:
+            logger.warning(f"Concurrent request holds idempotency key {record_key}")
+            raise IdempotencyInProgressError("A request with this Idempotency-Key is already in progress")
+        return claim_id
+
+    @staticmethod
+    def _hash_payload(payload: Any) -> str:
+        canonical = json.dumps(payload, cls=CustomEncoder, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
@@ -0,0 +1,144 @@
+import os
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from utils.database import get_table
+from utils.skiplist import IndexableSkipList
+
+logger = logging.getLogger(__name__)
+
+# Rebuild from the table after this many seconds so updates made by other
+# Lambda containers are eventually reflected in this one
+REFRESH_SECONDS = float(os.environ.get('LEADERBOARD_REFRESH_SECONDS', '300'))
+
+
+class LeaderboardService:
+    """In-process payroll leaderboard ordered by netProfitLoss.
+
+    The ranking is rebuilt from a projected scan of users-payroll on first use
+    and kept current by update_user_balance, so top-K, rank and pagination
+    queries are O(log n) instead of a full scan and sort per request.
+    """
+
+    def __init__(self, users_table=None, refresh_seconds: float = REFRESH_SECONDS):
+        self.users_table = users_table or get_table('users-payroll')
+        self.refresh_seconds = refresh_seconds
+        self._ranking = IndexableSkipList()
+        self._entries: Dict[str, Dict] = {}
+        self._loaded_at: Optional[float] = None
+
+    def rebuild(self) -> None:
+        """Reload every user from the payroll table"""
+
+        scan_params = {
+            'ProjectionExpression': 'userId, #name, currentBalance, totalSales, totalPurchases, totalTransactions',
+            'ExpressionAttributeNames': {'#name': 'name'}
+        }
+
+        ranking = IndexableSkipList()
+        entries = {}
+
+        response = self.users_table.scan(**scan_params)
+        while True:
+            for user in response.get('Items', []):
+                entry = self._to_entry(user)
+                entries[entry['userId']] = entry
+                ranking.insert(self._sort_key(entry))
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            response = self.users_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], **scan_params)
+
+        self._ranking = ranking
+        self._entries = entries
+        self._loaded_at = time.monotonic()
+        logger.info(f"Rebuilt payroll leaderboard with {len(entries)} users")
+
+    def apply(self, user: Dict) -> None:
+        """Re-rank a user from their latest payroll item"""
+
+        # Nothing to maintain until the first read loads the ranking
+        if self._loaded_at is None:
+            return
+
+        entry = self._to_entry(user)
+        previous = self._entries.get(entry['userId'])
+        if previous is not None:
+            self._ranking.remove(self._sort_key(previous))
+
+        self._entries[entry['userId']] = entry
+        self._ranking.insert(self._sort_key(entry))
+
+    def get_page(self, limit: int = 10, offset: int = 0, order: str = "desc") -> List[Dict]:
+        """Return `limit` ranked users starting at `offset`"""
+
+        self._ensure_fresh()
+
+        total = len(self._ranking)
+        if order.lower() == "desc":
+            keys = self._ranking.slice(offset, offset + limit)
+        else:
+            # Ascending pages are read from the tail of the descending ranking
+            keys = self._ranking.slice(total - offset - limit, total - offset)[::-1]
+
+        return [
+            {'rank': offset + i + 1, **self._entries[user_id]}
+            for i, (_, user_id) in enumerate(keys)
+        ]
+
+    def get_rank(self, user_id: str, order: str = "desc") -> Optional[Dict]:
+        """Return a user's leaderboard entry with their rank, or None"""
+
+        self._ensure_fresh()
+
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        position = self._ranking.rank(self._sort_key(entry))
+        if order.lower() != "desc":
+            position = len(self._ranking) - position - 1
+
+        return {'rank': position + 1, **entry}
+
+    def total_users(self) -> int:
+        self._ensure_fresh()
+        return len(self._ranking)
+
+    def _ensure_fresh(self) -> None:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.rebuild()
+
+    @staticmethod
+    def _sort_key(entry: Dict) -> Tuple[float, str]:
+        # Highest netProfitLoss first; userId breaks ties deterministically
+        return (-entry['netProfitLoss'], entry['userId'])
+
+    @staticmethod
+    def _to_entry(user: Dict) -> Dict:
+        total_sales = float(user.get('totalSales', 0))
+        total_purchases = float(user.get('totalPurchases', 0))
+        net_profit_loss = total_sales - total_purchases
+
+        return {
+            'userId': user.get('userId'),
+            'name': user.get('name'),
+            'currentBalance': float(user.get('currentBalance', 0)),
+            'netProfitLoss': net_profit_loss,
+            'totalTransactions': user.get('totalTransactions', 0),
+            'totalSales': total_sales,
+            'totalPurchases': total_purchases,
+            'isNetPositive': net_profit_loss > 0
+        }
+
+
+_leaderboard: Optional[LeaderboardService] = None
+
+
+def get_leaderboard() -> LeaderboardService:
+    """Return the process-wide leaderboard, shared across requests"""
+    global _leaderboard
+    if _leaderboard is None:
+        _leaderboard = LeaderboardService()
+    return _leaderboard
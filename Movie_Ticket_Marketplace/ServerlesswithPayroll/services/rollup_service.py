@@ -0,0 +1,204 @@
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from utils.database import get_table, get_thread_table
+
+logger = logging.getLogger(__name__)
+
+# Rollup partitions: one per movie, one for all movies, one per user
+MOVIE_PREFIX = 'MOVIE#'
+ALL_MOVIES_KEY = 'DAY'
+USER_PREFIX = 'USER#'
+
+DAY_COUNTERS = ['ticketsSold', 'grossRevenue', 'resaleCount', 'resaleVolume']
+MONTH_COUNTERS = ['purchaseCount', 'totalSpent', 'saleCount', 'totalEarned']
+
+ROLLUPS_TABLE = os.environ.get('ROLLUPS_TABLE', 'revenue-rollups')
+
+
+class RollupService:
+    """Pre-aggregated revenue counters kept next to the transaction log.
+
+    Items are keyed by rollupKey (movie, all movies or user) and period (a
+    YYYY-MM-DD day for movies, a YYYY-MM month for users), so a report over
+    a date range is a single Query over a few dozen small items.
+    """
+
+    def __init__(self):
+        self.rollups_table = get_table(ROLLUPS_TABLE)
+
+    async def record_purchase(self, user_id: str, movie: Optional[str], amount: Decimal, timestamp: str) -> None:
+        """Count a primary ticket purchase"""
+
+        day, month = timestamp[:10], timestamp[:7]
+        day_counters = {'ticketsSold': 1, 'grossRevenue': amount}
+
+        await asyncio.gather(
+            asyncio.to_thread(self._increment, self._movie_key(movie), day, day_counters),
+            asyncio.to_thread(self._increment, ALL_MOVIES_KEY, day, day_counters),
+            asyncio.to_thread(self._increment, USER_PREFIX + user_id, month, {'purchaseCount': 1, 'totalSpent': amount})
+        )
+
+    async def record_resale(self, seller_id: str, buyer_id: str, movie: Optional[str], amount: Decimal, timestamp: str) -> None:
+        """Count a ticket resold between two users"""
+
+        day, month = timestamp[:10], timestamp[:7]
+        day_counters = {'resaleCount': 1, 'resaleVolume': amount}
+
+        await asyncio.gather(
+            asyncio.to_thread(self._increment, self._movie_key(movie), day, day_counters),
+            asyncio.to_thread(self._increment, ALL_MOVIES_KEY, day, day_counters),
+            asyncio.to_thread(self._increment, USER_PREFIX + seller_id, month, {'saleCount': 1, 'totalEarned': amount}),
+            asyncio.to_thread(self._increment, USER_PREFIX + buyer_id, month, {'purchaseCount': 1, 'totalSpent': amount})
+        )
+
+    async def get_revenue_report(self, movie: Optional[str], from_date: str, to_date: str) -> Dict:
+        """Daily revenue for one movie, or for all movies, over [from_date, to_date]"""
+
+        rollup_key = self._movie_key(movie) if movie else ALL_MOVIES_KEY
+        items = await asyncio.to_thread(self._query_periods, rollup_key, from_date, to_date)
+
+        return {
+            'movie': movie,
+            'from': from_date,
+            'to': to_date,
+            'days': [self._format(item, DAY_COUNTERS, 'date') for item in items],
+            'totals': self._totals(items, DAY_COUNTERS)
+        }
+
+    async def get_user_report(self, user_id: str, from_month: str, to_month: str) -> Dict:
+        """Monthly spending and earnings for a user over [from_month, to_month]"""
+
+        items = await asyncio.to_thread(self._query_periods, USER_PREFIX + user_id, from_month, to_month)
+
+        return {
+            'user_id': user_id,
+            'from': from_month,
+            'to': to_month,
+            'months': [self._format(item, MONTH_COUNTERS, 'month') for item in items],
+            'totals': self._totals(items, MONTH_COUNTERS)
+        }
+
+    def rebuild_from_history(self, total_segments: int = 8) -> Dict:
+        """Recompute every rollup from user-transactions with a parallel scan.
+
+        Rollups are overwritten with absolute values, so run this while no
+        purchases are being processed or increments made meanwhile are lost.
+        """
+
+        with ThreadPoolExecutor(max_workers=total_segments) as executor:
+            partials = list(executor.map(
+                lambda segment: self._aggregate_segment(segment, total_segments),
+                range(total_segments)
+            ))
+
+        totals: Dict[Tuple[str, str], Dict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+        scanned = 0
+        for partial, segment_count in partials:
+            scanned += segment_count
+            for key, counters in partial.items():
+                for name, value in counters.items():
+                    totals[key][name] += value
+
+        written_at = datetime.utcnow().isoformat()
+        with self.rollups_table.batch_writer() as batch:
+            for (rollup_key, period), counters in totals.items():
+                batch.put_item(Item={
+                    'rollupKey': rollup_key,
+                    'period': period,
+                    'lastUpdated': written_at,
+                    **counters
+                })
+
+        logger.info(f"Rebuilt {len(totals)} rollups from {scanned} transactions")
+        return {'transactionsScanned': scanned, 'rollupsWritten': len(totals)}
+
+    def _aggregate_segment(self, segment: int, total_segments: int) -> Tuple[Dict, int]:
+        partial: Dict[Tuple[str, str], Dict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+        scan_params = {'Segment': segment, 'TotalSegments': total_segments}
+        count = 0
+
+        while True:
+            # Runs on an executor thread, which needs a resource of its own
+            response = get_thread_table('user-transactions').scan(**scan_params)
+            for transaction in response.get('Items', []):
+                count += 1
+                self._accumulate(partial, transaction)
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        return partial, count
+
+    def _accumulate(self, partial: Dict, transaction: Dict) -> None:
+        timestamp = transaction.get('timestamp', '')
+        day, month = timestamp[:10], timestamp[:7]
+        amount = Decimal(str(transaction.get('amount', 0)))
+        user_key = (USER_PREFIX + transaction['userId'], month)
+
+        if transaction.get('transactionType') == 'SALE':
+            # One SALE row per resale; the buyer's matching PURCHASE row is not double counted
+            for key in ((self._movie_key(transaction.get('movie')), day), (ALL_MOVIES_KEY, day)):
+                partial[key]['resaleCount'] += 1
+                partial[key]['resaleVolume'] += amount
+            partial[user_key]['saleCount'] += 1
+            partial[user_key]['totalEarned'] += amount
+
+        elif transaction.get('transactionType') == 'PURCHASE':
+            if 'sellerId' not in transaction:
+                for key in ((self._movie_key(transaction.get('movie')), day), (ALL_MOVIES_KEY, day)):
+                    partial[key]['ticketsSold'] += 1
+                    partial[key]['grossRevenue'] += amount
+            partial[user_key]['purchaseCount'] += 1
+            partial[user_key]['totalSpent'] += amount
+
+    def _increment(self, rollup_key: str, period: str, counters: Dict) -> None:
+        names = {f'#c{i}': name for i, name in enumerate(counters)}
+        values = {f':c{i}': value for i, value in enumerate(counters.values())}
+        values[':timestamp'] = datetime.utcnow().isoformat()
+
+        # ADD creates the item and counters on first use and is commutative, so concurrent writers never conflict.
+        # Called through asyncio.to_thread, so it opens the thread's own table.
+        get_thread_table(ROLLUPS_TABLE).update_item(
+            Key={'rollupKey': rollup_key, 'period': period},
+            UpdateExpression='ADD ' + ', '.join(f'#c{i} :c{i}' for i in range(len(counters))) + ' SET lastUpdated = :timestamp',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+
+    def _query_periods(self, rollup_key: str, start: str, end: str) -> List[Dict]:
+        query_params = {
+            'KeyConditionExpression': 'rollupKey = :rollup_key AND #period BETWEEN :start AND :end',
+            'ExpressionAttributeNames': {'#period': 'period'},
+            'ExpressionAttributeValues': {':rollup_key': rollup_key, ':start': start, ':end': end}
+        }
+
+        items = []
+        while True:
+            response = get_thread_table(ROLLUPS_TABLE).query(**query_params)
+            items.extend(response.get('Items', []))
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        return items
+
+    @staticmethod
+    def _movie_key(movie: Optional[str]) -> str:
+        return MOVIE_PREFIX + (movie or 'UNKNOWN')
+
+    @staticmethod
+    def _format(item: Dict, counters: List[str], period_name: str) -> Dict:
+        return {period_name: item['period'], **{name: item.get(name, 0) for name in counters}}
+
+    @staticmethod
+    def _totals(items: List[Dict], counters: List[str]) -> Dict:
+        return {name: sum((Decimal(str(item.get(name, 0))) for item in items), Decimal('0')) for name in counters}
@@ -0,0 +1,172 @@
+import os
+import time
+import uuid
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from utils.database import get_table
+
+logger = logging.getLogger(__name__)
+
+MAX_HOLD_MINUTES = 15
+# A transaction holds two operations per seat and DynamoDB allows 100
+MAX_SEATS_PER_HOLD = 10
+
+
+class SeatUnavailableError(Exception):
+    """One or more requested seats are sold, missing or held by someone else"""
+
+    def __init__(self, theatre_seats: List[str]):
+        self.theatre_seats = theatre_seats
+        super().__init__(f"Seats not available: {', '.join(theatre_seats)}")
+
+
+class SeatHoldRequiredError(Exception):
+    """A purchase came without a hold, or with one that is missing, expired or someone else's"""
+
+
+def theatre_of(theatre_seat: str) -> str:
+    """Theatre id from a Theatre-Seat key such as '1-A7'"""
+    return theatre_seat.split('-', 1)[0]
+
+
+class SeatHoldService:
+    """Time-limited seat reservations taken before checkout.
+
+    Each held seat is one item keyed by Theatre-Seat. Holds are written with
+    conditional transactions, expire through the expiresAt TTL attribute and
+    are treated as released as soon as that time passes, before DynamoDB
+    actually deletes them.
+    """
+
+    def __init__(self):
+        self.holds_table = get_table(os.environ.get('SEAT_HOLDS_TABLE', 'seat-holds'))
+        self.tickets_table = get_table()
+        self.client = self.holds_table.meta.client
+
+    async def hold_seats(self, user_id: str, theatre_seats: List[str], hold_minutes: int) -> Dict:
+        """Hold every seat or none of them"""
+
+        seats = list(dict.fromkeys(theatre_seats))
+        if not seats or len(seats) > MAX_SEATS_PER_HOLD:
+            raise ValueError(f"Between 1 and {MAX_SEATS_PER_HOLD} seats can be held at once")
+        if not 1 <= hold_minutes <= MAX_HOLD_MINUTES:
+            raise ValueError(f"hold_minutes must be between 1 and {MAX_HOLD_MINUTES}")
+
+        hold_id = str(uuid.uuid4())
+        now = int(time.time())
+        expires_at = now + hold_minutes * 60
+
+        transact_items = []
+        for seat in seats:
+            transact_items.append({
+                'ConditionCheck': {
+                    'TableName': self.tickets_table.name,
+                    'Key': {'Theatre-Seat': seat},
+                    'ConditionExpression': 'attribute_exists(#seat) AND (attribute_not_exists(#status) OR #status <> :sold)',
+                    'ExpressionAttributeNames': {'#seat': 'Theatre-Seat', '#status': 'status'},
+                    'ExpressionAttributeValues': {':sold': 'sold'}
+                }
+            })
+            transact_items.append({
+                'Put': {
+                    'TableName': self.holds_table.name,
+                    'Item': {
+                        'theatreSeat': seat,
+                        'theatreId': theatre_of(seat),
+                        'holdId': hold_id,
+                        'userId': user_id,
+                        'expiresAt': expires_at,
+                        'createdAt': datetime.utcnow().isoformat()
+                    },
+                    # Expired holds are released lazily by being overwritable
+                    'ConditionExpression': 'attribute_not_exists(theatreSeat) OR expiresAt <= :now OR userId = :user_id',
+                    'ExpressionAttributeValues': {':now': now, ':user_id': user_id}
+                }
+            })
+
+        try:
+            self.client.transact_write_items(TransactItems=transact_items)
+        except self.client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [])
+            unavailable = [
+                seats[i // 2] for i, reason in enumerate(reasons)
+                if reason.get('Code') == 'ConditionalCheckFailed'
+            ]
+            raise SeatUnavailableError(list(dict.fromkeys(unavailable)) or seats)
+
+        logger.info(f"Held {len(seats)} seats for {user_id} until {expires_at} (hold {hold_id})")
+
+        return {
+            'hold_id': hold_id,
+            'user_id': user_id,
+            'theatre_seats': seats,
+            'expires_at': expires_at
+        }
+
+    async def release_hold(self, hold_id: str, theatre_seats: List[str]) -> List[str]:
+        """Release the given seats if they still belong to the hold"""
+
+        released = []
+        for seat in dict.fromkeys(theatre_seats):
+            try:
+                self.holds_table.delete_item(
+                    Key={'theatreSeat': seat},
+                    ConditionExpression='holdId = :hold_id',
+                    ExpressionAttributeValues={':hold_id': hold_id}
+                )
+                released.append(seat)
+            except self.client.exceptions.ConditionalCheckFailedException:
+                logger.info(f"Seat {seat} is not held by {hold_id}")
+
+        return released
+
+    async def get_active_holds(self, theatre_id: str) -> List[Dict]:
+        """Active holds in a theatre, read from TheatreHoldsIndex"""
+
+        query_params = {
+            'IndexName': 'TheatreHoldsIndex',
+            'KeyConditionExpression': 'theatreId = :theatre_id AND expiresAt > :now',
+            'ExpressionAttributeValues': {':theatre_id': theatre_id, ':now': int(time.time())},
+            'ProjectionExpression': 'theatreSeat, expiresAt'
+        }
+
+        holds = []
+        while True:
+            response = self.holds_table.query(**query_params)
+            holds.extend(response.get('Items', []))
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        return holds
+
+    def consume_hold_operation(self, hold_id: str, user_id: str, theatre_seat: str) -> Dict:
+        """Transaction step that deletes a hold only if it is valid for this purchase"""
+
+        return {
+            'Delete': {
+                'TableName': self.holds_table.name,
+                'Key': {'theatreSeat': theatre_seat},
+                'ConditionExpression': 'holdId = :hold_id AND userId = :user_id AND expiresAt > :now',
+                'ExpressionAttributeValues': {
+                    ':hold_id': hold_id,
+                    ':user_id': user_id,
+                    ':now': int(time.time())
+                }
+            }
+        }
+
+    def no_foreign_hold_operation(self, user_id: str, theatre_seat: str) -> Dict:
+        """Transaction step for a purchase without a hold: no one else may hold the seat"""
+
+        return {
+            'ConditionCheck': {
+                'TableName': self.holds_table.name,
+                'Key': {'theatreSeat': theatre_seat},
+                'ConditionExpression': 'attribute_not_exists(theatreSeat) OR expiresAt <= :now OR userId = :user_id',
+                'ExpressionAttributeValues': {':now': int(time.time()), ':user_id': user_id}
+            }
+        }
@@ -1,23 +1,45 @@
-import boto3
+import os
 import uuid
 import logging
 from decimal import Decimal
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from utils.database import get_table
+from utils.pagination import decode_cursor, encode_cursor
+from services.idempotency_service import IdempotencyInProgressError
+from services.seat_hold_service import SeatHoldRequiredError, SeatHoldService, SeatUnavailableError
+from services.rollup_service import RollupService
+from services.version_service import TICKETS, VersionService
 # ✅ REMOVED: from services.user_service import UserService - This was causing circular import
 
 logger = logging.getLogger(__name__)
 
+# With REQUIRE_SEAT_HOLD=true purchases must present a hold from POST /seats/hold. Off by default so
+# clients written before holds existed keep working; a seat someone else holds still cannot be bought
+REQUIRE_SEAT_HOLD = os.environ.get('REQUIRE_SEAT_HOLD', 'false').lower() == 'true'
+
+def _lost_claim(reasons: List[Dict], error: Exception) -> Exception:
+    """The error for a cancelled transaction whose failing step was the idempotency commit step"""
+    if any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons):
+        return IdempotencyInProgressError("A request with this Idempotency-Key is already in progress")
+    return error
+
 class TransactionService:
-    def __init__(self):
-        self.transactions_table = boto3.resource('dynamodb').Table('user-transactions')
-        self.tickets_table = get_table()
+    def __init__(self, open_table=get_table):
+        # Pass get_thread_table when the service is built and used inside a worker thread
+        self.transactions_table = open_table('user-transactions')
+        self.tickets_table = open_table()
         # ✅ REMOVED: self.user_service = UserService() - Initialize when needed instead
 
-    async def process_ticket_purchase(self, user_id: str, theatre_seat: str, purchase_price: float, payment_method: str) -> Dict:
-        """Process a ticket purchase and update user payroll"""
+    async def process_ticket_purchase(self, user_id: str, theatre_seat: str, purchase_price: float, payment_method: str, hold_id: Optional[str] = None, commit_step: Optional[Dict] = None) -> Dict:
+        """Process a ticket purchase and update user payroll.
+
+        `commit_step`, from IdempotencyService.run, joins the ticket update's transaction.
+        """
+        
+        if not hold_id and REQUIRE_SEAT_HOLD:
+            raise SeatHoldRequiredError("A seat hold from POST /seats/hold is required to purchase this ticket")
         
         # Check if ticket exists and is available
         ticket_response = self.tickets_table.get_item(Key={'Theatre-Seat': theatre_seat})
@@ -32,6 +54,33 @@ class TransactionService:
         timestamp = datetime.utcnow().isoformat()
         
         try:
+            # Mark the ticket sold first; the condition stops two buyers winning the same seat
+            ticket_update = {
+                'Key': {'Theatre-Seat': theatre_seat},
+                'UpdateExpression': 'SET #status = :status, #owner = :owner, #purchasePrice = :price, #purchaseTimestamp = :timestamp',
+                'ConditionExpression': 'attribute_not_exists(#status) OR #status <> :status',
+                'ExpressionAttributeNames': {
+                    '#status': 'status',
+                    '#owner': 'owner',
+                    '#purchasePrice': 'purchasePrice',
+                    '#purchaseTimestamp': 'purchaseTimestamp'
+                },
+                'ExpressionAttributeValues': {
+                    ':status': 'sold',
+                    ':owner': user_id,
+                    ':price': Decimal(str(purchase_price)),
+                    ':timestamp': timestamp
+                }
+            }
+            
+            seat_hold_service = SeatHoldService()
+            if hold_id:
+                hold_step = seat_hold_service.consume_hold_operation(hold_id, user_id, theatre_seat)
+            else:
+                hold_step = seat_hold_service.no_foreign_hold_operation(user_id, theatre_seat)
+            self._update_ticket_with_hold_check(ticket_update, hold_step, hold_id, theatre_seat, commit_step)
+            await VersionService().bump(TICKETS, theatre_seat)
+            
             # Create transaction record
             transaction_data = {
                 'transactionId': transaction_id,
@@ -49,29 +98,21 @@ class TransactionService:
             # Save transaction
             self.transactions_table.put_item(Item=transaction_data)
             
-            # Update ticket status and owner
-            self.tickets_table.update_item(
-                Key={'Theatre-Seat': theatre_seat},
-                UpdateExpression='SET #status = :status, #owner = :owner, #purchasePrice = :price, #purchaseTimestamp = :timestamp',
-                ExpressionAttributeNames={
-                    '#status': 'status',
-                    '#owner': 'owner',
-                    '#purchasePrice': 'purchasePrice',
-                    '#purchaseTimestamp': 'purchaseTimestamp'
-                },
-                ExpressionAttributeValues={
-                    ':status': 'sold',
-                    ':owner': user_id,
-                    ':price': Decimal(str(purchase_price)),
-                    ':timestamp': timestamp
-                }
-            )
+            # ✅ LOCAL IMPORT - Import user_service only when needed to avoid circular import
+            from services.user_service import invalidate_user_summary
+            invalidate_user_summary(user_id)
             
             # ✅ LOCAL IMPORT - Import UserService only when needed to avoid circular import
             from services.user_service import UserService
             user_service = UserService()
             updated_payroll = await user_service.update_user_balance(user_id, -purchase_price, transaction_id)
             
+            try:
+                await RollupService().record_purchase(user_id, ticket.get('Movie'), transaction_data['amount'], timestamp)
+            except Exception as rollup_error:
+                # Reports can be repaired by the backfill job; never fail the purchase for them
+                logger.error(f"Failed to update revenue rollups: {str(rollup_error)}")
+            
             return {
                 'transaction_id': transaction_id,
                 'user_balance': updated_payroll['currentBalance'],
@@ -82,8 +123,35 @@ class TransactionService:
             logger.error(f"Error processing ticket purchase: {str(e)}")
             raise
 
-    async def process_ticket_sale(self, seller_id: str, buyer_id: str, theatre_seat: str, sale_price: float) -> Dict:
-        """Process a ticket sale between two users"""
+    def _update_ticket_with_hold_check(self, ticket_update: Dict, hold_step: Dict, hold_id: Optional[str], theatre_seat: str, commit_step: Optional[Dict] = None) -> None:
+        """Apply the ticket update in one transaction with the seat-holds step and any commit step.
+
+        With a hold the step deletes it; without one it checks that nobody
+        else holds the seat.
+        """
+        
+        client = self.tickets_table.meta.client
+        transact_items = [{'Update': dict(ticket_update, TableName=self.tickets_table.name)}, hold_step]
+        if commit_step:
+            transact_items.append(commit_step)
+        
+        try:
+            client.transact_write_items(TransactItems=transact_items)
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [{}, {}, {}])
+            if reasons[0].get('Code') == 'ConditionalCheckFailed':
+                raise Exception("Ticket already sold")
+            if reasons[1].get('Code') == 'ConditionalCheckFailed':
+                if hold_id:
+                    raise SeatHoldRequiredError("Seat hold is missing, expired or belongs to another user")
+                raise SeatUnavailableError([theatre_seat])
+            raise _lost_claim(reasons[2:], e)
+
+    async def process_ticket_sale(self, seller_id: str, buyer_id: str, theatre_seat: str, sale_price: float, commit_step: Optional[Dict] = None) -> Dict:
+        """Process a ticket sale between two users.
+
+        `commit_step`, from IdempotencyService.run, joins the ownership update's transaction.
+        """
         
         # Verify seller owns the ticket
         ticket_response = self.tickets_table.get_item(Key={'Theatre-Seat': theatre_seat})
@@ -127,30 +195,48 @@ class TransactionService:
                 'description': f"Purchased ticket for {ticket.get('Movie')} - Seat {theatre_seat} from {seller_id}"
             }
             
-            # Save both transactions
-            self.transactions_table.put_item(Item=seller_transaction)
-            self.transactions_table.put_item(Item=buyer_transaction)
-            
-            # Update ticket ownership
+            # Transfer the ticket first: the condition stops a seller who no longer owns it,
+            # and the transaction carries the idempotency commit step
             original_purchase_price = ticket.get('purchasePrice', Decimal('0'))
-            self.tickets_table.update_item(
-                Key={'Theatre-Seat': theatre_seat},
-                UpdateExpression='SET #owner = :new_owner, #salePrice = :sale_price, #saleTimestamp = :timestamp, #previousOwner = :previous_owner, #originalPurchasePrice = :original_price',
-                ExpressionAttributeNames={
+            ownership_update = {
+                'TableName': self.tickets_table.name,
+                'Key': {'Theatre-Seat': theatre_seat},
+                'UpdateExpression': 'SET #owner = :new_owner, #salePrice = :sale_price, #saleTimestamp = :timestamp, #previousOwner = :previous_owner, #originalPurchasePrice = :original_price',
+                'ConditionExpression': '#owner = :previous_owner',
+                'ExpressionAttributeNames': {
                     '#owner': 'owner',
                     '#salePrice': 'salePrice',
                     '#saleTimestamp': 'saleTimestamp',
                     '#previousOwner': 'previousOwner',
                     '#originalPurchasePrice': 'originalPurchasePrice'
                 },
-                ExpressionAttributeValues={
+                'ExpressionAttributeValues': {
                     ':new_owner': buyer_id,
                     ':sale_price': Decimal(str(sale_price)),
                     ':timestamp': timestamp,
                     ':previous_owner': seller_id,
                     ':original_price': original_purchase_price
                 }
-            )
+            }
+            client = self.tickets_table.meta.client
+            try:
+                client.transact_write_items(TransactItems=[{'Update': ownership_update}] + ([commit_step] if commit_step else []))
+            except client.exceptions.TransactionCanceledException as e:
+                reasons = e.response.get('CancellationReasons', [{}, {}])
+                if reasons[0].get('Code') == 'ConditionalCheckFailed':
+                    raise Exception("Seller does not own this ticket")
+                raise _lost_claim(reasons[1:], e)
+            
+            # Save both transactions
+            self.transactions_table.put_item(Item=seller_transaction)
+            self.transactions_table.put_item(Item=buyer_transaction)
+            
+            # ✅ LOCAL IMPORT - Import user_service only when needed to avoid circular import
+            from services.user_service import invalidate_user_summary
+            invalidate_user_summary(seller_id)
+            invalidate_user_summary(buyer_id)
+            
+            await VersionService().bump(TICKETS, theatre_seat)
             
             # ✅ LOCAL IMPORT - Import UserService only when needed to avoid circular import
             from services.user_service import UserService
@@ -158,6 +244,11 @@ class TransactionService:
             seller_payroll = await user_service.update_user_balance(seller_id, sale_price, seller_transaction_id)
             buyer_payroll = await user_service.update_user_balance(buyer_id, -sale_price, buyer_transaction_id)
             
+            try:
+                await RollupService().record_resale(seller_id, buyer_id, ticket.get('Movie'), seller_transaction['amount'], timestamp)
+            except Exception as rollup_error:
+                logger.error(f"Failed to update revenue rollups: {str(rollup_error)}")
+            
             return {
                 'seller_transaction_id': seller_transaction_id,
                 'buyer_transaction_id': buyer_transaction_id,
@@ -169,33 +260,77 @@ class TransactionService:
             logger.error(f"Error processing ticket sale: {str(e)}")
             raise
 
+    def _user_transactions_query(self, user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, newest_first: bool = True) -> Dict:
+        """Build UserTransactionsIndex query parameters for a user and date range"""
+        
+        query_params = {
+            'IndexName': 'UserTransactionsIndex',
+            'KeyConditionExpression': 'userId = :user_id',
+            'ExpressionAttributeValues': {':user_id': user_id},
+            'ScanIndexForward': not newest_first
+        }
+        
+        if start_date and end_date:
+            query_params['KeyConditionExpression'] += ' AND #timestamp BETWEEN :start_date AND :end_date'
+        elif start_date:
+            query_params['KeyConditionExpression'] += ' AND #timestamp >= :start_date'
+        elif end_date:
+            query_params['KeyConditionExpression'] += ' AND #timestamp <= :end_date'
+        
+        if start_date or end_date:
+            query_params['ExpressionAttributeNames'] = {'#timestamp': 'timestamp'}
+        if start_date:
+            query_params['ExpressionAttributeValues'][':start_date'] = start_date
+        if end_date:
+            query_params['ExpressionAttributeValues'][':end_date'] = end_date
+        
+        return query_params
+
     async def get_user_transactions(self, user_id: str, limit: int = 50, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
         """Get transaction history for a user"""
         
+        items, _ = await self.get_user_transactions_page(user_id, limit, start_date=start_date, end_date=end_date)
+        return items
+
+    async def get_user_transactions_page(self, user_id: str, limit: int = 50, cursor: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of a user's transaction history and the cursor for the next page"""
+        
+        exclusive_start_key = decode_cursor(cursor)
+        if exclusive_start_key and exclusive_start_key.get('userId') != user_id:
+            raise ValueError("Invalid pagination cursor")
+        
         try:
-            query_params = {
-                'IndexName': 'UserTransactionsIndex',
-                'KeyConditionExpression': 'userId = :user_id',
-                'ExpressionAttributeValues': {':user_id': user_id},
-                'ScanIndexForward': False,  # Most recent first
-                'Limit': limit
-            }
-            
-            if start_date and end_date:
-                query_params['KeyConditionExpression'] += ' AND #timestamp BETWEEN :start_date AND :end_date'
-                query_params['ExpressionAttributeNames'] = {'#timestamp': 'timestamp'}
-                query_params['ExpressionAttributeValues'].update({
-                    ':start_date': start_date,
-                    ':end_date': end_date
-                })
-            
-            response = self.transactions_table.query(**query_params)
-            return response.get('Items', [])
+            return self.query_user_transactions(user_id, limit, exclusive_start_key, start_date, end_date)
             
         except Exception as e:
             logger.error(f"Error retrieving user transactions: {str(e)}")
             raise
 
+    def query_user_transactions(self, user_id: str, limit: int, exclusive_start_key: Optional[Dict] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Blocking single-page query of a user's history, most recent first"""
+        
+        query_params = self._user_transactions_query(user_id, start_date, end_date)
+        query_params['Limit'] = limit
+        if exclusive_start_key:
+            query_params['ExclusiveStartKey'] = exclusive_start_key
+        
+        response = self.transactions_table.query(**query_params)
+        return response.get('Items', []), encode_cursor(response.get('LastEvaluatedKey'))
+
+    def iter_user_transactions(self, user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = 500) -> Iterator[Dict]:
+        """Yield a user's full ledger oldest first, one GSI page in memory at a time"""
+        
+        query_params = self._user_transactions_query(user_id, start_date, end_date, newest_first=False)
+        query_params['Limit'] = page_size
+        
+        while True:
+            response = self.transactions_table.query(**query_params)
+            yield from response.get('Items', [])
+            
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
     async def get_transaction_by_id(self, transaction_id: str) -> Optional[Dict]:
         """Get a specific transaction by ID"""
         
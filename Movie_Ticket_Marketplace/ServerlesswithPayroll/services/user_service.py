@@ -1,17 +1,46 @@
-import boto3
+import asyncio
+import os
 import logging
 from decimal import Decimal
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from services.idempotency_service import IdempotencyInProgressError
+from services.leaderboard_service import get_leaderboard
+from services.version_service import USERS, VersionService
+from utils.cache import TTLCache
+from utils.database import get_table, get_thread_table
+
 logger = logging.getLogger(__name__)
 
+# Number of transactions included in a user summary
+RECENT_TRANSACTIONS_LIMIT = 5
+
+# Short-lived per-process summary cache; disabled unless a TTL is configured
+summary_cache = TTLCache(float(os.environ.get('USER_SUMMARY_CACHE_TTL_SECONDS', '0')))
+
+def invalidate_user_summary(user_id: str) -> None:
+    """Drop any cached summary for a user after their payroll or history changes"""
+    summary_cache.invalidate(user_id)
+
+def _apply_to_leaderboard(user: Dict) -> None:
+    """Update the user's leaderboard entry after a write that has already succeeded"""
+    try:
+        get_leaderboard().apply(user)
+    except Exception as e:
+        # The leaderboard is rebuilt from the table on its next refresh
+        logger.error(f"Failed to update leaderboard for {user.get('userId')}: {str(e)}")
+
+
 class UserService:
     def __init__(self):
-        self.users_table = boto3.resource('dynamodb').Table('users-payroll')
+        self.users_table = get_table('users-payroll')
+
+    async def create_user(self, user_id: str, email: str, name: str, initial_balance: float = 0.0, commit_step: Optional[Dict] = None) -> Dict:
+        """Create a new user with payroll tracking.
 
-    async def create_user(self, user_id: str, email: str, name: str, initial_balance: float = 0.0) -> Dict:
-        """Create a new user with payroll tracking"""
+        `commit_step`, from IdempotencyService.run, joins the user's put in one transaction.
+        """
         
         timestamp = datetime.utcnow().isoformat()
         
@@ -28,18 +57,29 @@ class UserService:
             'status': 'ACTIVE'
         }
         
+        client = self.users_table.meta.client
         try:
-            # Check if user already exists
-            existing_user = self.users_table.get_item(Key={'userId': user_id})
-            if 'Item' in existing_user:
-                raise Exception("User already exists")
-            
-            self.users_table.put_item(Item=user_data)
-            return user_data
-            
+            # Conditional put so a concurrent balance upsert is never overwritten
+            put = {'Item': user_data, 'ConditionExpression': 'attribute_not_exists(userId)'}
+            if commit_step:
+                client.transact_write_items(TransactItems=[{'Put': dict(put, TableName=self.users_table.name)}, commit_step])
+            else:
+                self.users_table.put_item(**put)
+            
+        except (client.exceptions.ConditionalCheckFailedException, client.exceptions.TransactionCanceledException) as e:
+            reasons = e.response.get('CancellationReasons', [{'Code': 'ConditionalCheckFailed'}, {}])
+            if reasons[0].get('Code') != 'ConditionalCheckFailed':
+                logger.error("Error creating user: idempotency claim was lost")
+                raise IdempotencyInProgressError("A request with this Idempotency-Key is already in progress")
+            logger.error("Error creating user: User already exists")
+            raise Exception("User already exists")
         except Exception as e:
             logger.error(f"Error creating user: {str(e)}")
             raise
+        
+        _apply_to_leaderboard(user_data)
+        await VersionService().bump(USERS, user_id)
+        return user_data
 
     async def get_user_payroll(self, user_id: str) -> Optional[Dict]:
         """Get user's current payroll status"""
@@ -53,61 +93,95 @@ class UserService:
             raise
 
     async def update_user_balance(self, user_id: str, amount: float, transaction_id: str) -> Dict:
-        """Update user's balance and transaction counters"""
+        """Update user's balance and transaction counters.
+
+        Runs as a single UpdateItem: counters and profile defaults are
+        initialised with if_not_exists, so a first-time user is created by
+        the same atomic write that applies the amount.
+        """
         
         timestamp = datetime.utcnow().isoformat()
         amount_decimal = Decimal(str(amount))
         
         try:
-            # Ensure user exists
-            user = await self.get_user_payroll(user_id)
-            if not user:
-                # Create user if doesn't exist
-                await self.create_user(user_id, f"{user_id}@example.com", f"User {user_id}")
-            
             if amount > 0:
                 # Positive amount (sale/income)
-                update_expression = 'SET currentBalance = currentBalance + :amount, totalSales = totalSales + :amount, totalTransactions = totalTransactions + :one, lastUpdated = :timestamp, lastTransactionId = :transaction_id'
+                sale_amount, purchase_amount = amount_decimal, Decimal('0')
             else:
                 # Negative amount (purchase/expense)
-                update_expression = 'SET currentBalance = currentBalance + :amount, totalPurchases = totalPurchases + :abs_amount, totalTransactions = totalTransactions + :one, lastUpdated = :timestamp, lastTransactionId = :transaction_id'
+                sale_amount, purchase_amount = Decimal('0'), abs(amount_decimal)
+            
+            update_expression = (
+                'SET currentBalance = if_not_exists(currentBalance, :zero) + :amount, '
+                'totalSales = if_not_exists(totalSales, :zero) + :sale_amount, '
+                'totalPurchases = if_not_exists(totalPurchases, :zero) + :purchase_amount, '
+                'totalTransactions = if_not_exists(totalTransactions, :zero) + :one, '
+                'email = if_not_exists(email, :email), '
+                '#name = if_not_exists(#name, :name), '
+                '#status = if_not_exists(#status, :status), '
+                'createdAt = if_not_exists(createdAt, :timestamp), '
+                'lastUpdated = :timestamp, lastTransactionId = :transaction_id'
+            )
             
             expression_attribute_values = {
                 ':amount': amount_decimal,
+                ':sale_amount': sale_amount,
+                ':purchase_amount': purchase_amount,
+                ':zero': 0,
                 ':one': 1,
+                ':email': f"{user_id}@example.com",
+                ':name': f"User {user_id}",
+                ':status': 'ACTIVE',
                 ':timestamp': timestamp,
                 ':transaction_id': transaction_id
             }
             
-            if amount < 0:
-                expression_attribute_values[':abs_amount'] = abs(amount_decimal)
-            
             response = self.users_table.update_item(
                 Key={'userId': user_id},
                 UpdateExpression=update_expression,
+                ExpressionAttributeNames={'#name': 'name', '#status': 'status'},
                 ExpressionAttributeValues=expression_attribute_values,
                 ReturnValues='ALL_NEW'
             )
             
-            return response['Attributes']
-            
         except Exception as e:
             logger.error(f"Error updating user balance: {str(e)}")
             raise
+        
+        # The balance is already written, so nothing past this point may fail the caller
+        _apply_to_leaderboard(response['Attributes'])
+        invalidate_user_summary(user_id)
+        await VersionService().bump(USERS, user_id)
+        
+        return response['Attributes']
 
     async def get_user_summary(self, user_id: str) -> Optional[Dict]:
         """Get comprehensive user summary"""
         
+        cached = summary_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         try:
-            # Get payroll data
-            payroll = await self.get_user_payroll(user_id)
-            if not payroll:
-                return None
-            
             # ✅ LOCAL IMPORT - Import TransactionService only when needed to avoid circular import
             from services.transaction_service import TransactionService
-            transaction_service = TransactionService()
-            recent_transactions = await transaction_service.get_user_transactions(user_id, limit=10)
+            
+            # Payroll and recent history are independent reads, so issue them together,
+            # each on its worker thread's own tables rather than this service's shared ones
+            def read_payroll():
+                return get_thread_table('users-payroll').get_item(Key={'userId': user_id})
+            
+            def read_recent_transactions():
+                return TransactionService(get_thread_table).query_user_transactions(user_id, RECENT_TRANSACTIONS_LIMIT)
+            
+            payroll_response, (recent_transactions, _) = await asyncio.gather(
+                asyncio.to_thread(read_payroll),
+                asyncio.to_thread(read_recent_transactions)
+            )
+            
+            payroll = payroll_response.get('Item')
+            if not payroll:
+                return None
             
             # Calculate additional metrics
             current_balance = float(payroll.get('currentBalance', 0))
@@ -132,55 +206,37 @@ class UserService:
                     'total_transactions': payroll.get('totalTransactions', 0),
                     'is_net_positive': net_profit_loss > 0
                 },
-                'recent_transactions': recent_transactions[:5]  # Last 5 transactions
+                'recent_transactions': recent_transactions
             }
             
+            summary_cache.set(user_id, summary)
             return summary
             
         except Exception as e:
             logger.error(f"Error retrieving user summary: {str(e)}")
             raise
 
-    async def get_payroll_leaderboard(self, limit: int = 10, order: str = "desc") -> List[Dict]:
+    async def get_payroll_leaderboard(self, limit: int = 10, order: str = "desc", offset: int = 0) -> List[Dict]:
         """Get leaderboard of users by net payroll"""
         
         try:
-            response = self.users_table.scan()
-            users = response.get('Items', [])
-            
-            # Handle pagination
-            while 'LastEvaluatedKey' in response:
-                response = self.users_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-                users.extend(response.get('Items', []))
-            
-            # Calculate net profit/loss for each user
-            for user in users:
-                total_sales = float(user.get('totalSales', 0))
-                total_purchases = float(user.get('totalPurchases', 0))
-                user['netProfitLoss'] = total_sales - total_purchases
-                user['currentBalance'] = float(user.get('currentBalance', 0))
-            
-            # Sort by net profit/loss
-            reverse_order = order.lower() == "desc"
-            sorted_users = sorted(users, key=lambda x: x['netProfitLoss'], reverse=reverse_order)
-            
-            # Return top users with relevant info
-            leaderboard = []
-            for i, user in enumerate(sorted_users[:limit]):
-                leaderboard.append({
-                    'rank': i + 1,
-                    'userId': user.get('userId'),
-                    'name': user.get('name'),
-                    'currentBalance': user['currentBalance'],
-                    'netProfitLoss': user['netProfitLoss'],
-                    'totalTransactions': user.get('totalTransactions', 0),
-                    'totalSales': float(user.get('totalSales', 0)),
-                    'totalPurchases': float(user.get('totalPurchases', 0)),
-                    'isNetPositive': user['netProfitLoss'] > 0
-                })
-            
-            return leaderboard
+            return get_leaderboard().get_page(limit=limit, offset=offset, order=order)
             
         except Exception as e:
             logger.error(f"Error retrieving payroll leaderboard: {str(e)}")
             raise
+
+    async def get_user_rank(self, user_id: str, order: str = "desc") -> Optional[Dict]:
+        """Get a user's leaderboard entry and rank by net payroll"""
+        
+        try:
+            return get_leaderboard().get_rank(user_id, order)
+            
+        except Exception as e:
+            logger.error(f"Error retrieving user rank: {str(e)}")
+            raise
+
+    async def get_leaderboard_size(self) -> int:
+        """Get the number of ranked users"""
+        
+        return get_leaderboard().total_users()
@@ -0,0 +1,174 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from utils.database import get_table, get_thread_table
+
+logger = logging.getLogger(__name__)
+
+TICKETS = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
+USERS = 'users-payroll'
+# Change records expire through the table's TTL on expiresAt; a reader further behind must rescan
+CHANGE_RETENTION_SECONDS = int(os.environ.get('CHANGE_RETENTION_SECONDS', str(24 * 3600)))
+# Every app that bumps or reads a table's version must use the same count (local/ reads these feeds too)
+VERSION_SHARDS = int(os.environ.get('VERSION_SHARDS', '8'))
+BUMP_ATTEMPTS = int(os.environ.get('VERSION_BUMP_ATTEMPTS', '3'))
+BUMP_RETRY_DELAY_SECONDS = 0.05
+
+T = TypeVar('T')
+
+# Version keys whose last bump in this process failed; no ETag is served for them until one succeeds
+_invalidated: Set[str] = set()
+
+
+def version_key(resource: str, item_id: Optional[str] = None) -> str:
+    return f"{resource}#{item_id}" if item_id else resource
+
+
+def shard_key(resource: str, shard: int) -> str:
+    """Counter and change feed of one shard; shard 0 keeps the unsharded name, so older counters carry on"""
+    return f"{resource}@{shard}" if shard else resource
+
+
+class VersionService:
+    """Change counters for tables and items, used as ETags.
+
+    Every write bumps the counter of the table and of the item it touched,
+    so a conditional GET costs one small read instead of a scan. Readers
+    must fetch the version before the data: reading it afterwards could pair
+    stale data with the newer ETag and pin it in client caches.
+
+    A table's counter is split into VERSION_SHARDS items and each bump adds
+    one to a random shard, so no single item takes every write to the table.
+    The table's version is the sum of its shards. Each bump also appends the
+    ids it covered to the shard's change feed, under the shard's new count
+    as sequence number, so a reader holding a copy of the table as of some
+    count per shard can catch up by reading the items changed after them.
+
+    A bump that still fails after retries withholds the ETags it should have
+    changed, in this process, until a later bump of the same key succeeds,
+    so clients are not told 304 about data they have not seen.
+    """
+
+    def __init__(self, open_table=get_table):
+        # Pass get_thread_table when the service is built and used inside a worker thread
+        self.versions_table = open_table(os.environ.get('VERSIONS_TABLE', 'resource-versions'))
+        self.changes_table = open_table(os.environ.get('CHANGES_TABLE', 'resource-changes'))
+
+    def get_version(self, resource: str, item_id: Optional[str] = None) -> Optional[int]:
+        """Current version, or None if nothing has been written since versioning began"""
+
+        key = version_key(resource, item_id)
+        if key in _invalidated:
+            return None
+        if item_id is None:
+            sequences = self.get_sequences(resource)
+            return sum(sequences.values()) if sequences else None
+
+        response = self.versions_table.get_item(Key={'versionKey': key}, ProjectionExpression='version')
+        item = response.get('Item')
+        return int(item['version']) if item else None
+
+    async def bump(self, resource: str, item_id: Optional[str] = None) -> None:
+        """Invalidate ETags for the table and, if given, the item"""
+
+        await self.bump_items(resource, [item_id] if item_id else [])
+
+    async def bump_items(self, resource: str, item_ids: Iterable[str]) -> None:
+        """Invalidate ETags for the table once and for each of the items, and record the change"""
+
+        await asyncio.to_thread(_bump_on_worker_thread, resource, list(item_ids))
+
+    def bump_items_sync(self, resource: str, item_ids: Iterable[str]) -> None:
+        """bump_items for callers that are not coroutines, such as a write-behind flush thread"""
+
+        item_ids = list(item_ids)
+        # Each attempt picks its own shard, so one throttled shard does not fail the bump
+        bumped = self._with_retries(f"bump version of {resource}", lambda: self._increment_shard(resource))
+        self._settle(version_key(resource), bumped is not None)
+        for item_id in item_ids:
+            key = version_key(resource, item_id)
+            self._settle(key, self._with_retries(f"bump version of {key}", lambda: self._increment(key)) is not None)
+
+        if bumped is not None:
+            # Recorded even with no ids, so a reader can tell a gap in the sequence from a lost record.
+            # If it is lost anyway, readers skip the gap and pick the items up at their next full reload.
+            shard, sequence = bumped
+            self._with_retries(f"record change {sequence} of {shard_key(resource, shard)}",
+                               lambda: self._record_change(shard_key(resource, shard), sequence, item_ids))
+
+    def get_sequences(self, resource: str) -> Dict[int, int]:
+        """Count of each shard of the table's counter that exists, by shard number"""
+
+        shards = {shard_key(resource, shard): shard for shard in range(VERSION_SHARDS)}
+        client = self.versions_table.meta.client
+        request = {self.versions_table.name: {
+            'Keys': [{'versionKey': key} for key in shards],
+            'ProjectionExpression': 'versionKey, version'
+        }}
+        sequences = {}
+        delay = BUMP_RETRY_DELAY_SECONDS
+        while True:
+            response = client.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(self.versions_table.name, []):
+                sequences[shards[item['versionKey']]] = int(item['version'])
+            request = response.get('UnprocessedKeys')
+            if not request:
+                return sequences
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def _increment_shard(self, resource: str) -> Tuple[int, int]:
+        """(shard, its new count) after adding one to a random shard"""
+
+        shard = random.randrange(VERSION_SHARDS)
+        return shard, self._increment(shard_key(resource, shard))
+
+    def _increment(self, key: str) -> int:
+        response = self.versions_table.update_item(
+            Key={'versionKey': key},
+            UpdateExpression='ADD version :one',
+            ExpressionAttributeValues={':one': 1},
+            ReturnValues='UPDATED_NEW'
+        )
+        return int(response['Attributes']['version'])
+
+    def _record_change(self, feed: str, sequence: int, item_ids: List[str]) -> int:
+        self.changes_table.put_item(Item={
+            'resource': feed,
+            'sequence': sequence,
+            'itemIds': item_ids,
+            'expiresAt': int(time.time()) + CHANGE_RETENTION_SECONDS
+        })
+        return sequence
+
+    @staticmethod
+    def _with_retries(description: str, write: Callable[[], T]) -> Optional[T]:
+        """write()'s result, retrying with backoff; None once every attempt has failed"""
+
+        delay = BUMP_RETRY_DELAY_SECONDS
+        for attempt in range(1, BUMP_ATTEMPTS + 1):
+            try:
+                return write()
+            except Exception as e:
+                if attempt == BUMP_ATTEMPTS:
+                    # The write itself succeeded; only its ETags are affected
+                    logger.error(f"Failed to {description} after {attempt} attempts: {str(e)}")
+                    return None
+                time.sleep(delay)
+                delay *= 2
+
+    @staticmethod
+    def _settle(key: str, bumped: bool) -> None:
+        if bumped:
+            _invalidated.discard(key)
+        else:
+            _invalidated.add(key)
+
+
+def _bump_on_worker_thread(resource: str, item_ids: List[str]) -> None:
+    # The round trips block, so they run off the event loop, on tables of the worker thread's own
+    VersionService(get_thread_table).bump_items_sync(resource, item_ids)
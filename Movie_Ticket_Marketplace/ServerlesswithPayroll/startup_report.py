@@ -0,0 +1,134 @@
+"""Report where Lambda init time goes for app.handler.
+
+Each run starts a fresh interpreter, the way a cold Lambda container does,
+imports app with -X importtime and then serves one /health request through
+the Mangum handler. Usage:
+
+    python startup_report.py [--runs 5] [--top 15] [--eager] [--json report.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCAL_PACKAGES = ('app', 'handlers', 'services', 'utils')
+
+# Runs in the child interpreter; prints one JSON line of timings in ms
+CHILD = r'''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+event = {
+    "version": "2.0", "routeKey": "GET /health", "rawPath": "/health", "rawQueryString": "",
+    "headers": {"host": "localhost"}, "isBase64Encoded": False,
+    "requestContext": {"http": {"method": "GET", "path": "/health", "sourceIp": "127.0.0.1", "protocol": "HTTP/1.1"}, "stage": "$default"}
+}
+app.handler(event, type("Context", (), {})())
+served = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_request_ms": (served - imported) * 1000}))
+'''
+
+
+def run_once(eager: bool) -> Dict:
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env.setdefault('AWS_LAMBDA_FUNCTION_NAME', 'startup-report')
+    env['DEFER_ROUTER_IMPORTS'] = 'false' if eager else 'true'
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({
+            'module': name.strip(),
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000
+        })
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {**timings, 'modules': modules}
+
+
+def summarize(runs: List[Dict], top: int) -> Dict:
+    by_module = defaultdict(list)
+    by_package = defaultdict(list)
+
+    for run in runs:
+        package_totals = defaultdict(float)
+        for module in run['modules']:
+            by_module[module['module']].append(module)
+            package_totals[module['module'].split('.')[0]] += module['self_ms']
+        for package, total in package_totals.items():
+            by_package[package].append(total)
+
+    def median(values):
+        return round(statistics.median(values), 1)
+
+    local_modules = [
+        {
+            'module': name,
+            'self_ms': median([m['self_ms'] for m in samples]),
+            'cumulative_ms': median([m['cumulative_ms'] for m in samples])
+        }
+        for name, samples in by_module.items()
+        if name.split('.')[0] in LOCAL_PACKAGES
+    ]
+
+    return {
+        'runs': len(runs),
+        'import_ms': median([run['import_ms'] for run in runs]),
+        'first_request_ms': median([run['first_request_ms'] for run in runs]),
+        'packages': sorted(
+            ({'package': name, 'self_ms': median(values)} for name, values in by_package.items()),
+            key=lambda row: row['self_ms'], reverse=True
+        )[:top],
+        'local_modules': sorted(local_modules, key=lambda row: row['cumulative_ms'], reverse=True)
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"Cold start over {report['runs']} runs (median)")
+    print(f"  import app          {report['import_ms']:8.1f} ms")
+    print(f"  first /health call  {report['first_request_ms']:8.1f} ms")
+
+    print("\nImport cost by top-level package (self time)")
+    for row in report['packages']:
+        print(f"  {row['package']:<32} {row['self_ms']:8.1f} ms")
+
+    print("\nApplication modules (cumulative includes module-level init)")
+    for row in report['local_modules']:
+        print(f"  {row['module']:<32} {row['cumulative_ms']:8.1f} ms  (self {row['self_ms']:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and init cost of app.handler")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="Number of third-party packages to list")
+    parser.add_argument('--eager', action='store_true', help="Import every router at startup")
+    parser.add_argument('--json', dest='json_path', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = summarize([run_once(args.eager) for _ in range(args.runs)], args.top)
+    report['deferred_routers'] = not args.eager
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# The app imports its packages from the ServerlesswithPayroll/ directory, and the tests run without AWS
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('PRICE_CHANGE_TOPIC_ARN', '')
+
+from services import leaderboard_service, user_service, version_service  # noqa: E402
+from utils import database  # noqa: E402
+
+TICKETS = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    """A fresh in-memory store, leaderboard, summary cache and ETag state for every test"""
+    database.get_dynamodb.cache_clear()
+    leaderboard_service._leaderboard = None
+    user_service.summary_cache.clear()
+    version_service._invalidated.clear()
+    yield
+    database.get_dynamodb.cache_clear()
+    leaderboard_service._leaderboard = None
+    version_service._invalidated.clear()
+
+
+@pytest.fixture
+def put_ticket():
+    def put(theatre_seat: str, movie: str = 'Dune', price: int = 300, **attributes):
+        item = {'Theatre-Seat': theatre_seat, 'Movie': movie, 'Price': price, **attributes}
+        database.get_table(TICKETS).put_item(Item=item)
+        return item
+    return put
@@ -0,0 +1,145 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from services import idempotency_service
+from utils.database import get_table
+from utils.memory_store import MemoryTable
+
+PURCHASE = {'user_id': 'alice', 'theatre_seat': '1-A1', 'purchase_price': 300, 'payment_method': 'cash'}
+
+
+@pytest.fixture
+def client():
+    return TestClient(app.app)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(idempotency_service, 'COMPLETION_RETRY_DELAY_SECONDS', 0)
+
+
+@pytest.fixture
+def failing_completions(monkeypatch):
+    """Make the next `count` COMPLETED puts to the idempotency table fail"""
+    put_item = MemoryTable.put_item
+    remaining = []
+
+    def flaky_put_item(self, *, Item, **kwargs):
+        if self.name == 'idempotency-keys' and Item.get('status') == 'COMPLETED' and remaining and remaining[0] > 0:
+            remaining[0] -= 1
+            raise RuntimeError('ProvisionedThroughputExceededException')
+        return put_item(self, Item=Item, **kwargs)
+
+    monkeypatch.setattr(MemoryTable, 'put_item', flaky_put_item)
+    return lambda count: remaining.append(count)
+
+
+def record(key, scope='purchase-ticket'):
+    return get_table('idempotency-keys').get_item(Key={'idempotencyKey': f'{scope}#{key}'}).get('Item')
+
+
+def balance(user_id):
+    return get_table('users-payroll').get_item(Key={'userId': user_id})['Item']['currentBalance']
+
+
+def purchase(client, key, body=PURCHASE):
+    return client.post('/api/purchase-ticket', json=body, headers={'Idempotency-Key': key})
+
+
+def test_replay_returns_the_first_response_without_running_again(client, put_ticket):
+    put_ticket('1-A1')
+
+    first = purchase(client, 'k1')
+    second = purchase(client, 'k1')
+
+    assert first.status_code == second.status_code == 201
+    assert second.content == first.content
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert balance('alice') == -300
+    assert record('k1')['status'] == 'COMPLETED'
+
+
+def test_key_reused_with_another_payload_is_rejected(client, put_ticket):
+    put_ticket('1-A1')
+    purchase(client, 'k1')
+
+    assert purchase(client, 'k1', {**PURCHASE, 'purchase_price': 1}).status_code == 422
+
+
+def test_key_in_flight_is_a_conflict(client, put_ticket):
+    put_ticket('1-A1')
+    assert purchase(client, 'k1').status_code == 201
+    item = record('k1')
+    get_table('idempotency-keys').put_item(Item={**item, 'status': 'IN_PROGRESS', 'lockExpiresAt': int(time.time()) + 60})
+
+    assert purchase(client, 'k1').status_code == 409
+
+
+def test_failure_before_commit_releases_the_key(client, put_ticket):
+    assert purchase(client, 'k1').status_code == 500  # no such ticket yet
+    assert record('k1') is None
+
+    put_ticket('1-A1')
+    assert purchase(client, 'k1').status_code == 201
+
+
+def test_completion_write_is_retried(client, put_ticket, no_backoff, failing_completions):
+    put_ticket('1-A1')
+    failing_completions(idempotency_service.COMPLETION_ATTEMPTS - 1)
+
+    first = purchase(client, 'k1')
+
+    assert first.status_code == 201
+    assert record('k1')['status'] == 'COMPLETED'
+    assert purchase(client, 'k1').content == first.content
+
+
+def test_failed_completion_write_never_lets_the_purchase_run_twice(client, put_ticket, no_backoff, failing_completions):
+    put_ticket('1-A1')
+    failing_completions(idempotency_service.COMPLETION_ATTEMPTS)
+
+    assert purchase(client, 'k1').status_code == 201
+    assert record('k1')['status'] == 'COMMITTED'
+
+    # Even once the in-flight lock would have lapsed, the committed key is not reclaimed
+    get_table('idempotency-keys').update_item(
+        Key={'idempotencyKey': 'purchase-ticket#k1'},
+        UpdateExpression='SET lockExpiresAt = :past',
+        ExpressionAttributeValues={':past': int(time.time()) - 1}
+    )
+    assert purchase(client, 'k1').status_code == 409
+    assert balance('alice') == -300
+
+
+def test_failure_after_commit_keeps_the_key(client, put_ticket, monkeypatch):
+    from services.user_service import UserService
+
+    async def broken_balance_update(*args, **kwargs):
+        raise RuntimeError('users table unavailable')
+
+    put_ticket('1-A1')
+    monkeypatch.setattr(UserService, 'update_user_balance', broken_balance_update)
+
+    assert purchase(client, 'k1').status_code == 500
+    assert record('k1')['status'] == 'COMMITTED'
+    assert purchase(client, 'k1').status_code == 409
+
+
+def test_create_user_and_sell_replay(client, put_ticket):
+    body = {'user_id': 'bob', 'email': 'bob@example.com', 'name': 'Bob', 'initial_balance': 1000}
+    created = client.post('/api/users', json=body, headers={'Idempotency-Key': 'u1'})
+    assert created.status_code == 201
+    assert client.post('/api/users', json=body, headers={'Idempotency-Key': 'u1'}).content == created.content
+    assert client.post('/api/users', json=body).status_code == 500  # already exists, no key
+
+    put_ticket('1-A1', owner='alice', status='sold')
+    sale = {'user_id': 'alice', 'buyer_id': 'bob', 'theatre_seat': '1-A1', 'sale_price': 250}
+    sold = client.post('/api/sell-ticket', json=sale, headers={'Idempotency-Key': 's1'})
+    assert sold.status_code == 201
+    assert client.post('/api/sell-ticket', json=sale, headers={'Idempotency-Key': 's1'}).content == sold.content
+    assert balance('bob') == 750
+    assert balance('alice') == 250
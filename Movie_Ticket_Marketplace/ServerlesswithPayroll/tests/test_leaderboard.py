@@ -0,0 +1,48 @@
+import asyncio
+
+from services.leaderboard_service import LeaderboardService, get_leaderboard
+from services.user_service import UserService
+from services.version_service import USERS, VersionService
+from utils.database import get_table
+
+
+def create_user(user_id, balance=1000):
+    return asyncio.run(UserService().create_user(user_id, f'{user_id}@example.com', user_id.title(), balance))
+
+
+def break_leaderboard(monkeypatch):
+    def broken_apply(self, user):
+        raise RuntimeError('leaderboard corrupted')
+
+    monkeypatch.setattr(LeaderboardService, 'apply', broken_apply)
+
+
+def test_balance_update_is_reflected_in_the_ranking():
+    create_user('alice')
+    create_user('bob')
+    assert get_leaderboard().get_rank('alice')['rank'] == 1  # loads the ranking
+
+    asyncio.run(UserService().update_user_balance('alice', -300, 't1'))
+
+    assert get_leaderboard().get_rank('alice')['rank'] == 2
+    assert get_leaderboard().get_rank('alice')['currentBalance'] == 700
+
+
+def test_failing_leaderboard_leaves_the_balance_update_successful(monkeypatch):
+    create_user('alice')
+    get_leaderboard().get_page()
+    version = VersionService().get_version(USERS, 'alice')
+    break_leaderboard(monkeypatch)
+
+    updated = asyncio.run(UserService().update_user_balance('alice', -300, 't1'))
+
+    assert updated['currentBalance'] == 700
+    assert get_table('users-payroll').get_item(Key={'userId': 'alice'})['Item']['currentBalance'] == 700
+    # The steps after the leaderboard still ran
+    assert VersionService().get_version(USERS, 'alice') == version + 1
+
+    # A user created while it is broken is stored too, and the next rebuild ranks both
+    create_user('bob')
+    get_leaderboard().rebuild()
+    assert [entry['userId'] for entry in get_leaderboard().get_page()] == ['bob', 'alice']
+    assert get_leaderboard().get_rank('alice')['currentBalance'] == 700
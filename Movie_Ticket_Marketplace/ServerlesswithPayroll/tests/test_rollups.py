@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+from services.rollup_service import ROLLUPS_TABLE, RollupService
+from services.transaction_service import TransactionService
+from utils.database import get_table
+
+USERS = ['alice', 'bob', 'carol']
+
+
+def purchase(user_id, theatre_seat, price):
+    asyncio.run(TransactionService().process_ticket_purchase(user_id, theatre_seat, price, 'credit_card'))
+
+
+def sell(seller_id, buyer_id, theatre_seat, price):
+    asyncio.run(TransactionService().process_ticket_sale(seller_id, buyer_id, theatre_seat, price))
+
+
+def reports():
+    """Every report the rollups answer for the test's movies and users"""
+    today, month = datetime.utcnow().strftime('%Y-%m-%d'), datetime.utcnow().strftime('%Y-%m')
+    service = RollupService()
+    return {
+        **{movie: asyncio.run(service.get_revenue_report(movie, today, today)) for movie in ('Dune', 'Heat', None)},
+        **{user_id: asyncio.run(service.get_user_report(user_id, month, month)) for user_id in USERS}
+    }
+
+
+def test_rollups_match_the_transaction_log(put_ticket):
+    put_ticket('1-A1', movie='Dune')
+    put_ticket('1-A2', movie='Dune')
+    put_ticket('2-B1', movie='Heat')
+    purchase('alice', '1-A1', 300)
+    purchase('bob', '1-A2', 250)
+    purchase('alice', '2-B1', 200)
+    sell('alice', 'carol', '1-A1', 320)
+
+    incremental = reports()
+
+    assert incremental['Dune']['totals'] == {'ticketsSold': 2, 'grossRevenue': 550, 'resaleCount': 1, 'resaleVolume': 320}
+    assert incremental[None]['totals']['grossRevenue'] == 750
+    assert incremental['alice']['totals'] == {'purchaseCount': 2, 'totalSpent': 500, 'saleCount': 1, 'totalEarned': 320}
+    assert incremental['carol']['totals'] == {'purchaseCount': 1, 'totalSpent': 320, 'saleCount': 0, 'totalEarned': 0}
+
+    # Recomputing from the log from scratch must land on the same counters
+    RollupService().rebuild_from_history(total_segments=3)
+    assert reports() == incremental
+
+
+def test_backfill_repairs_a_failed_rollup_update(put_ticket, monkeypatch):
+    put_ticket('1-A1', movie='Dune')
+    put_ticket('1-A2', movie='Dune')
+    purchase('alice', '1-A1', 300)
+
+    async def broken_record_purchase(*args, **kwargs):
+        raise RuntimeError('rollups table unavailable')
+
+    with monkeypatch.context() as patched:
+        patched.setattr(RollupService, 'record_purchase', broken_record_purchase)
+        purchase('bob', '1-A2', 250)  # still succeeds
+
+    assert reports()['Dune']['totals']['ticketsSold'] == 1
+    assert get_table('user-transactions').scan()['Count'] == 2
+
+    RollupService().rebuild_from_history(total_segments=2)
+
+    repaired = reports()
+    assert repaired['Dune']['totals']['ticketsSold'] == 2
+    assert repaired['Dune']['totals']['grossRevenue'] == Decimal('550')
+    assert repaired['bob']['totals']['totalSpent'] == 250
+    assert get_table(ROLLUPS_TABLE).scan()['Count'] == 4  # the movie, all movies and two users, today
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.seat_hold_service import SeatHoldRequiredError, SeatHoldService, SeatUnavailableError
+from services.transaction_service import TransactionService
+from utils.database import get_table
+
+
+def purchase(user_id, theatre_seat, hold_id=None):
+    return asyncio.run(TransactionService().process_ticket_purchase(
+        user_id=user_id, theatre_seat=theatre_seat, purchase_price=300,
+        payment_method='credit_card', hold_id=hold_id
+    ))
+
+
+def hold(user_id, *theatre_seats):
+    return asyncio.run(SeatHoldService().hold_seats(user_id, list(theatre_seats), hold_minutes=5))
+
+
+def expire(theatre_seat):
+    get_table('seat-holds').update_item(
+        Key={'theatreSeat': theatre_seat},
+        UpdateExpression='SET expiresAt = :past',
+        ExpressionAttributeValues={':past': int(time.time()) - 1}
+    )
+
+
+def ticket(theatre_seat):
+    return get_table().get_item(Key={'Theatre-Seat': theatre_seat})['Item']
+
+
+def test_purchase_with_own_hold_consumes_it(put_ticket):
+    put_ticket('1-A1')
+    held = hold('alice', '1-A1')
+
+    purchase('alice', '1-A1', held['hold_id'])
+
+    assert ticket('1-A1')['owner'] == 'alice'
+    assert 'Item' not in get_table('seat-holds').get_item(Key={'theatreSeat': '1-A1'})
+
+
+def test_hold_owned_by_another_user_blocks_a_purchase_without_hold(put_ticket):
+    put_ticket('1-A1')
+    hold('alice', '1-A1')
+
+    with pytest.raises(SeatUnavailableError):
+        purchase('bob', '1-A1')
+    assert ticket('1-A1').get('status') != 'sold'
+
+
+def test_hold_owned_by_another_user_blocks_a_purchase_with_its_id(put_ticket):
+    put_ticket('1-A1')
+    held = hold('alice', '1-A1')
+
+    with pytest.raises(SeatHoldRequiredError):
+        purchase('bob', '1-A1', held['hold_id'])
+    assert ticket('1-A1').get('status') != 'sold'
+
+
+def test_expired_hold_is_released(put_ticket):
+    put_ticket('1-A1')
+    put_ticket('1-A2')
+    held = hold('alice', '1-A1', '1-A2')
+    expire('1-A1')
+    expire('1-A2')
+
+    # Nor can its owner still use it
+    with pytest.raises(SeatHoldRequiredError):
+        purchase('alice', '1-A1', held['hold_id'])
+
+    purchase('bob', '1-A1')
+    assert ticket('1-A1')['owner'] == 'bob'
+    assert hold('carol', '1-A2')['theatre_seats'] == ['1-A2']
+    assert [h['theatreSeat'] for h in asyncio.run(SeatHoldService().get_active_holds('1'))] == ['1-A2']
+
+
+def test_seat_conflicts_are_409s(put_ticket):
+    import app
+
+    put_ticket('1-A1')
+    hold('alice', '1-A1')
+    client = TestClient(app.app)
+    body = {'user_id': 'bob', 'theatre_seat': '1-A1', 'purchase_price': 300, 'payment_method': 'cash'}
+
+    response = client.post('/api/purchase-ticket', json=body)
+    assert response.status_code == 409
+    assert response.json()['detail']['unavailable_seats'] == ['1-A1']
+
+    response = client.post('/api/purchase-ticket', json={**body, 'hold_id': 'not-a-hold'})
+    assert response.status_code == 409
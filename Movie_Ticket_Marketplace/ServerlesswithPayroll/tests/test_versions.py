@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from services import version_service
+from services.version_service import TICKETS, VersionService, shard_key
+from utils.database import get_table
+from utils.memory_store import MemoryTable
+
+
+@pytest.fixture
+def client():
+    return TestClient(app.app)
+
+
+@pytest.fixture
+def versions_down(monkeypatch):
+    """Call with True to make every write to the versions table fail, and with False to stop"""
+    update_item = MemoryTable.update_item
+    down = [False]
+
+    def flaky_update_item(self, **kwargs):
+        if self.name == 'resource-versions' and down[0]:
+            raise RuntimeError('ProvisionedThroughputExceededException')
+        return update_item(self, **kwargs)
+
+    monkeypatch.setattr(version_service, 'BUMP_RETRY_DELAY_SECONDS', 0)
+    monkeypatch.setattr(MemoryTable, 'update_item', flaky_update_item)
+    return lambda failing: down.__setitem__(0, failing)
+
+
+def create(client, theatre_seat):
+    assert client.post('/api/ticket', json={'theatre_seat': theatre_seat, 'movie': 'Dune', 'price': 300}).status_code == 201
+
+
+def get(client, path, etag=None):
+    return client.get(path, headers={'If-None-Match': etag} if etag else {})
+
+
+@pytest.mark.parametrize('path', ['/api/tickets', '/api/ticket?Theatre-Seat=1-A1'])
+def test_unchanged_resource_is_not_modified(client, path):
+    create(client, '1-A1')
+    etag = get(client, path).headers['ETag']
+
+    response = get(client, path, etag)
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.content == b''
+    assert response.headers['Vary'] == ('Accept, Accept-Encoding' if path == '/api/tickets' else 'Accept-Encoding')
+
+
+def test_write_invalidates_table_and_item_etags(client):
+    create(client, '1-A1')
+    create(client, '1-A2')
+    table_etag = get(client, '/api/tickets').headers['ETag']
+    item_etag = get(client, '/api/ticket?Theatre-Seat=1-A1').headers['ETag']
+    other_etag = get(client, '/api/ticket?Theatre-Seat=1-A2').headers['ETag']
+
+    patch = {'theatre_seat': '1-A1', 'update_key': 'Price', 'update_value': 350}
+    assert client.patch('/api/ticket', json=patch).status_code == 200
+
+    tickets = get(client, '/api/tickets', table_etag)
+    assert tickets.status_code == 200
+    assert tickets.headers['ETag'] != table_etag
+    assert get(client, '/api/tickets', tickets.headers['ETag']).status_code == 304
+    assert get(client, '/api/ticket?Theatre-Seat=1-A1', item_etag).status_code == 200
+    assert get(client, '/api/ticket?Theatre-Seat=1-A2', other_etag).status_code == 304
+
+
+def test_failed_bump_withholds_the_etags_it_should_have_changed(client, versions_down):
+    create(client, '1-A1')
+    table_etag = get(client, '/api/tickets').headers['ETag']
+    item_etag = get(client, '/api/ticket?Theatre-Seat=1-A1').headers['ETag']
+
+    versions_down(True)
+    patch = {'theatre_seat': '1-A1', 'update_key': 'Price', 'update_value': 350}
+    assert client.patch('/api/ticket', json=patch).status_code == 200
+    versions_down(False)
+
+    for path, etag in (('/api/tickets', table_etag), ('/api/ticket?Theatre-Seat=1-A1', item_etag)):
+        response = get(client, path, etag)
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
+    assert get(client, '/api/ticket?Theatre-Seat=1-A1').json()['Price'] == 350
+
+    # The next successful bump restores them, at a version the stale ones no longer match
+    create(client, '1-A1')
+    for path, etag in (('/api/tickets', table_etag), ('/api/ticket?Theatre-Seat=1-A1', item_etag)):
+        response = get(client, path, etag)
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+
+def test_table_version_is_spread_over_shards_with_a_dense_feed_each():
+    for number in range(40):
+        asyncio.run(VersionService().bump(TICKETS, f'1-A{number}'))
+
+    versions = get_table('resource-versions')
+    counts = {shard: int(versions.get_item(Key={'versionKey': shard_key(TICKETS, shard)}).get('Item', {}).get('version', 0))
+              for shard in range(version_service.VERSION_SHARDS)}
+    assert VersionService().get_version(TICKETS) == sum(counts.values()) == 40
+    assert sum(1 for count in counts.values() if count) > 1
+
+    changes = get_table('resource-changes')
+    for shard, count in counts.items():
+        recorded = changes.query(KeyConditionExpression='#resource = :resource',
+                                 ExpressionAttributeNames={'#resource': 'resource'},
+                                 ExpressionAttributeValues={':resource': shard_key(TICKETS, shard)})['Items']
+        assert [int(record['sequence']) for record in recorded] == list(range(1, count + 1))
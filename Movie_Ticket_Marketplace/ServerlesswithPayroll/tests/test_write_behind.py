@@ -0,0 +1,155 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from handlers import event_handler, events
+from services.version_service import TICKETS, VersionService
+from utils import write_behind
+from utils.database import get_table
+from utils.write_behind import WriteBehindBuffer, WriteBehindError
+
+
+class FlakyTable:
+    """A table whose update_item runs `before_update` first, which may raise to fail the write"""
+
+    def __init__(self, table, before_update=None):
+        self.table = table
+        self.name = table.name
+        self.before_update = before_update
+        self.updates = []
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs['Key'])
+        if self.before_update:
+            self.before_update(kwargs)
+        return self.table.update_item(**kwargs)
+
+
+@pytest.fixture
+def buffer_for():
+    buffers = []
+
+    def create(table, **kwargs):
+        # No background flushes: the tests flush when they mean to
+        buffers.append(WriteBehindBuffer(table, 'Theatre-Seat', flush_seconds=3600, **kwargs))
+        return buffers[-1]
+
+    yield create
+    for buffer in buffers:
+        buffer.close()
+
+
+@pytest.fixture
+def derived_writes():
+    events.get_derived_writes.cache_clear()
+    yield events.get_derived_writes()
+    events.get_derived_writes().close()
+    events.get_derived_writes.cache_clear()
+
+
+def ticket(theatre_seat):
+    return get_table(TICKETS).get_item(Key={'Theatre-Seat': theatre_seat})['Item']
+
+
+def test_later_values_win_and_each_key_is_written_once(put_ticket, buffer_for):
+    put_ticket('1-A1')
+    table = FlakyTable(get_table(TICKETS))
+    buffer = buffer_for(table)
+
+    buffer.stage('1-A1', {'DiscountPercentage': 10, 'IsDiscounted': True})
+    buffer.stage('1-A1', {'DiscountPercentage': 20})
+
+    written = buffer.flush()
+
+    assert table.updates == [{'Theatre-Seat': '1-A1'}]
+    assert written['1-A1']['DiscountPercentage'] == 20
+    assert ticket('1-A1')['IsDiscounted'] is True
+    assert buffer.stats()['coalesced'] == 1
+
+
+def test_values_staged_during_a_failed_flush_win_over_its_retry(put_ticket, buffer_for):
+    put_ticket('1-A1')
+    buffer = None
+    failures = []
+
+    def stage_newer_then_fail(request):
+        if not failures:
+            failures.append(request)
+            buffer.stage('1-A1', {'DiscountPercentage': 30})
+            raise RuntimeError('ProvisionedThroughputExceededException')
+
+    buffer = buffer_for(FlakyTable(get_table(TICKETS), stage_newer_then_fail))
+    buffer.stage('1-A1', {'DiscountPercentage': 10, 'IsDiscounted': True})
+
+    assert buffer.flush() == {}
+    assert buffer.stats()['pending'] == 1
+    buffer.flush()
+
+    # The retried write keeps the attributes only the failed one had, under the newer value
+    assert ticket('1-A1')['DiscountPercentage'] == 30
+    assert ticket('1-A1')['IsDiscounted'] is True
+    assert buffer.stats()['pending'] == 0
+
+
+def test_strict_flush_raises_and_keeps_failed_writes_until_dropped(put_ticket, buffer_for):
+    put_ticket('1-A1')
+    put_ticket('1-A2')
+
+    def fail_one(request):
+        if request['Key']['Theatre-Seat'] == '1-A2':
+            raise ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'try again'}}, 'UpdateItem')
+
+    buffer = buffer_for(FlakyTable(get_table(TICKETS), fail_one))
+    buffer.stage('1-A1', {'IsDiscounted': True})
+    buffer.stage('1-A2', {'IsDiscounted': True})
+
+    with pytest.raises(WriteBehindError):
+        buffer.flush(strict=True)
+    assert ticket('1-A1')['IsDiscounted'] is True
+    assert 'IsDiscounted' not in ticket('1-A2')
+    assert buffer.stats()['pending'] == 1
+
+    for _ in range(write_behind.MAX_ATTEMPTS - 1):
+        with pytest.raises(WriteBehindError):
+            buffer.flush(strict=True)
+    assert buffer.stats()['pending'] == 0
+    assert buffer.stats()['dropped'] == 1
+
+
+def test_missing_item_is_skipped_not_created(buffer_for):
+    buffer = buffer_for(get_table(TICKETS))
+    buffer.stage('9-Z9', {'IsDiscounted': True})
+
+    assert buffer.flush(strict=True) == {}
+    assert 'Item' not in get_table(TICKETS).get_item(Key={'Theatre-Seat': '9-Z9'})
+    assert buffer.stats()['missing'] == 1
+
+
+def test_flush_bumps_the_versions_of_the_tickets_written(put_ticket, derived_writes):
+    put_ticket('1-A1', price=300)
+    put_ticket('1-A2', price=300)
+    versions = VersionService()
+    records = [{'messageId': str(number), 'body': json.dumps({'Message': json.dumps({
+        'eventType': 'PriceChangeInitiated', 'theatreSeat': theatre_seat, 'oldPrice': 300, 'newPrice': 240,
+        'timestamp': '2024-01-01T00:00:00'})})} for number, theatre_seat in enumerate(['1-A1', '1-A1', '9-Z9'])]
+
+    assert event_handler.handle_price_change_event({'Records': records}, None) == {'processed': 3}
+
+    assert ticket('1-A1')['DiscountPercentage'] == 20
+    assert versions.get_version(TICKETS, '1-A1') == 1
+    assert versions.get_version(TICKETS, '1-A2') is None
+    assert versions.get_version(TICKETS, '9-Z9') is None
+    assert versions.get_version(TICKETS) == 1
+
+
+def test_lambda_batch_fails_while_a_write_is_unstored(put_ticket, derived_writes, monkeypatch):
+    put_ticket('1-A1', price=300)
+    monkeypatch.setattr(derived_writes, 'table', FlakyTable(get_table(TICKETS), lambda request: 1 / 0))
+    record = {'messageId': '1', 'body': json.dumps({
+        'eventType': 'PriceChangeInitiated', 'theatreSeat': '1-A1', 'oldPrice': 300, 'newPrice': 240})}
+
+    # Raising leaves the SQS batch to be redelivered
+    with pytest.raises(WriteBehindError):
+        event_handler.handle_price_change_event({'Records': [record]}, None)
+    assert VersionService().get_version(TICKETS, '1-A1') is None
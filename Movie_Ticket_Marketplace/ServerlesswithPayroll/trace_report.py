@@ -0,0 +1,105 @@
+"""Report end-to-end price-change latency from exported trace spans.
+
+Reads the JSON lines written with TRACE_EXPORTER=file (or console output
+saved to a file) and looks at every trace that reached the SQS consumer.
+For each one it measures:
+
+    propagation   PATCH request start -> consumer span start
+    end_to_end    PATCH request start -> end of the last span in the trace,
+                  normally the completion publish
+
+Usage:
+
+    python trace_report.py /tmp/traces.jsonl [more files...] [--json report.json]
+"""
+import argparse
+import json
+import statistics
+from collections import defaultdict
+from typing import Dict, List
+
+CONSUMER_SPAN = 'price_change.process'
+
+
+def load_spans(paths: List[str]) -> Dict[str, List[Dict]]:
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line.startswith('{'):
+                    continue
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                if 'traceId' in span and 'spanId' in span:
+                    traces[span['traceId']].append(span)
+    return traces
+
+
+def price_change_latencies(traces: Dict[str, List[Dict]]) -> List[Dict]:
+    rows = []
+    for trace_id, spans in traces.items():
+        consumers = [span for span in spans if span['name'] == CONSUMER_SPAN]
+        # The caller may have sent its own traceparent, so the request span can have a remote parent
+        roots = [span for span in spans if span['kind'] == 'server']
+        if not consumers or not roots:
+            continue
+
+        root = min(roots, key=lambda span: span['startEpochMs'])
+        consumer = min(consumers, key=lambda span: span['startEpochMs'])
+        last_end = max(span['startEpochMs'] + span['durationMs'] for span in spans)
+        rows.append({
+            'trace_id': trace_id,
+            'request': root['name'],
+            'theatre_seat': consumer['attributes'].get('price_change.theatre_seat'),
+            'propagation_ms': round(consumer['startEpochMs'] - root['startEpochMs'], 1),
+            'end_to_end_ms': round(last_end - root['startEpochMs'], 1),
+            'aws_calls': sum(1 for span in spans if span['kind'] == 'client'),
+            'errors': sum(1 for span in spans if span['status'] == 'error')
+        })
+    return sorted(rows, key=lambda row: row['end_to_end_ms'], reverse=True)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {'p50': value, 'p95': value, 'p99': value, 'max': value}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': round(cuts[49], 1), 'p95': round(cuts[94], 1), 'p99': round(cuts[98], 1), 'max': max(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price-change propagation latency from trace spans")
+    parser.add_argument('paths', nargs='+', help="Span files written by utils.tracing")
+    parser.add_argument('--top', type=int, default=10, help="Slowest traces to list")
+    parser.add_argument('--json', dest='json_path', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    traces = load_spans(args.paths)
+    rows = price_change_latencies(traces)
+    report = {
+        'traces': len(traces),
+        'price_changes': len(rows),
+        'propagation_ms': percentiles([row['propagation_ms'] for row in rows]),
+        'end_to_end_ms': percentiles([row['end_to_end_ms'] for row in rows]),
+        'slowest': rows[:args.top]
+    }
+
+    print(f"{report['price_changes']} price changes in {report['traces']} traces")
+    for name in ('propagation_ms', 'end_to_end_ms'):
+        stats = report[name]
+        print(f"  {name:<16} p50 {stats['p50']:>9.1f}  p95 {stats['p95']:>9.1f}  "
+              f"p99 {stats['p99']:>9.1f}  max {stats['max']:>9.1f}")
+    for row in report['slowest']:
+        print(f"  {row['trace_id']}  {row['theatre_seat'] or '-':<10} {row['end_to_end_ms']:>9.1f} ms  "
+              f"{row['aws_calls']} AWS calls  {row['errors']} errors")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+import boto3
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def get_sns_client():
+    """Get the process-wide SNS client, created on first publish.
+
+    Building a botocore client loads its service model, which costs more
+    than 100 ms; only price changes publish, so Lambda init should not pay it.
+    """
+    return boto3.client('sns')
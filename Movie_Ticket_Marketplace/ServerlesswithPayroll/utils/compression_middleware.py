@@ -0,0 +1,118 @@
+import os
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.compression import MINIMUM_SIZE, StreamCompressor, compress, is_compressible, negotiate_encoding
+
+# Bodies above this size are compressed in a worker thread so a large ticket
+# list does not stall every other request on the event loop
+THREADED_MIN_SIZE = int(os.environ.get('COMPRESSION_THREADED_MIN_SIZE', str(256 * 1024)))
+
+
+class CompressionMiddleware:
+    """gzip/brotli response compression negotiated from Accept-Encoding.
+
+    Complete bodies below `minimum_size` pass through untouched; streamed
+    bodies (such as transaction exports) are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = MINIMUM_SIZE, threaded_min_size: int = THREADED_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.threaded_min_size = threaded_min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.minimum_size, self.threaded_min_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int, threaded_min_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.threaded_min_size = threaded_min_size
+        self._start_message: Message = None
+        self._compressor: StreamCompressor = None
+        self._passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            # Hold the headers back until the first body chunk shows the size
+            self._start_message = message
+            headers = Headers(raw=message['headers'])
+            self._passthrough = 'content-encoding' in headers or not is_compressible(headers.get('content-type'))
+            return
+
+        if message['type'] != 'http.response.body':
+            await self._send(message)
+            return
+
+        if self._passthrough:
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self._compressor is not None:
+            chunk = self._compressor.compress(body)
+            if not more_body:
+                chunk += self._compressor.finish()
+            if chunk or not more_body:
+                await self._send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+            return
+
+        if not more_body:
+            if len(body) < self.minimum_size:
+                self._passthrough = True
+                await self._flush_start()
+                await self._send(message)
+                return
+
+            if len(body) >= self.threaded_min_size:
+                compressed = await anyio.to_thread.run_sync(compress, body, self.encoding)
+            else:
+                compressed = compress(body, self.encoding)
+
+            headers = self._encoded_headers()
+            headers['Content-Length'] = str(len(compressed))
+            await self._flush_start()
+            await self._send({'type': 'http.response.body', 'body': compressed})
+            return
+
+        # First chunk of a streamed body: the final length is unknown
+        self._compressor = StreamCompressor(self.encoding)
+        headers = self._encoded_headers()
+        del headers['Content-Length']
+        await self._flush_start()
+        chunk = self._compressor.compress(body)
+        if chunk:
+            await self._send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    def _encoded_headers(self) -> MutableHeaders:
+        headers = MutableHeaders(raw=self._start_message['headers'])
+        headers['Content-Encoding'] = self.encoding
+        headers.add_vary_header('Accept-Encoding')
+        etag = headers.get('etag')
+        if etag and etag.endswith('"'):
+            # A strong ETag must differ per content-coding
+            headers['ETag'] = f'{etag[:-1]}-{self.encoding}"'
+        return headers
+
+    async def _flush_start(self) -> None:
+        if self._start_message is not None:
+            await self._send(self._start_message)
+            self._start_message = None
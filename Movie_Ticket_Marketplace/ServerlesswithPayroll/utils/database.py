@@ -1,8 +1,87 @@
 import boto3
 import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional, Protocol
 
-def get_table():
+# STORAGE_BACKEND=memory keeps every table in this process (see utils.memory_store), for benchmarks and local runs
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'dynamodb')
+
+# Schema of the tables the services use: (name, key schema, global secondary indexes)
+TABLES = [
+    (os.environ.get('DYNAMODB_TABLE', 'ticket-booking'), [('Theatre-Seat', 'HASH')], []),
+    ('users-payroll', [('userId', 'HASH')], []),
+    ('user-transactions', [('transactionId', 'HASH')],
+     [('UserTransactionsIndex', [('userId', 'HASH'), ('timestamp', 'RANGE')], 'ALL')]),
+    (os.environ.get('IDEMPOTENCY_TABLE', 'idempotency-keys'), [('idempotencyKey', 'HASH')], []),
+    (os.environ.get('ROLLUPS_TABLE', 'revenue-rollups'), [('rollupKey', 'HASH'), ('period', 'RANGE')], []),
+    (os.environ.get('VERSIONS_TABLE', 'resource-versions'), [('versionKey', 'HASH')], []),
+    (os.environ.get('CHANGES_TABLE', 'resource-changes'), [('resource', 'HASH'), ('sequence', 'RANGE')], []),
+    (os.environ.get('SEAT_HOLDS_TABLE', 'seat-holds'), [('theatreSeat', 'HASH')],
+     [('TheatreHoldsIndex', [('theatreId', 'HASH'), ('expiresAt', 'RANGE')], 'KEYS_ONLY')]),
+]
+
+
+class StorageClient(Protocol):
+    """Multi-item calls made through `table.meta.client`, with Python values as in the resource API"""
+
+    exceptions: Any
+
+    def batch_get_item(self, *, RequestItems: Dict, **kwargs) -> Dict: ...
+
+    def batch_write_item(self, *, RequestItems: Dict, **kwargs) -> Dict: ...
+
+    def transact_write_items(self, *, TransactItems: list, **kwargs) -> Dict: ...
+
+    def transact_get_items(self, *, TransactItems: list, **kwargs) -> Dict: ...
+
+
+class StorageTable(Protocol):
+    """The table interface the services are written against: a boto3 DynamoDB Table or a MemoryTable"""
+
+    name: str
+
+    def get_item(self, *, Key: Dict, **kwargs) -> Dict: ...
+
+    def put_item(self, *, Item: Dict, **kwargs) -> Dict: ...
+
+    def update_item(self, *, Key: Dict, **kwargs) -> Dict: ...
+
+    def delete_item(self, *, Key: Dict, **kwargs) -> Dict: ...
+
+    def query(self, **kwargs) -> Dict: ...
+
+    def scan(self, **kwargs) -> Dict: ...
+
+    def batch_writer(self, overwrite_by_pkeys: Optional[list] = None) -> Any: ...
+
+
+@lru_cache(maxsize=None)
+def get_dynamodb():
+    """Get the process-wide storage resource, created on first use"""
+    if STORAGE_BACKEND == 'memory':
+        from utils.memory_store import MemoryResource
+        return MemoryResource(TABLES)
+    return boto3.resource('dynamodb')
+
+def get_table(table_name: Optional[str] = None) -> StorageTable:
     """Get DynamoDB table instance"""
-    dynamodb = boto3.resource('dynamodb')
-    table_name = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
+    dynamodb = get_dynamodb()
+    table_name = table_name or os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
     return dynamodb.Table(table_name)
+
+_thread_local = threading.local()
+
+def get_thread_table(table_name: Optional[str] = None) -> StorageTable:
+    """get_table for code running in a worker thread (asyncio.to_thread).
+
+    boto3 resources are not thread-safe, so each thread opens its own from a
+    fresh session and keeps it for later calls. The in-memory tables lock
+    internally and are shared.
+    """
+    if STORAGE_BACKEND == 'memory':
+        return get_table(table_name)
+    dynamodb = getattr(_thread_local, 'dynamodb', None)
+    if dynamodb is None:
+        dynamodb = _thread_local.dynamodb = boto3.session.Session().resource('dynamodb')
+    return dynamodb.Table(table_name or os.environ.get('DYNAMODB_TABLE', 'ticket-booking'))
@@ -0,0 +1,56 @@
+import importlib
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+from utils.json_response import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRouter(BaseRoute):
+    """Route that imports a rarely used router on the first request under its path.
+
+    The router module, its services and FastAPI's per-endpoint setup are
+    skipped during Lambda init. Its endpoints are served by a small FastAPI
+    sub-app built on first use, so they do not appear in the main app's
+    OpenAPI schema; set DEFER_ROUTER_IMPORTS=false to include them eagerly.
+    """
+
+    def __init__(self, path_prefix: str, module: str, prefix: str = "/api", tags: Optional[List[str]] = None):
+        self.path_prefix = path_prefix.rstrip("/")
+        # Walkers of app.routes (route listings, OpenAPI helpers) expect every route to have a path
+        self.path = self.path_prefix
+        self.module = module
+        self.prefix = prefix
+        self.tags = tags
+        self._app: Optional[FastAPI] = None
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope["type"] == "http":
+            path = scope["path"]
+            if path == self.path_prefix or path.startswith(self.path_prefix + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self._load()(scope, receive, send)
+
+    def url_path_for(self, name: str, /, **path_params) -> None:
+        raise NoMatchFound(name, path_params)
+
+    def _load(self) -> FastAPI:
+        if self._app is None:
+            started = time.perf_counter()
+            router = importlib.import_module(self.module).router
+
+            app = FastAPI(openapi_url=None, docs_url=None, redoc_url=None, default_response_class=FastJSONResponse)
+            app.include_router(router, prefix=self.prefix, tags=self.tags)
+            self._app = app
+
+            logger.info(f"Loaded {self.module} on first use in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return self._app
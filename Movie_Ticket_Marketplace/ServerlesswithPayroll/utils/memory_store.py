@@ -0,0 +1 @@
+../../local/utils/memory_store.py
\ No newline at end of file
@@ -0,0 +1,27 @@
+import base64
+import json
+from typing import Dict, Optional
+
+from utils.encoder import CustomEncoder
+
+
+def encode_cursor(last_evaluated_key: Optional[Dict]) -> Optional[str]:
+    """Turn a DynamoDB LastEvaluatedKey into an opaque continuation token"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, cls=CustomEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict]:
+    """Turn a continuation token back into an ExclusiveStartKey"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+    if not isinstance(key, dict):
+        raise ValueError("Invalid pagination cursor")
+    return key
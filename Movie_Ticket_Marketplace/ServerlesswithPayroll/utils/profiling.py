@@ -0,0 +1,216 @@
+"""On-demand request profiling.
+
+A request is profiled when it carries PROFILE_HEADER set to PROFILE_TOKEN, or
+at random with probability PROFILE_SAMPLE_RATE (0 by default). While it runs,
+a background thread samples every thread's Python stack every
+PROFILE_INTERVAL_MS. Idle stacks are dropped, such as an event loop waiting
+in select() or a worker blocked on its queue.
+
+Each profiled request produces:
+
+- a Server-Timing header and X-Profile-Id on the response, with time split
+  into pydantic validation, boto3 marshalling, network wait, JSON encoding
+  and application code
+- <PROFILE_DIR>/<profile id>.folded, in collapsed-stack format, which
+  flamegraph.pl, speedscope and inferno all read
+- one structured log line with the same breakdown, since /tmp does not
+  outlive a Lambda container
+
+Stacks of other requests running at the same time are included, so profile
+on an otherwise quiet process when you can. On Lambda that is always true.
+"""
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER', 'x-profile').lower().encode('latin-1')
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL_MS', '1')) / 1000
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/profiles')
+MAX_STACK_DEPTH = 128
+APP_ROOT = os.getcwd().replace('\\', '/').rstrip('/') + '/'
+
+# Checked in order against every frame of a sample; the first category with a
+# matching frame wins, so a socket read under botocore counts as network wait
+CATEGORIES = (
+    ('network', ('/urllib3/', '/http/client.py', '/socket.py', '/ssl.py')),
+    ('boto3', ('/botocore/', '/boto3/', '/s3transfer/')),
+    ('pydantic', ('/pydantic/', '/pydantic_core/', '/fastapi/_compat.py', '/fastapi/dependencies/')),
+    ('json', ('/json/', '/fastapi/encoders.py', '/utils/encoder.py', '/utils/json_response.py', '/utils/negotiation.py')),
+)
+APPLICATION = 'app'
+# Leaf frames that mean the thread is waiting for work, not doing any
+IDLE_LEAVES = {
+    ('selectors.py', 'select'), ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'), ('thread.py', '_worker'), ('base_events.py', '_run_once'),
+}
+
+_active = threading.Lock()
+
+
+class StackSampler:
+    """Samples all other threads' stacks until stopped"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self.categories: Dict[str, float] = defaultdict(float)
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self) -> 'StackSampler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._sample(frame, elapsed)
+
+    def _sample(self, frame, elapsed: float) -> None:
+        leaf = frame.f_code
+        if (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+            return
+
+        filenames = []
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            filenames.append(code.co_filename)
+            stack.append(f"{_module_name(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        stack.reverse()
+
+        self.stacks[tuple(stack)] += elapsed
+        self.categories[_categorize(filenames)] += elapsed
+        self.samples += 1
+
+    def folded(self) -> str:
+        """Collapsed stacks, weighted in microseconds"""
+        return ''.join(
+            f"{';'.join(stack)} {int(seconds * 1_000_000)}\n"
+            for stack, seconds in sorted(self.stacks.items(), key=lambda item: -item[1])
+        )
+
+
+def _categorize(filenames) -> str:
+    for category, markers in CATEGORIES:
+        for filename in filenames:
+            normalized = filename.replace('\\', '/')
+            if any(marker in normalized for marker in markers):
+                return category
+    return APPLICATION
+
+
+def _module_name(filename: str) -> str:
+    normalized = filename.replace('\\', '/')
+    if normalized.startswith(APP_ROOT):
+        normalized = normalized[len(APP_ROOT):]
+    for marker in ('/site-packages/', '/dist-packages/', '/lib/python'):
+        if marker in normalized:
+            normalized = normalized.split(marker, 1)[1]
+            break
+    return normalized[:-3] if normalized.endswith('.py') else normalized
+
+
+def should_profile(headers) -> bool:
+    """`headers` is the raw ASGI header list"""
+    if PROFILE_TOKEN:
+        for name, value in headers:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value.decode('latin-1'), PROFILE_TOKEN)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def server_timing(categories: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(categories.items())]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(parts)
+
+
+def store_profile(profile_id: str, sampler: StackSampler) -> Optional[str]:
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+        with open(path, 'w') as f:
+            f.write(sampler.folded())
+        return path
+    except OSError as e:
+        logger.warning(f"Could not store profile {profile_id}: {e}")
+        return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles privileged or sampled requests.
+
+    Only one request is profiled at a time. The response of a profiled request
+    is held until its body is complete, so the breakdown can go in its headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not should_profile(scope.get('headers') or []):
+            await self.app(scope, receive, send)
+            return
+        if not _active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        messages = []
+
+        async def hold(message):
+            messages.append(message)
+
+        started = time.perf_counter()
+        sampler = StackSampler().start()
+        try:
+            try:
+                await self.app(scope, receive, hold)
+            finally:
+                sampler.stop()
+                total = time.perf_counter() - started
+        finally:
+            _active.release()
+
+        categories = dict(sampler.categories)
+        path = store_profile(profile_id, sampler)
+        logger.info('Request profile %s', profile_id, extra={'fields': {
+            'profileId': profile_id,
+            'method': scope['method'],
+            'path': scope['path'],
+            'durationMs': round(total * 1000, 2),
+            'samples': sampler.samples,
+            'breakdownMs': {name: round(seconds * 1000, 2) for name, seconds in categories.items()},
+            'file': path
+        }})
+
+        for message in messages:
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers') or [])
+                headers.append((b'x-profile-id', profile_id.encode('latin-1')))
+                headers.append((b'server-timing', server_timing(categories, total).encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
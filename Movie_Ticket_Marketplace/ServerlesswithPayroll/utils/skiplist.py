@@ -0,0 +1,123 @@
+import random
+from typing import Any, List, Optional
+
+
+class _Node:
+    __slots__ = ('value', 'next', 'width')
+
+    def __init__(self, value: Any, levels: int):
+        self.value = value
+        self.next: List[Optional['_Node']] = [None] * levels
+        # Number of bottom-level steps covered by each forward link
+        self.width: List[int] = [1] * levels
+
+
+class IndexableSkipList:
+    """Sorted collection with O(log n) insert, remove, rank and index lookups"""
+
+    def __init__(self, max_levels: int = 32):
+        self._max_levels = max_levels
+        self._head = _Node(None, max_levels)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self._max_levels and random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, value: Any) -> None:
+        """Insert a value, keeping the collection sorted"""
+        chain = [self._head] * self._max_levels
+        steps_at_level = [0] * self._max_levels
+        node = self._head
+
+        for level in reversed(range(self._max_levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_level()
+        new_node = _Node(value, levels)
+        steps = 0
+
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+
+        for level in range(levels, self._max_levels):
+            chain[level].width[level] += 1
+
+        self._size += 1
+
+    def remove(self, value: Any) -> None:
+        """Remove a value, raising ValueError if it is not present"""
+        chain = [self._head] * self._max_levels
+        node = self._head
+
+        for level in reversed(range(self._max_levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.value != value:
+            raise ValueError(f"{value!r} not in skiplist")
+
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+
+        for level in range(len(target.next), self._max_levels):
+            chain[level].width[level] -= 1
+
+        self._size -= 1
+
+    def rank(self, value: Any) -> int:
+        """Return the number of stored values strictly less than value"""
+        rank = 0
+        node = self._head
+
+        for level in reversed(range(self._max_levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                rank += node.width[level]
+                node = node.next[level]
+
+        return rank
+
+    def slice(self, start: int, stop: int) -> List[Any]:
+        """Return the values at positions [start, stop) in sorted order"""
+        start = max(start, 0)
+        stop = min(stop, self._size)
+        if start >= stop:
+            return []
+
+        # Walk down to the node at position `start`, then along the bottom level
+        remaining = start + 1
+        node = self._head
+        for level in reversed(range(self._max_levels)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        values = []
+        while node is not None and len(values) < stop - start:
+            values.append(node.value)
+            node = node.next[0]
+        return values
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("skiplist index out of range")
+        return self.slice(index, index + 1)[0]
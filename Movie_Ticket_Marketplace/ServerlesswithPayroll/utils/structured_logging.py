@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import random
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Fraction of requests logged; LOG_SAMPLE_RATES overrides it per route prefix,
+# e.g. '{"GET /api/tickets": 0.01, "/api/purchase-ticket": 1}'
+DEFAULT_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+SAMPLE_RATES: Dict[str, float] = json.loads(os.environ.get('LOG_SAMPLE_RATES') or '{}')
+# Strings longer than this are cut, so one log record stays bounded
+MAX_FIELD_CHARS = int(os.environ.get('LOG_MAX_FIELD_CHARS', '512'))
+
+REDACTED = '[REDACTED]'
+REDACT_KEYS = {
+    'authorization', 'cookie', 'set-cookie', 'x-api-key', 'x-amz-security-token',
+    'password', 'token', 'secret', 'email', 'idempotency-key'
+}
+# Parts of an API Gateway event worth keeping; headers and the raw context are dropped
+EVENT_HEADERS = ('user-agent', 'content-type', 'content-length', 'accept', 'accept-encoding')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any `extra={'fields': {...}}` merged in"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': _truncate(record.getMessage())
+        }
+        request_id = getattr(record, 'aws_request_id', None)
+        if request_id:
+            entry['requestId'] = request_id
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exception'] = _truncate(self.formatException(record.exc_info), MAX_FIELD_CHARS * 4)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Switch every root handler to JSON output; safe to call more than once.
+
+    Lambda installs its own root handler, which is kept so records still
+    carry the request id; elsewhere a stdout handler is added.
+    """
+
+    root = logging.getLogger()
+    root.setLevel(level or os.environ.get('LOG_LEVEL', 'INFO'))
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    for handler in root.handlers:
+        handler.setFormatter(JsonFormatter())
+
+
+def sample_rate(method: str, path: str) -> float:
+    """Rate for the longest LOG_SAMPLE_RATES key matching 'METHOD /path' or '/path'"""
+
+    route = f"{method} {path}"
+    best, rate = -1, DEFAULT_SAMPLE_RATE
+    for prefix, prefix_rate in SAMPLE_RATES.items():
+        if (route.startswith(prefix) or path.startswith(prefix)) and len(prefix) > best:
+            best, rate = len(prefix), prefix_rate
+    return rate
+
+
+def should_sample(method: str, path: str) -> bool:
+    rate = sample_rate(method, path)
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def redact(value: Any, depth: int = 0) -> Any:
+    """Copy of `value` with secrets masked and long strings cut"""
+
+    if depth > 4:
+        return '...'
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in REDACT_KEYS else redact(item, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        items = [redact(item, depth + 1) for item in value[:20]]
+        return items + [f'... {len(value) - 20} more'] if len(value) > 20 else items
+    if isinstance(value, str):
+        return _truncate(value)
+    return value
+
+
+def summarize_event(event: Dict) -> Dict:
+    """Small, redacted view of an API Gateway or SQS event for logging"""
+
+    if 'Records' in event:
+        records = event['Records']
+        return {'records': len(records), 'eventSource': records[0].get('eventSource') if records else None}
+
+    context = event.get('requestContext') or {}
+    http = context.get('http') or {}
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    body = event.get('body')
+
+    return {
+        'method': event.get('httpMethod') or http.get('method'),
+        'path': event.get('path') or event.get('rawPath'),
+        'query': redact(event.get('queryStringParameters')),
+        'headers': {key: headers[key] for key in EVENT_HEADERS if key in headers},
+        'bodyBytes': len(body) if body else 0,
+        'sourceIp': (context.get('identity') or {}).get('sourceIp') or http.get('sourceIp'),
+        'apiRequestId': context.get('requestId')
+    }
+
+
+def log_event(logger: logging.Logger, message: str, event: Dict, **fields) -> None:
+    """Log a sampled, redacted summary of a Lambda event.
+
+    Nothing is built unless INFO is enabled and the route is sampled, so an
+    unsampled request costs one random() call.
+    """
+
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    summary = summarize_event(event)
+    if summary.get('method') and not should_sample(summary['method'], summary.get('path') or ''):
+        return
+
+    logger.info(message, extra={'fields': {'event': summary, **redact(fields)}})
+
+
+class RequestLoggingMiddleware:
+    """ASGI middleware logging one sampled JSON record per request.
+
+    Server errors are always logged, whatever the sampling rate.
+    """
+
+    def __init__(self, app, logger_name: str = 'request'):
+        self.app = app
+        self.logger = logging.getLogger(logger_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            method, path = scope['method'], scope['path']
+            if status['code'] >= 500 or should_sample(method, path):
+                self.logger.info('%s %s %s', method, path, status['code'], extra={'fields': {
+                    'method': method,
+                    'path': path,
+                    'status': status['code'],
+                    'durationMs': round((time.perf_counter() - started) * 1000, 2),
+                    'sampleRate': sample_rate(method, path)
+                }})
+
+
+def _truncate(value: str, limit: int = MAX_FIELD_CHARS) -> str:
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}... ({len(value) - limit} more chars)"
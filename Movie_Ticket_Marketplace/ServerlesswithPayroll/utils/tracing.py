@@ -0,0 +1,258 @@
+"""Lightweight tracing for HTTP requests, AWS calls and the price-change flow.
+
+Spans use W3C trace context ids. Importing this module registers botocore
+hooks on the default boto3 session, so every AWS call becomes a child span
+of the active one. SNS Publish calls also carry a `traceparent` message
+attribute. The SQS consumer reads it back with `traceparent_from_sqs`, so a
+PATCH, its SNS hop, the event handler's DynamoDB writes and the completion
+publish all share one trace.
+
+TRACE_EXPORTER chooses where finished spans go:
+
+    none (default)  tracing is off and the hooks do nothing
+    console         one JSON line per span on stderr (CloudWatch on Lambda)
+    file            one JSON line per span appended to TRACE_FILE
+
+trace_report.py turns an exported file into price-change latency figures.
+"""
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import boto3
+
+TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', 'none').lower()
+TRACE_FILE = os.environ.get('TRACE_FILE', '/tmp/traces.jsonl')
+TRACING_ENABLED = TRACE_EXPORTER in ('console', 'file')
+TRACEPARENT = 'traceparent'
+
+_export_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ('name', 'kind', 'trace_id', 'span_id', 'parent_id', 'attributes',
+                 'error', 'start_time', '_started', 'duration_ms')
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[str] = None) -> None:
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self.error = error or self.error
+        export(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentId': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTime': datetime.fromtimestamp(self.start_time, timezone.utc).isoformat(),
+            'startEpochMs': round(self.start_time * 1000, 3),
+            'durationMs': round(self.duration_ms or 0.0, 3),
+            'status': 'error' if self.error else 'ok',
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace id, parent span id) from a W3C traceparent header, if valid"""
+    parts = (value or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def _new_span(name: str, kind: str, traceparent: Optional[str], attributes: Dict[str, Any]) -> Span:
+    remote = parse_traceparent(traceparent)
+    if remote:
+        trace_id, parent_id = remote
+    else:
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        parent_id = parent.span_id if parent else None
+    return Span(name, kind, trace_id, parent_id, attributes)
+
+
+@contextmanager
+def start_span(name: str, kind: str = 'internal', traceparent: Optional[str] = None, **attributes) -> Iterator[Optional[Span]]:
+    """Run the block inside a span; a valid `traceparent` makes it a child of a remote span"""
+
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    span = _new_span(name, kind, traceparent, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def export(span: Span) -> None:
+    line = json.dumps(span.to_dict(), default=str, separators=(',', ':'))
+    with _export_lock:
+        if TRACE_EXPORTER == 'file':
+            with open(TRACE_FILE, 'a') as f:
+                f.write(line + '\n')
+        elif TRACE_EXPORTER == 'console':
+            sys.stderr.write(line + '\n')
+
+
+def traceparent_from_sqs(record: Dict, body: Optional[Dict] = None) -> Optional[str]:
+    """traceparent of an SQS record: raw delivery message attributes or the SNS envelope"""
+
+    attribute = (record.get('messageAttributes') or {}).get(TRACEPARENT)
+    if attribute:
+        return attribute.get('stringValue')
+    if body is None:
+        try:
+            body = json.loads(record.get('body') or '{}')
+        except ValueError:
+            return None
+    attribute = (body.get('MessageAttributes') or {}).get(TRACEPARENT)
+    return attribute.get('Value') if attribute else None
+
+
+def traced_handler(name: str):
+    """Wrap an API Gateway Lambda handler in a server span, continuing a caller's trace"""
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(event, context):
+            headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+            with start_span(name, kind='server', traceparent=headers.get(TRACEPARENT)) as span:
+                response = handler(event, context)
+                if span is not None and isinstance(response, dict):
+                    span.set_attribute('http.status_code', response.get('statusCode'))
+                    response.setdefault('headers', {})[TRACEPARENT] = span.traceparent
+                return response
+        return wrapper
+    return decorator
+
+
+# --- botocore hooks -----------------------------------------------------------
+
+def _start_aws_span(params, model, context, **kwargs):
+    if not TRACING_ENABLED:
+        return
+    service = model.service_model.service_name
+    attributes = {'rpc.system': 'aws-api', 'rpc.service': service, 'rpc.method': model.name}
+    if 'TableName' in params:
+        attributes['aws.dynamodb.table_name'] = params['TableName']
+    if 'TopicArn' in params:
+        attributes['messaging.destination'] = params['TopicArn']
+
+    span = _new_span(f"{service}.{model.name}", 'client', None, attributes)
+    context['trace_span'] = span
+
+    if service == 'sns' and model.name == 'Publish':
+        attributes_param = params.setdefault('MessageAttributes', {})
+        attributes_param.setdefault(TRACEPARENT, {'DataType': 'String', 'StringValue': span.traceparent})
+
+
+def _end_aws_span(http_response, parsed, context, **kwargs):
+    span = context.pop('trace_span', None)
+    if span is None:
+        return
+    metadata = parsed.get('ResponseMetadata', {}) if isinstance(parsed, dict) else {}
+    span.set_attribute('aws.request_id', metadata.get('RequestId'))
+    span.set_attribute('aws.retry_attempts', metadata.get('RetryAttempts', 0))
+    span.set_attribute('http.status_code', http_response.status_code)
+    error = (parsed.get('Error') or {}).get('Code') if http_response.status_code >= 400 else None
+    span.end(error=error)
+
+
+def _fail_aws_span(exception, context, **kwargs):
+    span = context.pop('trace_span', None)
+    if span is not None:
+        span.end(error=f"{type(exception).__name__}: {exception}")
+
+
+def install_aws_hooks(session=None) -> None:
+    events = (session or boto3._get_default_session()).events
+    events.register('provide-client-params', _start_aws_span, unique_id='tracing-start')
+    events.register('after-call', _end_aws_span, unique_id='tracing-end')
+    events.register('after-call-error', _fail_aws_span, unique_id='tracing-error')
+
+
+# --- ASGI ---------------------------------------------------------------------
+
+class TracingMiddleware:
+    """Server span per HTTP request, continuing an incoming traceparent header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope.get('headers') or []:
+            if name == b'traceparent':
+                incoming = value.decode('latin-1')
+
+        with start_span(f"{scope['method']} {scope['path']}", kind='server', traceparent=incoming) as span:
+            span.set_attribute('http.method', scope['method'])
+            span.set_attribute('http.target', scope['path'])
+
+            async def send_wrapper(message):
+                if message['type'] == 'http.response.start':
+                    span.set_attribute('http.status_code', message['status'])
+                    headers = list(message.get('headers') or [])
+                    headers.append((b'traceparent', span.traceparent.encode('latin-1')))
+                    message = {**message, 'headers': headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get('route'), 'path', None)
+                if route:
+                    span.name = f"{scope['method']} {route}"
+                    span.set_attribute('http.route', route)
+
+
+install_aws_hooks()
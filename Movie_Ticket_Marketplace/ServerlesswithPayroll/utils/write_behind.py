@@ -0,0 +1 @@
+../../local/utils/write_behind.py
\ No newline at end of file
@@ -1,21 +1,21 @@
 import boto3
 import json
-from custom_encoder import CustomEncoder
-import logging
+from custom_encoder import dumps
+from structuredlogging import configurelogging, logevent
+from compression import requestbody
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = configurelogging()
 
 dynamodbTableName = "ticket-booking"
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(dynamodbTableName)
 
 def lambda_handler(event, context):
-    logger.info("Received event: " + json.dumps(event))
+    logevent(logger, "Received event", event)
     path = event['path']
     
     if path == '/ticket':
-        requestBody = json.loads(event['body'])
+        requestBody = json.loads(requestbody(event))
         response = deleteticket(requestBody['Theatre-Seat'])
     else:
         response = buildresponse(400, "Invalid path for DELETE method")
@@ -51,6 +51,6 @@ def buildresponse(statusCode, body=None):
         }
     }
     if body is not None:
-        response['body'] = json.dumps(body, cls=CustomEncoder)
+        response['body'] = dumps(body)
     
     return response
\ No newline at end of file
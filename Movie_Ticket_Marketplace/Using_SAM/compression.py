@@ -0,0 +1,9 @@
+import base64
+
+# Responses are compressed by API Gateway itself (MinimumCompressionSize in template.yaml)
+
+def requestbody(event):
+    # Bodies of a binary media type arrive base64 encoded
+    if event.get('body') and event.get('isBase64Encoded'):
+        return base64.b64decode(event['body']).decode('utf-8')
+    return event.get('body')
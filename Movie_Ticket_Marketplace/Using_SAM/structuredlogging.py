@@ -0,0 +1,72 @@
+import os
+import json
+import random
+import logging
+from datetime import datetime, timezone
+
+# LOG_SAMPLE_RATES overrides LOG_SAMPLE_RATE per path prefix, e.g. '{"/tickets": 0.01, "PATCH /ticket": 1}'
+defaultSampleRate = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+sampleRates = json.loads(os.environ.get('LOG_SAMPLE_RATES') or '{}')
+maxFieldChars = int(os.environ.get('LOG_MAX_FIELD_CHARS', '512'))
+
+redactedKeys = {'authorization', 'cookie', 'x-api-key', 'x-amz-security-token', 'password', 'token', 'secret', 'email'}
+loggedHeaders = ('user-agent', 'content-type', 'content-length', 'accept', 'accept-encoding')
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'message': truncate(record.getMessage())
+        }
+        if getattr(record, 'aws_request_id', None):
+            entry['requestId'] = record.aws_request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = truncate(self.formatException(record.exc_info), maxFieldChars * 4)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+def configurelogging():
+    # Keep the Lambda runtime's root handler (it adds the request id) and only swap its formatter
+    root = logging.getLogger()
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    for handler in root.handlers:
+        handler.setFormatter(JsonFormatter())
+    return root
+
+def sampled(method, path):
+    route = f"{method} {path}"
+    matches = [prefix for prefix in sampleRates if route.startswith(prefix) or path.startswith(prefix)]
+    rate = sampleRates[max(matches, key=len)] if matches else defaultSampleRate
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+def truncate(value, limit=maxFieldChars):
+    return value if len(value) <= limit else f"{value[:limit]}... ({len(value) - limit} more chars)"
+
+def redact(value):
+    if isinstance(value, dict):
+        return {key: '[REDACTED]' if str(key).lower() in redactedKeys else redact(item) for key, item in value.items()}
+    if isinstance(value, str):
+        return truncate(value)
+    return value
+
+def logevent(logger, message, event):
+    # Only a sampled, redacted summary is serialized, never the raw event
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    method, path = event.get('httpMethod') or '', event.get('path') or ''
+    if not sampled(method, path):
+        return
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    context = event.get('requestContext') or {}
+    logger.info(message, extra={'fields': {'event': {
+        'method': method,
+        'path': path,
+        'query': redact(event.get('queryStringParameters')),
+        'headers': {key: headers[key] for key in loggedHeaders if key in headers},
+        'bodyBytes': len(event.get('body') or ''),
+        'sourceIp': (context.get('identity') or {}).get('sourceIp'),
+        'apiRequestId': context.get('requestId')
+    }}})
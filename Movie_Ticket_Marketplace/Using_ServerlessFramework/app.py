@@ -3,19 +3,27 @@ from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
 import os
 import logging
+
+# Registers the botocore metrics hooks, so it must precede modules that create boto3 clients
+from utils.metrics import MetricsMiddleware, metrics_response
 from handlers.movies import router as movies_router
 from handlers.tickets import router as tickets_router
 from handlers.events import router as events_router
+from utils.compression_middleware import CompressionMiddleware
+from utils.json_response import FastJSONResponse
+from utils.profiling import ProfilingMiddleware
+from utils.structured_logging import RequestLoggingMiddleware, configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Single-line JSON log records; level from LOG_LEVEL
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Create FastAPI application
 app = FastAPI(
     title="Movie Booking API",
     description="Serverless movie ticket booking CRUD API with event-driven architecture",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -27,6 +35,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large list payloads; Mangum base64-encodes the compressed body for API Gateway
+app.add_middleware(CompressionMiddleware)
+
+# One sampled JSON line per request (LOG_SAMPLE_RATE / LOG_SAMPLE_RATES); 5xx always logged
+app.add_middleware(RequestLoggingMiddleware)
+
+# Per-route latency and DynamoDB/SNS usage, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Stack-sampling profile of requests sent with X-Profile: $PROFILE_TOKEN or picked by PROFILE_SAMPLE_RATE
+app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(movies_router, prefix="/api", tags=["movies"])
 app.include_router(tickets_router, prefix="/api", tags=["tickets"])
@@ -36,6 +56,11 @@ app.include_router(events_router, prefix="/api", tags=["events"])
 async def root():
     return {"message": "Movie Booking API is running", "version": "1.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this process's request and AWS call metrics"""
+    return metrics_response()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "movie-booking-api"}
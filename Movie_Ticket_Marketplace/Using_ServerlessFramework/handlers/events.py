@@ -7,6 +7,7 @@ from decimal import Decimal
 from datetime import datetime
 from utils.database import get_table
 from utils.encoder import CustomEncoder
+from utils.structured_logging import redact
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -17,7 +18,7 @@ topic_arn = os.environ.get('PRICE_CHANGE_TOPIC_ARN')
 
 async def handle_price_change_event(event_data: dict):
     """Handle price change events"""
-    logger.info(f"Processing price change event: {json.dumps(event_data)}")
+    logger.info("Processing price change event", extra={'fields': {'event': redact(event_data)}})
     
     try:
         table = get_table()
@@ -66,7 +67,7 @@ async def handle_price_change_event(event_data: dict):
                 )
                 
                 updated_item = response.get('Attributes', {})
-                logger.info(f"Added price change metadata for {theatre_seat}")
+                logger.info("Added price change metadata for %s", theatre_seat)
                 
                 # Publish completion event
                 completion_event = {
@@ -88,7 +89,7 @@ async def handle_price_change_event(event_data: dict):
                             Message=json.dumps(completion_event, cls=CustomEncoder),
                             Subject=f'Price Change Processed for {theatre_seat}'
                         )
-                        logger.info(f"Published price change completion event for {theatre_seat}")
+                        logger.info("Published price change completion event for %s", theatre_seat)
                     except Exception as sns_error:
                         logger.error(f"Failed to publish completion event: {str(sns_error)}")
         
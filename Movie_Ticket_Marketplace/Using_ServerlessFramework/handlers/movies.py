@@ -3,6 +3,7 @@ import boto3
 import os
 import logging
 from utils.database import get_table
+from utils.json_response import FastJSONResponse
 from typing import List
 
 router = APIRouter()
@@ -11,7 +12,7 @@ logger = logging.getLogger(__name__)
 @router.get("/movies", response_model=dict)
 async def get_movies():
     """Retrieve all unique movies from tickets"""
-    logger.info("Retrieving all unique movies")
+    logger.debug("Retrieving all unique movies")
     
     try:
         table = get_table()
@@ -26,7 +27,7 @@ async def get_movies():
         # Extract unique movie names
         unique_movies = list({item.get('Movie') for item in items if item.get('Movie')})
         
-        return {"movies": unique_movies}
+        return FastJSONResponse({"movies": unique_movies})
         
     except Exception as e:
         logger.error(f"Error retrieving movies: {str(e)}")
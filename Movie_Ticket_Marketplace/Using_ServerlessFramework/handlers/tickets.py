@@ -9,6 +9,7 @@ from decimal import Decimal
 from datetime import datetime
 from utils.database import get_table
 from utils.encoder import CustomEncoder
+from utils.json_response import FastJSONResponse
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -43,14 +44,14 @@ topic_arn = os.environ.get('PRICE_CHANGE_TOPIC_ARN')
 @router.get("/ticket")
 async def get_ticket(theatre_seat: str = Query(..., alias="Theatre-Seat")):
     """Retrieve a specific ticket by Theatre-Seat ID"""
-    logger.info(f"Retrieving ticket: {theatre_seat}")
+    logger.debug("Retrieving ticket: %s", theatre_seat)
     
     try:
         table = get_table()
         response = table.get_item(Key={'Theatre-Seat': theatre_seat})
         
         if 'Item' in response:
-            return response['Item']
+            return FastJSONResponse(response['Item'])
         else:
             raise HTTPException(status_code=404, detail="Ticket not found")
             
@@ -63,7 +64,7 @@ async def get_ticket(theatre_seat: str = Query(..., alias="Theatre-Seat")):
 @router.get("/tickets")
 async def get_all_tickets():
     """Retrieve all tickets"""
-    logger.info("Retrieving all tickets")
+    logger.debug("Retrieving all tickets")
     
     try:
         table = get_table()
@@ -75,7 +76,7 @@ async def get_all_tickets():
             response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
             items.extend(response.get('Items', []))
         
-        return {"tickets": items}
+        return FastJSONResponse({"tickets": items})
         
     except Exception as e:
         logger.error(f"Error retrieving all tickets: {str(e)}")
@@ -84,7 +85,7 @@ async def get_all_tickets():
 @router.post("/ticket", status_code=201)
 async def create_ticket(ticket: TicketCreate):
     """Create a new ticket booking"""
-    logger.info(f"Creating ticket: {ticket.theatre_seat}")
+    logger.info("Creating ticket: %s", ticket.theatre_seat)
     
     try:
         table = get_table()
@@ -107,7 +108,7 @@ async def create_ticket(ticket: TicketCreate):
             'Movie': ticket.movie
         }
         
-        logger.info(f"Successfully created ticket: {ticket.theatre_seat}")
+        logger.info("Successfully created ticket: %s", ticket.theatre_seat)
         return response_body
         
     except Exception as e:
@@ -117,7 +118,7 @@ async def create_ticket(ticket: TicketCreate):
 @router.patch("/ticket")
 async def update_ticket(ticket_update: TicketUpdate):
     """Update an existing ticket"""
-    logger.info(f"Updating ticket: {ticket_update.theatre_seat}")
+    logger.info("Updating ticket: %s", ticket_update.theatre_seat)
     
     try:
         table = get_table()
@@ -188,7 +189,7 @@ async def update_ticket(ticket_update: TicketUpdate):
                     Message=json.dumps(event_message, cls=CustomEncoder),
                     Subject=f'Price Change Event for {ticket_update.theatre_seat}'
                 )
-                logger.info(f"Published price change event for {ticket_update.theatre_seat}")
+                logger.info("Published price change event for %s", ticket_update.theatre_seat)
             except Exception as sns_error:
                 logger.error(f"Failed to publish price change event: {str(sns_error)}")
         
@@ -201,7 +202,7 @@ async def update_ticket(ticket_update: TicketUpdate):
             'priceChangeEventPublished': is_price_change and topic_arn is not None
         }
         
-        logger.info(f"Successfully updated ticket: {ticket_update.theatre_seat}")
+        logger.info("Successfully updated ticket: %s", ticket_update.theatre_seat)
         return response_body
         
     except HTTPException:
@@ -213,7 +214,7 @@ async def update_ticket(ticket_update: TicketUpdate):
 @router.delete("/ticket")
 async def delete_ticket(ticket_delete: TicketDelete):
     """Delete a ticket booking"""
-    logger.info(f"Deleting ticket: {ticket_delete.theatre_seat}")
+    logger.info("Deleting ticket: %s", ticket_delete.theatre_seat)
     
     try:
         table = get_table()
@@ -229,7 +230,7 @@ async def delete_ticket(ticket_delete: TicketDelete):
                 'Theatre-Seat': ticket_delete.theatre_seat,
                 'deletedItem': response['Attributes']
             }
-            logger.info(f"Successfully deleted ticket: {ticket_delete.theatre_seat}")
+            logger.info("Successfully deleted ticket: %s", ticket_delete.theatre_seat)
             return response_body
         else:
             raise HTTPException(status_code=404, detail="Ticket not found")
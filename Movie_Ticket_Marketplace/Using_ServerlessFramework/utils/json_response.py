@@ -0,0 +1,15 @@
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+from utils.encoder import dumps
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the orjson-backed encoder.
+
+    Returning an instance directly from an endpoint also skips FastAPI's
+    jsonable_encoder pass, which matters for large list payloads.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,236 @@
+"""In-process request and AWS call metrics, served as Prometheus text on /metrics.
+
+Importing this module registers botocore hooks on the default boto3 session.
+Clients copy the session's hooks when they are created, so import it before
+any module that builds a boto3 client at import time. The hooks:
+
+- ask DynamoDB for ReturnConsumedCapacity=TOTAL on every operation that
+  supports it, unless the caller already set it
+- time each DynamoDB and SNS call and record its consumed capacity
+
+Calls are attributed to the HTTP route being served through a context
+variable, so /metrics shows how many calls and capacity units each route
+costs. Counters live in the process; on Lambda each warm container reports
+its own.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import boto3
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AWS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+INSTRUMENTED_SERVICES = ('dynamodb', 'sns')
+# DynamoDB operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = {
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'
+}
+READ_OPERATIONS = {'GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems'}
+# Route label for AWS calls made outside an HTTP request (init, SQS events)
+NO_ROUTE = ('', 'none')
+
+_lock = threading.Lock()
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1.0) -> None:
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        with _lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ('le',)
+        for labels, series in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (_number(bound),))} {_number(count)}")
+            lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {_number(series[-1])}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_number(series[-1])}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route and status.',
+    ('method', 'route', 'status'), LATENCY_BUCKETS
+)
+AWS_CALLS_PER_REQUEST = Histogram(
+    'aws_calls_per_request', 'AWS API calls made while serving one request.',
+    ('method', 'route', 'service'), CALL_COUNT_BUCKETS
+)
+AWS_CALLS = Counter(
+    'aws_calls_total', 'AWS API calls by the route that made them.',
+    ('method', 'route', 'service', 'operation')
+)
+AWS_CALL_DURATION = Histogram(
+    'aws_call_duration_seconds', 'AWS API call latency.',
+    ('service', 'operation'), AWS_LATENCY_BUCKETS
+)
+CONSUMED_CAPACITY = Counter(
+    'dynamodb_consumed_capacity_units_total', 'DynamoDB capacity units consumed, by route and table.',
+    ('method', 'route', 'table', 'operation', 'kind')
+)
+METRICS = (REQUEST_DURATION, AWS_CALLS_PER_REQUEST, AWS_CALLS, AWS_CALL_DURATION, CONSUMED_CAPACITY)
+
+
+class _RequestCalls:
+    """AWS calls seen while serving one request, labelled once the route is known"""
+
+    def __init__(self):
+        self.calls: Dict[Tuple[str, str], int] = {}
+        self.capacity: Dict[Tuple[str, str, str], float] = {}
+
+
+_current_request: ContextVar[Optional[_RequestCalls]] = ContextVar('metrics_request', default=None)
+
+
+def _request_consumed_capacity(params, model, **kwargs):
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _start_timer(context, **kwargs):
+    context['metrics_started'] = time.perf_counter()
+
+
+def _record_call(model, parsed, context, **kwargs):
+    service = model.service_model.service_name
+    operation = model.name
+    started = context.get('metrics_started')
+    if started is not None:
+        AWS_CALL_DURATION.observe((service, operation), time.perf_counter() - started)
+
+    capacity = parsed.get('ConsumedCapacity') if isinstance(parsed, dict) else None
+    entries = capacity if isinstance(capacity, list) else [capacity] if capacity else []
+    kind = 'read' if operation in READ_OPERATIONS else 'write'
+
+    current = _current_request.get()
+    if current is None:
+        AWS_CALLS.inc(NO_ROUTE + (service, operation))
+        for entry in entries:
+            CONSUMED_CAPACITY.inc(NO_ROUTE + (entry.get('TableName', ''), operation, kind), entry.get('CapacityUnits', 0))
+        return
+
+    key = (service, operation)
+    current.calls[key] = current.calls.get(key, 0) + 1
+    for entry in entries:
+        key = (entry.get('TableName', ''), operation, kind)
+        current.capacity[key] = current.capacity.get(key, 0.0) + float(entry.get('CapacityUnits', 0))
+
+
+def install_aws_hooks(session=None) -> None:
+    """Register the botocore hooks on `session` (the default boto3 session if omitted)"""
+
+    events = (session or boto3._get_default_session()).events
+    for service in INSTRUMENTED_SERVICES:
+        events.register(f'before-call.{service}', _start_timer, unique_id=f'metrics-start-{service}')
+        events.register(f'after-call.{service}', _record_call, unique_id=f'metrics-record-{service}')
+    events.register('provide-client-params.dynamodb', _request_consumed_capacity, unique_id='metrics-capacity')
+
+
+def _route_label(scope) -> str:
+    route = scope.get('route')
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and AWS usage per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {'code': 500}
+        calls = _RequestCalls()
+        token = _current_request.set(calls)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            method, route = scope['method'], _route_label(scope)
+            REQUEST_DURATION.observe((method, route, str(status['code'])), time.perf_counter() - started)
+
+            per_service = {service: 0 for service in INSTRUMENTED_SERVICES}
+            for (service, operation), count in calls.calls.items():
+                AWS_CALLS.inc((method, route, service, operation), count)
+                per_service[service] = per_service.get(service, 0) + count
+            for service, count in per_service.items():
+                AWS_CALLS_PER_REQUEST.observe((method, route, service), count)
+            for (table, operation, kind), units in calls.capacity.items():
+                CONSUMED_CAPACITY.inc((method, route, table, operation, kind), units)
+
+
+def render_metrics() -> str:
+    with _lock:
+        lines = [line for metric in METRICS for line in metric.render()]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_response() -> Response:
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+install_aws_hooks()
@@ -0,0 +1,476 @@
+"""Generate a realistic, seeded dataset for scale testing.
+
+Writes three tables through parallel batch writes:
+
+    ticket-booking     one ticket per seat, for as many theatres as it takes
+                       to reach --tickets. Screens come in small, medium
+                       and large layouts with rows A-Z (no I or O) and
+                       Theatre-Seat keys such as '12-F14'
+    users-payroll      --users payroll users. Totals and balances are the
+                       sums of their transactions
+    user-transactions  a PURCHASE for every sold seat and a SALE/PURCHASE
+                       pair for every resale, in time order per seat
+
+Prices start from a log-normal base per screen, with a 3D or IMAX uplift,
+cheaper front rows and premium back rows, and .49/.99 endings. A share of
+unsold seats carry a recent markdown. Buyers are drawn from a Zipf
+distribution over users, so a few hot users make most of the purchases.
+Resales are Zipf-skewed toward each screen's best sold seats, so hot seats
+change hands many times. Popular movies get more screens and fuller rooms.
+
+Each theatre and user gets its own random stream derived from --seed, so a
+seed always yields the same items whatever --workers is. --dry-run
+generates without writing and prints a digest of every item, which is a
+quick way to confirm two runs match.
+
+Run from the local/ directory against LocalStack (`make start`) or any
+AWS_ENDPOINT_URL, or with STORAGE_BACKEND=sqlite to fill the local SQLite
+database (tables are created there on open):
+
+    python -m benchmarks.generate_data [--tickets 2000000] [--users 200000]
+        [--seed 42] [--workers 8] [--create-tables] [--dry-run]
+
+Revenue rollups are not written. Rebuild them afterwards with
+ServerlesswithPayroll/backfill_rollups.py.
+"""
+import argparse
+import bisect
+import hashlib
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.database import STORAGE_BACKEND
+
+TICKETS_TABLE = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
+USERS_TABLE = 'users-payroll'
+TRANSACTIONS_TABLE = 'user-transactions'
+# (name, key schema, global secondary indexes, extra attribute types), as in load_test.py
+TABLES = [
+    (TICKETS_TABLE, [('Theatre-Seat', 'HASH')], [], {}),
+    (USERS_TABLE, [('userId', 'HASH')], [], {}),
+    (TRANSACTIONS_TABLE, [('transactionId', 'HASH')],
+     [('UserTransactionsIndex', [('userId', 'HASH'), ('timestamp', 'RANGE')], 'ALL')],
+     {'userId': 'S', 'timestamp': 'S'}),
+]
+
+# Ordered by expected popularity; the Zipf draw over this list picks each screen's movie
+MOVIES = [
+    "Dune: Part Two", "Oppenheimer", "Inception", "Interstellar", "The Batman", "Barbie",
+    "Spider-Man: Across the Spider-Verse", "Top Gun: Maverick", "Everything Everywhere All at Once",
+    "Past Lives", "Killers of the Flower Moon", "Poor Things", "The Holdovers", "Godzilla Minus One",
+    "Anatomy of a Fall", "Asteroid City", "The Zone of Interest", "Perfect Days", "Aftersun", "Tar",
+]
+ROW_LETTERS = 'ABCDEFGHJKLMNPQRSTUVWXYZ'
+# (share of screens, rows range, seats in the front row range)
+SCREEN_LAYOUTS = [
+    (0.35, (8, 11), (10, 14)),
+    (0.45, (12, 16), (14, 20)),
+    (0.20, (18, 24), (20, 28)),
+]
+FORMAT_UPLIFT_CENTS = [('2D', 0, 0.70), ('3D', 300, 0.20), ('IMAX', 600, 0.10)]
+BASE_PRICE_CENTS = 1200
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Priya", "Chen", "Maria", "Noah", "Aisha", "Lucas", "Yuki",
+               "Omar", "Elena", "Kofi", "Ines", "Mateo", "Hana", "Ravi", "Zoe", "Ivan", "Leila"]
+LAST_NAMES = ["Smith", "Garcia", "Kim", "Patel", "Nguyen", "Silva", "Müller", "Okafor", "Rossi",
+              "Tanaka", "Cohen", "Novak", "Haddad", "Jensen", "Moreau", "Singh", "Lopez", "Ali"]
+
+
+class Zipf:
+    """Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s"""
+
+    def __init__(self, n: int, s: float):
+        self.cdf = list(accumulate(1.0 / (rank + 1) ** s for rank in range(n)))
+
+    def sample(self, rng: random.Random) -> int:
+        return bisect.bisect_left(self.cdf, rng.random() * self.cdf[-1])
+
+
+class Ledger:
+    """Per-user running totals, in cents, so the users written last match their history"""
+
+    def __init__(self, users: int):
+        self.sales = array('q', bytes(8 * users))
+        self.purchases = array('q', bytes(8 * users))
+        self.transactions = array('q', bytes(8 * users))
+        self.last: List[Optional[Tuple[str, str]]] = [None] * users
+
+    def record(self, user: int, transaction: Dict, cents: int) -> None:
+        if transaction['transactionType'] == 'SALE':
+            self.sales[user] += cents
+        else:
+            self.purchases[user] += cents
+        self.transactions[user] += 1
+        if self.last[user] is None or self.last[user][0] < transaction['timestamp']:
+            self.last[user] = (transaction['timestamp'], transaction['transactionId'])
+
+
+class Generator:
+    def __init__(self, args):
+        self.seed = args.seed
+        self.tickets = args.tickets
+        self.users = args.users
+        self.resale_rate = args.resale_rate
+        self.discount_rate = args.discount_rate
+        self.start = datetime.fromisoformat(args.start)
+        self.days = args.days
+        self.ledger = Ledger(args.users)
+        self.movie_zipf = Zipf(len(MOVIES), 1.0)
+        self.user_zipf = Zipf(args.users, args.user_skew)
+        self.seat_skew = args.seat_skew
+        self._seat_zipfs: Dict[int, Zipf] = {}
+        # Hot users are spread over the id space rather than being user-0000000, 1, 2...
+        self.user_by_rank = list(range(args.users))
+        random.Random(f"{args.seed}:users").shuffle(self.user_by_rank)
+
+    def user_id(self, user: int) -> str:
+        return f"user-{user:07d}"
+
+    def pick_user(self, rng: random.Random, exclude: Optional[int] = None) -> int:
+        while True:
+            user = self.user_by_rank[self.user_zipf.sample(rng)]
+            if user != exclude or self.users == 1:
+                return user
+
+    def seat_zipf(self, n: int) -> Zipf:
+        zipf = self._seat_zipfs.get(n)
+        if zipf is None:
+            zipf = self._seat_zipfs[n] = Zipf(n, self.seat_skew)
+        return zipf
+
+    def timestamp(self, seconds: float) -> str:
+        return (self.start + timedelta(seconds=seconds)).isoformat(timespec='microseconds')
+
+    # --- tickets and transactions ---------------------------------------------
+
+    def theatres(self) -> Iterator[Tuple[List[Dict], List[Dict]]]:
+        """(tickets, transactions) per theatre until --tickets seats exist"""
+        remaining = self.tickets
+        theatre = 1
+        while remaining > 0:
+            tickets, transactions = self.theatre(theatre, remaining)
+            remaining -= len(tickets)
+            theatre += 1
+            yield tickets, transactions
+
+    def theatre(self, theatre: int, limit: int) -> Tuple[List[Dict], List[Dict]]:
+        rng = random.Random(f"{self.seed}:theatre:{theatre}")
+        _, rows_range, width_range = rng.choices(SCREEN_LAYOUTS, weights=[layout[0] for layout in SCREEN_LAYOUTS])[0]
+        rows = rng.randint(*rows_range)
+        width = rng.randint(*width_range)
+        movie_rank = self.movie_zipf.sample(rng)
+        movie = MOVIES[movie_rank]
+        _, uplift, _ = rng.choices(FORMAT_UPLIFT_CENTS, weights=[uplift[2] for uplift in FORMAT_UPLIFT_CENTS])[0]
+        base = min(max(int(rng.lognormvariate(math.log(BASE_PRICE_CENTS), 0.2)), 700), 2500) + uplift
+        occupancy = min(0.95, 0.2 + 0.6 * (1 - movie_rank / len(MOVIES)) + rng.uniform(-0.1, 0.1))
+        opening = rng.uniform(0, self.days * 86400)
+
+        tickets = []
+        sold = []
+        transactions = []
+        for row in range(rows):
+            # Stadium seating: rows widen toward the back
+            if rng.random() < 0.4:
+                width += 1
+            if row < 3:
+                row_factor = 0.85
+            elif row >= rows - 2 and rows >= 12:
+                row_factor = 1.25
+            else:
+                row_factor = 1.0 + 0.1 * (1 - abs(row - rows * 0.6) / rows)
+
+            for number in range(1, width + 1):
+                if len(tickets) == limit:
+                    break
+                # 1.0 dead centre of the sweet-spot row, falling off to the sides and ends
+                centrality = 1 - abs(number - (width + 1) / 2) / width
+                depth = 1 - abs(row - rows * 0.6) / rows
+                desirability = centrality * depth
+                ticket = {
+                    'Theatre-Seat': f"{theatre}-{ROW_LETTERS[row]}{number}",
+                    'Movie': movie,
+                    'Price': self.price(base * row_factor * rng.gauss(1.0, 0.03), rng),
+                    'status': 'available'
+                }
+                tickets.append(ticket)
+
+                if rng.random() < min(1.0, occupancy * (0.5 + desirability)):
+                    seconds = opening + rng.expovariate(1 / 86400)
+                    buyer = self.pick_user(rng)
+                    transaction = self.transaction(rng, 'PURCHASE', buyer, ticket, ticket['Price'], seconds)
+                    ticket.update({
+                        'status': 'sold',
+                        'owner': self.user_id(buyer),
+                        'purchasePrice': ticket['Price'],
+                        'purchaseTimestamp': transaction['timestamp']
+                    })
+                    transactions.append(transaction)
+                    sold.append((desirability, ticket, buyer, seconds))
+                elif rng.random() < self.discount_rate:
+                    self.mark_down(ticket, rng, opening)
+
+        transactions.extend(self.resales(rng, sold))
+        return tickets, transactions
+
+    def price(self, cents: float, rng: random.Random) -> Decimal:
+        """Round to a .49 or .99 ending"""
+        dollars = max(int(cents // 100), 5)
+        return Decimal(dollars * 100 + rng.choice((49, 99))) / 100
+
+    def mark_down(self, ticket: Dict, rng: random.Random, opening: float) -> None:
+        previous = ticket['Price']
+        price = self.price(float(previous) * 100 * rng.uniform(0.7, 0.9), rng)
+        if price >= previous:
+            return
+        ticket.update({
+            'Price': price,
+            'PreviousPrice': previous,
+            'DiscountPercentage': Decimal(str(round(float((previous - price) / previous * 100), 2))),
+            'IsDiscounted': True,
+            'LastPriceChangeTimestamp': self.timestamp(opening + rng.uniform(0, 7 * 86400))
+        })
+
+    def resales(self, rng: random.Random, sold: List[Tuple]) -> List[Dict]:
+        """Resell the screen's sold seats, favouring the best ones"""
+        if not sold or self.users < 2:
+            return []
+        sold.sort(key=lambda entry: -entry[0])
+        zipf = self.seat_zipf(len(sold))
+        owners = {index: (buyer, seconds) for index, (_, _, buyer, seconds) in enumerate(sold)}
+
+        transactions = []
+        for _ in range(int(len(sold) * self.resale_rate + rng.random())):
+            index = zipf.sample(rng)
+            _, ticket, _, _ = sold[index]
+            seller, seconds = owners[index]
+            buyer = self.pick_user(rng, exclude=seller)
+            seconds += rng.expovariate(1 / 43200)
+            last_price = ticket.get('salePrice', ticket['purchasePrice'])
+            sale_price = (last_price * Decimal(str(round(rng.uniform(0.9, 1.5), 2)))).quantize(Decimal('0.01'))
+
+            sale = self.transaction(rng, 'SALE', seller, ticket, sale_price, seconds, buyerId=self.user_id(buyer))
+            purchase = self.transaction(rng, 'PURCHASE', buyer, ticket, sale_price, seconds, sellerId=self.user_id(seller))
+            transactions.extend((sale, purchase))
+            ticket.update({
+                'owner': self.user_id(buyer),
+                'salePrice': sale_price,
+                'saleTimestamp': sale['timestamp'],
+                'previousOwner': self.user_id(seller),
+                'originalPurchasePrice': ticket['purchasePrice']
+            })
+            owners[index] = (buyer, seconds)
+        return transactions
+
+    def transaction(self, rng: random.Random, kind: str, user: int, ticket: Dict, amount: Decimal,
+                    seconds: float, **counterparty) -> Dict:
+        seat, movie = ticket['Theatre-Seat'], ticket['Movie']
+        if kind == 'SALE':
+            description = f"Sold ticket for {movie} - Seat {seat} to {counterparty['buyerId']}"
+        elif counterparty:
+            description = f"Purchased ticket for {movie} - Seat {seat} from {counterparty['sellerId']}"
+        else:
+            description = f"Purchased ticket for {movie} - Seat {seat}"
+        transaction = {
+            'transactionId': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'userId': self.user_id(user),
+            'transactionType': kind,
+            'theatreSeat': seat,
+            'movie': movie,
+            'amount': amount,
+            **counterparty,
+            'timestamp': self.timestamp(seconds),
+            'status': 'COMPLETED',
+            'description': description
+        }
+        if kind == 'PURCHASE' and not counterparty:
+            transaction['paymentMethod'] = rng.choice(['card', 'card', 'card', 'wallet', 'paypal'])
+        self.ledger.record(user, transaction, int(amount * 100))
+        return transaction
+
+    # --- users ----------------------------------------------------------------
+
+    def user_items(self) -> Iterator[Dict]:
+        ledger = self.ledger
+        for user in range(self.users):
+            rng = random.Random(f"{self.seed}:user:{user}")
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            initial = rng.randint(50, 1000) * 100
+            created = self.timestamp(-rng.uniform(0, 365 * 86400))
+            sales, purchases = ledger.sales[user], ledger.purchases[user]
+            item = {
+                'userId': self.user_id(user),
+                'email': f"{first}.{last}.{user}@example.com".lower(),
+                'name': f"{first} {last}",
+                'currentBalance': Decimal(initial + sales - purchases) / 100,
+                'totalPurchases': Decimal(purchases) / 100,
+                'totalSales': Decimal(sales) / 100,
+                'totalTransactions': ledger.transactions[user],
+                'createdAt': created,
+                'lastUpdated': created,
+                'status': 'ACTIVE'
+            }
+            if ledger.last[user] is not None:
+                item['lastUpdated'], item['lastTransactionId'] = ledger.last[user]
+            yield item
+
+
+class ParallelWriter:
+    """Batch-writes items from a thread pool, one boto3 resource per thread"""
+
+    def __init__(self, workers: int, chunk_size: int, dry_run: bool):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.max_pending = workers * 4
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='generate-data')
+        self.pending = set()
+        self.buffers: Dict[str, List[Dict]] = {}
+        self.counts: Dict[str, int] = {}
+        self.digest = hashlib.sha256()
+        self._local = threading.local()
+
+    def put(self, table: str, item: Dict) -> None:
+        self.counts[table] = self.counts.get(table, 0) + 1
+        if self.dry_run:
+            self.digest.update(repr(sorted(item.items())).encode('utf-8'))
+            return
+        buffer = self.buffers.setdefault(table, [])
+        buffer.append(item)
+        if len(buffer) >= self.chunk_size:
+            self._submit(table, buffer)
+            self.buffers[table] = []
+
+    def _submit(self, table: str, items: List[Dict]) -> None:
+        # Bounded, so generation never runs far ahead of the writes
+        while len(self.pending) >= self.max_pending:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        self.pending.add(self.executor.submit(self._write, table, items))
+
+    def _write(self, table: str, items: List[Dict]) -> None:
+        dynamodb = getattr(self._local, 'dynamodb', None)
+        if dynamodb is None:
+            dynamodb = self._local.dynamodb = resource()
+        # batch_writer sends 25-item BatchWriteItem calls and resends unprocessed items
+        with dynamodb.Table(table).batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
+
+    def close(self) -> None:
+        for table, buffer in self.buffers.items():
+            if buffer:
+                self._submit(table, buffer)
+        self.buffers = {}
+        for future in self.pending:
+            future.result()
+        self.executor.shutdown()
+
+
+def resource():
+    from utils.database import get_dynamodb
+    if STORAGE_BACKEND != 'dynamodb':
+        # The app's own resource, which is shared and serializes its writes
+        return get_dynamodb()
+
+    import boto3
+    return boto3.resource(
+        'dynamodb',
+        endpoint_url=os.environ.get('AWS_ENDPOINT_URL', 'http://localhost:4566'),
+        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID', 'test'),
+        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY', 'test'),
+        region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+    )
+
+
+def create_tables() -> None:
+    """Create any of the three tables that does not exist yet"""
+    client = resource().meta.client
+    existing = set(client.list_tables()['TableNames'])
+    for name, keys, indexes, extra_attributes in TABLES:
+        if name in existing:
+            continue
+        attributes = {attribute: 'S' for attribute, _ in keys}
+        attributes.update(extra_attributes)
+        spec = {
+            'TableName': name,
+            'KeySchema': [{'AttributeName': attribute, 'KeyType': kind} for attribute, kind in keys],
+            'AttributeDefinitions': [{'AttributeName': a, 'AttributeType': t} for a, t in attributes.items()],
+            'BillingMode': 'PAY_PER_REQUEST',
+        }
+        if indexes:
+            spec['GlobalSecondaryIndexes'] = [{
+                'IndexName': index_name,
+                'KeySchema': [{'AttributeName': attribute, 'KeyType': kind} for attribute, kind in index_keys],
+                'Projection': {'ProjectionType': projection},
+            } for index_name, index_keys, projection in indexes]
+        client.create_table(**spec)
+        client.get_waiter('table_exists').wait(TableName=name)
+        print(f"Created {name}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=2000000, help="Seats to generate")
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--resale-rate', type=float, default=0.15, help="Resales per sold seat")
+    parser.add_argument('--discount-rate', type=float, default=0.1, help="Share of unsold seats marked down")
+    parser.add_argument('--user-skew', type=float, default=1.1, help="Zipf exponent for buyers")
+    parser.add_argument('--seat-skew', type=float, default=1.2, help="Zipf exponent for resold seats")
+    parser.add_argument('--start', default='2024-01-01T00:00:00', help="Earliest purchase time (UTC)")
+    parser.add_argument('--days', type=int, default=90, help="Days over which screens open")
+    parser.add_argument('--workers', type=int, default=8, help="Parallel batch writers")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Items per writer task")
+    parser.add_argument('--create-tables', action='store_true', help="Create missing tables first")
+    parser.add_argument('--dry-run', action='store_true', help="Generate only and print a digest of the items")
+    args = parser.parse_args()
+    if args.users < 1 or args.tickets < 1:
+        parser.error("--tickets and --users must be positive")
+
+    if args.create_tables and not args.dry_run and STORAGE_BACKEND == 'dynamodb':
+        create_tables()
+    elif not args.dry_run:
+        # Opened here, so the writer threads share one resource
+        resource()
+
+    generator = Generator(args)
+    writer = ParallelWriter(args.workers, args.chunk_size, args.dry_run)
+    started = time.perf_counter()
+    reported = 0
+    try:
+        for tickets, transactions in generator.theatres():
+            for ticket in tickets:
+                writer.put(TICKETS_TABLE, ticket)
+            for transaction in transactions:
+                writer.put(TRANSACTIONS_TABLE, transaction)
+            if writer.counts[TICKETS_TABLE] - reported >= 100000:
+                reported = writer.counts[TICKETS_TABLE]
+                print(f"  {reported} tickets, {writer.counts.get(TRANSACTIONS_TABLE, 0)} transactions "
+                      f"({time.perf_counter() - started:.0f} s)", file=sys.stderr)
+        for user in generator.user_items():
+            writer.put(USERS_TABLE, user)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    total = sum(writer.counts.values())
+    action = 'Generated' if args.dry_run else 'Wrote'
+    print(f"{action} {total} items in {elapsed:.1f} s ({total / elapsed:.0f} items/s), seed {args.seed}")
+    for table, count in writer.counts.items():
+        print(f"  {table:<20} {count:>10}")
+    if args.dry_run:
+        print(f"  digest {writer.digest.hexdigest()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""Microbenchmarks for the per-item hot paths, on fixed 1k/100k/1M datasets.
+
+Every list, update and event runs these once per item, so their per-item
+cost multiplies with table size:
+
+    local    DynamoDBService._process_item_from_dynamodb / _for_dynamodb,
+             EventService._calculate_discount_info, CustomEncoder.default,
+             TicketCreate and PriceChangeEvent validation
+    payroll  leaderboard ordering in ServerlesswithPayroll: a full sort of
+             the entries, the skip list rebuild and a ranked page read
+
+Datasets are generated from --seed, so runs are comparable across commits.
+Each suite runs in its own interpreter from its app directory, because both
+apps ship top-level `services` and `utils` packages. No AWS access is needed.
+
+Run from the local/ directory:
+
+    python -m benchmarks.hot_paths_bench [--sizes 1000 100000 1000000]
+        [--cases discount leaderboard] [--repeat 5] [--budget 2]
+        [--out hot_paths_results.json] [--baseline previous.json]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(os.path.dirname(BENCH_DIR))
+SUITE_DIRS = {
+    'local': os.path.join(REPO_DIR, 'local'),
+    'payroll': os.path.join(REPO_DIR, 'ServerlesswithPayroll'),
+}
+
+MOVIES = ["Inception", "Interstellar", "Dune: Part Two", "Oppenheimer", "The Batman", "Barbie"]
+# Items per scan page; roughly what fits in DynamoDB's 1 MB page for users-payroll
+SCAN_PAGE_SIZE = 2000
+
+# A case gets the dataset for one size and returns (callable, operations per call)
+Case = Callable[[Dict], Tuple[Callable[[], object], int]]
+
+
+# --- datasets -----------------------------------------------------------------
+
+def seat(i: int) -> str:
+    return f"{i // 400 + 1}-{chr(65 + (i // 20) % 20)}{i % 20 + 1}"
+
+
+def make_tickets(count: int, rng: random.Random) -> List[Dict]:
+    """DynamoDB-shaped ticket items, with Decimal numbers as boto3 returns them"""
+    tickets = []
+    for i in range(count):
+        price = Decimal(rng.randint(800, 2500)) / 100
+        previous = price + rng.choice([0, 0, 1, 2, 3])
+        tickets.append({
+            'Theatre-Seat': seat(i),
+            'Movie': rng.choice(MOVIES),
+            'Price': price,
+            'PreviousPrice': previous,
+            'DiscountPercentage': Decimal(str(round(float((previous - price) / previous * 100), 2))),
+            'IsDiscounted': previous > price,
+            'status': rng.choice(['available', 'sold'])
+        })
+    return tickets
+
+
+def make_users(count: int, rng: random.Random) -> List[Dict]:
+    """users-payroll items as the leaderboard's projected scan returns them"""
+    return [{
+        'userId': f"user-{i:07d}",
+        'name': f"User {i}",
+        'currentBalance': Decimal(rng.randint(0, 500000)) / 100,
+        'totalSales': Decimal(rng.randint(0, 200000)) / 100,
+        'totalPurchases': Decimal(rng.randint(0, 200000)) / 100,
+        'totalTransactions': rng.randint(0, 400)
+    } for i in range(count)]
+
+
+# --- local suite --------------------------------------------------------------
+
+def local_cases() -> Dict[str, Case]:
+    from models.ticket import PriceChangeEvent, TicketCreate
+    from services.dynamodb_service import DynamoDBService
+    from services.event_service import EventService
+    from utils.encoder import CustomEncoder
+
+    # Constructing the services only builds boto3 resources; nothing is called
+    service = DynamoDBService()
+    events = EventService()
+    encoder = CustomEncoder()
+
+    def from_dynamodb(data):
+        items = data['tickets']
+        return (lambda: [service._process_item_from_dynamodb(item) for item in items]), len(items)
+
+    def for_dynamodb(data):
+        items = [service._process_item_from_dynamodb(item) for item in data['tickets']]
+        return (lambda: [service._process_item_for_dynamodb(item) for item in items]), len(items)
+
+    def discount(data):
+        pairs = [(item['PreviousPrice'], item['Price']) for item in data['tickets']]
+        return (lambda: [events._calculate_discount_info(old, new) for old, new in pairs]), len(pairs)
+
+    def encoder_default(data):
+        values = [item['Price'] for item in data['tickets']]
+        return (lambda: [encoder.default(value) for value in values]), len(values)
+
+    def ticket_create(data):
+        bodies = [{
+            'Theatre-Seat': item['Theatre-Seat'],
+            'Movie': item['Movie'],
+            'Price': float(item['Price']),
+            'CustomerName': 'Alex Doe'
+        } for item in data['tickets']]
+        return (lambda: [TicketCreate.model_validate(body) for body in bodies]), len(bodies)
+
+    def price_change_event(data):
+        messages = [{
+            'eventType': 'PriceChangeInitiated',
+            'theatreSeat': item['Theatre-Seat'],
+            'movie': item['Movie'],
+            'oldPrice': float(item['PreviousPrice']),
+            'newPrice': float(item['Price']),
+            'timestamp': '2024-06-01T12:00:00.000000'
+        } for item in data['tickets']]
+        return (lambda: [PriceChangeEvent.model_validate(message) for message in messages]), len(messages)
+
+    return {
+        'process_item_from_dynamodb': from_dynamodb,
+        'process_item_for_dynamodb': for_dynamodb,
+        'discount': discount,
+        'encoder_default': encoder_default,
+        'ticket_create': ticket_create,
+        'price_change_event': price_change_event,
+    }
+
+
+def local_dataset(size: int, seed: int) -> Dict:
+    return {'tickets': make_tickets(size, random.Random(seed))}
+
+
+# --- payroll suite ------------------------------------------------------------
+
+class _ScanTable:
+    """Serves the leaderboard's paginated scan from memory"""
+
+    def __init__(self, users: List[Dict]):
+        self.users = users
+
+    def scan(self, ExclusiveStartKey=None, **kwargs):
+        start = ExclusiveStartKey['offset'] if ExclusiveStartKey else 0
+        page = {'Items': self.users[start:start + SCAN_PAGE_SIZE]}
+        if start + SCAN_PAGE_SIZE < len(self.users):
+            page['LastEvaluatedKey'] = {'offset': start + SCAN_PAGE_SIZE}
+        return page
+
+
+def payroll_cases() -> Dict[str, Case]:
+    from services.leaderboard_service import LeaderboardService
+
+    def full_sort(data):
+        # What a leaderboard request cost before the skip list: sort every entry
+        entries = [LeaderboardService._to_entry(user) for user in data['users']]
+        return (lambda: sorted(entries, key=LeaderboardService._sort_key)[:10]), len(entries)
+
+    def rebuild(data):
+        leaderboard = LeaderboardService(users_table=_ScanTable(data['users']), refresh_seconds=float('inf'))
+        return leaderboard.rebuild, len(data['users'])
+
+    def page(data):
+        users = data['users']
+        leaderboard = LeaderboardService(users_table=_ScanTable(users), refresh_seconds=float('inf'))
+        leaderboard.rebuild()
+        rng = random.Random(0)
+        offsets = [rng.randrange(len(users)) for _ in range(1000)]
+        return (lambda: [leaderboard.get_page(limit=10, offset=offset) for offset in offsets]), len(offsets)
+
+    return {
+        'leaderboard_sort': full_sort,
+        'leaderboard_rebuild': rebuild,
+        'leaderboard_page': page,
+    }
+
+
+def payroll_dataset(size: int, seed: int) -> Dict:
+    return {'users': make_users(size, random.Random(seed))}
+
+
+SUITES = {
+    'local': (local_cases, local_dataset),
+    'payroll': (payroll_cases, payroll_dataset),
+}
+CASE_NAMES = {
+    'local': ['process_item_from_dynamodb', 'process_item_for_dynamodb', 'discount', 'encoder_default',
+              'ticket_create', 'price_change_event'],
+    'payroll': ['leaderboard_sort', 'leaderboard_rebuild', 'leaderboard_page'],
+}
+
+
+# --- runner -------------------------------------------------------------------
+
+def best_of(fn, repeat: int, budget: float) -> Tuple[float, int]:
+    """Fastest of up to `repeat` runs, stopping early once `budget` seconds are spent"""
+    timings = []
+    spent = 0.0
+    while len(timings) < repeat and (not timings or spent < budget):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        spent += elapsed
+    return min(timings), len(timings)
+
+
+def selected(suite: str, patterns: Optional[List[str]]) -> List[str]:
+    names = CASE_NAMES[suite]
+    if not patterns:
+        return names
+    return [name for name in names if any(pattern in name for pattern in patterns)]
+
+
+def run_suite(suite: str, args) -> None:
+    make_cases, make_dataset = SUITES[suite]
+    cases = make_cases()
+    rows = []
+    for size in args.sizes:
+        data = make_dataset(size, args.seed)
+        for name in selected(suite, args.cases):
+            fn, operations = cases[name](data)
+            elapsed, runs = best_of(fn, args.repeat, args.budget)
+            rows.append({
+                'case': name,
+                'size': size,
+                'operations': operations,
+                'runs': runs,
+                'best_ms': round(elapsed * 1000, 3),
+                'ns_per_op': round(elapsed / operations * 1e9, 1),
+                'ops_per_s': round(operations / elapsed)
+            })
+            del fn
+        del data
+    print(json.dumps(rows))
+
+
+def spawn(suite: str, args) -> List[Dict]:
+    app_dir = SUITE_DIRS[suite]
+    env = dict(os.environ, PYTHONPATH=app_dir, PYTHONDONTWRITEBYTECODE='1')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    command = [
+        sys.executable, os.path.abspath(__file__), '--run-suite', suite,
+        '--sizes', *map(str, args.sizes), '--repeat', str(args.repeat),
+        '--budget', str(args.budget), '--seed', str(args.seed),
+    ]
+    if args.cases:
+        command += ['--cases', *args.cases]
+    result = subprocess.run(command, cwd=app_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Benchmark suite '{suite}' failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: Dict, baseline: Optional[Dict]) -> None:
+    previous = {
+        (suite, row['case'], row['size']): row['ns_per_op']
+        for suite, rows in ((baseline or {}).get('suites') or {}).items() for row in rows
+    }
+    for suite, rows in results['suites'].items():
+        print(f"\n{suite}")
+        print(f"  {'case':<28} {'size':>9} {'best ms':>11} {'ns/op':>10} {'ops/s':>12} {'runs':>5}")
+        for row in rows:
+            line = (f"  {row['case']:<28} {row['size']:>9} {row['best_ms']:>11.2f} "
+                    f"{row['ns_per_op']:>10.1f} {row['ops_per_s']:>12} {row['runs']:>5}")
+            before = previous.get((suite, row['case'], row['size']))
+            if before:
+                line += f"  {(row['ns_per_op'] - before) / before * 100:+.1f}%"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suites', nargs='+', choices=sorted(SUITES), default=sorted(SUITES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 100000, 1000000])
+    parser.add_argument('--cases', nargs='+', help="Only run cases whose name contains one of these")
+    parser.add_argument('--repeat', type=int, default=5, help="Most timed runs per case")
+    parser.add_argument('--budget', type=float, default=2.0, help="Stop repeating a case after this many seconds")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help="Also write machine-readable results to this file")
+    parser.add_argument('--baseline', help="Earlier results file to compare ns/op against")
+    parser.add_argument('--run-suite', choices=sorted(SUITES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_suite:
+        run_suite(args.run_suite, args)
+        return
+
+    results = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {key: getattr(args, key) for key in ('sizes', 'repeat', 'budget', 'seed')},
+        'suites': {}
+    }
+    for suite in args.suites:
+        if selected(suite, args.cases):
+            results['suites'][suite] = spawn(suite, args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
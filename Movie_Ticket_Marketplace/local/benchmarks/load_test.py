@@ -0,0 +1,501 @@
+"""End-to-end load test with per-endpoint throughput and p50/p95/p99 latency.
+
+Each target runs in its own interpreter against moto's server mode, started
+in-process as the DynamoDB/SNS stand-in, so neither LocalStack nor an AWS
+account is needed:
+
+    local    local/main.py, served in-process over an ASGI transport
+    lambda   ServerlesswithPayroll app.handler, called with API Gateway v2
+             events the way the Lambda runtime would call it
+
+Traffic is a weighted mix of browse (ticket, movie and list reads), price
+(PATCH Price, which also publishes to SNS), purchase (seat hold + purchase)
+and resale. Purchase and resale only exist on the lambda target; their share
+goes to browse on local. Requires moto[server] and httpx.
+
+With --storage memory the apps run on the in-process engine in
+utils/memory_store.py instead (STORAGE_BACKEND=memory) and moto is not
+started, which takes HTTP and serialization out of every storage call.
+Price changes are then not published, as no SNS topic is configured.
+
+Run from the local/ directory:
+
+    python -m benchmarks.load_test [--targets local lambda] [--requests 2000]
+        [--concurrency 16] [--mix browse=70,price=10,purchase=15,resale=5] [--storage moto|memory]
+        [--out load_test_results.json] [--baseline previous.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(os.path.dirname(BENCH_DIR))
+
+MOVIES = ["Inception", "Interstellar", "Dune: Part Two", "Oppenheimer", "The Batman", "Barbie"]
+OPERATIONS = ('browse', 'price', 'purchase', 'resale')
+
+TARGETS = {
+    'local': {
+        'app_dir': os.path.join(REPO_DIR, 'local'),
+        'operations': ('browse', 'price'),
+        'seat_param': 'theatre_seat',
+        'tables': [
+            ('ticket-booking', [('Theatre-Seat', 'HASH')], [], {}),
+            ('resource-versions', [('versionKey', 'HASH')], [], {}),
+            ('resource-changes', [('resource', 'HASH'), ('sequence', 'RANGE')], [], {'sequence': 'N'}),
+        ],
+    },
+    'lambda': {
+        'app_dir': os.path.join(REPO_DIR, 'ServerlesswithPayroll'),
+        'operations': OPERATIONS,
+        'seat_param': 'Theatre-Seat',
+        'tables': [
+            ('ticket-booking', [('Theatre-Seat', 'HASH')], [], {}),
+            ('resource-versions', [('versionKey', 'HASH')], [], {}),
+            ('resource-changes', [('resource', 'HASH'), ('sequence', 'RANGE')], [], {'sequence': 'N'}),
+            ('users-payroll', [('userId', 'HASH')], [], {}),
+            ('idempotency-keys', [('idempotencyKey', 'HASH')], [], {}),
+            ('revenue-rollups', [('rollupKey', 'HASH'), ('period', 'RANGE')], [], {}),
+            ('user-transactions', [('transactionId', 'HASH')],
+             [('UserTransactionsIndex', [('userId', 'HASH'), ('timestamp', 'RANGE')], 'ALL')],
+             {'userId': 'S', 'timestamp': 'S'}),
+            ('seat-holds', [('theatreSeat', 'HASH')],
+             [('TheatreHoldsIndex', [('theatreId', 'HASH'), ('expiresAt', 'RANGE')], 'KEYS_ONLY')],
+             {'theatreId': 'S', 'expiresAt': 'N'}),
+        ],
+    },
+}
+
+
+# --- stand-in backend -------------------------------------------------------
+
+def start_backend(tables) -> Any:
+    """Start moto's server on a free port and point every boto3 client at it"""
+
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        sys.exit("The load test needs moto's server mode: pip install 'moto[server]'")
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    os.environ['AWS_ENDPOINT_URL'] = f"http://127.0.0.1:{port}"
+
+    import boto3
+    dynamodb = boto3.client('dynamodb')
+    for name, keys, indexes, extra_attributes in tables:
+        attributes = {attribute: 'S' for attribute, _ in keys}
+        attributes.update(extra_attributes)
+        spec = {
+            'TableName': name,
+            'KeySchema': [{'AttributeName': attribute, 'KeyType': kind} for attribute, kind in keys],
+            'AttributeDefinitions': [{'AttributeName': a, 'AttributeType': t} for a, t in attributes.items()],
+            'BillingMode': 'PAY_PER_REQUEST',
+        }
+        if indexes:
+            spec['GlobalSecondaryIndexes'] = [{
+                'IndexName': index_name,
+                'KeySchema': [{'AttributeName': attribute, 'KeyType': kind} for attribute, kind in index_keys],
+                'Projection': {'ProjectionType': projection},
+            } for index_name, index_keys, projection in indexes]
+        dynamodb.create_table(**spec)
+
+    topic = boto3.client('sns').create_topic(Name='price-change-events')
+    os.environ['PRICE_CHANGE_TOPIC_ARN'] = topic['TopicArn']
+    return server
+
+
+def seed(target: str, tickets: int, users: int, rng: random.Random) -> Tuple[List[str], List[str]]:
+    """Write tickets (and payroll users on lambda) straight to the stand-in"""
+
+    from decimal import Decimal
+    # The app's own resource, so seeding reaches the in-process tables when STORAGE_BACKEND=memory
+    from utils.database import get_dynamodb
+
+    dynamodb = get_dynamodb()
+    seats = [f"{i // 400 + 1}-{chr(65 + (i // 20) % 20)}{i % 20 + 1}" for i in range(tickets)]
+    with dynamodb.Table('ticket-booking').batch_writer() as batch:
+        for seat in seats:
+            batch.put_item(Item={
+                'Theatre-Seat': seat,
+                'Movie': rng.choice(MOVIES),
+                'Price': Decimal(str(round(rng.uniform(8, 25), 2))),
+                'status': 'available',
+            })
+
+    user_ids = [f"bench-user-{i}" for i in range(users)] if target == 'lambda' else []
+    with dynamodb.Table('users-payroll').batch_writer() if user_ids else nullcontext() as batch:
+        for user_id in user_ids:
+            batch.put_item(Item={
+                'userId': user_id,
+                'email': f"{user_id}@example.com",
+                'name': user_id,
+                'currentBalance': Decimal('100000'),
+                'totalSpent': Decimal('0'),
+                'totalEarned': Decimal('0'),
+                'ticketsPurchased': 0,
+                'ticketsSold': 0,
+            })
+    return seats, user_ids
+
+
+# --- clients ----------------------------------------------------------------
+
+class AsgiClient:
+    """Calls the FastAPI app in-process, with its lifespan running"""
+
+    def __init__(self, app):
+        import httpx
+        self.app = app
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench')
+
+    async def __aenter__(self):
+        self.lifespan = self.app.router.lifespan_context(self.app)
+        await self.lifespan.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        await self.lifespan.__aexit__(*exc)
+
+    async def request(self, method: str, path: str, params=None, body=None) -> Tuple[int, bytes]:
+        response = await self.client.request(method, path, params=params, json=body)
+        return response.status_code, response.content
+
+
+class LambdaClient:
+    """Calls a Mangum handler with API Gateway HTTP API (v2) events.
+
+    Each worker thread stands in for one warm Lambda container, so the
+    handler sees the same one-request-at-a-time pattern as in AWS.
+    """
+
+    def __init__(self, handler, concurrency: int):
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(concurrency, initializer=lambda: asyncio.set_event_loop(asyncio.new_event_loop()))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.executor.shutdown(wait=True)
+
+    async def request(self, method: str, path: str, params=None, body=None) -> Tuple[int, bytes]:
+        from urllib.parse import urlencode
+        query = urlencode(params or {})
+        event = {
+            'version': '2.0',
+            'routeKey': f"{method} {path}",
+            'rawPath': path,
+            'rawQueryString': query,
+            'queryStringParameters': dict(params) if params else None,
+            'headers': {'host': 'bench', 'content-type': 'application/json'},
+            'requestContext': {
+                'http': {'method': method, 'path': path, 'sourceIp': '127.0.0.1', 'protocol': 'HTTP/1.1'},
+                'requestId': f"bench-{random.getrandbits(32):08x}",
+                'stage': '$default',
+            },
+            'body': json.dumps(body) if body is not None else None,
+            'isBase64Encoded': False,
+        }
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.executor, self.handler, event, _LambdaContext())
+        payload = response.get('body') or ''
+        if response.get('isBase64Encoded'):
+            import base64
+            return response['statusCode'], base64.b64decode(payload)
+        return response['statusCode'], payload.encode('utf-8')
+
+
+class _LambdaContext:
+    function_name = 'load-test'
+    aws_request_id = 'load-test'
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+# --- workload ---------------------------------------------------------------
+
+class Workload:
+    """Picks operations by weight and keeps track of which seats are free or owned"""
+
+    def __init__(self, target: str, client, seats: List[str], users: List[str], mix: Dict[str, float], rng: random.Random):
+        self.target = target
+        self.client = client
+        self.seats = seats
+        self.users = users
+        self.rng = rng
+        supported = TARGETS[target]['operations']
+        self.operations = [op for op in OPERATIONS if op in supported and mix.get(op, 0) > 0]
+        self.weights = [mix[op] for op in self.operations]
+        # Unsupported operations keep their share of traffic as browse
+        unsupported = sum(weight for op, weight in mix.items() if op not in supported)
+        if unsupported and 'browse' in self.operations:
+            self.weights[self.operations.index('browse')] += unsupported
+        self.available = list(seats)
+        rng.shuffle(self.available)
+        self.owned: List[Tuple[str, str]] = []
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.record = True
+
+    async def call(self, name: str, method: str, path: str, params=None, body=None) -> Tuple[int, bytes]:
+        started = time.perf_counter()
+        try:
+            status, content = await self.client.request(method, path, params=params, body=body)
+        except Exception:
+            status, content = 599, b''
+        if self.record:
+            self.samples[name].append((time.perf_counter() - started) * 1000)
+            self.statuses[name][status] += 1
+        return status, content
+
+    async def run_one(self):
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        await getattr(self, operation)()
+
+    async def browse(self):
+        roll = self.rng.random()
+        if roll < 0.8:
+            seat = self.rng.choice(self.seats)
+            params = {TARGETS[self.target]['seat_param']: seat}
+            await self.call('GET /api/ticket', 'GET', '/api/ticket', params=params)
+        elif roll < 0.9:
+            await self.call('GET /api/movies', 'GET', '/api/movies')
+        else:
+            await self.call('GET /api/tickets', 'GET', '/api/tickets')
+
+    async def price(self):
+        seat = self.rng.choice(self.seats)
+        value = round(self.rng.uniform(8, 25), 2)
+        if self.target == 'lambda':
+            body = {'theatre_seat': seat, 'update_key': 'Price', 'update_value': value}
+        else:
+            body = {'Theatre-Seat': seat, 'updateKey': 'Price', 'updateValue': value}
+        await self.call('PATCH /api/ticket', 'PATCH', '/api/ticket', body=body)
+
+    async def purchase(self):
+        if not self.available:
+            return await self.browse()
+        seat = self.available.pop()
+        user = self.rng.choice(self.users)
+        status, content = await self.call('POST /api/seats/hold', 'POST', '/api/seats/hold',
+                                          body={'user_id': user, 'theatre_seats': [seat]})
+        if status != 201:
+            return
+        hold_id = json.loads(content)['hold_id']
+        status, _ = await self.call('POST /api/purchase-ticket', 'POST', '/api/purchase-ticket', body={
+            'user_id': user, 'theatre_seat': seat, 'purchase_price': 12.5, 'hold_id': hold_id
+        })
+        if status == 201:
+            self.owned.append((seat, user))
+
+    async def resale(self):
+        if not self.owned:
+            return await self.purchase()
+        seat, seller = self.owned.pop(self.rng.randrange(len(self.owned)))
+        buyer = self.rng.choice([user for user in self.users if user != seller] or self.users)
+        status, _ = await self.call('POST /api/sell-ticket', 'POST', '/api/sell-ticket', body={
+            'user_id': seller, 'theatre_seat': seat, 'sale_price': 15.0, 'buyer_id': buyer
+        })
+        self.owned.append((seat, buyer if status == 201 else seller))
+
+
+async def drive(workload: Workload, requests: int, concurrency: int) -> float:
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await workload.run_one()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(workload: Workload, elapsed: float) -> Dict:
+    endpoints = {}
+    for name, samples in sorted(workload.samples.items()):
+        ordered = sorted(samples)
+        statuses = workload.statuses[name]
+        endpoints[name] = {
+            'requests': len(ordered),
+            'throughput_rps': round(len(ordered) / elapsed, 1),
+            'p50_ms': round(percentile(ordered, 50), 2),
+            'p95_ms': round(percentile(ordered, 95), 2),
+            'p99_ms': round(percentile(ordered, 99), 2),
+            'mean_ms': round(sum(ordered) / len(ordered), 2),
+            'max_ms': round(ordered[-1], 2),
+            'client_errors': sum(count for status, count in statuses.items() if 400 <= status < 500),
+            'errors': sum(count for status, count in statuses.items() if status >= 500),
+            'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        }
+    total = sum(endpoint['requests'] for endpoint in endpoints.values())
+    return {
+        'duration_s': round(elapsed, 3),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 1),
+        'endpoints': endpoints,
+    }
+
+
+async def run_target_async(target: str, args) -> Dict:
+    rng = random.Random(args.seed)
+    seats, users = seed(target, args.tickets, args.users, rng)
+
+    if target == 'lambda':
+        import app
+        client = LambdaClient(app.handler, args.concurrency)
+    else:
+        import main
+        client = AsgiClient(main.app)
+
+    async with client:
+        workload = Workload(target, client, seats, users, parse_mix(args.mix), rng)
+        workload.record = False
+        await drive(workload, args.warmup, args.concurrency)
+        workload.record = True
+        elapsed = await drive(workload, args.requests, args.concurrency)
+    return summarize(workload, elapsed)
+
+
+def run_target(target: str, args) -> None:
+    """Child process entry point; prints the summary as the last stdout line"""
+
+    for name, value in (('AWS_DEFAULT_REGION', 'us-east-1'), ('AWS_ACCESS_KEY_ID', 'bench'),
+                        ('AWS_SECRET_ACCESS_KEY', 'bench'), ('LOG_LEVEL', 'WARNING')):
+        os.environ.setdefault(name, value)
+
+    server = start_backend(TARGETS[target]['tables']) if args.storage == 'moto' else None
+    try:
+        result = asyncio.run(run_target_async(target, args))
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(result))
+
+
+# --- parent -----------------------------------------------------------------
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}' in --mix; expected {', '.join(OPERATIONS)}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def spawn(target: str, args) -> Dict:
+    app_dir = TARGETS[target]['app_dir']
+    env = dict(os.environ, PYTHONPATH=app_dir, PYTHONDONTWRITEBYTECODE='1')
+    if args.storage == 'memory':
+        # Empty rather than unset, so local's .env cannot point publishes at LocalStack
+        env.update(STORAGE_BACKEND='memory', PRICE_CHANGE_TOPIC_ARN='')
+    command = [
+        sys.executable, os.path.abspath(__file__), '--run-target', target,
+        '--requests', str(args.requests), '--warmup', str(args.warmup), '--concurrency', str(args.concurrency),
+        '--tickets', str(args.tickets), '--users', str(args.users), '--mix', args.mix, '--seed', str(args.seed),
+        '--storage', args.storage,
+    ]
+    result = subprocess.run(command, cwd=app_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Load test for target '{target}' failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: Dict, baseline: Optional[Dict]) -> None:
+    for target, summary in results['targets'].items():
+        print(f"\n{target}: {summary['requests']} requests in {summary['duration_s']:.1f} s "
+              f"({summary['throughput_rps']:.0f} req/s, concurrency {results['config']['concurrency']})")
+        print(f"  {'endpoint':<28} {'count':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'4xx':>5} {'5xx':>5}")
+        previous = ((baseline or {}).get('targets') or {}).get(target, {}).get('endpoints', {})
+        for name, row in summary['endpoints'].items():
+            line = (f"  {name:<28} {row['requests']:>6} {row['throughput_rps']:>8.1f} "
+                    f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['client_errors']:>5} {row['errors']:>5}")
+            if name in previous and previous[name]['p95_ms']:
+                change = (row['p95_ms'] - previous[name]['p95_ms']) / previous[name]['p95_ms'] * 100
+                line += f"  p95 {change:+.1f}%"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--targets', nargs='+', choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument('--requests', type=int, default=2000, help="Measured requests per target")
+    parser.add_argument('--warmup', type=int, default=100, help="Unmeasured requests run first")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--tickets', type=int, default=2000, help="Tickets seeded before the run")
+    parser.add_argument('--users', type=int, default=50, help="Payroll users seeded on the lambda target")
+    parser.add_argument('--mix', default='browse=70,price=10,purchase=15,resale=5')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--storage', choices=('moto', 'memory'), default='moto',
+                        help="moto's server, or the apps' in-process storage engine")
+    parser.add_argument('--out', default='load_test_results.json', help="Machine-readable results file")
+    parser.add_argument('--baseline', help="Earlier results file to compare p95 against")
+    parser.add_argument('--run-target', choices=sorted(TARGETS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    if args.run_target:
+        run_target(args.run_target, args)
+        return
+
+    results = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {key: getattr(args, key) for key in ('requests', 'warmup', 'concurrency', 'tickets', 'users', 'mix', 'seed', 'storage')},
+        'targets': {target: spawn(target, args) for target in args.targets},
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
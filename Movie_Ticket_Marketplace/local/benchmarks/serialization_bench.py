@@ -0,0 +1,71 @@
+"""Compare response serializers on a 50k-ticket GET /tickets payload.
+
+Run from the local/ directory:
+
+    python -m benchmarks.serialization_bench [--tickets 50000] [--repeat 3]
+"""
+import argparse
+import json
+import random
+import time
+from decimal import Decimal
+
+from utils.encoder import CustomEncoder, dumps
+
+MOVIES = ["Inception", "Interstellar", "Dune: Part Two", "Oppenheimer", "The Batman", "Barbie"]
+
+def make_tickets(count: int, seed: int = 42):
+    """Build DynamoDB-shaped ticket items with Decimal numbers"""
+    rng = random.Random(seed)
+    tickets = []
+    for i in range(count):
+        price = Decimal(str(round(rng.uniform(8, 25), 2)))
+        previous = price + Decimal(rng.choice([0, 1, 2, 3]))
+        tickets.append({
+            'Theatre-Seat': f"{i // 400 + 1}-{chr(65 + (i // 20) % 20)}{i % 20 + 1}",
+            'Movie': rng.choice(MOVIES),
+            'Price': price,
+            'PreviousPrice': previous,
+            'DiscountPercentage': Decimal(str(round(float((previous - price) / previous * 100), 2))),
+            'IsDiscounted': previous > price,
+            'LastPriceChangeTimestamp': '2024-06-01T12:00:00.000000',
+            'status': rng.choice(['available', 'sold'])
+        })
+    return {'tickets': tickets}
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    payload = make_tickets(args.tickets)
+    cases = {
+        'json + CustomEncoder (build_response before)': lambda: json.dumps(payload, cls=CustomEncoder).encode('utf-8'),
+        'utils.encoder.dumps': lambda: dumps(payload),
+    }
+
+    try:
+        from fastapi.encoders import jsonable_encoder
+        from fastapi.responses import JSONResponse
+        cases['jsonable_encoder + JSONResponse (FastAPI default)'] = lambda: JSONResponse(jsonable_encoder(payload)).body
+    except ImportError:
+        pass
+
+    print(f"Serializing {args.tickets} tickets, best of {args.repeat}")
+    baseline = None
+    for name, fn in cases.items():
+        elapsed = best_of(fn, args.repeat)
+        baseline = baseline or elapsed
+        print(f"  {name:<52} {elapsed * 1000:9.1f} ms  {baseline / elapsed:6.1f}x  {len(fn()) / 1e6:6.2f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -3,26 +3,32 @@ import json
 import os
 import logging
 from utils.encoder import CustomEncoder
+from utils.structured_logging import configure_logging, log_event
+from utils.tracing import traced_handler
+from services.version_service import VersionService
+from utils.compression import decode_request_body
 from utils.response import build_response
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+configure_logging()
 
 # DynamoDB setup
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
 table = dynamodb.Table(table_name)
+versions = VersionService(dynamodb)
 
+@traced_handler("DELETE /ticket")
 def remove_ticket(event, context):
     """Delete a ticket booking"""
-    logger.info(f"Deleting ticket with event: {json.dumps(event)}")
+    log_event(logger, "Deleting ticket", event)
     
     try:
         # Parse request body
         if not event.get('body'):
             return build_response(400, {'error': 'Request body is required'})
         
-        request_data = json.loads(event['body'])
+        request_data = json.loads(decode_request_body(event))
         
         # Validate required field
         theatre_seat = request_data.get('Theatre-Seat')
@@ -38,6 +44,7 @@ def remove_ticket(event, context):
         
         # Check if item was actually deleted
         if 'Attributes' in response:
+            versions.bump(table_name, theatre_seat)
             response_body = {
                 'message': 'Ticket deleted successfully',
                 'Theatre-Seat': theatre_seat,
@@ -4,27 +4,59 @@ import os
 import logging
 from decimal import Decimal
 from datetime import datetime
+from utils.clients import get_sns_client
 from utils.encoder import CustomEncoder
+from utils.structured_logging import configure_logging, log_event
+from utils.tracing import start_span, traceparent_from_sqs
+from utils.write_behind import WriteBehindBuffer
+from services.version_service import VersionService
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+configure_logging()
 
 # DynamoDB setup
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
 table = dynamodb.Table(table_name)
+versions = VersionService(dynamodb)
 
-# SNS setup
-sns = boto3.client('sns')
+# SNS setup; the client itself is created on first publish
 topic_arn = os.environ.get('PRICE_CHANGE_TOPIC_ARN')
 
-# SQS setup
-sqs = boto3.client('sqs')
-queue_url = os.environ.get('SQS_QUEUE_URL')
+def _price_changes_written(items):
+    """After a flush: bump the tickets' versions and publish a completion event per ticket"""
+    versions.bump_items(table_name, list(items))
+    if not topic_arn:
+        return
+
+    for theatre_seat, updated_item in items.items():
+        completion_event = {
+            'eventType': 'PriceChangeProcessed',
+            'theatreSeat': theatre_seat,
+            'movie': updated_item.get('Movie'),
+            'finalPrice': updated_item.get('Price'),
+            'priceChangeTimestamp': updated_item.get('LastPriceChangeTimestamp'),
+            'isDiscounted': updated_item.get('IsDiscounted', False),
+            'discountPercentage': float(updated_item.get('DiscountPercentage', 0)),
+            'processedAt': datetime.utcnow().isoformat(),
+            'updatedItem': updated_item
+        }
+        try:
+            get_sns_client().publish(
+                TopicArn=topic_arn,
+                Message=json.dumps(completion_event, cls=CustomEncoder),
+                Subject=f'Price Change Processed for {theatre_seat}'
+            )
+            logger.info(f"Published price change completion event for {theatre_seat}")
+        except Exception as sns_error:
+            logger.error(f"Failed to publish completion event: {str(sns_error)}")
+
+# Derived ticket attributes, coalesced per seat and written once per batch (see utils.write_behind)
+derived_writes = WriteBehindBuffer(table, 'Theatre-Seat', on_flushed=_price_changes_written)
 
 async def handle_price_change_event(event, context):
     """Handle price change events from SQS queue"""
-    logger.info(f"Received SQS event: {json.dumps(event)}")
+    log_event(logger, "Received SQS event", event)
     try:
         # Parse SQS messages
         for record in event.get('Records', []):
@@ -38,8 +70,14 @@ async def handle_price_change_event(event, context):
                 else:
                     # Direct SQS message (fallback)
                     message = sqs_body
-                # Process the message
-                await process_price_change_message(message)
+                # Process the message, continuing the trace of the request that published it
+                with start_span('price_change.process', kind='consumer', traceparent=traceparent_from_sqs(record, sqs_body),
+                                **{'messaging.system': 'aws_sqs', 'messaging.message_id': record.get('messageId'),
+                                   'price_change.theatre_seat': message.get('theatreSeat')}):
+                    await process_price_change_message(message)
+        # Messages only stage their writes; store them before SQS deletes the batch
+        with start_span('price_change.flush'):
+            derived_writes.flush(strict=True)
         return {
             'statusCode': 200,
             'body': json.dumps({'message': 'Price change event processed successfully'})
@@ -55,7 +93,6 @@ async def process_price_change_message(message):
         # Extract event details
         event_type = message.get('eventType')
         theatre_seat = message.get('theatreSeat')
-        movie = message.get('movie')
         old_price = message.get('oldPrice')
         new_price = message.get('newPrice')
         timestamp = message.get('timestamp')
@@ -78,51 +115,9 @@ async def process_price_change_message(message):
                 additional_updates['DiscountPercentage'] = Decimal('0')
                 additional_updates['IsDiscounted'] = False
 
-            # Update the ticket with additional metadata
-            update_expression_parts = []
-            expression_attribute_names = {}
-            expression_attribute_values = {}
-
-            for key, value in additional_updates.items():
-                update_expression_parts.append(f'#{key} = :{key}')
-                expression_attribute_names[f'#{key}'] = key
-                expression_attribute_values[f':{key}'] = value
-
-            if update_expression_parts:
-                update_expression = 'SET ' + ', '.join(update_expression_parts)
-                response = table.update_item(
-                    Key={'Theatre-Seat': theatre_seat},
-                    UpdateExpression=update_expression,
-                    ExpressionAttributeNames=expression_attribute_names,
-                    ExpressionAttributeValues=expression_attribute_values,
-                    ReturnValues='ALL_NEW'
-                )
-                updated_item = response.get('Attributes', {})
-                logger.info(f"Added price change metadata for {theatre_seat}")
-
-                # Publish another event indicating the processing is complete
-                completion_event = {
-                    'eventType': 'PriceChangeProcessed',
-                    'theatreSeat': theatre_seat,
-                    'movie': movie,
-                    'finalPrice': new_price,
-                    'priceChangeTimestamp': additional_updates['LastPriceChangeTimestamp'],
-                    'isDiscounted': additional_updates['IsDiscounted'],
-                    'discountPercentage': float(additional_updates['DiscountPercentage']),
-                    'processedAt': datetime.utcnow().isoformat(),
-                    'updatedItem': updated_item
-                }
-
-                if topic_arn:
-                    try:
-                        sns.publish(
-                            TopicArn=topic_arn,
-                            Message=json.dumps(completion_event, cls=CustomEncoder),
-                            Subject=f'Price Change Processed for {theatre_seat}'
-                        )
-                        logger.info(f"Published price change completion event for {theatre_seat}")
-                    except Exception as sns_error:
-                        logger.error(f"Failed to publish completion event: {str(sns_error)}")
+            # Written with any other pending changes to the seat; the completion event follows the write
+            derived_writes.stage(theatre_seat, additional_updates)
+            logger.info(f"Staged price change metadata for {theatre_seat}")
 
         elif event_type == 'PriceChangeProcessed':
             logger.info(f"Price change processing completed for {theatre_seat}")
@@ -1,18 +1,20 @@
 import boto3
-import json
 import os
 import logging
 from utils.encoder import CustomEncoder
+from utils.structured_logging import configure_logging, log_event
+from utils.tracing import traced_handler
 from utils.response import build_response
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+configure_logging()
 
 # DynamoDB setup
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
 table = dynamodb.Table(table_name)
 
+@traced_handler("GET /movies")
 def get_movies(event, context):
     """Retrieve all unique movies from tickets"""
     logger.info("Retrieving all unique movies")
@@ -35,9 +37,10 @@ def get_movies(event, context):
         logger.error(f"Error retrieving movies: {str(e)}")
         return build_response(500, {'error': 'Failed to retrieve movies'})
 
+@traced_handler("GET /ticket")
 def get_ticket(event, context):
     """Retrieve a specific ticket by Theatre-Seat ID"""
-    logger.info(f"Retrieving ticket with event: {json.dumps(event)}")
+    log_event(logger, "Retrieving ticket", event)
     
     try:
         # Get Theatre-Seat from query parameters
@@ -60,6 +63,7 @@ def get_ticket(event, context):
         logger.error(f"Error retrieving ticket: {str(e)}")
         return build_response(500, {'error': 'Failed to retrieve ticket'})
 
+@traced_handler("GET /tickets")
 def get_all_tickets(event, context):
     """Retrieve all tickets"""
     logger.info("Retrieving all tickets")
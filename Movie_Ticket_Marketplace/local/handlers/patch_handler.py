@@ -5,32 +5,38 @@ import logging
 from decimal import Decimal
 from datetime import datetime
 
+from utils.clients import get_sns_client
 from utils.encoder import CustomEncoder
+from utils.structured_logging import configure_logging, log_event
+from utils.tracing import traced_handler
+from services.version_service import VersionService
+from utils.compression import decode_request_body
 from utils.response import build_response
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+configure_logging()
 
 # DynamoDB setup
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
 table = dynamodb.Table(table_name)
+versions = VersionService(dynamodb)
 
-# SNS setup
-sns = boto3.client('sns')
+# SNS setup; the client itself is created on first publish
 topic_arn = os.environ.get('PRICE_CHANGE_TOPIC_ARN')
 
 
+@traced_handler("PATCH /ticket")
 def update_ticket(event, context):
     """Update an existing ticket"""
-    logger.info(f"Updating ticket with event: {json.dumps(event)}")
+    log_event(logger, "Updating ticket", event)
     
     try:
         # Parse request body
         if not event.get('body'):
             return build_response(400, {'error': 'Request body is required'})
 
-        request_data = json.loads(event['body'])
+        request_data = json.loads(decode_request_body(event))
 
         # Validate required fields
         theatre_seat = request_data.get('Theatre-Seat')
@@ -89,6 +95,7 @@ def update_ticket(event, context):
         )
         
         updated_item = response.get('Attributes', {})
+        versions.bump(table_name, theatre_seat)
 
         # Check if this is a price change and publish event
         is_price_change = update_key.lower() == 'price'
@@ -108,7 +115,7 @@ def update_ticket(event, context):
             }
 
             try:
-                sns.publish(
+                get_sns_client().publish(
                     TopicArn=topic_arn,
                     Message=json.dumps(event_message, cls=CustomEncoder),
                     Subject=f'Price Change Event for {theatre_seat}'
@@ -3,10 +3,14 @@ import json
 import os
 import logging
 from utils.encoder import CustomEncoder
+from utils.structured_logging import configure_logging, log_event
+from utils.tracing import traced_handler
+from services.version_service import VersionService
+from utils.compression import decode_request_body
 from utils.response import build_response
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+configure_logging()
 
 # DynamoDB setup
 dynamodb_endpoint = os.environ.get('AWS_ENDPOINT_URL')
@@ -23,17 +27,19 @@ dynamodb = boto3.resource(
 
 table_name = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
 table = dynamodb.Table(table_name)
+versions = VersionService(dynamodb)
 
+@traced_handler("POST /ticket")
 def create_ticket(event, context):
     """Create a new ticket booking"""
-    logger.info(f"Creating ticket with event: {json.dumps(event)}")
+    log_event(logger, "Creating ticket", event)
     
     try:
         # Parse request body
         if not event.get('body'):
             return build_response(400, {'error': 'Request body is required'})
         
-        ticket_data = json.loads(event['body'])
+        ticket_data = json.loads(decode_request_body(event))
         
         # Validate required fields
         if not ticket_data.get('Theatre-Seat'):
@@ -44,6 +50,7 @@ def create_ticket(event, context):
         
         # Save ticket to DynamoDB
         table.put_item(Item=ticket_data)
+        versions.bump(table_name, ticket_data['Theatre-Seat'])
         
         response_body = {
             'message': 'Ticket created successfully',
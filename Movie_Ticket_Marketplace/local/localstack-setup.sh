@@ -29,6 +29,35 @@ awslocal dynamodb wait table-exists --table-name ticket-booking --region us-east
 
 echo "✅ DynamoDB table created successfully!"
 
+# Create the version counters table behind ETags
+echo "📊 Creating resource-versions table..."
+awslocal dynamodb create-table \
+    --table-name resource-versions \
+    --attribute-definitions \
+        AttributeName=versionKey,AttributeType=S \
+    --key-schema \
+        AttributeName=versionKey,KeyType=HASH \
+    --billing-mode PAY_PER_REQUEST \
+    --region us-east-1
+
+# Create the change feed behind snapshot catch-up, expired by TTL
+echo "📊 Creating resource-changes table..."
+awslocal dynamodb create-table \
+    --table-name resource-changes \
+    --attribute-definitions \
+        AttributeName=resource,AttributeType=S \
+        AttributeName=sequence,AttributeType=N \
+    --key-schema \
+        AttributeName=resource,KeyType=HASH \
+        AttributeName=sequence,KeyType=RANGE \
+    --billing-mode PAY_PER_REQUEST \
+    --region us-east-1
+
+awslocal dynamodb update-time-to-live \
+    --table-name resource-changes \
+    --time-to-live-specification Enabled=true,AttributeName=expiresAt \
+    --region us-east-1
+
 # List tables to verify
 echo "📋 Verifying table creation..."
 awslocal dynamodb list-tables --region us-east-1
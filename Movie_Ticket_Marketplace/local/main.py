@@ -4,12 +4,26 @@ from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
-from routers import tickets, movies, events
+# These register botocore hooks, so they must precede modules that create boto3 clients
+from utils.metrics import MetricsMiddleware, metrics_response
+from utils.tracing import TracingMiddleware
+
+from routers import tickets, movies, events, users, theatres
 from services.dynamodb_service import DynamoDBService
+from services.event_service import get_derived_writes
+from services.ticket_snapshot import start_ticket_snapshot, stop_ticket_snapshot
+from services.user_snapshot import start_user_snapshot, stop_user_snapshot
+from utils.compression_middleware import CompressionMiddleware
+from utils.json_response import FastJSONResponse
+from utils.profiling import ProfilingMiddleware
+from utils.structured_logging import RequestLoggingMiddleware, configure_logging
 
 # Load environment variables
 load_dotenv()
 
+# Single-line JSON log records; level from LOG_LEVEL
+configure_logging()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -18,17 +32,27 @@ async def lifespan(app: FastAPI):
     # Initialize DynamoDB service
     dynamodb_service = DynamoDBService()
     app.state.dynamodb_service = dynamodb_service
+    derived_writes = get_derived_writes()
+    # TICKET_SNAPSHOT=on and USER_SNAPSHOT=on serve reads from memory, restored from SNAPSHOT_DIR when possible
+    start_ticket_snapshot(dynamodb_service.table, dynamodb_service.versions)
+    start_user_snapshot(dynamodb_service.dynamodb, dynamodb_service.versions)
     
     yield
     
     # Shutdown
     print("🛑 Shutting down Movie Booking FastAPI...")
+    # Write the discount attributes still buffered before the process exits
+    derived_writes.close()
+    # Saves the snapshots for the next worker to start from
+    stop_ticket_snapshot()
+    stop_user_snapshot()
 
 app = FastAPI(
     title="Movie Booking API",
     description="A FastAPI-based movie ticket booking system with LocalStack integration",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -38,12 +62,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# gzip/brotli for large list payloads, negotiated via Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
+# One sampled JSON line per request (LOG_SAMPLE_RATE / LOG_SAMPLE_RATES); 5xx always logged
+app.add_middleware(RequestLoggingMiddleware)
+
+# Per-route latency and DynamoDB/SNS usage, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Stack-sampling profile of requests sent with X-Profile: $PROFILE_TOKEN or picked by PROFILE_SAMPLE_RATE
+app.add_middleware(ProfilingMiddleware)
+
+# Server span per request, continuing an incoming traceparent (TRACE_EXPORTER)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(tickets.router, prefix="/api", tags=["tickets"])
 app.include_router(movies.router, prefix="/api", tags=["movies"])
 app.include_router(events.router, prefix="/api", tags=["events"])
+app.include_router(users.router, prefix="/api", tags=["users"])
+app.include_router(theatres.router, prefix="/api", tags=["theatres"])
 
 @app.get("/")
 async def root():
@@ -53,6 +95,11 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this process's request and AWS call metrics"""
+    return metrics_response()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "movie-booking-api"}
@@ -3,6 +3,8 @@ from typing import List
 import logging
 
 from services.dynamodb_service import DynamoDBService
+from utils.json_response import FastJSONResponse
+from utils.conditional import cache_headers, make_etag, not_modified
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -12,12 +14,19 @@ def get_dynamodb_service(request: Request) -> DynamoDBService:
 
 @router.get("/movies")
 async def get_movies(
+    request: Request,
     dynamodb_service: DynamoDBService = Depends(get_dynamodb_service)
 ):
     """Retrieve all unique movies from tickets"""
     try:
+        # Movies are derived from tickets, so they share the tickets table version
+        etag = make_etag('movies', dynamodb_service.get_tickets_version())
+        cached = not_modified(request, 'movies', etag)
+        if cached:
+            return cached
+        
         movies = dynamodb_service.get_movies()
-        return {"movies": movies}
+        return FastJSONResponse({"movies": movies}, headers=cache_headers('movies', etag))
     except Exception as e:
         logger.error(f"Error retrieving movies: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve movies")
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import Optional
+import logging
+
+from services.dynamodb_service import DynamoDBService
+from services.seat_map import block_response, seat_map_response
+from utils.json_response import FastJSONResponse
+from utils.conditional import cache_headers, make_etag, not_modified
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Largest block a best-available search accepts
+MAX_ADJACENT_SEATS = 40
+
+def get_dynamodb_service(request: Request) -> DynamoDBService:
+    return request.app.state.dynamodb_service
+
+@router.get("/theatres/{theatre}/seatmap")
+async def get_seat_map(
+    theatre: str,
+    request: Request,
+    dynamodb_service: DynamoDBService = Depends(get_dynamodb_service)
+):
+    """Rows of a theatre front to back, with which seats are free and which are sold"""
+    try:
+        if not theatre.isdigit():
+            raise HTTPException(status_code=404, detail="Theatre not found")
+
+        # Seat maps are derived from tickets, so they share the tickets table version
+        etag = make_etag('seatmap', dynamodb_service.get_tickets_version(), theatre)
+        cached = not_modified(request, 'seatmap', etag)
+        if cached:
+            return cached
+
+        seats = dynamodb_service.get_theatre_seats(theatre)
+        if seats is None:
+            raise HTTPException(status_code=404, detail="Theatre not found")
+
+        return FastJSONResponse(seat_map_response(theatre, seats), headers=cache_headers('seatmap', etag))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving seat map: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve seat map")
+
+@router.get("/theatres/{theatre}/best-available")
+async def get_best_available(
+    theatre: str,
+    count: int = Query(1, ge=1, le=MAX_ADJACENT_SEATS),
+    row: Optional[str] = None,
+    dynamodb_service: DynamoDBService = Depends(get_dynamodb_service)
+):
+    """The best block of `count` free adjacent seats, optionally in one row"""
+    try:
+        seats = dynamodb_service.get_theatre_seats(theatre) if theatre.isdigit() else None
+        if seats is None:
+            raise HTTPException(status_code=404, detail="Theatre not found")
+
+        block = seats.best_adjacent(count, row.upper() if row else None)
+        if block is None:
+            raise HTTPException(status_code=404, detail=f"No {count} adjacent seats available")
+
+        return block_response(theatre, block[0], block[1], count)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching for adjacent seats: {e}")
+        raise HTTPException(status_code=500, detail="Failed to search for seats")
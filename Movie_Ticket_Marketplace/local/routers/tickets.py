@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import List, Dict, Any, Optional
+import hashlib
 import logging
 
 from models.ticket import TicketCreate, TicketUpdate, TicketDelete, TicketResponse
 from services.dynamodb_service import DynamoDBService
 from services.sns_service import SNSService
+from services.ticket_snapshot import get_ticket_snapshot
+from utils.json_response import FastJSONResponse
+from utils.conditional import cache_headers, make_etag, not_modified
+from utils.negotiation import streaming_msgpack_response, wants_msgpack
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -12,6 +17,11 @@ logger = logging.getLogger(__name__)
 def get_dynamodb_service(request: Request) -> DynamoDBService:
     return request.app.state.dynamodb_service
 
+def filter_variant(filters: Dict[str, Any]) -> Optional[str]:
+    """Short ETag-safe digest of the list filters in use, or None without filters"""
+    used = sorted((name, value) for name, value in filters.items() if value is not None)
+    return hashlib.sha1(repr(used).encode('utf-8')).hexdigest()[:12] if used else None
+
 @router.post("/ticket", response_model=Dict[str, Any], status_code=201)
 async def create_ticket(
     ticket: TicketCreate,
@@ -38,6 +48,7 @@ async def create_ticket(
 @router.get("/ticket")
 async def get_ticket(
     theatre_seat: str,
+    request: Request,
     dynamodb_service: DynamoDBService = Depends(get_dynamodb_service)
 ):
     """Retrieve a specific ticket by Theatre-Seat ID"""
@@ -45,11 +56,16 @@ async def get_ticket(
         if not theatre_seat:
             raise HTTPException(status_code=400, detail="Theatre-Seat query parameter is required")
         
+        etag = make_etag('ticket', dynamodb_service.get_ticket_version(theatre_seat))
+        cached = not_modified(request, 'ticket', etag)
+        if cached:
+            return cached
+        
         ticket = dynamodb_service.get_ticket(theatre_seat)
         if not ticket:
             raise HTTPException(status_code=404, detail="Ticket not found")
         
-        return ticket
+        return FastJSONResponse(ticket, headers=cache_headers('ticket', etag))
     except HTTPException:
         raise
     except Exception as e:
@@ -58,16 +74,44 @@ async def get_ticket(
 
 @router.get("/tickets")
 async def get_all_tickets(
+    request: Request,
+    movie: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
     dynamodb_service: DynamoDBService = Depends(get_dynamodb_service)
 ):
-    """Retrieve all tickets"""
+    """Retrieve all tickets, or those of one `movie` and/or within `min_price`..`max_price`.
+
+    With `Accept: application/msgpack` the tickets are streamed as a sequence
+    of MessagePack objects, one per ticket, as each scan page arrives.
+    """
     try:
-        tickets = dynamodb_service.get_all_tickets()
-        return {"tickets": tickets}
+        msgpack_requested = wants_msgpack(request)
+        filters = {'movie': movie, 'min_price': min_price, 'max_price': max_price}
+        # Each filter and encoding is its own representation, so each gets its own ETag
+        variant = '-'.join(part for part in ('msgpack' if msgpack_requested else None, filter_variant(filters)) if part)
+        etag = make_etag('tickets', dynamodb_service.get_tickets_version(), variant or None)
+        cached = not_modified(request, 'tickets', etag)
+        if cached:
+            return cached
+        
+        if msgpack_requested:
+            return streaming_msgpack_response(dynamodb_service.iter_tickets(**filters), headers=cache_headers('tickets', etag))
+        
+        tickets = dynamodb_service.get_all_tickets(**filters)
+        return FastJSONResponse({"tickets": tickets}, headers={**cache_headers('tickets', etag), 'Vary': 'Accept'})
     except Exception as e:
         logger.error(f"Error retrieving all tickets: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve tickets")
 
+@router.get("/tickets/snapshot")
+async def get_snapshot_stats():
+    """Size, memory footprint and staleness bound of the in-memory ticket snapshot"""
+    snapshot = get_ticket_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Ticket snapshot is not enabled (TICKET_SNAPSHOT=on)")
+    return snapshot.stats()
+
 @router.patch("/ticket")
 async def update_ticket(
     ticket_update: TicketUpdate,
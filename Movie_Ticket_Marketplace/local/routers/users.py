@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException, Depends, Request
+import logging
+
+from services.dynamodb_service import DynamoDBService
+from services.user_snapshot import USERS_TABLE, get_user_snapshot
+from utils.json_response import FastJSONResponse
+from utils.conditional import cache_headers, make_etag, not_modified
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def get_dynamodb_service(request: Request) -> DynamoDBService:
+    return request.app.state.dynamodb_service
+
+@router.get("/users/{user_id}")
+async def get_user(
+    user_id: str,
+    request: Request,
+    dynamodb_service: DynamoDBService = Depends(get_dynamodb_service)
+):
+    """Retrieve a payroll user, from the in-memory snapshot when USER_SNAPSHOT=on"""
+    try:
+        snapshot = get_user_snapshot()
+        # The snapshot trails the table by up to a catch-up interval, so its ETag follows the snapshot
+        version = snapshot.version if snapshot is not None else dynamodb_service.versions.get_version(USERS_TABLE, user_id)
+        etag = make_etag('user', version)
+        cached = not_modified(request, 'user', etag)
+        if cached:
+            return cached
+
+        if snapshot is not None:
+            user = snapshot.get(user_id)
+        else:
+            user = dynamodb_service.dynamodb.Table(USERS_TABLE).get_item(Key={'userId': user_id}).get('Item')
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        return FastJSONResponse(user, headers=cache_headers('user', etag))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving user: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve user")
+
+@router.get("/users/snapshot/stats")
+async def get_snapshot_stats():
+    """Size, memory footprint and staleness bound of the in-memory user snapshot"""
+    snapshot = get_user_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="User snapshot is not enabled (USER_SNAPSHOT=on)")
+    return snapshot.stats()
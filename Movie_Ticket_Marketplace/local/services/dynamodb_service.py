@@ -1,23 +1,37 @@
-import boto3
 import os
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Union
 from decimal import Decimal
 from botocore.exceptions import ClientError
 
+from services.seat_map import SOLD, TheatreSeats, parse_theatre_seat
+from services.ticket_snapshot import get_ticket_snapshot
+from services.version_service import VersionService
+from utils.database import get_dynamodb
+
 logger = logging.getLogger(__name__)
 
 class DynamoDBService:
     def __init__(self):
-        self.dynamodb = boto3.resource(
-            'dynamodb',
-            endpoint_url=os.environ.get('AWS_ENDPOINT_URL', 'http://localhost:4566'),
-            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID', 'test'),
-            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY', 'test'),
-            region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
-        )
+        self.dynamodb = get_dynamodb()
         self.table_name = os.environ.get('DYNAMODB_TABLE', 'ticket-booking')
         self.table = self.dynamodb.Table(self.table_name)
+        self.versions = VersionService(self.dynamodb)
+
+    def get_tickets_version(self) -> Optional[Union[int, str]]:
+        """Version of the whole tickets table, bumped on every write.
+
+        With the in-memory snapshot the lists are built from it, so their
+        ETags follow the snapshot rather than the table.
+        """
+        snapshot = get_ticket_snapshot()
+        if snapshot is not None:
+            return snapshot.version
+        return self.versions.get_version(self.table_name)
+
+    def get_ticket_version(self, theatre_seat: str) -> Optional[int]:
+        """Version of a single ticket"""
+        return self.versions.get_version(self.table_name, theatre_seat)
 
     def create_ticket(self, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new ticket booking"""
@@ -26,6 +40,8 @@ class DynamoDBService:
             processed_data = self._process_item_for_dynamodb(ticket_data)
             
             self.table.put_item(Item=processed_data)
+            self.versions.bump(self.table_name, ticket_data.get('Theatre-Seat'))
+            self._snapshot_put(processed_data)
             logger.info(f"Successfully created ticket: {ticket_data.get('Theatre-Seat')}")
             
             return {
@@ -49,15 +65,21 @@ class DynamoDBService:
             logger.error(f"Error retrieving ticket: {e}")
             raise
 
-    def get_all_tickets(self) -> List[Dict[str, Any]]:
-        """Retrieve all tickets"""
+    def get_all_tickets(self, movie: Optional[str] = None, min_price: Optional[float] = None,
+                        max_price: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Retrieve all tickets, optionally only one movie's and/or a price range"""
         try:
-            response = self.table.scan()
+            snapshot = get_ticket_snapshot()
+            if snapshot is not None:
+                return snapshot.tickets(movie, min_price, max_price)
+
+            scan_params = self._ticket_filter(movie, min_price, max_price)
+            response = self.table.scan(**scan_params)
             items = response.get('Items', [])
             
             # Handle pagination
             while 'LastEvaluatedKey' in response:
-                response = self.table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+                response = self.table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], **scan_params)
                 items.extend(response.get('Items', []))
             
             return [self._process_item_from_dynamodb(item) for item in items]
@@ -65,9 +87,35 @@ class DynamoDBService:
             logger.error(f"Error retrieving all tickets: {e}")
             raise
 
+    def iter_tickets(self, movie: Optional[str] = None, min_price: Optional[float] = None,
+                     max_price: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield raw ticket items one scan page at a time, for streaming responses"""
+        snapshot = get_ticket_snapshot()
+        if snapshot is not None:
+            yield from snapshot.iter_tickets(movie, min_price, max_price)
+            return
+
+        scan_params = self._ticket_filter(movie, min_price, max_price)
+        while True:
+            response = self.table.scan(**scan_params)
+            yield from response.get('Items', [])
+            
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
     def get_movies(self) -> List[str]:
         """Retrieve all unique movies from tickets"""
         try:
+            snapshot = get_ticket_snapshot()
+            if snapshot is not None:
+                return snapshot.movies()
+
+            # The local storage engines read this from the Movie index; DynamoDB needs the scan
+            distinct_values = getattr(self.table, 'distinct_values', None)
+            if distinct_values is not None:
+                return distinct_values('Movie')
+
             response = self.table.scan()
             items = response.get('Items', [])
             
@@ -131,6 +179,8 @@ class DynamoDBService:
                 ReturnValues='ALL_NEW'
             )
 
+            self.versions.bump(self.table_name, theatre_seat)
+            self._snapshot_put(response.get('Attributes'))
             updated_item = self._process_item_from_dynamodb(response.get('Attributes', {}))
             
             return {
@@ -154,6 +204,10 @@ class DynamoDBService:
             )
             
             if 'Attributes' in response:
+                self.versions.bump(self.table_name, theatre_seat)
+                snapshot = get_ticket_snapshot()
+                if snapshot is not None:
+                    snapshot.remove(theatre_seat)
                 deleted_item = self._process_item_from_dynamodb(response['Attributes'])
                 return {
                     'message': 'Ticket deleted successfully',
@@ -166,6 +220,62 @@ class DynamoDBService:
             logger.error(f"Error deleting ticket: {e}")
             raise
 
+    def get_theatre_seats(self, theatre: str) -> Optional[TheatreSeats]:
+        """Seat map of one theatre, or None if it has no seats"""
+        try:
+            snapshot = get_ticket_snapshot()
+            if snapshot is not None:
+                return snapshot.theatre_seats(theatre)
+
+            # Keys are not sorted by theatre, so without the snapshot this is a filtered scan
+            scan_params = {
+                'FilterExpression': 'begins_with(#seat, :prefix)',
+                'ProjectionExpression': '#seat, #status',
+                'ExpressionAttributeNames': {'#seat': 'Theatre-Seat', '#status': 'status'},
+                'ExpressionAttributeValues': {':prefix': f"{theatre}-"}
+            }
+            seats = TheatreSeats()
+            while True:
+                response = self.table.scan(**scan_params)
+                for item in response.get('Items', []):
+                    parsed = parse_theatre_seat(item['Theatre-Seat'])
+                    if parsed is not None and parsed[0] == theatre:
+                        seats.add(parsed[1], parsed[2], item.get('status') != SOLD)
+                if 'LastEvaluatedKey' not in response:
+                    break
+                scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            return seats if seats.seats else None
+        except Exception as e:
+            logger.error(f"Error retrieving seat map of theatre {theatre}: {e}")
+            raise
+
+    def _snapshot_put(self, item: Optional[Dict[str, Any]]) -> None:
+        """Apply a whole-item write to the in-memory snapshot, if one is loaded"""
+        snapshot = get_ticket_snapshot()
+        if snapshot is not None and item:
+            snapshot.put(item)
+
+    def _ticket_filter(self, movie: Optional[str], min_price: Optional[float], max_price: Optional[float]) -> Dict[str, Any]:
+        """Scan parameters selecting one movie and/or a price range; empty for all tickets"""
+        conditions, values = [], {}
+        if movie is not None:
+            conditions.append('Movie = :movie')
+            values[':movie'] = movie
+        if min_price is not None and max_price is not None:
+            conditions.append('Price BETWEEN :min_price AND :max_price')
+        elif min_price is not None:
+            conditions.append('Price >= :min_price')
+        elif max_price is not None:
+            conditions.append('Price <= :max_price')
+        if min_price is not None:
+            values[':min_price'] = self._convert_to_decimal_if_number(min_price)
+        if max_price is not None:
+            values[':max_price'] = self._convert_to_decimal_if_number(max_price)
+
+        if not conditions:
+            return {}
+        return {'FilterExpression': ' AND '.join(conditions), 'ExpressionAttributeValues': values}
+
     def _process_item_for_dynamodb(self, item: Dict[str, Any]) -> Dict[str, Any]:
         """Convert item for DynamoDB storage"""
         processed = {}
@@ -2,10 +2,27 @@ import logging
 from typing import Dict, Any
 from decimal import Decimal
 from datetime import datetime
+from functools import lru_cache
 from services.dynamodb_service import DynamoDBService
+from services.ticket_snapshot import get_ticket_snapshot
+from utils.write_behind import WriteBehindBuffer
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def get_derived_writes() -> WriteBehindBuffer:
+    """Process-wide write-behind buffer for the discount attributes, closed by the app's lifespan"""
+    service = DynamoDBService()
+
+    def written(items: Dict[str, Dict[str, Any]]) -> None:
+        service.versions.bump_items(service.table_name, list(items))
+        snapshot = get_ticket_snapshot()
+        if snapshot is not None:
+            for item in items.values():
+                snapshot.put(item)
+
+    return WriteBehindBuffer(service.table, 'Theatre-Seat', on_flushed=written)
+
 class EventService:
     def __init__(self):
         self.dynamodb_service = DynamoDBService()
@@ -125,22 +142,14 @@ class EventService:
             if not current_ticket:
                 raise ValueError(f"Ticket not found: {theatre_seat}")
             
-            # Update discount percentage
-            self.dynamodb_service.update_ticket(
-                theatre_seat, 
-                'DiscountPercentage', 
-                discount_info['discount_percentage']
-            )
-            
-            # Update is_discounted flag
-            self.dynamodb_service.update_ticket(
-                theatre_seat, 
-                'IsDiscounted', 
-                discount_info['is_discounted']
-            )
+            # Coalesced with any other pending change to the seat and written by the buffer's flusher
+            get_derived_writes().stage(theatre_seat, {
+                'DiscountPercentage': discount_info['discount_percentage'],
+                'IsDiscounted': discount_info['is_discounted'],
+            })
             
             return {
-                'status': 'updated',
+                'status': 'staged',
                 'updatedFields': ['DiscountPercentage', 'IsDiscounted'],
                 'discountPercentage': float(discount_info['discount_percentage']),
                 'isDiscounted': discount_info['is_discounted']
@@ -175,6 +184,10 @@ class EventService:
     def get_event_processing_stats(self) -> Dict[str, Any]:
         """Get statistics about event processing"""
         try:
+            snapshot = get_ticket_snapshot()
+            if snapshot is not None:
+                return {'writeBehind': get_derived_writes().stats(), **snapshot.discount_stats()}
+
             # Get all tickets to calculate stats
             all_tickets = self.dynamodb_service.get_all_tickets()
             
@@ -191,6 +204,8 @@ class EventService:
             avg_discount = total_discount / discounted_tickets if discounted_tickets > 0 else 0
             
             return {
+                # The counts come from the table, so they exclude updates still waiting here
+                'writeBehind': get_derived_writes().stats(),
                 'totalTickets': total_tickets,
                 'discountedTickets': discounted_tickets,
                 'nonDiscountedTickets': total_tickets - discounted_tickets,
@@ -0,0 +1,250 @@
+"""Seat maps: which seats each theatre has and which of them are still for sale.
+
+Theatre-Seat keys name a theatre, a row and a seat number: '1-A7' is seat 7
+of row A in theatre 1. parse_theatre_seat() splits them; keys of any other
+shape, or with a seat number above MAX_SEAT_NUMBER, are left out of the
+maps.
+
+A TheatreSeats keeps two bitmaps per row as Python ints, bit n standing for
+seat n: the seats that exist and the ones not sold. A run of n free
+adjacent seats is a few shifts and ANDs on the row's int, so a
+best-available search looks at each row once and costs microseconds per
+theatre.
+
+Seats are free unless their status is 'sold', the same test the payroll
+service's purchase and hold conditions use. Holds live in the payroll
+service's seat-holds table and are not reflected here.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+SOLD = 'sold'
+# Moving one row away from the preferred row costs as much as moving this many seats off centre
+ROW_WEIGHT = 2.0
+# The preferred row, as a fraction of the way from the front row to the back
+PREFERRED_DEPTH = 0.6
+# Seat-map characters for a free seat, a sold seat and a gap in the row's numbering
+FREE, TAKEN, GAP = 'o', 'x', '.'
+
+# Bounds the bitmaps, as a key such as '1-A99999999' would otherwise cost megabytes
+MAX_SEAT_NUMBER = 999
+
+_THEATRE_SEAT = re.compile(r'(\d+)-([A-Z]+)(\d+)')
+
+
+def parse_theatre_seat(theatre_seat: str) -> Optional[Tuple[str, str, int]]:
+    """(theatre, row, seat number) of a key such as '1-A7', or None if it has another shape"""
+    match = _THEATRE_SEAT.fullmatch(theatre_seat)
+    if match is None:
+        return None
+    number = int(match.group(3))
+    return (match.group(1), match.group(2), number) if 0 < number <= MAX_SEAT_NUMBER else None
+
+
+def _row_order(row: str) -> Tuple[int, str]:
+    # A..Z, then AA, AB...
+    return len(row), row
+
+
+def _runs(mask: int, count: int) -> int:
+    """Bits i of `mask` for which bits i..i+count-1 are all set"""
+    span = 1
+    while span < count and mask:
+        step = min(span, count - span)
+        mask &= mask >> step
+        span += step
+    return mask
+
+
+def _nearest_bits(mask: int, target: int) -> Tuple[int, int]:
+    """The highest set bit of a non-zero `mask` at or below `target` and the lowest above it; -1 if none"""
+    target = max(target, 0)
+    below = (mask & ((2 << target) - 1)).bit_length() - 1
+    above_mask = mask >> (target + 1)
+    above = target + (above_mask & -above_mask).bit_length() if above_mask else -1
+    return below, above
+
+
+class TheatreSeats:
+    """Existing and free seats of one theatre, one pair of bitmaps per row"""
+
+    __slots__ = ('exists', 'free', 'seats', 'available', '_order', '_ranked')
+
+    def __init__(self):
+        self.exists: Dict[str, int] = {}
+        self.free: Dict[str, int] = {}
+        self.seats = 0
+        self.available = 0
+        self._order: Optional[List[str]] = None
+        self._ranked: Optional[List[Tuple[float, str]]] = None
+
+    def add(self, row: str, number: int, free: bool) -> None:
+        bit = 1 << number
+        exists = self.exists.get(row)
+        if exists is None:
+            exists = self.exists[row] = self.free[row] = 0
+            self._order = self._ranked = None
+        if exists & bit:
+            # Already mapped; only availability can change
+            if self.free[row] & bit:
+                self.available -= 1
+        else:
+            self.exists[row] = exists | bit
+            self.seats += 1
+        if free:
+            self.free[row] |= bit
+            self.available += 1
+        else:
+            self.free[row] &= ~bit
+
+    def discard(self, row: str, number: int) -> None:
+        bit = 1 << number
+        exists = self.exists.get(row, 0)
+        if not exists & bit:
+            return
+        self.seats -= 1
+        if self.free[row] & bit:
+            self.free[row] &= ~bit
+            self.available -= 1
+        if exists == bit:
+            del self.exists[row], self.free[row]
+            self._order = self._ranked = None
+        else:
+            self.exists[row] = exists & ~bit
+
+    def rows(self) -> List[str]:
+        if self._order is None:
+            self._order = sorted(self.exists, key=_row_order)
+        return self._order
+
+    def ranked(self) -> List[Tuple[float, str]]:
+        """(cost, row) of every row, nearest the preferred depth first"""
+        if self._ranked is None:
+            rows = self.rows()
+            preferred = (len(rows) - 1) * PREFERRED_DEPTH
+            self._ranked = sorted((abs(index - preferred) * ROW_WEIGHT, row) for index, row in enumerate(rows))
+        return self._ranked
+
+    def __getstate__(self):
+        # The row orders are caches, rebuilt on demand
+        return self.exists, self.free, self.seats, self.available
+
+    def __setstate__(self, state):
+        self.exists, self.free, self.seats, self.available = state
+        self._order = self._ranked = None
+
+    def copy(self) -> 'TheatreSeats':
+        clone = TheatreSeats()
+        clone.exists, clone.free = dict(self.exists), dict(self.free)
+        clone.seats, clone.available = self.seats, self.available
+        clone._order, clone._ranked = self._order, self._ranked
+        return clone
+
+    def layout(self) -> List[Dict[str, Any]]:
+        """Per row, front to back: seat counts and a map with one character per seat number"""
+        layout = []
+        for row in self.rows():
+            exists, free = self.exists[row], self.free[row]
+            first = (exists & -exists).bit_length() - 1
+            layout.append({
+                'row': row,
+                'firstSeat': first,
+                'seats': bin(exists).count('1'),
+                'available': bin(free).count('1'),
+                'map': ''.join(FREE if free >> number & 1 else TAKEN if exists >> number & 1 else GAP
+                               for number in range(first, exists.bit_length()))
+            })
+        return layout
+
+    def best_adjacent(self, count: int, row: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """(row, first seat number) of the best block of `count` free adjacent seats, or None.
+
+        Best means closest to the centre of a row near the preferred depth,
+        scored as ROW_WEIGHT per row away plus one per seat off centre.
+        With `row`, only that row is searched.
+        """
+        if count < 1 or count > self.available:
+            return None
+        if row is not None:
+            if row not in self.exists:
+                return None
+            ranked = [(0.0, row)]
+        else:
+            # Nearest rows first, so the search can stop once no further row can win
+            ranked = self.ranked()
+
+        best: Optional[Tuple[float, str, int]] = None
+        for row_cost, label in ranked:
+            if best is not None and row_cost >= best[0]:
+                break
+            starts = _runs(self.free[label], count)
+            if not starts:
+                continue
+            exists = self.exists[label]
+            # Twice the row's centre, to stay in integers: first plus last seat number
+            centre2 = (exists & -exists).bit_length() - 1 + exists.bit_length() - 1
+            # The centre can fall between two seats, so compare the nearest start on either side of it
+            offset, start = min((abs(2 * candidate + count - 1 - centre2), candidate)
+                                for candidate in _nearest_bits(starts, (centre2 - count + 1) // 2)
+                                if candidate >= 0)
+            cost = row_cost + offset / 2
+            if best is None or cost < best[0]:
+                best = (cost, label, start)
+        return None if best is None else (best[1], best[2])
+
+
+class SeatMap:
+    """TheatreSeats for every theatre, kept current one Theatre-Seat at a time"""
+
+    def __init__(self):
+        self.theatres: Dict[str, TheatreSeats] = {}
+
+    def add(self, theatre_seat: str, free: bool) -> None:
+        parsed = parse_theatre_seat(theatre_seat)
+        if parsed is None:
+            return
+        theatre, row, number = parsed
+        seats = self.theatres.get(theatre)
+        if seats is None:
+            seats = self.theatres[theatre] = TheatreSeats()
+        seats.add(row, number, free)
+
+    def discard(self, theatre_seat: str) -> None:
+        parsed = parse_theatre_seat(theatre_seat)
+        if parsed is None:
+            return
+        theatre, row, number = parsed
+        seats = self.theatres.get(theatre)
+        if seats is None:
+            return
+        seats.discard(row, number)
+        if not seats.seats:
+            del self.theatres[theatre]
+
+    def theatre(self, theatre: str) -> Optional[TheatreSeats]:
+        return self.theatres.get(theatre)
+
+    def copy(self) -> 'SeatMap':
+        clone = SeatMap()
+        clone.theatres = {theatre: seats.copy() for theatre, seats in self.theatres.items()}
+        return clone
+
+
+def seat_map_response(theatre: str, seats: TheatreSeats) -> Dict[str, Any]:
+    """The GET /theatres/{theatre}/seatmap body"""
+    return {
+        'theatre': theatre,
+        'seats': seats.seats,
+        'available': seats.available,
+        'legend': {'free': FREE, 'sold': TAKEN, 'noSeat': GAP},
+        'rows': seats.layout()
+    }
+
+
+def block_response(theatre: str, row: str, first: int, count: int) -> Dict[str, Any]:
+    """A best-available result: the row and the Theatre-Seat keys of the block"""
+    return {
+        'theatre': theatre,
+        'row': row,
+        'theatreSeats': [f"{theatre}-{row}{number}" for number in range(first, first + count)]
+    }
@@ -0,0 +1,364 @@
+"""In-process copy of a whole table, restored from a file and kept current from the change feed.
+
+A TableSnapshot holds a table in a utils.columnar.Columns. It is built in
+one of two ways:
+
+- From the snapshot file in SNAPSHOT_DIR, if there is one. Opening a
+  million rows takes well under a second. The snapshot then catches up on
+  the changes recorded since the file was saved.
+- Otherwise by a full scan in SNAPSHOT_SEGMENTS parallel segments. The
+  result is saved at once, so the next worker to start can open it.
+
+The sequence number of each shard of the table's version
+(services.version_service) is read before the scan, or saved with the
+file. The snapshot reflects every change up to those numbers. Every
+SNAPSHOT_CATCHUP_SECONDS a background thread asks
+VersionService.changes_since() for the ids written after them, fetches
+those items with BatchGetItem and applies them, removing the ones that
+are gone.
+
+Sequence numbers are handed out before their change is recorded, so a
+number can be missing for a moment. The snapshot does not move a shard
+past a missing number for SNAPSHOT_HOLE_SECONDS. After that it assumes the
+record was lost and skips it. Writes by this process are applied as they
+happen, without waiting for the feed. A full reload every
+SNAPSHOT_REFRESH_SECONDS repairs anything skipped. The file is saved every
+SNAPSHOT_SAVE_SECONDS and on stop().
+
+Files are not used with STORAGE_BACKEND=memory, whose tables start empty
+in each process.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.version_service import CHANGE_RETENTION_SECONDS, VersionService
+from utils.columnar import Columns, Schema
+from utils.database import STORAGE_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# Parallel segments overlap DynamoDB round trips; the in-process engines only contend for the GIL
+SCAN_SEGMENTS = int(os.environ.get('SNAPSHOT_SEGMENTS', '8' if STORAGE_BACKEND == 'dynamodb' else '1'))
+# 0 disables each of these
+CATCHUP_SECONDS = float(os.environ.get('SNAPSHOT_CATCHUP_SECONDS', '2'))
+REFRESH_SECONDS = float(os.environ.get('SNAPSHOT_REFRESH_SECONDS', '3600'))
+SAVE_SECONDS = float(os.environ.get('SNAPSHOT_SAVE_SECONDS', '300'))
+HOLE_SECONDS = float(os.environ.get('SNAPSHOT_HOLE_SECONDS', '30'))
+# Empty disables the files
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots') if STORAGE_BACKEND != 'memory' else ''
+# BatchGetItem's limit
+BATCH_GET_KEYS = 100
+
+
+class TableSnapshot:
+    """A table held in memory; see the module docstring.
+
+    Subclasses set `schema` and may set `columns_class` to keep aggregates.
+    """
+
+    schema: Schema
+    columns_class = Columns
+
+    def __init__(self, table, versions: VersionService, segments: int = SCAN_SEGMENTS,
+                 snapshot_dir: str = SNAPSHOT_DIR, catchup_seconds: float = CATCHUP_SECONDS,
+                 refresh_seconds: float = REFRESH_SECONDS, save_seconds: float = SAVE_SECONDS):
+        self.table = table
+        self.resource = table.name
+        self.versions = versions
+        self.segments = max(1, segments)
+        self.path = os.path.join(snapshot_dir, f"{table.name}.snap") if snapshot_dir else None
+        self.catchup_seconds = catchup_seconds
+        self.refresh_seconds = refresh_seconds
+        self.save_seconds = save_seconds if self.path else 0
+        self._lock = threading.Lock()
+        # One load or catch-up at a time, as each moves the sequences
+        self._sync_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._data = self.columns_class(self.schema)
+        # Sequence number reached in each shard of the change feed
+        self._sequences: Dict[int, int] = {}
+        # Missing (shard, sequence number)s, with when each was first noticed
+        self._holes: Dict[Tuple[int, int], float] = {}
+        # Writes applied while a reload scans, replayed onto its result before the swap
+        self._replay: Optional[List] = None
+        self._changes = 0
+        self._load_started = 0.0
+        self._loaded_at = 0.0
+        self._load_seconds = 0.0
+        self._source: Optional[str] = None
+        self._synced_at = 0.0
+        self._counts = {'catchUps': 0, 'itemsFetched': 0, 'holesSkipped': 0, 'saves': 0}
+        self._last_save: Dict[str, Any] = {'at': None, 'seconds': 0.0, 'bytes': 0}
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def version(self) -> str:
+        """Changes with every write the snapshot applies, for ETags of responses built from it"""
+        return f"s{int(self._load_started * 1000)}.{self._changes}"
+
+    def start(self) -> None:
+        """Restore from the file or scan, catch up, then keep current in the background"""
+        if not self.restore():
+            self.load()
+            self.save()
+        self.catch_up()
+        if self._thread is None and (self.catchup_seconds > 0 or self.refresh_seconds > 0 or self.save_seconds > 0):
+            self._thread = threading.Thread(target=self._run, name=f'{self.resource}-snapshot', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and save for the next process"""
+        self._stopped.set()
+        self.save()
+
+    def load(self) -> None:
+        """Scan the table in parallel segments and replace the snapshot's contents"""
+        with self._sync_lock:
+            started = time.time()
+            # Read before scanning: changes after it may be missed by the scan, and catch-up refetches them
+            sequences = self.versions.get_sequences(self.resource)
+            with self._lock:
+                self._replay = []
+            try:
+                columns = self.columns_class(self.schema)
+                page_lock = threading.Lock()
+
+                def scan_segment(segment: int) -> None:
+                    params = {'Segment': segment, 'TotalSegments': self.segments} if self.segments > 1 else {}
+                    while True:
+                        response = self.table.scan(**params)
+                        with page_lock:
+                            for item in response.get('Items', []):
+                                columns.put(item)
+                        if 'LastEvaluatedKey' not in response:
+                            return
+                        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+                with ThreadPoolExecutor(max_workers=self.segments, thread_name_prefix='snapshot-scan') as executor:
+                    list(executor.map(scan_segment, range(self.segments)))
+            except Exception:
+                with self._lock:
+                    self._replay = None
+                raise
+
+            with self._lock:
+                for change in self._replay:
+                    if change[0] == 'put':
+                        columns.put(change[1])
+                    else:
+                        columns.remove(change[1])
+                self._install(columns, sequences, 'scan', started)
+        logger.info(f"Loaded {len(columns)} items of {self.resource} into the snapshot "
+                    f"in {self._load_seconds:.2f}s")
+
+    def restore(self) -> bool:
+        """Replace the contents with the saved file; False if there is none this table can use"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with self._sync_lock:
+            started = time.time()
+            try:
+                columns, meta = self.columns_class.open(self.path, self.schema)
+            except Exception as e:
+                logger.warning(f"Ignoring snapshot file {self.path}: {e}")
+                return False
+
+            if meta.get('table') != self.resource:
+                logger.warning(f"Ignoring snapshot file {self.path}: it holds {meta.get('table')}")
+                return False
+            if started - meta['savedAt'] > CHANGE_RETENTION_SECONDS:
+                logger.info(f"Ignoring snapshot file {self.path}: older than the change feed's retention")
+                return False
+            if 'sequences' not in meta:
+                logger.info(f"Ignoring snapshot file {self.path}: saved before the change feed was sharded")
+                return False
+            # JSON keeps the shard numbers as strings
+            saved = {int(shard): sequence for shard, sequence in meta['sequences'].items()}
+            current = self.versions.get_sequences(self.resource)
+            if any(current.get(shard, 0) < sequence for shard, sequence in saved.items()):
+                # The table was recreated since, so its changes cannot be replayed onto the file
+                logger.warning(f"Ignoring snapshot file {self.path}: saved at {saved}, table is at {current}")
+                return False
+
+            with self._lock:
+                self._install(columns, saved, 'file', started)
+        logger.info(f"Restored {len(columns)} items of {self.resource} from {self.path} "
+                    f"in {self._load_seconds:.3f}s, {sum(current.values()) - sum(saved.values())} changes behind")
+        return True
+
+    def catch_up(self) -> int:
+        """Apply the changes recorded since the snapshot's sequences; returns how many items were refetched"""
+        with self._sync_lock:
+            started = time.time()
+            changes = self.versions.changes_since(self.resource, self._sequences)
+            ids = list(dict.fromkeys(item_id for _, _, item_ids in changes for item_id in item_ids))
+            items = self._fetch(ids) if ids else {}
+            sequences = self._advance([(shard, number) for shard, number, _ in changes])
+
+            with self._lock:
+                for item_id in ids:
+                    item = items.get(item_id)
+                    if item is None:
+                        self._data.remove(item_id)
+                    else:
+                        self._data.put(item)
+                self._changes += len(ids)
+                self._sequences = sequences
+                self._synced_at = started
+                self._counts['catchUps'] += 1
+                self._counts['itemsFetched'] += len(ids)
+        if ids:
+            logger.info(f"Caught {self.resource} up to version {sum(sequences.values())}: {len(ids)} items in "
+                        f"{time.time() - started:.3f}s")
+        return len(ids)
+
+    def save(self) -> Optional[int]:
+        """Write the snapshot file; returns its size, or None if files are disabled or nothing is loaded"""
+        if not self.path or not self._source:
+            return None
+        with self._save_lock:
+            started = time.time()
+            with self._lock:
+                columns, sequences = self._data.copy(), dict(self._sequences)
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                size = columns.save(self.path, {'table': self.resource, 'sequences': sequences, 'savedAt': started})
+            except Exception as e:
+                logger.error(f"Failed to save snapshot of {self.resource} to {self.path}: {e}")
+                return None
+            seconds = time.time() - started
+            with self._lock:
+                self._counts['saves'] += 1
+                self._last_save = {'at': started, 'seconds': round(seconds, 3), 'bytes': size}
+        logger.info(f"Saved {len(columns)} items of {self.resource} to {self.path} ({size} bytes) in {seconds:.2f}s")
+        return size
+
+    def put(self, item: Dict[str, Any]) -> None:
+        """Apply a write of the whole item, as returned by PutItem or ReturnValues=ALL_NEW"""
+        with self._lock:
+            self._data.put(item)
+            self._changes += 1
+            if self._replay is not None:
+                self._replay.append(('put', item))
+
+    def remove(self, key: Any) -> None:
+        with self._lock:
+            self._data.remove(key)
+            self._changes += 1
+            if self._replay is not None:
+                self._replay.append(('remove', key))
+
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        """The item as the table would return it, or None"""
+        with self._lock:
+            return self._data.get(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, memory footprint, sync state and staleness bound"""
+        with self._lock:
+            data = self._data
+            items, rows = len(data), len(data.keys)
+            footprint = data.footprint()
+            stats = {
+                'items': items,
+                'tombstones': rows - items,
+                'version': self.version,
+                'sequence': sum(self._sequences.values()),
+                'source': self._source,
+                'loadedAt': self._loaded_at,
+                'loadSeconds': round(self._load_seconds, 3),
+                'pendingHoles': len(self._holes),
+                'lastSave': dict(self._last_save),
+                **self._counts,
+            }
+            synced_at = self._synced_at
+        stats.update({
+            'file': self.path,
+            'catchUpSeconds': self.catchup_seconds,
+            'refreshSeconds': self.refresh_seconds,
+            # Writes by this process are applied at once; anyone else's may be missing for this long
+            'stalenessBoundSeconds': round(time.time() - synced_at, 3) if synced_at else None,
+            'memoryBytes': footprint,
+            'bytesPerMillionItems': round(footprint / rows * 1_000_000) if rows else 0
+        })
+        return stats
+
+    def _install(self, columns: Columns, sequences: Dict[int, int], source: str, started: float) -> None:
+        """Swap in freshly built columns; the caller holds both locks"""
+        self._replay = None
+        self._data = columns
+        self._sequences = dict(sequences)
+        self._holes = {}
+        self._changes = 0
+        self._source = source
+        self._load_started = self._synced_at = started
+        self._loaded_at = time.time()
+        self._load_seconds = self._loaded_at - started
+
+    def _advance(self, changes: List[Tuple[int, int]]) -> Dict[int, int]:
+        """Per shard, the highest sequence up to which every number has been seen, waiting out recent holes"""
+        sequences, now = dict(self._sequences), time.monotonic()
+        blocked = set()
+        for shard, number in sorted(set(changes)):
+            if shard in blocked:
+                continue
+            sequence = sequences.get(shard, 0)
+            while sequence + 1 < number:
+                noticed = self._holes.setdefault((shard, sequence + 1), now)
+                if now - noticed < HOLE_SECONDS:
+                    blocked.add(shard)
+                    break
+                logger.warning(f"Skipping change {sequence + 1} of shard {shard} of {self.resource}, not recorded "
+                               f"after {HOLE_SECONDS:g}s")
+                del self._holes[(shard, sequence + 1)]
+                self._counts['holesSkipped'] += 1
+                sequence += 1
+            else:
+                self._holes.pop((shard, number), None)
+                sequence = number
+            sequences[shard] = sequence
+        return sequences
+
+    def _fetch(self, keys: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """The current items for `keys`, by key; keys with no item are left out"""
+        key_name = self.schema.key
+        client = self.table.meta.client
+        items = {}
+        for start in range(0, len(keys), BATCH_GET_KEYS):
+            request = {self.table.name: {'Keys': [{key_name: key} for key in keys[start:start + BATCH_GET_KEYS]]}}
+            delay = 0.05
+            while True:
+                response = client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table.name, []):
+                    items[item[key_name]] = item
+                request = response.get('UnprocessedKeys')
+                if not request:
+                    break
+                # Throttled; back off before asking for the rest
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+        return items
+
+    def _run(self) -> None:
+        intervals = [seconds for seconds in (self.catchup_seconds, self.refresh_seconds, self.save_seconds) if seconds > 0]
+        tick = min(intervals)
+        next_refresh = time.monotonic() + self.refresh_seconds
+        next_save = time.monotonic() + self.save_seconds
+        while not self._stopped.wait(tick):
+            now = time.monotonic()
+            try:
+                if self.refresh_seconds > 0 and now >= next_refresh:
+                    next_refresh = now + self.refresh_seconds
+                    self.load()
+                if self.catchup_seconds > 0:
+                    self.catch_up()
+            except Exception as e:
+                logger.error(f"Snapshot sync of {self.resource} failed, keeping the previous data: {e}")
+            if self.save_seconds > 0 and now >= next_save:
+                next_save = now + self.save_seconds
+                self.save()
@@ -0,0 +1,194 @@
+"""In-process, column-oriented copy of the tickets table for the browse endpoints.
+
+With TICKET_SNAPSHOT=on the app serves GET /tickets, GET /movies and the
+event stats from memory instead of scanning per request. Loading, the
+snapshot file and catch-up from the change feed are those of every
+services.table_snapshot.TableSnapshot; this module adds the ticket schema,
+the filters of DynamoDBService._ticket_filter and running totals for the
+movie list, the discount stats and the seat maps (services.seat_map).
+
+Writes made by this process, DynamoDBService's and the flushes of the
+price-change write-behind buffer, are applied as they happen. Writes from
+other workers and the Lambda handlers arrive through catch-up.
+"""
+import math
+import os
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional
+
+from services.seat_map import SOLD, SeatMap, TheatreSeats
+from services.table_snapshot import TableSnapshot
+from services.version_service import VersionService
+from utils.columnar import NO_NUMBER, TRUE, Columns, Schema
+
+TICKET_SNAPSHOT = os.environ.get('TICKET_SNAPSHOT', 'off').lower() == 'on'
+
+TICKETS_SCHEMA = Schema(
+    key='Theatre-Seat',
+    numbers=('Price', 'PreviousPrice', 'DiscountPercentage', 'purchasePrice', 'salePrice', 'originalPurchasePrice'),
+    strings=('Movie', 'status', 'owner', 'previousOwner'),
+    timestamps=('LastPriceChangeTimestamp', 'purchaseTimestamp', 'saleTimestamp'),
+    booleans=('IsDiscounted',),
+)
+# Rows copied into items per lock hold while streaming
+STREAM_CHUNK = 1000
+
+
+class TicketColumns(Columns):
+    """Ticket columns plus the running totals behind the movie list, discount stats and seat maps"""
+
+    def __init__(self, schema: Schema):
+        super().__init__(schema)
+        self.movie_counts: Dict[int, int] = {}
+        self.discounted = 0
+        # In hundredths, so whole-cent discounts sum exactly
+        self.discount_total = 0.0
+        self.seat_map = SeatMap()
+
+    def select(self, movie: Optional[str], min_price: Optional[float], max_price: Optional[float]) -> List[int]:
+        """Rows matching the same filters DynamoDBService._ticket_filter expresses"""
+        movie_id = None
+        if movie is not None:
+            movie_id = self.interned['Movie'].ids.get(movie)
+            if movie_id is None:
+                return []
+        # Bounds in hundredths, rounded inwards, so integer comparisons are exact
+        low = NO_NUMBER + 1 if min_price is None else math.ceil(Decimal(str(min_price)) * 100)
+        high = 2 ** 31 if max_price is None else math.floor(Decimal(str(max_price)) * 100)
+        by_price = min_price is not None or max_price is not None
+        movies, prices = self.strings['Movie'], self.numbers['Price']
+
+        rows = []
+        for row, seat in enumerate(self.keys):
+            if seat is None:
+                continue
+            if movie_id is not None and movies[row] != movie_id:
+                continue
+            if by_price:
+                price = prices[row]
+                if price == NO_NUMBER:
+                    # Absent, or kept exactly in the overflow dict; only numbers compare
+                    price = self.extra.get(row, {}).get('Price')
+                    if isinstance(price, bool) or not isinstance(price, (Decimal, int)):
+                        continue
+                    if not (min_price is None or price >= Decimal(str(min_price))) \
+                            or not (max_price is None or price <= Decimal(str(max_price))):
+                        continue
+                elif not low <= price <= high:
+                    continue
+            rows.append(row)
+        return rows
+
+    def movies(self) -> List[str]:
+        values = self.interned['Movie'].values
+        return [values[movie_id] for movie_id, count in self.movie_counts.items() if count]
+
+    def aggregates(self) -> Dict[str, Any]:
+        return {'movieCounts': dict(self.movie_counts), 'discounted': self.discounted,
+                'discountTotal': self.discount_total, 'seatMap': self.seat_map.copy()}
+
+    def restore_aggregates(self, aggregates: Dict[str, Any]) -> None:
+        self.movie_counts = dict(aggregates['movieCounts'])
+        self.discounted = aggregates['discounted']
+        self.discount_total = aggregates['discountTotal']
+        self.seat_map = aggregates['seatMap']
+
+    def _account(self, row: int, sign: int) -> None:
+        if sign > 0:
+            self.seat_map.add(self.keys[row], self.strings['status'][row] != self.interned['status'].ids.get(SOLD))
+        else:
+            self.seat_map.discard(self.keys[row])
+        movie_id = self.strings['Movie'][row]
+        if movie_id:
+            self.movie_counts[movie_id] = self.movie_counts.get(movie_id, 0) + sign
+        if self.booleans['IsDiscounted'][row] == TRUE:
+            self.discounted += sign
+            discount = self.numbers['DiscountPercentage'][row]
+            if discount != NO_NUMBER:
+                self.discount_total += sign * discount
+            else:
+                value = self.extra.get(row, {}).get('DiscountPercentage', 0)
+                self.discount_total += sign * float(value if isinstance(value, (Decimal, int, float)) else 0) * 100
+
+
+class TicketSnapshot(TableSnapshot):
+    """The tickets table held in memory; see the module docstring"""
+
+    schema = TICKETS_SCHEMA
+    columns_class = TicketColumns
+
+    def tickets(self, movie: Optional[str] = None, min_price: Optional[float] = None,
+                max_price: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Matching tickets with numbers as floats, like DynamoDBService.get_all_tickets"""
+        with self._lock:
+            data = self._data
+            return [data.item(row, raw=False) for row in data.select(movie, min_price, max_price)]
+
+    def iter_tickets(self, movie: Optional[str] = None, min_price: Optional[float] = None,
+                     max_price: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Matching raw items, built a chunk at a time so streaming does not hold the lock"""
+        with self._lock:
+            data = self._data
+            rows = data.select(movie, min_price, max_price)
+        for start in range(0, len(rows), STREAM_CHUNK):
+            with self._lock:
+                chunk = [data.item(row, raw=True) for row in rows[start:start + STREAM_CHUNK]
+                         if data.keys[row] is not None]
+            yield from chunk
+
+    def movies(self) -> List[str]:
+        with self._lock:
+            return self._data.movies()
+
+    def theatre_seats(self, theatre: str) -> Optional[TheatreSeats]:
+        """A copy of the theatre's seat map, or None if it has no seats"""
+        with self._lock:
+            seats = self._data.seat_map.theatre(theatre)
+            return seats.copy() if seats is not None else None
+
+    def discount_stats(self) -> Dict[str, Any]:
+        """The figures of EventService.get_event_processing_stats, kept as running totals"""
+        with self._lock:
+            total, discounted = len(self._data), self._data.discounted
+            discount_total = self._data.discount_total
+        average = discount_total / 100 / discounted if discounted > 0 else 0
+        return {
+            'totalTickets': total,
+            'discountedTickets': discounted,
+            'nonDiscountedTickets': total - discounted,
+            'averageDiscountPercentage': round(average, 2),
+            'discountedTicketPercentage': round((discounted / total * 100) if total > 0 else 0, 2)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats['movies'] = sum(1 for count in self._data.movie_counts.values() if count)
+            stats['theatres'] = len(self._data.seat_map.theatres)
+        return stats
+
+
+_snapshot: Optional[TicketSnapshot] = None
+
+
+def get_ticket_snapshot() -> Optional[TicketSnapshot]:
+    """The process's snapshot once start_ticket_snapshot() has loaded it, else None"""
+    return _snapshot
+
+
+def start_ticket_snapshot(table, versions: VersionService) -> Optional[TicketSnapshot]:
+    """Restore or load the snapshot if TICKET_SNAPSHOT=on; called from the app's lifespan"""
+    global _snapshot
+    if not TICKET_SNAPSHOT:
+        return None
+    snapshot = TicketSnapshot(table, versions)
+    snapshot.start()
+    _snapshot = snapshot
+    return snapshot
+
+
+def stop_ticket_snapshot() -> None:
+    global _snapshot
+    if _snapshot is not None:
+        _snapshot.stop()
+        _snapshot = None
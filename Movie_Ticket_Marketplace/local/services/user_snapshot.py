@@ -0,0 +1,58 @@
+"""In-process copy of the payroll users table, for user lookups without a GetItem.
+
+With USER_SNAPSHOT=on, GET /api/users/{user_id} reads from memory. The
+table is loaded, saved and caught up like every
+services.table_snapshot.TableSnapshot. This app never writes users, so
+every change arrives through catch-up from the payroll service's version
+bumps.
+"""
+import os
+from typing import Optional
+
+from services.table_snapshot import TableSnapshot
+from services.version_service import VersionService
+from utils.columnar import Schema
+
+USER_SNAPSHOT = os.environ.get('USER_SNAPSHOT', 'off').lower() == 'on'
+# The payroll service's name for it, which is also the resource of its version bumps
+USERS_TABLE = 'users-payroll'
+
+USERS_SCHEMA = Schema(
+    key='userId',
+    numbers=('currentBalance', 'totalPurchases', 'totalSales', 'totalTransactions'),
+    strings=('status',),
+    texts=('email', 'name', 'lastTransactionId'),
+    timestamps=('createdAt', 'lastUpdated'),
+)
+
+
+class UserSnapshot(TableSnapshot):
+    """The payroll users table held in memory"""
+
+    schema = USERS_SCHEMA
+
+
+_snapshot: Optional[UserSnapshot] = None
+
+
+def get_user_snapshot() -> Optional[UserSnapshot]:
+    """The process's snapshot once start_user_snapshot() has loaded it, else None"""
+    return _snapshot
+
+
+def start_user_snapshot(dynamodb, versions: VersionService) -> Optional[UserSnapshot]:
+    """Restore or load the snapshot if USER_SNAPSHOT=on; called from the app's lifespan"""
+    global _snapshot
+    if not USER_SNAPSHOT:
+        return None
+    snapshot = UserSnapshot(dynamodb.Table(USERS_TABLE), versions)
+    snapshot.start()
+    _snapshot = snapshot
+    return snapshot
+
+
+def stop_user_snapshot() -> None:
+    global _snapshot
+    if _snapshot is not None:
+        _snapshot.stop()
+        _snapshot = None
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The app imports its packages from the local/ directory, and the tests run without LocalStack
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('PRICE_CHANGE_TOPIC_ARN', '')
@@ -0,0 +1,13 @@
+import json
+from decimal import Decimal
+
+from utils.encoder import dumps
+
+
+def test_decimals_keep_whole_numbers_as_integers():
+    assert json.loads(dumps({'whole': Decimal('5'), 'fraction': Decimal('1.5')})) == {'whole': 5, 'fraction': 1.5}
+
+
+def test_whole_decimals_beyond_int64_are_exact_strings():
+    body = json.loads(dumps({'low': Decimal(-2 ** 63), 'high': Decimal(2 ** 63), 'huge': Decimal('1E+30')}))
+    assert body == {'low': -2 ** 63, 'high': str(2 ** 63), 'huge': '1' + '0' * 30}
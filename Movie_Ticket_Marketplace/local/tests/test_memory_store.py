@@ -0,0 +1,44 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from utils.memory_store import MemoryResource
+
+TABLES = [
+    ('user-transactions', [('transactionId', 'HASH')],
+     [('UserTransactionsIndex', [('userId', 'HASH'), ('timestamp', 'RANGE')], 'ALL')]),
+]
+
+
+@pytest.fixture
+def dynamodb():
+    resource = MemoryResource(TABLES)
+    # Pins the index's userId key type to string
+    resource.Table('user-transactions').put_item(Item={'transactionId': 't0', 'userId': 'u1', 'timestamp': '1'})
+    return resource
+
+
+def test_rejected_transaction_stores_nothing(dynamodb):
+    with pytest.raises(ClientError) as error:
+        dynamodb.meta.client.transact_write_items(TransactItems=[
+            {'Put': {'TableName': 'user-transactions',
+                     'Item': {'transactionId': 't1', 'userId': 'u1', 'timestamp': '2'}}},
+            {'Put': {'TableName': 'user-transactions',
+                     'Item': {'transactionId': 't2', 'userId': 5, 'timestamp': '3'}}},
+        ])
+    assert error.value.response['Error']['Code'] == 'ValidationException'
+
+    table = dynamodb.Table('user-transactions')
+    assert 'Item' not in table.get_item(Key={'transactionId': 't1'})
+    assert table.query(IndexName='UserTransactionsIndex',
+                       KeyConditionExpression='userId = :u',
+                       ExpressionAttributeValues={':u': 'u1'})['Count'] == 1
+
+
+def test_rejected_batch_write_stores_nothing(dynamodb):
+    with pytest.raises(ClientError):
+        dynamodb.meta.client.batch_write_item(RequestItems={'user-transactions': [
+            {'PutRequest': {'Item': {'transactionId': 't1', 'userId': 'u1', 'timestamp': '2'}}},
+            {'PutRequest': {'Item': {'transactionId': 't2', 'userId': 'u2', 'timestamp': 3}}},
+        ]})
+
+    assert dynamodb.Table('user-transactions').scan()['Count'] == 1
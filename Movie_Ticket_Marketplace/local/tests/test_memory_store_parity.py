@@ -0,0 +1,219 @@
+"""The memory store against moto: the same calls must give the same results and errors"""
+from decimal import Decimal
+
+import boto3
+import pytest
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from utils.memory_store import MemoryResource
+
+moto = pytest.importorskip('moto')
+
+# (name, key schema, global secondary indexes, types of non-string key attributes)
+TABLES = [
+    ('ticket-booking', [('Theatre-Seat', 'HASH')], [], {}),
+    ('resource-changes', [('resource', 'HASH'), ('sequence', 'RANGE')], [], {'sequence': 'N'}),
+    ('user-transactions', [('transactionId', 'HASH')],
+     [('UserTransactionsIndex', [('userId', 'HASH'), ('timestamp', 'RANGE')], 'ALL')], {}),
+]
+
+
+def memory_resource():
+    return MemoryResource([(name, keys, indexes) for name, keys, indexes, _ in TABLES])
+
+
+def moto_resource():
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    for name, keys, indexes, types in TABLES:
+        attributes = {attribute: types.get(attribute, 'S') for attribute, _ in keys}
+        attributes.update({attribute: types.get(attribute, 'S') for _, index_keys, _ in indexes for attribute, _ in index_keys})
+        spec = {
+            'TableName': name,
+            'KeySchema': [{'AttributeName': attribute, 'KeyType': kind} for attribute, kind in keys],
+            'AttributeDefinitions': [{'AttributeName': a, 'AttributeType': t} for a, t in attributes.items()],
+            'BillingMode': 'PAY_PER_REQUEST',
+        }
+        if indexes:
+            spec['GlobalSecondaryIndexes'] = [{
+                'IndexName': index_name,
+                'KeySchema': [{'AttributeName': attribute, 'KeyType': kind} for attribute, kind in index_keys],
+                'Projection': {'ProjectionType': projection},
+            } for index_name, index_keys, projection in indexes]
+        dynamodb.create_table(**spec)
+    return dynamodb
+
+
+@pytest.fixture(autouse=True)
+def aws_credentials(monkeypatch):
+    for name, value in (('AWS_ACCESS_KEY_ID', 'test'), ('AWS_SECRET_ACCESS_KEY', 'test'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv('AWS_ENDPOINT_URL', raising=False)
+
+
+def outcome(call):
+    """What a call returned, less request metadata, or the code and cancellation reasons of the error it raised"""
+    try:
+        response = call()
+        return {name: value for name, value in response.items()
+                if name not in ('ResponseMetadata', 'ConsumedCapacity') and value != {}}
+    except ClientError as error:
+        reasons = [reason.get('Code') for reason in error.response.get('CancellationReasons', [])]
+        return ('error', error.response['Error']['Code'], reasons)
+
+
+def on_both(scenario):
+    """Run scenario(resource) on a fresh memory store and on moto; returns both lists of outcomes"""
+    with moto.mock_aws():
+        return [scenario(resource) for resource in (memory_resource(), moto_resource())]
+
+
+def assert_same(scenario):
+    memory, expected = on_both(scenario)
+    assert memory == expected
+    return expected
+
+
+def test_condition_expressions():
+    def scenario(dynamodb):
+        tickets = dynamodb.Table('ticket-booking')
+        tickets.put_item(Item={'Theatre-Seat': '1-A1', 'Price': 300, 'status': 'available', 'tags': ['imax']})
+        attempts = [
+            lambda: tickets.put_item(Item={'Theatre-Seat': '1-A1'}, ConditionExpression='attribute_not_exists(#s)',
+                                     ExpressionAttributeNames={'#s': 'Theatre-Seat'}),
+            lambda: tickets.update_item(Key={'Theatre-Seat': '1-A1'}, UpdateExpression='SET #o = :o',
+                                        ConditionExpression='#st = :available AND Price BETWEEN :low AND :high',
+                                        ExpressionAttributeNames={'#o': 'owner', '#st': 'status'},
+                                        ExpressionAttributeValues={':o': 'alice', ':available': 'available',
+                                                                   ':low': 100, ':high': 500},
+                                        ReturnValues='ALL_NEW'),
+            lambda: tickets.update_item(Key={'Theatre-Seat': '1-A1'}, UpdateExpression='SET #o = :o',
+                                        ConditionExpression='attribute_not_exists(#o) OR #o = :o',
+                                        ExpressionAttributeNames={'#o': 'owner'},
+                                        ExpressionAttributeValues={':o': 'bob'}),
+            lambda: tickets.delete_item(Key={'Theatre-Seat': '1-A1'},
+                                        ConditionExpression=Attr('Price').lt(100) | Attr('tags').contains('3d')),
+            lambda: tickets.delete_item(Key={'Theatre-Seat': '1-A1'},
+                                        ConditionExpression='size(tags) = :one AND begins_with(#st, :a) '
+                                                            'AND attribute_type(Price, :n) AND NOT Price IN (:one, :two)',
+                                        ExpressionAttributeNames={'#st': 'status'},
+                                        ExpressionAttributeValues={':one': 1, ':two': 2, ':a': 'avail', ':n': 'N'},
+                                        ReturnValues='ALL_OLD'),
+            lambda: tickets.get_item(Key={'Theatre-Seat': '1-A1'}),
+        ]
+        return [outcome(attempt) for attempt in attempts]
+
+    results = assert_same(scenario)
+    assert results[0][1] == 'ConditionalCheckFailedException'
+    assert results[1]['Attributes']['owner'] == 'alice'
+
+
+def test_update_expressions():
+    def scenario(dynamodb):
+        tickets = dynamodb.Table('ticket-booking')
+        key = {'Theatre-Seat': '1-A1'}
+        updates = [
+            ('ADD sold :one, tags :tags', {':one': 1, ':tags': {'imax'}}, 'UPDATED_NEW'),
+            ('ADD sold :one SET firstSoldAt = if_not_exists(firstSoldAt, :now), Price = :price',
+             {':one': 1, ':now': '2024-01-01', ':price': Decimal('12.50')}, 'ALL_NEW'),
+            ('SET firstSoldAt = if_not_exists(firstSoldAt, :now), Price = Price - :discount, history = '
+             'list_append(if_not_exists(history, :empty), :event)',
+             {':now': '2025-01-01', ':discount': Decimal('2.5'), ':empty': [], ':event': ['sold']}, 'ALL_OLD'),
+            ('SET history = list_append(history, :event), meta.counts = :counts REMOVE tags',
+             {':event': ['resold'], ':counts': {'visits': 3}}, 'ALL_NEW'),
+            ('SET meta.counts.visits = meta.counts.visits + :one DELETE labels :gone',
+             {':one': 1, ':gone': {'x'}}, 'UPDATED_NEW'),
+        ]
+        # moto's UPDATED_* list only the attributes whose value changed, the memory store every attribute
+        # the update names, so a step that rewrites a value unchanged asks for ALL_* instead
+        results = []
+        tickets.put_item(Item={**key, 'meta': {}, 'labels': {'x', 'y'}})
+        for expression, values, returns in updates:
+            results.append(outcome(lambda: tickets.update_item(Key=key, UpdateExpression=expression,
+                                                               ExpressionAttributeValues=values, ReturnValues=returns)))
+        results.append(tickets.get_item(Key=key)['Item'])
+        return results
+
+    results = assert_same(scenario)
+    assert results[-1]['sold'] == 2
+    assert results[-1]['firstSoldAt'] == '2024-01-01'
+    assert results[-1]['history'] == ['sold', 'resold']
+
+
+def test_gsi_queries():
+    def scenario(dynamodb):
+        transactions = dynamodb.Table('user-transactions')
+        with transactions.batch_writer() as batch:
+            for number in range(12):
+                batch.put_item(Item={'transactionId': f't{number:02}', 'userId': 'alice' if number % 3 else 'bob',
+                                     'timestamp': f'2024-01-{number + 1:02}', 'amount': number * 10})
+        results = []
+        params = {'IndexName': 'UserTransactionsIndex', 'Limit': 3, 'ScanIndexForward': False,
+                  'KeyConditionExpression': Key('userId').eq('alice') & Key('timestamp').gte('2024-01-03'),
+                  'FilterExpression': Attr('amount').gt(20)}
+        while True:
+            page = transactions.query(**params)
+            results.append((page['Items'], page['Count'], page['ScannedCount']))
+            if 'LastEvaluatedKey' not in page:
+                break
+            params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+        results.append(transactions.query(IndexName='UserTransactionsIndex',
+                                          KeyConditionExpression=Key('userId').eq('bob') &
+                                          Key('timestamp').between('2024-01-01', '2024-01-07'),
+                                          ProjectionExpression='transactionId, amount')['Items'])
+        results.append(outcome(lambda: transactions.query(IndexName='UserTransactionsIndex',
+                                                          KeyConditionExpression=Key('amount').eq(10))))
+        return results
+
+    results = assert_same(scenario)
+    assert [item['transactionId'] for page in results[:-2] for item in page[0]][0] == 't11'
+
+
+def test_transaction_cancellation_reasons():
+    def scenario(dynamodb):
+        client = dynamodb.meta.client
+        tickets = dynamodb.Table('ticket-booking')
+        tickets.put_item(Item={'Theatre-Seat': '1-A1', 'status': 'sold'})
+        tickets.put_item(Item={'Theatre-Seat': '1-A2', 'status': 'available'})
+        cancelled = outcome(lambda: client.transact_write_items(TransactItems=[
+            {'Update': {'TableName': 'ticket-booking', 'Key': {'Theatre-Seat': '1-A2'},
+                        'UpdateExpression': 'SET #st = :sold', 'ConditionExpression': '#st = :available',
+                        'ExpressionAttributeNames': {'#st': 'status'},
+                        'ExpressionAttributeValues': {':sold': 'sold', ':available': 'available'}}},
+            {'ConditionCheck': {'TableName': 'ticket-booking', 'Key': {'Theatre-Seat': '1-A1'},
+                                'ConditionExpression': 'attribute_not_exists(#st)',
+                                'ExpressionAttributeNames': {'#st': 'status'}}},
+            {'Put': {'TableName': 'user-transactions',
+                     'Item': {'transactionId': 't1', 'userId': 'alice', 'timestamp': '1'}}},
+        ]))
+        committed = outcome(lambda: client.transact_write_items(TransactItems=[
+            {'Delete': {'TableName': 'ticket-booking', 'Key': {'Theatre-Seat': '1-A1'},
+                        'ConditionExpression': 'attribute_exists(#st)', 'ExpressionAttributeNames': {'#st': 'status'}}},
+            {'Put': {'TableName': 'user-transactions',
+                     'Item': {'transactionId': 't1', 'userId': 'alice', 'timestamp': '1'}}},
+        ]))
+        return [cancelled, committed, tickets.scan()['Items'], dynamodb.Table('user-transactions').scan()['Count']]
+
+    results = assert_same(scenario)
+    assert results[0] == ('error', 'TransactionCanceledException', ['None', 'ConditionalCheckFailed', 'None'])
+
+
+def test_batch_get_item():
+    def scenario(dynamodb):
+        changes = dynamodb.Table('resource-changes')
+        for sequence in range(1, 6):
+            changes.put_item(Item={'resource': 'tickets', 'sequence': sequence, 'itemIds': [f'1-A{sequence}']})
+        response = dynamodb.meta.client.batch_get_item(RequestItems={'resource-changes': {
+            'Keys': [{'resource': 'tickets', 'sequence': sequence} for sequence in (5, 1, 9, 3)],
+            'ProjectionExpression': '#seq, itemIds',
+            'ExpressionAttributeNames': {'#seq': 'sequence'},
+        }})
+        items = sorted(response['Responses']['resource-changes'], key=lambda item: item['sequence'])
+        duplicate = outcome(lambda: dynamodb.meta.client.batch_get_item(RequestItems={'resource-changes': {
+            'Keys': [{'resource': 'tickets', 'sequence': 1}, {'resource': 'tickets', 'sequence': 1}]}}))
+        return [items, response['UnprocessedKeys'], duplicate]
+
+    results = assert_same(scenario)
+    assert [item['sequence'] for item in results[0]] == [1, 3, 5]
+    assert results[2][1] == 'ValidationException'
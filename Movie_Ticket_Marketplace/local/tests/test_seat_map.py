@@ -0,0 +1,139 @@
+import random
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services import ticket_snapshot
+from services.seat_map import TheatreSeats, _runs, parse_theatre_seat
+from services.version_service import VersionService
+from utils.database import get_dynamodb
+
+
+def brute_force_best(seats: TheatreSeats, count: int, row: str):
+    """The most central block of `count` free seats in `row`, lower start on ties"""
+    exists, free = seats.exists[row], seats.free[row]
+    numbers = [number for number in range(exists.bit_length()) if exists >> number & 1]
+    centre2 = numbers[0] + numbers[-1]
+    starts = [start for start in range(free.bit_length())
+              if all(free >> number & 1 for number in range(start, start + count))]
+    if not starts:
+        return None
+    return min(starts, key=lambda start: (abs(2 * start + count - 1 - centre2), start))
+
+
+def test_parse_theatre_seat():
+    assert parse_theatre_seat('12-F14') == ('12', 'F', 14)
+    assert parse_theatre_seat('1-AA3') == ('1', 'AA', 3)
+    assert parse_theatre_seat('VIP') is None
+    assert parse_theatre_seat('1-A0') is None
+    assert parse_theatre_seat('1-A99999999') is None
+
+
+def test_runs():
+    assert _runs(0b1110111, 1) == 0b1110111
+    assert _runs(0b1110111, 3) == 0b0010001
+    assert _runs(0b1110111, 4) == 0
+    assert _runs(0b11111, 5) == 0b1
+    assert _runs(0, 2) == 0
+
+
+def test_add_and_discard_keep_counts():
+    seats = TheatreSeats()
+    seats.add('B', 1, True)
+    seats.add('A', 2, False)
+    seats.add('A', 1, True)
+    assert (seats.seats, seats.available) == (3, 2)
+    assert seats.rows() == ['A', 'B']
+
+    # Re-adding a seat only changes its availability
+    seats.add('A', 1, False)
+    assert (seats.seats, seats.available) == (3, 1)
+    assert seats.free['A'] == 0
+
+    seats.discard('B', 1)
+    seats.discard('B', 1)
+    assert (seats.seats, seats.available) == (2, 0)
+    assert seats.rows() == ['A']
+    seats.discard('A', 1)
+    seats.discard('A', 2)
+    assert (seats.seats, seats.available, seats.exists) == (0, 0, {})
+
+
+def test_best_adjacent_prefers_the_centre_over_a_lower_seat():
+    seats = TheatreSeats()
+    for number in range(3, 11):
+        seats.add('A', number, number in (3, 4, 5, 7, 9))
+    assert seats.best_adjacent(1) == ('A', 7)
+    assert seats.best_adjacent(2) == ('A', 4)
+    assert seats.best_adjacent(4) is None
+
+
+def test_best_adjacent_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(2000):
+        seats = TheatreSeats()
+        first, last = rng.randint(1, 5), rng.randint(6, 30)
+        for number in range(first, last + 1):
+            seats.add('A', number, rng.random() < 0.5)
+        count = rng.randint(1, 5)
+        expected = brute_force_best(seats, count, 'A')
+        assert seats.best_adjacent(count, 'A') == (None if expected is None else ('A', expected))
+
+
+def test_best_adjacent_prefers_rows_near_the_preferred_depth():
+    seats = TheatreSeats()
+    for row in 'ABCDEF':
+        for number in range(1, 11):
+            seats.add(row, number, True)
+    # Six rows: the preferred depth is 3.0 rows back, row D
+    assert seats.best_adjacent(2) == ('D', 5)
+    assert seats.best_adjacent(2, 'A') == ('A', 5)
+    assert seats.best_adjacent(2, 'Z') is None
+    assert seats.best_adjacent(11) is None
+
+
+@pytest.fixture
+def client():
+    table = get_dynamodb().Table('ticket-booking')
+    keys = []
+    for row in 'ABCD':
+        for number in range(1, 9):
+            key = f'7-{row}{number}'
+            item = {'Theatre-Seat': key, 'Movie': 'Dune', 'Price': Decimal('10')}
+            if row != 'C' or number in (1, 2):
+                item['status'] = 'sold'
+            table.put_item(Item=item)
+            keys.append(key)
+    # Gives the tickets table a version, so the seat map gets an ETag without the snapshot too
+    VersionService(get_dynamodb()).bump('ticket-booking')
+    try:
+        yield main.app
+    finally:
+        for key in keys:
+            table.delete_item(Key={'Theatre-Seat': key})
+
+
+@pytest.mark.parametrize('snapshot', [True, False])
+def test_seat_map_endpoints(client, monkeypatch, snapshot):
+    monkeypatch.setattr(ticket_snapshot, 'TICKET_SNAPSHOT', snapshot)
+    with TestClient(client) as c:
+        response = c.get('/api/theatres/7/seatmap')
+        assert response.status_code == 200
+        body = response.json()
+        assert (body['seats'], body['available']) == (32, 6)
+        assert body['rows'][2] == {'row': 'C', 'firstSeat': 1, 'seats': 8, 'available': 6, 'map': 'xxoooooo'}
+        assert c.get('/api/theatres/7/seatmap', headers={'If-None-Match': response.headers['etag']}).status_code == 304
+
+        best = c.get('/api/theatres/7/best-available', params={'count': 3}).json()
+        assert best == {'theatre': '7', 'row': 'C', 'theatreSeats': ['7-C3', '7-C4', '7-C5']}
+
+        c.patch('/api/ticket', json={'Theatre-Seat': '7-C5', 'updateKey': 'status', 'updateValue': 'sold'})
+        best = c.get('/api/theatres/7/best-available', params={'count': 3, 'row': 'c'}).json()
+        assert best['theatreSeats'] == ['7-C6', '7-C7', '7-C8']
+
+        assert c.get('/api/theatres/7/best-available', params={'count': 4}).status_code == 404
+        assert c.get('/api/theatres/7/best-available', params={'count': 0}).status_code == 422
+        assert c.get('/api/theatres/8/seatmap').status_code == 404
+        assert c.get('/api/theatres/x/seatmap').status_code == 404
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from services.user_snapshot import USERS_TABLE, UserSnapshot
+from services.version_service import CHANGE_RETENTION_SECONDS, VersionService, shard_key
+from utils.database import TABLES
+from utils.memory_store import MemoryResource
+
+
+@pytest.fixture
+def dynamodb():
+    return MemoryResource(TABLES)
+
+
+def snapshot(dynamodb, snapshot_dir=''):
+    return UserSnapshot(dynamodb.Table(USERS_TABLE), VersionService(dynamodb), segments=1, snapshot_dir=snapshot_dir,
+                        catchup_seconds=0, refresh_seconds=0, save_seconds=0)
+
+
+def write_user(dynamodb, user_id, balance=100):
+    dynamodb.Table(USERS_TABLE).put_item(Item={'userId': user_id, 'currentBalance': balance})
+    VersionService(dynamodb).bump(USERS_TABLE, user_id)
+
+
+def test_catch_up_reads_every_shard(dynamodb):
+    users = snapshot(dynamodb)
+    users.load()
+
+    for number in range(20):
+        write_user(dynamodb, f'u{number}')
+
+    assert users.catch_up() == 20
+    assert users.get('u7')['currentBalance'] == 100
+    assert users.stats()['sequence'] == VersionService(dynamodb).get_version(USERS_TABLE) == 20
+
+
+def test_hole_in_one_shard_does_not_hold_back_the_others(dynamodb):
+    users = snapshot(dynamodb)
+    users.load()
+    for user_id, shard, sequence in (('u1', 0, 1), ('u2', 1, 2)):
+        dynamodb.Table(USERS_TABLE).put_item(Item={'userId': user_id, 'currentBalance': 5})
+        dynamodb.Table('resource-changes').put_item(Item={
+            'resource': shard_key(USERS_TABLE, shard), 'sequence': sequence, 'itemIds': [user_id],
+            'expiresAt': int(time.time()) + CHANGE_RETENTION_SECONDS
+        })
+
+    assert users.catch_up() == 2
+    assert users._sequences == {0: 1, 1: 0}
+    assert users.stats()['pendingHoles'] == 1
+
+
+def test_restored_file_catches_up_from_its_saved_sequences(dynamodb, tmp_path):
+    for number in range(5):
+        write_user(dynamodb, f'u{number}')
+    saved = snapshot(dynamodb, str(tmp_path))
+    saved.load()
+    saved.save()
+    write_user(dynamodb, 'u2', balance=7)
+
+    restored = snapshot(dynamodb, str(tmp_path))
+    assert restored.restore()
+    assert restored._sequences == saved._sequences
+    assert restored.catch_up() == 1
+    assert restored.get('u2')['currentBalance'] == 7
@@ -0,0 +1,383 @@
+"""Column-oriented storage for in-memory copies of a table, and its snapshot file.
+
+A Columns object holds one table as parallel arrays indexed by row instead
+of one dict per item. The Schema names which attribute goes in which kind
+of column:
+
+- numbers: int32 hundredths, so prices and percentages are stored exactly
+- strings: small ids into a table of interned values, for low-cardinality
+  attributes such as a movie or a status
+- texts: a plain list of str, for unique values such as names
+- timestamps: naive ISO timestamps as int64 microseconds since the epoch
+- booleans: one byte per row
+
+Any other attribute, or a value its column cannot hold exactly, goes to a
+sparse per-row dict. Items are rebuilt with the values the table returns.
+
+save() writes the columns to one file:
+
+- an 8-byte magic number and an 8-byte header length
+- a JSON header with the schema, the caller's metadata and the offset of
+  every section
+- each array's raw bytes, 8-byte aligned
+- one pickle holding the keys, interned values, texts and overflow dicts
+
+Columns.open() maps the file and copies each array out of the mapping with
+a single memcpy, so a million rows open in a fraction of a second. The file
+is only ever read by the process that wrote it or a sibling worker, which
+is what makes pickle acceptable here.
+"""
+import copy
+import json
+import mmap
+import os
+import pickle
+import sys
+from array import array
+from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+MAGIC = b'COLSNAP1'
+ABSENT = 0
+FALSE, TRUE = 1, 2
+NO_NUMBER = -2 ** 31
+NUMBER_RANGE = range(NO_NUMBER + 1, 2 ** 31)
+NO_TIMESTAMP = -2 ** 63
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+NUMBER, STRING, TEXT, TIMESTAMP, BOOLEAN = 'number', 'string', 'text', 'timestamp', 'boolean'
+
+
+class Schema:
+    """The key attribute and which attributes get a typed column"""
+
+    def __init__(self, key: str, numbers: Sequence[str] = (), strings: Sequence[str] = (),
+                 texts: Sequence[str] = (), timestamps: Sequence[str] = (), booleans: Sequence[str] = ()):
+        self.key = key
+        self.numbers = tuple(numbers)
+        self.strings = tuple(strings)
+        self.texts = tuple(texts)
+        self.timestamps = tuple(timestamps)
+        self.booleans = tuple(booleans)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'key': self.key, 'numbers': list(self.numbers), 'strings': list(self.strings),
+                'texts': list(self.texts), 'timestamps': list(self.timestamps), 'booleans': list(self.booleans)}
+
+
+def _hundredths(value: Any) -> Optional[int]:
+    """`value` in hundredths if that is a whole number that fits an int32, else None"""
+    if isinstance(value, bool) or not isinstance(value, (Decimal, int)):
+        return None
+    if isinstance(value, Decimal) and not value.is_finite():
+        return None
+    return _scale(value)
+
+
+# Prices repeat across rows, and Decimal arithmetic is slow next to a lookup
+@lru_cache(maxsize=1 << 16)
+def _scale(value) -> Optional[int]:
+    scaled = value * 100
+    if scaled != int(scaled) or int(scaled) not in NUMBER_RANGE:
+        return None
+    return int(scaled)
+
+
+def _exact_timestamp(value: Any) -> Optional[int]:
+    """A naive ISO timestamp as microseconds since the epoch, if it formats back to the same string"""
+    if not isinstance(value, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is not None or moment.isoformat() != value:
+        return None
+    return (moment - EPOCH) // MICROSECOND
+
+
+class _Interned:
+    """Strings stored once and referred to by id; id 0 means absent"""
+
+    __slots__ = ('values', 'ids')
+
+    def __init__(self, values: Optional[List[Optional[str]]] = None):
+        self.values: List[Optional[str]] = values or [None]
+        self.ids: Dict[str, int] = {value: index for index, value in enumerate(self.values) if index}
+
+    def id(self, value: str) -> int:
+        interned = self.ids.get(value)
+        if interned is None:
+            interned = self.ids[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return interned
+
+
+class Columns:
+    """One table as parallel arrays; not thread-safe, callers hold their own lock.
+
+    Deleted rows become tombstones (key None) rather than being reused, so a
+    row number names the same item for the life of the object. Subclasses
+    keep running aggregates by overriding _account().
+    """
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self.rows: Dict[Any, int] = {}
+        self.keys: List[Any] = []
+        self.numbers = {name: array('i') for name in schema.numbers}
+        self.strings = {name: array('I') for name in schema.strings}
+        self.interned = {name: _Interned() for name in schema.strings}
+        self.texts: Dict[str, List[Optional[str]]] = {name: [] for name in schema.texts}
+        self.timestamps = {name: array('q') for name in schema.timestamps}
+        self.booleans = {name: bytearray() for name in schema.booleans}
+        self.extra: Dict[int, Dict[str, Any]] = {}
+        self._index()
+
+    def _index(self) -> None:
+        self._kinds = {**dict.fromkeys(self.numbers, NUMBER), **dict.fromkeys(self.strings, STRING),
+                       **dict.fromkeys(self.texts, TEXT), **dict.fromkeys(self.timestamps, TIMESTAMP),
+                       **dict.fromkeys(self.booleans, BOOLEAN)}
+        self._empty = ([(column, NO_NUMBER) for column in self.numbers.values()]
+                       + [(column, ABSENT) for column in self.strings.values()]
+                       + [(column, None) for column in self.texts.values()]
+                       + [(column, NO_TIMESTAMP) for column in self.timestamps.values()]
+                       + [(column, ABSENT) for column in self.booleans.values()])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def put(self, item: Dict[str, Any]) -> None:
+        key = item[self.schema.key]
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.keys)
+            self.keys.append(key)
+            for column, empty in self._empty:
+                column.append(empty)
+        else:
+            self._account(row, -1)
+            self._clear(row)
+
+        extra = {}
+        for name, value in item.items():
+            kind = self._kinds.get(name)
+            if kind is NUMBER:
+                number = _hundredths(value)
+                if number is not None:
+                    self.numbers[name][row] = number
+                    continue
+            elif kind is STRING:
+                if value.__class__ is str:
+                    self.strings[name][row] = self.interned[name].id(value)
+                    continue
+            elif kind is TEXT:
+                if value.__class__ is str:
+                    self.texts[name][row] = value
+                    continue
+            elif kind is TIMESTAMP:
+                moment = _exact_timestamp(value)
+                if moment is not None:
+                    self.timestamps[name][row] = moment
+                    continue
+            elif kind is BOOLEAN:
+                if value.__class__ is bool:
+                    self.booleans[name][row] = TRUE if value else FALSE
+                    continue
+            elif name == self.schema.key:
+                continue
+            extra[name] = value
+        if extra:
+            self.extra[row] = extra
+        self._account(row, 1)
+
+    def remove(self, key: Any) -> None:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        self._account(row, -1)
+        self._clear(row)
+        self.keys[row] = None
+
+    def get(self, key: Any, raw: bool = True) -> Optional[Dict[str, Any]]:
+        row = self.rows.get(key)
+        return None if row is None else self.item(row, raw)
+
+    def item(self, row: int, raw: bool) -> Dict[str, Any]:
+        """The stored item; numbers as Decimal like the table returns them if `raw`, else as float"""
+        item: Dict[str, Any] = {self.schema.key: self.keys[row]}
+        for name, column in self.strings.items():
+            value = column[row]
+            if value:
+                item[name] = self.interned[name].values[value]
+        for name, column in self.texts.items():
+            value = column[row]
+            if value is not None:
+                item[name] = value
+        for name, column in self.numbers.items():
+            number = column[row]
+            if number != NO_NUMBER:
+                item[name] = Decimal(number).scaleb(-2) if raw else number / 100
+        for name, column in self.timestamps.items():
+            moment = column[row]
+            if moment != NO_TIMESTAMP:
+                item[name] = (EPOCH + moment * MICROSECOND).isoformat()
+        for name, column in self.booleans.items():
+            value = column[row]
+            if value:
+                item[name] = value == TRUE
+        extra = self.extra.get(row)
+        if extra:
+            if raw:
+                item.update(extra)
+            else:
+                item.update((name, float(value) if isinstance(value, Decimal) else value) for name, value in extra.items())
+        return item
+
+    def live_rows(self) -> Iterable[int]:
+        return (row for row, key in enumerate(self.keys) if key is not None)
+
+    def copy(self) -> 'Columns':
+        """An independent copy, cheap enough to take under the caller's lock and save outside it"""
+        clone = copy.copy(self)
+        clone.rows = dict(self.rows)
+        clone.keys = list(self.keys)
+        clone.numbers = {name: column[:] for name, column in self.numbers.items()}
+        clone.strings = {name: column[:] for name, column in self.strings.items()}
+        clone.interned = {name: _Interned(list(interned.values)) for name, interned in self.interned.items()}
+        clone.texts = {name: column[:] for name, column in self.texts.items()}
+        clone.timestamps = {name: column[:] for name, column in self.timestamps.items()}
+        clone.booleans = {name: column[:] for name, column in self.booleans.items()}
+        clone.extra = dict(self.extra)
+        clone.restore_aggregates(self.aggregates())
+        clone._index()
+        return clone
+
+    def footprint(self) -> int:
+        """Approximate bytes held, counting the containers and the objects they own"""
+        size = sys.getsizeof(self.rows) + sys.getsizeof(self.keys)
+        size += sum(sys.getsizeof(key) for key in self.keys if key is not None)
+        for columns in (self.numbers, self.strings, self.timestamps):
+            size += sum(column.buffer_info()[1] * column.itemsize for column in columns.values())
+        size += sum(len(column) for column in self.booleans.values())
+        for interned in self.interned.values():
+            size += sys.getsizeof(interned.values) + sys.getsizeof(interned.ids)
+            size += sum(sys.getsizeof(value) for value in interned.values if value is not None)
+        for column in self.texts.values():
+            size += sys.getsizeof(column) + sum(sys.getsizeof(value) for value in column if value is not None)
+        size += sys.getsizeof(self.extra)
+        for extra in self.extra.values():
+            size += sys.getsizeof(extra) + sum(sys.getsizeof(value) for value in extra.values())
+        return size
+
+    def aggregates(self) -> Dict[str, Any]:
+        """Copies of the running totals a subclass keeps, saved with the file so opening need not recompute them"""
+        return {}
+
+    def restore_aggregates(self, aggregates: Dict[str, Any]) -> None:
+        pass
+
+    def _account(self, row: int, sign: int) -> None:
+        pass
+
+    def _clear(self, row: int) -> None:
+        for column, empty in self._empty:
+            column[row] = empty
+        self.extra.pop(row, None)
+
+    def save(self, path: str, meta: Dict[str, Any]) -> int:
+        """Write the columns and `meta` to `path` atomically; returns the file size"""
+        arrays = self._arrays()
+        objects = pickle.dumps({
+            'keys': self.keys,
+            'interned': {name: interned.values for name, interned in self.interned.items()},
+            'texts': self.texts,
+            'extra': self.extra,
+            'aggregates': self.aggregates(),
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+
+        sections: Dict[str, Tuple[int, int, str]] = {}
+        offset = 0
+        for name, column in arrays:
+            size = column.buffer_info()[1] * column.itemsize if isinstance(column, array) else len(column)
+            sections[name] = (offset, size, column.typecode if isinstance(column, array) else 'B')
+            offset += _aligned(size)
+        header = {'schema': self.schema.to_dict(), 'meta': meta, 'byteorder': sys.byteorder,
+                  'sections': sections, 'objects': (offset, len(objects))}
+        header_bytes = json.dumps(header).encode('utf-8')
+        base = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+        # Per process, as several workers may save the same table at once
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(MAGIC + len(header_bytes).to_bytes(8, 'little') + header_bytes)
+                f.write(b'\0' * (base - f.tell()))
+                for name, column in arrays:
+                    data = column.tobytes() if isinstance(column, array) else bytes(column)
+                    f.write(data + b'\0' * (_aligned(len(data)) - len(data)))
+                f.write(objects)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return size
+
+    @classmethod
+    def open(cls, path: str, schema: Schema) -> Tuple['Columns', Dict[str, Any]]:
+        """Read a file written by save(); returns the columns and the saved metadata.
+
+        Raises ValueError if the file is not a snapshot of this schema.
+        """
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                if bytes(view[:len(MAGIC)]) != MAGIC:
+                    raise ValueError(f"{path} is not a column snapshot")
+                length = int.from_bytes(view[len(MAGIC):len(MAGIC) + 8], 'little')
+                header = json.loads(bytes(view[len(MAGIC) + 8:len(MAGIC) + 8 + length]))
+                if header['schema'] != schema.to_dict():
+                    raise ValueError(f"{path} was written for another schema")
+                base = _aligned(len(MAGIC) + 8 + length)
+
+                columns = cls(schema)
+                for name, column in columns._arrays():
+                    offset, size, _ = header['sections'][name]
+                    # Slices must be released before the mapping can close
+                    with view[base + offset:base + offset + size] as data:
+                        if isinstance(column, array):
+                            column.frombytes(data)
+                            if header['byteorder'] != sys.byteorder:
+                                column.byteswap()
+                        else:
+                            column.extend(data)
+                offset, size = header['objects']
+                with view[base + offset:base + offset + size] as data:
+                    objects = pickle.loads(data)
+            finally:
+                view.release()
+
+        columns.keys = objects['keys']
+        columns.rows = {key: row for row, key in enumerate(columns.keys) if key is not None}
+        columns.interned = {name: _Interned(values) for name, values in objects['interned'].items()}
+        columns.texts = objects['texts']
+        columns.extra = objects['extra']
+        columns.restore_aggregates(objects['aggregates'])
+        columns._index()
+        return columns, header['meta']
+
+    def _arrays(self) -> List[Tuple[str, Any]]:
+        return ([(f'number:{name}', column) for name, column in self.numbers.items()]
+                + [(f'string:{name}', column) for name, column in self.strings.items()]
+                + [(f'timestamp:{name}', column) for name, column in self.timestamps.items()]
+                + [(f'boolean:{name}', column) for name, column in self.booleans.items()])
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
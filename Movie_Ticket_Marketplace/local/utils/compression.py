@@ -0,0 +1,89 @@
+import os
+import gzip
+import zlib
+import base64
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # gzip only where brotli is not packaged
+    brotli = None
+
+# Responses smaller than this are sent as-is; compressing them saves nothing
+MINIMUM_SIZE = int(os.environ.get('COMPRESSION_MINIMUM_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_COMPRESSION_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_COMPRESSION_QUALITY', '5'))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/msgpack', 'text/')
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None"""
+
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+
+    wildcard = weights.get('*', 0.0)
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    accepted = [(weights.get(coding, wildcard), coding) for coding in candidates]
+    accepted = [(quality, coding) for quality, coding in accepted if quality > 0]
+    if not accepted:
+        return None
+
+    # Highest q-value wins; brotli is preferred on ties since it is listed first
+    return max(accepted, key=lambda pair: pair[0])[1]
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a complete body with the configured level"""
+
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental compressor for streamed (chunked) response bodies"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 writes a gzip header and trailer around the deflate stream
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(chunk)
+        return self._compressor.compress(chunk)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def decode_request_body(event: Dict) -> Optional[str]:
+    """Request body as text, undoing API Gateway's base64 for binary media types"""
+
+    body = event.get('body')
+    if body and event.get('isBase64Encoded'):
+        return base64.b64decode(body).decode('utf-8')
+    return body
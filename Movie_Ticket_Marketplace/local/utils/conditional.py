@@ -0,0 +1,78 @@
+import os
+from typing import Dict, Optional, Union
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Per-route Cache-Control; override with CACHE_CONTROL_<ROUTE>, e.g. CACHE_CONTROL_MOVIES="public, max-age=60"
+CACHE_CONTROL_DEFAULTS = {
+    'tickets': 'no-cache',
+    'ticket': 'no-cache',
+    'movies': 'no-cache',
+    'user': 'no-cache',
+    'seatmap': 'no-cache'
+}
+
+# Request headers, besides Accept-Encoding, that pick the representation a route returns
+ROUTE_VARY = {
+    'tickets': 'Accept'
+}
+
+# Suffixes CompressionMiddleware adds to the ETag of an encoded representation
+ENCODING_SUFFIXES = ('-br', '-gzip')
+
+
+def cache_control(route: str) -> str:
+    return os.environ.get(f'CACHE_CONTROL_{route.upper()}', CACHE_CONTROL_DEFAULTS.get(route, 'no-cache'))
+
+
+def make_etag(route: str, version: Optional[Union[int, str]], variant: Optional[str] = None) -> Optional[str]:
+    """Strong ETag for a route at a given version, or None if unversioned.
+
+    `variant` distinguishes other representations of the same data, such as
+    MessagePack, which must not share the JSON ETag.
+    """
+    if version is None:
+        return None
+    return f'"{route}-{version}-{variant}"' if variant else f'"{route}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        for suffix in ENCODING_SUFFIXES:
+            if candidate.endswith(suffix + '"'):
+                candidate = candidate[:-len(suffix) - 1] + '"'
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_headers(route: str, etag: Optional[str]) -> Dict[str, str]:
+    headers = {'Cache-Control': cache_control(route)}
+    if etag:
+        headers['ETag'] = etag
+    return headers
+
+
+def vary(route: str) -> str:
+    # CompressionMiddleware may encode the 200 but leaves a bodiless 304 alone, so Accept-Encoding is listed here
+    return ', '.join(filter(None, (ROUTE_VARY.get(route), 'Accept-Encoding')))
+
+
+def not_modified(request: Request, route: str, etag: Optional[str]) -> Optional[Response]:
+    """A 304 response if the client already has this version, else None.
+
+    It carries the Vary of the 200 it stands for, so caches key both alike.
+    """
+
+    if etag and etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers={**cache_headers(route, etag), 'Vary': vary(route)})
+    return None
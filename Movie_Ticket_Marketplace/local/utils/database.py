@@ -0,0 +1,41 @@
+import boto3
+import os
+from functools import lru_cache
+
+# STORAGE_BACKEND: dynamodb (LocalStack or AWS_ENDPOINT_URL), memory (utils.memory_store, in this process)
+# or sqlite (utils.sqlite_store, persisted to SQLITE_DATABASE)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'dynamodb')
+SQLITE_DATABASE = os.environ.get('SQLITE_DATABASE', 'movie-booking.db')
+
+# Schema of the tables the services use, plus the payroll tables benchmarks.generate_data
+# fills: (name, key schema, global secondary indexes)
+TABLES = [
+    (os.environ.get('DYNAMODB_TABLE', 'ticket-booking'), [('Theatre-Seat', 'HASH')], []),
+    (os.environ.get('VERSIONS_TABLE', 'resource-versions'), [('versionKey', 'HASH')], []),
+    (os.environ.get('CHANGES_TABLE', 'resource-changes'), [('resource', 'HASH'), ('sequence', 'RANGE')], []),
+    ('users-payroll', [('userId', 'HASH')], []),
+    ('user-transactions', [('transactionId', 'HASH')],
+     [('UserTransactionsIndex', [('userId', 'HASH'), ('timestamp', 'RANGE')], 'ALL')]),
+]
+
+# Non-key attributes the SQLite backend indexes, so filters on them skip the full scan
+INDEXED_ATTRIBUTES = {
+    os.environ.get('DYNAMODB_TABLE', 'ticket-booking'): ('Movie', 'Price', 'owner'),
+}
+
+@lru_cache(maxsize=None)
+def get_dynamodb():
+    """Get the process-wide storage resource for STORAGE_BACKEND"""
+    if STORAGE_BACKEND == 'memory':
+        from utils.memory_store import MemoryResource
+        return MemoryResource(TABLES)
+    if STORAGE_BACKEND == 'sqlite':
+        from utils.sqlite_store import SqliteResource
+        return SqliteResource(SQLITE_DATABASE, TABLES, INDEXED_ATTRIBUTES)
+    return boto3.resource(
+        'dynamodb',
+        endpoint_url=os.environ.get('AWS_ENDPOINT_URL', 'http://localhost:4566'),
+        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID', 'test'),
+        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY', 'test'),
+        region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+    )
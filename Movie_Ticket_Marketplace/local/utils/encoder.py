@@ -1,6 +1,17 @@
 import json
+from datetime import date, datetime
 from decimal import Decimal
 
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder where orjson is not packaged
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are only offered where msgpack is packaged
+    msgpack = None
+
 class CustomEncoder(json.JSONEncoder):
     """Custom JSON encoder to handle Decimal types from DynamoDB"""
     
@@ -8,4 +19,33 @@ class CustomEncoder(json.JSONEncoder):
         if isinstance(obj, Decimal):
             # Convert Decimal to float for JSON serialization
             return float(obj)
-        return super(CustomEncoder, self).default(obj)
\ No newline at end of file
+        return super(CustomEncoder, self).default(obj)
+
+def _default(obj):
+    """orjson hook for the types it does not serialize itself"""
+    if isinstance(obj, Decimal):
+        if obj == obj.to_integral_value():
+            # Whole numbers stay integers, matching FastAPI's own Decimal handling; orjson
+            # rejects integers outside int64, so those are sent as exact digit strings
+            return int(obj) if -2 ** 63 <= obj < 2 ** 63 else str(int(obj))
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (datetime, date)):
+        # Only reached by the stdlib fallback; orjson encodes these natively
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj) -> bytes:
+    """Serialize DynamoDB items (Decimal, datetime, sets) to compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+def packb(obj) -> bytes:
+    """Serialize DynamoDB items to MessagePack.
+
+    Whole Decimals (prices, counters) become variable-width ints rather than
+    9-byte floats, so typical ticket items shrink further than their JSON.
+    """
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
@@ -0,0 +1,1413 @@
+"""In-process storage engine with the boto3 DynamoDB Table API.
+
+`MemoryResource` stands in for `boto3.resource('dynamodb')`. Its tables
+accept the same calls and return the same shapes as boto3 tables, so the
+services run unchanged on it:
+
+- get_item, put_item, update_item and delete_item, with condition
+  expressions and ReturnValues
+- query and scan on the table or a global secondary index, with key
+  conditions, filters, projections, Limit, pagination and parallel scan
+  segments
+- batch_writer, plus batch_get_item, batch_write_item, transact_write_items
+  and transact_get_items on `table.meta.client`
+
+The expression language covers comparisons, BETWEEN, IN, AND/OR/NOT, the
+attribute_exists, attribute_not_exists, attribute_type, begins_with,
+contains and size functions, and SET (with if_not_exists, list_append and
++/-), REMOVE, ADD and DELETE update actions on nested paths.
+
+It also enforces the DynamoDB rules that most often break code moving
+between LocalStack and AWS. Floats are rejected, numbers come back as
+Decimal, and placeholders must be both defined and used. Failed conditions
+raise the same ClientError codes, and transactions are all-or-nothing with
+CancellationReasons.
+
+Keys live in sorted chunked lists, so point reads and writes take O(log n)
+and a query touches only its key range. One lock serializes all operations
+on a resource. TTL deletion, item size limits, capacity accounting and
+reserved-word checks are not emulated. tests/test_memory_store_parity.py
+runs the same calls against moto and compares the results.
+
+ServerlesswithPayroll/utils/memory_store.py is a symlink to this file, so
+both apps run on one engine.
+"""
+import re
+import threading
+import zlib
+from bisect import bisect_left, insort
+from decimal import Decimal
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.table import BatchWriter
+from boto3.dynamodb.types import DYNAMODB_CONTEXT, Binary
+from botocore.exceptions import ClientError
+
+# Items evaluated per query/scan page when no Limit is given, standing in for the 1 MB page cap
+PAGE_ITEMS = 1000
+MAX_BATCH_WRITE = 25
+MAX_BATCH_GET = 100
+MAX_TRANSACTION_ITEMS = 100
+
+
+class ConditionalCheckFailedException(ClientError):
+    pass
+
+
+class TransactionCanceledException(ClientError):
+    pass
+
+
+class ResourceNotFoundException(ClientError):
+    pass
+
+
+def _error(cls, code: str, message: str, operation: str, **extra) -> ClientError:
+    return cls({'Error': {'Code': code, 'Message': message}, **extra}, operation)
+
+
+def _validation(message: str, operation: str = 'Expression') -> ClientError:
+    return _error(ClientError, 'ValidationException', message, operation)
+
+
+class _Missing:
+    """An attribute that is not in the item"""
+
+    def __repr__(self):
+        return '<missing>'
+
+
+class _Top:
+    """Sorts after every key value, to bound key ranges in the sorted lists"""
+
+    def __eq__(self, other):
+        return other is self
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return other is self
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __ge__(self, other):
+        return True
+
+    def __hash__(self):
+        return 0
+
+
+MISSING = _Missing()
+TOP = _Top()
+_CONTAINERS = (dict, list, set)
+
+
+# --- values -------------------------------------------------------------------
+
+def to_store(value: Any, operation: str = 'PutItem') -> Any:
+    """Normalize a Python value the way boto3's serializer would accept it"""
+
+    if value is None or isinstance(value, (str, bool, Decimal)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError("Float types are not supported. Use Decimal types instead.")
+    if isinstance(value, dict):
+        return {key: to_store(item, operation) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_store(item, operation) for item in value]
+    if isinstance(value, (set, frozenset)):
+        if not value:
+            raise _validation("One or more parameter values were invalid: An empty set is not allowed", operation)
+        return {to_store(item, operation) for item in value}
+    if isinstance(value, Binary):
+        return value.value
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    raise TypeError(f'Unsupported type "{type(value)}" for value "{value}"')
+
+
+def copy_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: copy_value(item) if isinstance(item, _CONTAINERS) else item for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_value(item) if isinstance(item, _CONTAINERS) else item for item in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def type_of(value: Any) -> str:
+    if isinstance(value, str):
+        return 'S'
+    if isinstance(value, bool):
+        return 'BOOL'
+    if isinstance(value, Decimal):
+        return 'N'
+    if isinstance(value, bytes):
+        return 'B'
+    if value is None:
+        return 'NULL'
+    if isinstance(value, dict):
+        return 'M'
+    if isinstance(value, list):
+        return 'L'
+    if isinstance(value, set):
+        element = type_of(next(iter(value)))
+        return element + 'S'
+    return '?'
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    if left is MISSING or right is MISSING:
+        return op == '<>'
+    left_type, right_type = type_of(left), type_of(right)
+    if op == '=':
+        return left_type == right_type and left == right
+    if op == '<>':
+        return left_type != right_type or left != right
+    if left_type != right_type or left_type not in ('S', 'N', 'B'):
+        return False
+    if op == '<':
+        return left < right
+    if op == '<=':
+        return left <= right
+    if op == '>':
+        return left > right
+    return left >= right
+
+
+# --- expressions --------------------------------------------------------------
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<value>:[A-Za-z0-9_]+) |
+    (?P<name>\#[A-Za-z0-9_]+) |
+    (?P<number>[0-9]+) |
+    (?P<op><>|<=|>=|[=<>(),.\[\]+-]) |
+    (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+)""", re.VERBOSE)
+_CONDITION_FUNCTIONS = {'attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains'}
+_COMPARATORS = {'=', '<>', '<', '<=', '>', '>='}
+_UPDATE_CLAUSES = {'SET', 'REMOVE', 'ADD', 'DELETE'}
+
+
+class _Parser:
+    """Recursive-descent parser producing tuple ASTs with alias names resolved"""
+
+    def __init__(self, expression: str, names: Dict[str, str]):
+        self.expression = expression
+        self.names = names
+        self.used_names = set()
+        self.used_values = set()
+        self.tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = _TOKEN.match(expression, position)
+            if not match or match.end() == position:
+                raise self.error(expression[position:].strip()[:10])
+            kind = match.lastgroup
+            self.tokens.append((kind, match.group(kind)))
+            position = match.end()
+        self.position = 0
+
+    def error(self, token: Optional[str] = None) -> ClientError:
+        near = token if token is not None else (self.peek()[1] if self.peek() else '<EOF>')
+        return _validation(f'Invalid expression: Syntax error; token: "{near}", near: "{self.expression}"')
+
+    def peek(self, offset: int = 0) -> Optional[Tuple[str, str]]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token is None:
+            raise self.error()
+        self.position += 1
+        return token
+
+    def accept(self, text: str) -> bool:
+        token = self.peek()
+        if token and token[0] in ('op', 'word') and token[1].upper() == text:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, text: str) -> None:
+        if not self.accept(text):
+            raise self.error()
+
+    def done(self) -> None:
+        if self.peek() is not None:
+            raise self.error()
+
+    # paths and operands
+
+    def path(self) -> Tuple:
+        elements = [self.path_name()]
+        while True:
+            if self.accept('.'):
+                elements.append(self.path_name())
+            elif self.accept('['):
+                kind, text = self.take()
+                if kind != 'number':
+                    raise self.error(text)
+                elements.append(int(text))
+                self.expect(']')
+            else:
+                return ('path', tuple(elements))
+
+    def path_name(self) -> str:
+        kind, text = self.take()
+        if kind == 'name':
+            if text not in self.names:
+                raise _validation(f"An expression attribute name used in the document path is not defined; attribute name: {text}")
+            self.used_names.add(text)
+            return self.names[text]
+        if kind == 'word':
+            return text
+        raise self.error(text)
+
+    def value(self) -> Tuple:
+        kind, text = self.take()
+        if kind != 'value':
+            raise self.error(text)
+        self.used_values.add(text)
+        return ('value', text)
+
+    def operand(self) -> Tuple:
+        token = self.peek()
+        if token is None:
+            raise self.error()
+        if token[0] == 'value':
+            return self.value()
+        if token[0] == 'word' and token[1] == 'size' and self.peek(1) == ('op', '('):
+            self.take()
+            self.expect('(')
+            path = self.path()
+            self.expect(')')
+            return ('size', path)
+        return self.path()
+
+    # conditions
+
+    def condition(self) -> Tuple:
+        node = self.conjunction()
+        while self.accept('OR'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self) -> Tuple:
+        node = self.negation()
+        while self.accept('AND'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self) -> Tuple:
+        if self.accept('NOT'):
+            return ('not', self.negation())
+        return self.predicate()
+
+    def predicate(self) -> Tuple:
+        if self.accept('('):
+            node = self.condition()
+            self.expect(')')
+            return node
+
+        token = self.peek()
+        if token and token[0] == 'word' and token[1] in _CONDITION_FUNCTIONS and self.peek(1) == ('op', '('):
+            name = self.take()[1]
+            self.expect('(')
+            path = self.path()
+            if name in ('attribute_exists', 'attribute_not_exists'):
+                self.expect(')')
+                return (name, path)
+            self.expect(',')
+            argument = self.operand()
+            self.expect(')')
+            return (name, path, argument)
+
+        left = self.operand()
+        if self.accept('BETWEEN'):
+            low = self.operand()
+            self.expect('AND')
+            return ('between', left, low, self.operand())
+        if self.accept('IN'):
+            self.expect('(')
+            options = [self.operand()]
+            while self.accept(','):
+                options.append(self.operand())
+            self.expect(')')
+            return ('in', left, tuple(options))
+        kind, text = self.take()
+        if kind != 'op' or text not in _COMPARATORS:
+            raise self.error(text)
+        return ('compare', text, left, self.operand())
+
+    # updates
+
+    def update(self) -> Tuple:
+        actions = []
+        seen = set()
+        while self.peek() is not None:
+            kind, text = self.take()
+            clause = text.upper()
+            if kind != 'word' or clause not in _UPDATE_CLAUSES:
+                raise self.error(text)
+            if clause in seen:
+                raise _validation(f'Invalid UpdateExpression: The "{clause}" section can only be used once in an update expression;')
+            seen.add(clause)
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.expect('=')
+                    actions.append(('SET', path, self.set_value()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', path))
+                else:
+                    actions.append((clause, path, self.value()))
+                if not self.accept(','):
+                    break
+        if not actions:
+            raise self.error()
+        return tuple(actions)
+
+    def set_value(self) -> Tuple:
+        left = self.set_operand()
+        token = self.peek()
+        if token in (('op', '+'), ('op', '-')):
+            self.take()
+            return (token[1], left, self.set_operand())
+        return left
+
+    def set_operand(self) -> Tuple:
+        token = self.peek()
+        if token and token[0] == 'word' and token[1] in ('if_not_exists', 'list_append') and self.peek(1) == ('op', '('):
+            name = self.take()[1]
+            self.expect('(')
+            first = self.path() if name == 'if_not_exists' else self.set_operand()
+            self.expect(',')
+            second = self.set_operand()
+            self.expect(')')
+            return (name, first, second)
+        if token and token[0] == 'value':
+            return self.value()
+        return self.path()
+
+    def projection(self) -> Tuple:
+        paths = [self.path()[1]]
+        while self.accept(','):
+            paths.append(self.path()[1])
+        return tuple(paths)
+
+
+def _names_key(names: Optional[Dict[str, str]]) -> Tuple:
+    return tuple(sorted(names.items())) if names else ()
+
+
+@lru_cache(maxsize=2048)
+def _parse(kind: str, expression: str, names: Tuple) -> Tuple[Any, frozenset, frozenset]:
+    parser = _Parser(expression, dict(names))
+    if kind == 'update':
+        tree = parser.update()
+    elif kind == 'projection':
+        tree = parser.projection()
+    else:
+        tree = parser.condition()
+    parser.done()
+    if kind == 'condition':
+        tree = _compile_condition(tree)
+    return tree, frozenset(parser.used_names), frozenset(parser.used_values)
+
+
+class _Expressions:
+    """The expressions of one request, parsed, with placeholder bookkeeping"""
+
+    def __init__(self, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]], operation: str):
+        self.names = names or {}
+        self.names_key = _names_key(names)
+        self.values = {key: to_store(value, operation) for key, value in (values or {}).items()}
+        self.used_names = set()
+        self.used_values = set()
+
+    def parse(self, kind: str, expression: Optional[str]):
+        if expression is None:
+            return None
+        if not expression.strip():
+            raise _validation(f"Invalid {kind} expression: The expression can not be empty;")
+        tree, names, values = _parse(kind, expression, self.names_key)
+        self.used_names |= names
+        self.used_values |= values
+        return tree
+
+    def check(self) -> None:
+        undefined = self.used_values - self.values.keys()
+        if undefined:
+            raise _validation(f"An expression attribute value used in expression is not defined; attribute value: {min(undefined)}")
+        unused = self.values.keys() - self.used_values
+        if unused:
+            raise _validation(f"Value provided in ExpressionAttributeValues unused in expressions: keys: {{{', '.join(sorted(unused))}}}")
+        unused = self.names.keys() - self.used_names
+        if unused:
+            raise _validation(f"Value provided in ExpressionAttributeNames unused in expressions: keys: {{{', '.join(sorted(unused))}}}")
+
+
+def _resolve(item: Dict, elements: Sequence) -> Any:
+    value = item
+    for element in elements:
+        if isinstance(element, int):
+            if not isinstance(value, list) or element >= len(value):
+                return MISSING
+        elif not isinstance(value, dict) or element not in value:
+            return MISSING
+        value = value[element]
+    return value
+
+
+def _compile_operand(node: Tuple) -> Callable:
+    kind = node[0]
+    if kind == 'value':
+        placeholder = node[1]
+        return lambda item, values: values[placeholder]
+    if kind == 'path':
+        elements = node[1]
+        if len(elements) == 1:
+            name = elements[0]
+            return lambda item, values: item.get(name, MISSING)
+        return lambda item, values: _resolve(item, elements)
+    if kind == 'size':
+        path = _compile_operand(node[1])
+
+        def size(item, values):
+            value = path(item, values)
+            if isinstance(value, (str, bytes, list, dict, set)):
+                return Decimal(len(value.encode('utf-8')) if isinstance(value, str) else len(value))
+            return MISSING
+        return size
+    raise _validation(f"Invalid operand: {kind}")
+
+
+def _compile_condition(node: Tuple) -> Callable:
+    kind = node[0]
+    if kind == 'and':
+        left, right = _compile_condition(node[1]), _compile_condition(node[2])
+        return lambda item, values: left(item, values) and right(item, values)
+    if kind == 'or':
+        left, right = _compile_condition(node[1]), _compile_condition(node[2])
+        return lambda item, values: left(item, values) or right(item, values)
+    if kind == 'not':
+        inner = _compile_condition(node[1])
+        return lambda item, values: not inner(item, values)
+    if kind == 'compare':
+        op, left, right = node[1], _compile_operand(node[2]), _compile_operand(node[3])
+        return lambda item, values: _compare(op, left(item, values), right(item, values))
+    if kind == 'between':
+        value, low, high = (_compile_operand(part) for part in node[1:])
+
+        def between(item, values):
+            current = value(item, values)
+            return _compare('>=', current, low(item, values)) and _compare('<=', current, high(item, values))
+        return between
+    if kind == 'in':
+        value = _compile_operand(node[1])
+        options = [_compile_operand(option) for option in node[2]]
+
+        def in_(item, values):
+            current = value(item, values)
+            return any(_compare('=', current, option(item, values)) for option in options)
+        return in_
+    if kind == 'attribute_exists':
+        path = _compile_operand(node[1])
+        return lambda item, values: path(item, values) is not MISSING
+    if kind == 'attribute_not_exists':
+        path = _compile_operand(node[1])
+        return lambda item, values: path(item, values) is MISSING
+    if kind == 'attribute_type':
+        path, expected = _compile_operand(node[1]), _compile_operand(node[2])
+
+        def attribute_type(item, values):
+            current = path(item, values)
+            return current is not MISSING and type_of(current) == expected(item, values)
+        return attribute_type
+    if kind == 'begins_with':
+        path, prefix = _compile_operand(node[1]), _compile_operand(node[2])
+
+        def begins_with(item, values):
+            current, start = path(item, values), prefix(item, values)
+            return (isinstance(current, (str, bytes)) and type(current) is type(start)
+                    and current.startswith(start))
+        return begins_with
+    if kind == 'contains':
+        path, operand = _compile_operand(node[1]), _compile_operand(node[2])
+
+        def contains(item, values):
+            current, needle = path(item, values), operand(item, values)
+            if isinstance(current, (str, bytes)):
+                return type(current) is type(needle) and needle in current
+            if isinstance(current, set):
+                return not isinstance(needle, (dict, list, set)) and needle in current
+            if isinstance(current, list):
+                return any(_compare('=', element, needle) for element in current)
+            return False
+        return contains
+    raise _validation(f"Invalid condition: {kind}")
+
+
+# --- updates ------------------------------------------------------------------
+
+def _update_value(node: Tuple, item: Dict, values: Dict) -> Any:
+    kind = node[0]
+    if kind == 'value':
+        return values[node[1]]
+    if kind == 'path':
+        value = _resolve(item, node[1])
+        if value is MISSING:
+            raise _validation("The provided expression refers to an attribute that does not exist in the item", 'UpdateItem')
+        return value
+    if kind == 'if_not_exists':
+        value = _resolve(item, node[1][1])
+        return value if value is not MISSING else _update_value(node[2], item, values)
+    if kind == 'list_append':
+        first, second = _update_value(node[1], item, values), _update_value(node[2], item, values)
+        if not isinstance(first, list) or not isinstance(second, list):
+            raise _validation("An operand in the update expression has an incorrect data type", 'UpdateItem')
+        return first + second
+    if kind in ('+', '-'):
+        left, right = _update_value(node[1], item, values), _update_value(node[2], item, values)
+        if type_of(left) != 'N' or type_of(right) != 'N':
+            raise _validation("An operand in the update expression has an incorrect data type", 'UpdateItem')
+        return DYNAMODB_CONTEXT.add(left, right) if kind == '+' else DYNAMODB_CONTEXT.subtract(left, right)
+    raise _validation(f"Invalid update operand: {kind}", 'UpdateItem')
+
+
+def _assign(item: Dict, elements: Sequence, value: Any) -> None:
+    parent = _resolve(item, elements[:-1])
+    last = elements[-1]
+    if isinstance(last, int) and isinstance(parent, list):
+        if last < len(parent):
+            parent[last] = value
+        else:
+            parent.append(value)
+    elif not isinstance(last, int) and isinstance(parent, dict):
+        parent[last] = value
+    else:
+        raise _validation("The document path provided in the update expression is invalid for update", 'UpdateItem')
+
+
+def _remove(item: Dict, elements: Sequence) -> None:
+    parent = _resolve(item, elements[:-1])
+    last = elements[-1]
+    if isinstance(last, int) and isinstance(parent, list):
+        if last < len(parent):
+            del parent[last]
+    elif isinstance(parent, dict):
+        parent.pop(last, None)
+
+
+def _apply_update(actions: Tuple, old: Dict, values: Dict, key_names: Sequence[str]) -> Tuple[Dict, Tuple]:
+    """New item and the paths it touched; operands all read `old`"""
+
+    touched = tuple(action[1][1] for action in actions)
+    for name in key_names:
+        if any(path[0] == name for path in touched):
+            raise _validation(f"One or more parameter values were invalid: Cannot update attribute {name}. "
+                              f"This attribute is part of the key", 'UpdateItem')
+
+    resolved = []
+    for action in actions:
+        clause, path = action[0], action[1][1]
+        if clause == 'REMOVE':
+            resolved.append((clause, path, None))
+            continue
+        value = _update_value(action[2], old, values)
+        current = _resolve(old, path)
+        if clause == 'ADD':
+            if current is MISSING:
+                if type_of(value) not in ('N', 'SS', 'NS', 'BS'):
+                    raise _validation("Incorrect operand type for operator or function; operator: ADD", 'UpdateItem')
+            elif type_of(current) == 'N' and type_of(value) == 'N':
+                value = DYNAMODB_CONTEXT.add(current, value)
+            elif isinstance(current, set) and type_of(current) == type_of(value):
+                value = current | value
+            else:
+                raise _validation("An operand in the update expression has an incorrect data type", 'UpdateItem')
+        elif clause == 'DELETE':
+            if current is MISSING:
+                continue
+            if not isinstance(current, set) or type_of(current) != type_of(value):
+                raise _validation("An operand in the update expression has an incorrect data type", 'UpdateItem')
+            value = current - value
+            if not value:
+                resolved.append(('REMOVE', path, None))
+                continue
+        resolved.append((clause, path, value))
+
+    item = copy_value(old)
+    for clause, path, value in resolved:
+        if clause != 'REMOVE':
+            _assign(item, path, copy_value(value))
+    # Higher list indexes first, so removing one does not shift the others
+    removals = [path for clause, path, _ in resolved if clause == 'REMOVE']
+    for path in sorted(removals, key=lambda path: [-element if isinstance(element, int) else 0 for element in path]):
+        _remove(item, path)
+    return item, touched
+
+
+def _project(item: Dict, paths: Optional[Tuple]) -> Dict:
+    if not paths:
+        return copy_value(item)
+    projected: Dict[str, Any] = {}
+    for elements in paths:
+        value = _resolve(item, elements)
+        if value is MISSING:
+            continue
+        target = projected
+        for element, following in zip(elements, elements[1:]):
+            if isinstance(target, dict):
+                target = target.setdefault(element, [] if isinstance(following, int) else {})
+            else:
+                target.append([] if isinstance(following, int) else {})
+                target = target[-1]
+        if isinstance(target, dict):
+            target[elements[-1]] = copy_value(value)
+        else:
+            target.append(copy_value(value))
+    return projected
+
+
+# --- storage ------------------------------------------------------------------
+
+class SortedKeys:
+    """Sorted list split into chunks, so inserts and deletes stay cheap at millions of keys"""
+
+    LOAD = 512
+
+    def __init__(self):
+        self._lists: List[List] = []
+        self._maxes: List = []
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._lists)
+
+    def add(self, value) -> None:
+        if not self._maxes:
+            self._lists.append([value])
+            self._maxes.append(value)
+            return
+        index = bisect_left(self._maxes, value)
+        if index == len(self._maxes):
+            index -= 1
+            self._lists[index].append(value)
+            self._maxes[index] = value
+        else:
+            insort(self._lists[index], value)
+        chunk = self._lists[index]
+        if len(chunk) > 2 * self.LOAD:
+            self._lists.insert(index + 1, chunk[self.LOAD:])
+            del chunk[self.LOAD:]
+            self._maxes[index] = chunk[-1]
+            self._maxes.insert(index + 1, self._lists[index + 1][-1])
+
+    def remove(self, value) -> None:
+        index = bisect_left(self._maxes, value)
+        chunk = self._lists[index]
+        position = bisect_left(chunk, value)
+        del chunk[position]
+        if not chunk:
+            del self._lists[index]
+            del self._maxes[index]
+        else:
+            self._maxes[index] = chunk[-1]
+
+    def locate(self, value) -> Tuple[int, int]:
+        """Position of the first entry not less than `value`"""
+        index = bisect_left(self._maxes, value)
+        if index == len(self._maxes):
+            return index, 0
+        return index, bisect_left(self._lists[index], value)
+
+    def between(self, low: Tuple[int, int], high: Tuple[int, int], reverse: bool = False) -> Iterator:
+        """Entries from position `low` up to, not including, position `high`"""
+        lists = self._lists
+        if not reverse:
+            index, position = low
+            while (index, position) < high and index < len(lists):
+                chunk = lists[index]
+                end = high[1] if index == high[0] else len(chunk)
+                yield from chunk[position:end]
+                index, position = index + 1, 0
+            return
+        index, position = high
+        while (index, position) > low:
+            if position == 0:
+                index -= 1
+                position = len(lists[index])
+                continue
+            start = low[1] if index == low[0] else 0
+            chunk = lists[index]
+            for offset in range(position - 1, start - 1, -1):
+                yield chunk[offset]
+            if index == low[0]:
+                return
+            position = 0
+
+
+def _range(keys: SortedKeys, prefix: Tuple, condition: Optional[Tuple]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """Positions bounding the entries under `prefix` whose next element meets `condition`"""
+
+    locate = keys.locate
+    if condition is None:
+        return locate(prefix), locate(prefix + (TOP,))
+    op, first, second = condition
+    if op == '=':
+        return locate(prefix + (first,)), locate(prefix + (first, TOP))
+    if op == '<':
+        return locate(prefix), locate(prefix + (first,))
+    if op == '<=':
+        return locate(prefix), locate(prefix + (first, TOP))
+    if op == '>':
+        return locate(prefix + (first, TOP)), locate(prefix + (TOP,))
+    if op == '>=':
+        return locate(prefix + (first,)), locate(prefix + (TOP,))
+    if op == 'between':
+        return locate(prefix + (first,)), locate(prefix + (second, TOP))
+    # begins_with: every string with the prefix sorts below prefix + the highest code point
+    upper = first + ('\U0010ffff' if isinstance(first, str) else b'\xff' * 8)
+    return locate(prefix + (first,)), locate(prefix + (upper,))
+
+
+class _Index:
+    def __init__(self, name: str, keys: Sequence[Tuple[str, str]], projection: str, non_key_attributes: Sequence[str]):
+        self.name = name
+        self.hash_name = keys[0][0]
+        self.range_name = keys[1][0] if len(keys) > 1 else None
+        self.projection = projection
+        self.non_key_attributes = tuple(non_key_attributes)
+        # hash value -> sorted (range value, table key) or (table key,) entries
+        self.partitions: Dict[Any, SortedKeys] = {}
+
+    def entry(self, item: Dict, table_key: Tuple) -> Optional[Tuple[Any, Tuple]]:
+        hash_value = item.get(self.hash_name, MISSING)
+        if hash_value is MISSING:
+            return None
+        if self.range_name is None:
+            return hash_value, (table_key,)
+        range_value = item.get(self.range_name, MISSING)
+        if range_value is MISSING:
+            return None
+        return hash_value, (range_value, table_key)
+
+    def add(self, entry) -> None:
+        hash_value, sort_entry = entry
+        partition = self.partitions.get(hash_value)
+        if partition is None:
+            partition = self.partitions[hash_value] = SortedKeys()
+        partition.add(sort_entry)
+
+    def remove(self, entry) -> None:
+        hash_value, sort_entry = entry
+        partition = self.partitions[hash_value]
+        partition.remove(sort_entry)
+        if not partition._lists:
+            del self.partitions[hash_value]
+
+
+class _Table:
+    def __init__(self, name: str, keys: Sequence[Tuple[str, str]], indexes: Iterable[Tuple]):
+        self.name = name
+        self.key_names = tuple(attribute for attribute, _ in keys)
+        self.items: Dict[Tuple, Dict] = {}
+        self.order = SortedKeys()
+        self.indexes: Dict[str, _Index] = {}
+        for index in indexes:
+            index_name, index_keys, projection = index[:3]
+            self.indexes[index_name] = _Index(index_name, index_keys, projection, index[3] if len(index) > 3 else ())
+        self.key_types: Dict[str, type] = {}
+
+    def key_of(self, key: Dict, operation: str) -> Tuple:
+        if len(key) != len(self.key_names) or any(name not in key for name in self.key_names):
+            raise _validation("The provided key element does not match the schema", operation)
+        return tuple(self.checked_key_value(name, to_store(key[name], operation), operation) for name in self.key_names)
+
+    def checked_key_value(self, name: str, value: Any, operation: str) -> Any:
+        if not isinstance(value, (str, Decimal, bytes)) or isinstance(value, bool) or value in ('', b''):
+            raise _validation(f"One or more parameter values were invalid: Type mismatch for key {name}", operation)
+        expected = self.key_types.setdefault(name, type(value))
+        if type(value) is not expected:
+            raise _validation(f"One or more parameter values were invalid: Type mismatch for key {name} "
+                              f"expected: {type_of(expected())} actual: {type_of(value)}", operation)
+        return value
+
+    def key_item(self, table_key: Tuple) -> Dict:
+        return dict(zip(self.key_names, table_key))
+
+    def get(self, table_key: Tuple) -> Optional[Dict]:
+        return self.items.get(table_key)
+
+    def __len__(self):
+        return len(self.items)
+
+    def distinct(self, attribute: str) -> List:
+        values = {item[attribute] for item in self.items.values() if type_of(item.get(attribute)) in ('S', 'N', 'B')}
+        return sorted(values)
+
+    def check_index_keys(self, item: Dict, operation: str) -> None:
+        """Raise the ValidationException DynamoDB gives for an index key attribute of the wrong type"""
+        for index in self.indexes.values():
+            if index.entry(item, ()) is not None:
+                for name in (index.hash_name, index.range_name):
+                    if name is not None:
+                        self.checked_key_value(name, item[name], operation)
+
+    def store(self, table_key: Tuple, item: Optional[Dict], operation: str) -> None:
+        """Write or (with item None) delete one item, keeping the indexes in step"""
+        if item is not None:
+            self.check_index_keys(item, operation)
+        old = self.items.get(table_key)
+        entries = []
+        for index in self.indexes.values():
+            old_entry = index.entry(old, table_key) if old is not None else None
+            new_entry = index.entry(item, table_key) if item is not None else None
+            if old_entry != new_entry:
+                entries.append((index, old_entry, new_entry))
+
+        if item is None:
+            if old is not None:
+                del self.items[table_key]
+                self.order.remove(table_key)
+        else:
+            if old is None:
+                self.order.add(table_key)
+            self.items[table_key] = item
+        for index, old_entry, new_entry in entries:
+            if old_entry is not None:
+                index.remove(old_entry)
+            if new_entry is not None:
+                index.add(new_entry)
+
+    def index(self, name: str, operation: str) -> _Index:
+        index = self.indexes.get(name)
+        if index is None:
+            raise _validation(f"The table does not have the specified index: {name}", operation)
+        return index
+
+    def project_index(self, index: _Index, item: Dict) -> Dict:
+        if index.projection == 'ALL':
+            return item
+        names = set(self.key_names) | {index.hash_name, index.range_name} | set(index.non_key_attributes)
+        return {name: value for name, value in item.items() if name in names}
+
+
+# --- resource, tables and client ----------------------------------------------
+
+class _Write:
+    """One planned write: the item's key, its old and new state and the condition outcome"""
+
+    __slots__ = ('table', 'key', 'old', 'new', 'passed', 'touched')
+
+    def __init__(self, table: _Table, key: Tuple, old: Optional[Dict], new: Any, passed: bool, touched=()):
+        self.table = table
+        self.key = key
+        self.old = old
+        self.new = new
+        self.passed = passed
+        self.touched = touched
+
+
+_UNCHANGED = object()
+
+
+class MemoryResource:
+    """Stand-in for boto3.resource('dynamodb') holding tables in this process"""
+
+    def __init__(self, tables: Iterable[Tuple] = ()):
+        self._tables: Dict[str, _Table] = {}
+        self._lock = threading.RLock()
+        self.meta = SimpleNamespace(client=MemoryClient(self))
+        for spec in tables:
+            self.add_table(*spec)
+
+    def add_table(self, name: str, keys: Sequence[Tuple[str, str]], indexes: Iterable[Tuple] = ()) -> 'MemoryTable':
+        """Create a table from (attribute, HASH|RANGE) keys and (name, keys, projection[, non-key attributes]) indexes"""
+        with self._lock:
+            if name not in self._tables:
+                self._tables[name] = self._new_table(name, keys, indexes)
+        return self.Table(name)
+
+    def _new_table(self, name: str, keys: Sequence[Tuple[str, str]], indexes: Iterable[Tuple]) -> _Table:
+        return _Table(name, keys, indexes)
+
+    def _writing(self):
+        """Held for the whole of a write, from reading the current items to storing the new ones"""
+        return self._lock
+
+    def Table(self, name: str) -> 'MemoryTable':
+        return MemoryTable(self, name)
+
+    def _table(self, name: str, operation: str) -> _Table:
+        table = self._tables.get(name)
+        if table is None:
+            raise _error(ResourceNotFoundException, 'ResourceNotFoundException', 'Requested resource not found', operation)
+        return table
+
+    # planning: conditions are checked against the current item, nothing is written yet
+
+    def _check(self, expressions: _Expressions, condition: Optional[str], old: Optional[Dict]) -> bool:
+        check = expressions.parse('condition', condition)
+        return check is None or check(old if old is not None else {}, expressions.values)
+
+    def _plan_put(self, request: Dict, operation: str) -> _Write:
+        table = self._table(request['TableName'], operation)
+        item = to_store(request['Item'], operation)
+        key = table.key_of({name: item.get(name) for name in table.key_names if name in item}, operation)
+        expressions = _Expressions(request.get('ExpressionAttributeNames'), request.get('ExpressionAttributeValues'), operation)
+        old = table.get(key)
+        passed = self._check(expressions, request.get('ConditionExpression'), old)
+        expressions.check()
+        return _Write(table, key, old, item, passed)
+
+    def _plan_update(self, request: Dict, operation: str) -> _Write:
+        table = self._table(request['TableName'], operation)
+        key = table.key_of(request['Key'], operation)
+        expressions = _Expressions(request.get('ExpressionAttributeNames'), request.get('ExpressionAttributeValues'), operation)
+        actions = expressions.parse('update', request.get('UpdateExpression'))
+        old = table.get(key)
+        passed = self._check(expressions, request.get('ConditionExpression'), old)
+        expressions.check()
+        base = old if old is not None else table.key_item(key)
+        if actions is None or not passed:
+            return _Write(table, key, old, copy_value(base), passed)
+        new, touched = _apply_update(actions, base, expressions.values, table.key_names)
+        return _Write(table, key, old, new, passed, touched)
+
+    def _plan_delete(self, request: Dict, operation: str) -> _Write:
+        table = self._table(request['TableName'], operation)
+        key = table.key_of(request['Key'], operation)
+        expressions = _Expressions(request.get('ExpressionAttributeNames'), request.get('ExpressionAttributeValues'), operation)
+        old = table.get(key)
+        passed = self._check(expressions, request.get('ConditionExpression'), old)
+        expressions.check()
+        return _Write(table, key, old, None, passed)
+
+    def _plan_check(self, request: Dict, operation: str) -> _Write:
+        table = self._table(request['TableName'], operation)
+        key = table.key_of(request['Key'], operation)
+        expressions = _Expressions(request.get('ExpressionAttributeNames'), request.get('ExpressionAttributeValues'), operation)
+        old = table.get(key)
+        passed = self._check(expressions, request['ConditionExpression'], old)
+        expressions.check()
+        return _Write(table, key, old, _UNCHANGED, passed)
+
+    def _commit(self, writes: Sequence[_Write], operation: str) -> None:
+        # Validate every write before storing any, so a rejected batch or transaction leaves no partial effect
+        for write in writes:
+            if write.new is not _UNCHANGED and write.new is not None:
+                write.table.check_index_keys(write.new, operation)
+        for write in writes:
+            if write.new is not _UNCHANGED:
+                write.table.store(write.key, write.new, operation)
+
+    # single-item operations
+
+    def write_one(self, kind: str, request: Dict) -> Dict:
+        operation = {'put': 'PutItem', 'update': 'UpdateItem', 'delete': 'DeleteItem'}[kind]
+        plan = {'put': self._plan_put, 'update': self._plan_update, 'delete': self._plan_delete}[kind]
+        with self._writing():
+            write = plan(request, operation)
+            if not write.passed:
+                extra = {}
+                if request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and write.old is not None:
+                    extra['Item'] = copy_value(write.old)
+                raise _error(ConditionalCheckFailedException, 'ConditionalCheckFailedException',
+                             'The conditional request failed', operation, **extra)
+            self._commit([write], operation)
+            return self._return_values(write, request.get('ReturnValues') or 'NONE', operation)
+
+    def _return_values(self, write: _Write, mode: str, operation: str) -> Dict:
+        if mode == 'NONE':
+            return {}
+        if mode == 'ALL_OLD':
+            return {'Attributes': copy_value(write.old)} if write.old is not None else {}
+        if operation != 'UpdateItem':
+            raise _validation("ReturnValues can only be ALL_OLD or NONE", operation)
+        if mode == 'ALL_NEW':
+            return {'Attributes': copy_value(write.new)}
+        source = write.new if mode == 'UPDATED_NEW' else (write.old or {})
+        attributes = _project(source, write.touched) if write.touched else {}
+        return {'Attributes': attributes} if attributes else {}
+
+    def get_one(self, request: Dict) -> Dict:
+        with self._lock:
+            table = self._table(request['TableName'], 'GetItem')
+            key = table.key_of(request['Key'], 'GetItem')
+            expressions = _Expressions(request.get('ExpressionAttributeNames'), None, 'GetItem')
+            paths = expressions.parse('projection', request.get('ProjectionExpression'))
+            expressions.check()
+            item = table.get(key)
+            return {'Item': _project(item, paths)} if item is not None else {}
+
+    # reads over many items
+
+    def read_many(self, request: Dict, operation: str) -> Dict:
+        with self._lock:
+            table = self._table(request['TableName'], operation)
+            expressions = _Expressions(request.get('ExpressionAttributeNames'), request.get('ExpressionAttributeValues'), operation)
+            key_condition = expressions.parse('key', request.get('KeyConditionExpression')) if operation == 'Query' else None
+            if operation == 'Query' and key_condition is None:
+                raise _validation("Either the KeyConditions or KeyConditionExpression parameter must be specified in the request.", operation)
+            filter_ = expressions.parse('condition', request.get('FilterExpression'))
+            paths = expressions.parse('projection', request.get('ProjectionExpression'))
+            expressions.check()
+
+            index = table.index(request['IndexName'], operation) if request.get('IndexName') else None
+            start = request.get('ExclusiveStartKey')
+            forward = request.get('ScanIndexForward', True)
+            if operation == 'Query':
+                entries = self._query_entries(table, index, key_condition, expressions.values, start, forward, operation)
+            else:
+                entries = self._scan_entries(table, index, request, expressions, operation)
+
+            limit = request.get('Limit') or PAGE_ITEMS
+            items, scanned, last = [], 0, None
+            for table_key, entry_item in entries:
+                if scanned == limit:
+                    break
+                scanned += 1
+                last = (table_key, entry_item)
+                item = table.project_index(index, entry_item) if index else entry_item
+                if filter_ is None or filter_(item, expressions.values):
+                    items.append(item)
+            else:
+                last = None
+
+            response = {'Count': len(items), 'ScannedCount': scanned}
+            if request.get('Select') != 'COUNT':
+                response['Items'] = [_project(item, paths) for item in items]
+            if last is not None:
+                response['LastEvaluatedKey'] = self._evaluated_key(table, index, *last)
+            return response
+
+    def _evaluated_key(self, table: _Table, index: Optional[_Index], table_key: Tuple, item: Dict) -> Dict:
+        key = table.key_item(table_key)
+        if index is not None:
+            for name in (index.hash_name, index.range_name):
+                if name is not None:
+                    key[name] = item[name]
+        return copy_value(key)
+
+    def _query_entries(self, table, index, key_condition, values, start, forward, operation) -> Iterator[Tuple[Tuple, Dict]]:
+        hash_name = index.hash_name if index else table.key_names[0]
+        range_name = index.range_name if index else (table.key_names[1] if len(table.key_names) > 1 else None)
+        hash_value, sort_condition = _key_bounds(key_condition, hash_name, range_name, values, operation)
+
+        if index is None and range_name is None:
+            if sort_condition is not None:
+                raise _validation("Query key condition not supported", operation)
+            key = (hash_value,)
+            if key in table.items and start is None:
+                yield key, table.items[key]
+            return
+
+        if index is None:
+            keys, prefix = table.order, (hash_value,)
+        else:
+            keys, prefix = index.partitions.get(hash_value), ()
+            if keys is None:
+                return
+        low, high = _range(keys, prefix, sort_condition)
+        if start is not None:
+            start_entry = self._start_entry(table, index, start, operation)
+            if forward:
+                low = max(low, keys.locate(start_entry + (TOP,)))
+            else:
+                high = min(high, keys.locate(start_entry))
+        for entry in keys.between(low, high, reverse=not forward):
+            table_key = entry if index is None else entry[-1]
+            yield table_key, table.items[table_key]
+
+    def _scan_entries(self, table, index, request, expressions, operation) -> Iterator[Tuple[Tuple, Dict]]:
+        start, segment, total_segments = request.get('ExclusiveStartKey'), request.get('Segment'), request.get('TotalSegments')
+        if (segment is None) != (total_segments is None):
+            raise _validation("The TotalSegments and Segment parameters must be specified together", operation)
+        if index is None:
+            low = table.order.locate(table.key_of(start, operation) + (TOP,)) if start else (0, 0)
+            entries = ((key, table.items[key]) for key in table.order.between(low, (len(table.order._lists), 0)))
+        else:
+            entries = self._scan_index(table, index, start, operation)
+        for table_key, item in entries:
+            if segment is None or zlib.crc32(repr(table_key[0]).encode('utf-8')) % total_segments == segment:
+                yield table_key, item
+
+    def _scan_index(self, table, index, start, operation) -> Iterator[Tuple[Tuple, Dict]]:
+        # Partitions in hash order, so a scan can resume from any evaluated key
+        hashes = sorted(index.partitions)
+        first = 0
+        start_entry = None
+        if start:
+            start_hash = start[index.hash_name]
+            first = bisect_left(hashes, start_hash)
+            start_entry = self._start_entry(table, index, start, operation)
+        for hash_value in hashes[first:]:
+            keys = index.partitions[hash_value]
+            low = keys.locate(start_entry + (TOP,)) if start_entry and hash_value == start_hash else (0, 0)
+            for entry in keys.between(low, (len(keys._lists), 0)):
+                yield entry[-1], table.items[entry[-1]]
+
+    def _start_entry(self, table: _Table, index: Optional[_Index], start: Dict, operation: str) -> Tuple:
+        table_key = table.key_of({name: start[name] for name in table.key_names if name in start}, operation)
+        if index is None:
+            return table_key
+        if index.range_name is None:
+            return (table_key,)
+        return (to_store(start[index.range_name], operation), table_key)
+
+    # batches and transactions
+
+    def batch_write(self, request_items: Dict) -> Dict:
+        operation = 'BatchWriteItem'
+        requests = [(name, request) for name, requests in request_items.items() for request in requests]
+        if not requests or len(requests) > MAX_BATCH_WRITE:
+            raise _validation("Too many items requested for the BatchWriteItem call", operation)
+        with self._writing():
+            writes = []
+            seen = set()
+            for name, request in requests:
+                if 'PutRequest' in request:
+                    write = self._plan_put({'TableName': name, 'Item': request['PutRequest']['Item']}, operation)
+                else:
+                    write = self._plan_delete({'TableName': name, 'Key': request['DeleteRequest']['Key']}, operation)
+                if (name, write.key) in seen:
+                    raise _validation("Provided list of item keys contains duplicates", operation)
+                seen.add((name, write.key))
+                writes.append(write)
+            self._commit(writes, operation)
+        return {'UnprocessedItems': {}}
+
+    def batch_get(self, request_items: Dict) -> Dict:
+        operation = 'BatchGetItem'
+        if sum(len(request['Keys']) for request in request_items.values()) > MAX_BATCH_GET:
+            raise _validation("Too many items requested for the BatchGetItem call", operation)
+        responses = {}
+        with self._lock:
+            for name, request in request_items.items():
+                table = self._table(name, operation)
+                expressions = _Expressions(request.get('ExpressionAttributeNames'), None, operation)
+                paths = expressions.parse('projection', request.get('ProjectionExpression'))
+                expressions.check()
+                keys = [table.key_of(key, operation) for key in request['Keys']]
+                if len(set(keys)) != len(keys):
+                    raise _validation("Provided list of item keys contains duplicates", operation)
+                items = (table.get(key) for key in keys)
+                responses[name] = [_project(item, paths) for item in items if item is not None]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def transact_write(self, transact_items: Sequence[Dict]) -> Dict:
+        operation = 'TransactWriteItems'
+        if not transact_items or len(transact_items) > MAX_TRANSACTION_ITEMS:
+            raise _validation(f"Member must have length less than or equal to {MAX_TRANSACTION_ITEMS}", operation)
+        planners = {'Put': self._plan_put, 'Update': self._plan_update, 'Delete': self._plan_delete,
+                    'ConditionCheck': self._plan_check}
+        with self._writing():
+            writes, requests = [], []
+            seen = set()
+            for transact_item in transact_items:
+                (kind, request), = transact_item.items()
+                request = _built_conditions(request)
+                write = planners[kind](request, operation)
+                if (write.table.name, write.key) in seen:
+                    raise _validation("Transaction request cannot include multiple operations on one item", operation)
+                seen.add((write.table.name, write.key))
+                writes.append(write)
+                requests.append(request)
+
+            if not all(write.passed for write in writes):
+                reasons = []
+                for write, request in zip(writes, requests):
+                    if write.passed:
+                        reasons.append({'Code': 'None'})
+                        continue
+                    reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                    if request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and write.old is not None:
+                        reason['Item'] = copy_value(write.old)
+                    reasons.append(reason)
+                codes = ', '.join(reason['Code'] for reason in reasons)
+                raise _error(TransactionCanceledException, 'TransactionCanceledException',
+                             f"Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]",
+                             operation, CancellationReasons=reasons)
+            self._commit(writes, operation)
+        return {}
+
+    def transact_get(self, transact_items: Sequence[Dict]) -> Dict:
+        with self._lock:
+            return {'Responses': [self.get_one(transact_item['Get']) for transact_item in transact_items]}
+
+
+def _key_bounds(tree: Tuple, hash_name: str, range_name: Optional[str], values: Dict, operation: str) -> Tuple[Any, Optional[Tuple]]:
+    """Hash value and optional (op, value, value) sort condition from a parsed key condition"""
+
+    parts = []
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        if node[0] == 'and':
+            pending.extend((node[2], node[1]))
+        else:
+            parts.append(node)
+
+    hash_value, sort_condition = MISSING, None
+    for node in parts:
+        kind = node[0]
+        if kind == 'compare' and node[2][0] == 'path' and node[3][0] == 'value':
+            name, value = node[2][1], values[node[3][1]]
+            if name == (hash_name,) and node[1] == '=' and hash_value is MISSING:
+                hash_value = value
+                continue
+            if name == (range_name,) and node[1] in ('=', '<', '<=', '>', '>=') and sort_condition is None:
+                sort_condition = (node[1], value, None)
+                continue
+        elif kind == 'between' and node[1][1] == (range_name,) and sort_condition is None:
+            sort_condition = ('between', values[node[2][1]], values[node[3][1]])
+            continue
+        elif kind == 'begins_with' and node[1][1] == (range_name,) and sort_condition is None:
+            sort_condition = ('begins_with', values[node[2][1]], None)
+            continue
+        raise _validation("Query key condition not supported", operation)
+
+    if hash_value is MISSING:
+        raise _validation(f"Query condition missed key schema element: {hash_name}", operation)
+    return hash_value, sort_condition
+
+
+class MemoryTable:
+    """boto3 Table API over a MemoryResource table"""
+
+    def __init__(self, resource: MemoryResource, name: str):
+        self._resource = resource
+        self.name = name
+        self.meta = SimpleNamespace(client=resource.meta.client)
+
+    @property
+    def table_name(self) -> str:
+        return self.name
+
+    @property
+    def key_schema(self) -> List[Dict]:
+        table = self._resource._table(self.name, 'DescribeTable')
+        kinds = ('HASH', 'RANGE')
+        return [{'AttributeName': name, 'KeyType': kind} for name, kind in zip(table.key_names, kinds)]
+
+    @property
+    def item_count(self) -> int:
+        with self._resource._lock:
+            return len(self._resource._table(self.name, 'DescribeTable'))
+
+    def distinct_values(self, attribute: str) -> List:
+        """Sorted distinct string, number and binary values of an attribute, without a Scan"""
+        with self._resource._lock:
+            return self._resource._table(self.name, 'Scan').distinct(attribute)
+
+    def get_item(self, *, Key, ProjectionExpression=None, ExpressionAttributeNames=None,
+                 ConsistentRead=False, ReturnConsumedCapacity=None) -> Dict:
+        return self._resource.get_one({'TableName': self.name, 'Key': Key, 'ProjectionExpression': ProjectionExpression,
+                                       'ExpressionAttributeNames': ExpressionAttributeNames})
+
+    def put_item(self, *, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                 ReturnValues=None, ReturnConsumedCapacity=None, ReturnItemCollectionMetrics=None,
+                 ReturnValuesOnConditionCheckFailure=None) -> Dict:
+        return self._resource.write_one('put', dict(_arguments(locals()), TableName=self.name))
+
+    def update_item(self, *, Key, UpdateExpression=None, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None, ReturnConsumedCapacity=None,
+                    ReturnItemCollectionMetrics=None, ReturnValuesOnConditionCheckFailure=None) -> Dict:
+        return self._resource.write_one('update', dict(_arguments(locals()), TableName=self.name))
+
+    def delete_item(self, *, Key, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                    ReturnValues=None, ReturnConsumedCapacity=None, ReturnItemCollectionMetrics=None,
+                    ReturnValuesOnConditionCheckFailure=None) -> Dict:
+        return self._resource.write_one('delete', dict(_arguments(locals()), TableName=self.name))
+
+    def query(self, *, KeyConditionExpression, IndexName=None, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ExpressionAttributeValues=None, Limit=None, ExclusiveStartKey=None,
+              ScanIndexForward=True, Select=None, ConsistentRead=False, ReturnConsumedCapacity=None) -> Dict:
+        return self._resource.read_many(dict(_arguments(locals()), TableName=self.name), 'Query')
+
+    def scan(self, *, IndexName=None, FilterExpression=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, Limit=None, ExclusiveStartKey=None, Segment=None, TotalSegments=None,
+             Select=None, ConsistentRead=False, ReturnConsumedCapacity=None) -> Dict:
+        return self._resource.read_many(dict(_arguments(locals()), TableName=self.name), 'Scan')
+
+    def batch_writer(self, overwrite_by_pkeys=None) -> BatchWriter:
+        return BatchWriter(self.name, self.meta.client, overwrite_by_pkeys=overwrite_by_pkeys)
+
+
+def _arguments(arguments: Dict) -> Dict:
+    return _built_conditions({name: value for name, value in arguments.items() if name != 'self' and value is not None})
+
+
+def _built_conditions(request: Dict) -> Dict:
+    """The request with boto3.dynamodb.conditions objects (Key, Attr) rendered to expressions, as boto3 tables do"""
+    builder = None
+    for name in ('KeyConditionExpression', 'ConditionExpression', 'FilterExpression'):
+        condition = request.get(name)
+        if not isinstance(condition, ConditionBase):
+            continue
+        builder = builder or ConditionExpressionBuilder()
+        built = builder.build_expression(condition, is_key_condition=name == 'KeyConditionExpression')
+        request = {**request, name: built.condition_expression,
+                   'ExpressionAttributeNames': {**request.get('ExpressionAttributeNames', {}),
+                                                **built.attribute_name_placeholders}}
+        if built.attribute_value_placeholders:
+            request['ExpressionAttributeValues'] = {**request.get('ExpressionAttributeValues', {}),
+                                                    **built.attribute_value_placeholders}
+    return request
+
+
+class MemoryClient:
+    """The `table.meta.client` calls the services make, in resource (Python value) form"""
+
+    exceptions = SimpleNamespace(
+        ClientError=ClientError,
+        ConditionalCheckFailedException=ConditionalCheckFailedException,
+        TransactionCanceledException=TransactionCanceledException,
+        ResourceNotFoundException=ResourceNotFoundException,
+    )
+
+    def __init__(self, resource: MemoryResource):
+        self._resource = resource
+
+    def get_item(self, *, TableName, **kwargs) -> Dict:
+        return self._resource.Table(TableName).get_item(**kwargs)
+
+    def put_item(self, *, TableName, **kwargs) -> Dict:
+        return self._resource.Table(TableName).put_item(**kwargs)
+
+    def update_item(self, *, TableName, **kwargs) -> Dict:
+        return self._resource.Table(TableName).update_item(**kwargs)
+
+    def delete_item(self, *, TableName, **kwargs) -> Dict:
+        return self._resource.Table(TableName).delete_item(**kwargs)
+
+    def query(self, *, TableName, **kwargs) -> Dict:
+        return self._resource.Table(TableName).query(**kwargs)
+
+    def scan(self, *, TableName, **kwargs) -> Dict:
+        return self._resource.Table(TableName).scan(**kwargs)
+
+    def batch_write_item(self, *, RequestItems, ReturnConsumedCapacity=None, ReturnItemCollectionMetrics=None) -> Dict:
+        return self._resource.batch_write(RequestItems)
+
+    def batch_get_item(self, *, RequestItems, ReturnConsumedCapacity=None) -> Dict:
+        return self._resource.batch_get(RequestItems)
+
+    def transact_write_items(self, *, TransactItems, ClientRequestToken=None, ReturnConsumedCapacity=None,
+                             ReturnItemCollectionMetrics=None) -> Dict:
+        return self._resource.transact_write(TransactItems)
+
+    def transact_get_items(self, *, TransactItems, ReturnConsumedCapacity=None) -> Dict:
+        return self._resource.transact_get(TransactItems)
@@ -0,0 +1,71 @@
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from utils.encoder import msgpack, packb
+from utils.json_response import FastJSONResponse
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, 'application/x-msgpack')
+MSGPACK_AVAILABLE = msgpack is not None
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return packb(content)
+
+
+def _media_qualities(accept: str) -> Dict[str, float]:
+    qualities = {}
+    for part in accept.split(','):
+        media_type, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.strip().lower()] = quality
+    return qualities
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True if the client asks for MessagePack at least as strongly as JSON"""
+
+    accept = request.headers.get('accept')
+    if not MSGPACK_AVAILABLE or not accept:
+        return False
+
+    qualities = _media_qualities(accept)
+    msgpack_quality = max(qualities.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    json_quality = qualities.get('application/json', 0.0)
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+def negotiated_response(request: Request, content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """MessagePack or JSON rendering of `content`, chosen from the Accept header"""
+
+    headers = {**(headers or {}), 'Vary': 'Accept'}
+    if wants_msgpack(request):
+        return MsgPackResponse(content, headers=headers)
+    return FastJSONResponse(content, headers=headers)
+
+
+def msgpack_stream(items: Iterable[Any]) -> Iterator[bytes]:
+    """One MessagePack object per item, readable incrementally with msgpack.Unpacker"""
+
+    for item in items:
+        yield packb(item)
+
+
+def streaming_msgpack_response(items: Iterable[Any], headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    return StreamingResponse(
+        msgpack_stream(items),
+        media_type=MSGPACK_MEDIA_TYPE,
+        headers={**(headers or {}), 'Vary': 'Accept'}
+    )
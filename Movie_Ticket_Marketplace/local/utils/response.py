@@ -1,8 +1,11 @@
-import json
-from utils.encoder import CustomEncoder
+from utils.encoder import dumps
 
 def build_response(status_code, body=None):
-    """Build a standardized API Gateway response"""
+    """Build a standardized API Gateway response.
+
+    API Gateway compresses it for clients that accept it (minimumCompressionSize
+    in serverless.yml).
+    """
     
     response = {
         'statusCode': status_code,
@@ -15,6 +18,6 @@ def build_response(status_code, body=None):
     }
     
     if body is not None:
-        response['body'] = json.dumps(body, cls=CustomEncoder)
+        response['body'] = dumps(body).decode('utf-8')
     
-    return response
\ No newline at end of file
+    return response
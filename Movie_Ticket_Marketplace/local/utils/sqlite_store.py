@@ -0,0 +1,339 @@
+"""SQLite storage engine with the boto3 DynamoDB Table API, for local runs.
+
+`SqliteResource` is a `MemoryResource` whose tables live in one SQLite file
+instead of dicts, so expressions, conditions, transactions and the
+Table/client API behave exactly as in utils.memory_store, and data survives
+restarts without LocalStack.
+
+Each table is a WITHOUT ROWID table keyed on its key attributes, with the
+item pickled alongside. Global secondary index keys and any extra indexed
+attributes are copied into their own columns, each with a partial SQL
+index:
+
+- a Query on the table or on a GSI reads only its key range, in key order
+- a Scan whose FilterExpression has top-level `attr = :v`, `<`, `<=`, `>`,
+  `>=`, BETWEEN or begins_with terms on indexed attributes reads only the
+  matching rows. Limit then counts matching rows rather than scanned ones
+- distinct_values() reads the attribute's index alone
+
+The database runs in WAL mode with synchronous=NORMAL: readers never block
+the writer, and a committed write survives a process crash (the last
+commits can be lost on power failure). Each write operation is one SQLite
+transaction taken with BEGIN IMMEDIATE, so other processes on the same file
+see whole batches and transactions. Numbers in key and indexed columns are
+stored as SQLite integers or doubles, so numeric keys beyond 15 significant
+digits lose precision in ordering.
+"""
+import pickle
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.memory_store import MISSING, MemoryResource, _Index, _key_bounds, _Table, _validation, to_store, type_of
+
+# Highest code point and byte, bounding the values a begins_with prefix can start
+_STRING_CEILING = '\U0010ffff'
+_BYTES_CEILING = b'\xff' * 8
+_PUSHDOWN_COMPARATORS = {'=', '<', '<=', '>', '>='}
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _sql_value(value: Any) -> Any:
+    """A key or indexed value as stored in its column; None for types that are not indexed"""
+    if isinstance(value, (str, bytes)):
+        return value
+    if isinstance(value, Decimal):
+        if value == value.to_integral_value() and abs(value) < 2 ** 63:
+            return int(value)
+        return float(value)
+    return None
+
+
+def _segment(value: Any, total_segments: int) -> int:
+    return zlib.crc32(repr(value).encode('utf-8')) % total_segments
+
+
+class _SqliteTable(_Table):
+    """One DynamoDB table stored as a SQLite table"""
+
+    def __init__(self, connection: sqlite3.Connection, name: str, keys: Sequence[Tuple[str, str]],
+                 indexes: Iterable[Tuple], indexed_attributes: Sequence[str]):
+        self.name = name
+        self.key_names = tuple(attribute for attribute, _ in keys)
+        self.indexes: Dict[str, _Index] = {}
+        for index in indexes:
+            index_name, index_keys, projection = index[:3]
+            self.indexes[index_name] = _Index(index_name, index_keys, projection, index[3] if len(index) > 3 else ())
+        self.key_types: Dict[str, type] = {}
+        self.connection = connection
+        self.sql_table = _quote(f"t_{name}")
+
+        self.key_columns = tuple(f"k{position}" for position in range(len(self.key_names)))
+        attributes = []
+        for index in self.indexes.values():
+            attributes.extend(name for name in (index.hash_name, index.range_name) if name is not None)
+        attributes.extend(indexed_attributes)
+        # attribute -> column, for every non-key attribute copied out of the item
+        self.columns: Dict[str, str] = {}
+        for attribute in attributes:
+            if attribute not in self.key_names and attribute not in self.columns:
+                self.columns[attribute] = f"c{len(self.columns)}"
+
+        # One transaction, so processes opening a new or older file at the same time do not race
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._create()
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def column(self, attribute: str) -> str:
+        if attribute in self.key_names:
+            return self.key_columns[self.key_names.index(attribute)]
+        return self.columns[attribute]
+
+    def _create(self) -> None:
+        key_definition = ', '.join(self.key_columns)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.sql_table} "
+            f"({', '.join(f'{column} NOT NULL' for column in self.key_columns)}, item BLOB NOT NULL, "
+            f"PRIMARY KEY ({key_definition})) WITHOUT ROWID"
+        )
+        existing = {row[1] for row in self.connection.execute(f"PRAGMA table_info({self.sql_table})")}
+        missing = {attribute: column for attribute, column in self.columns.items() if column not in existing}
+        for column in missing.values():
+            self.connection.execute(f"ALTER TABLE {self.sql_table} ADD COLUMN {column}")
+        if missing:
+            self._backfill(missing)
+
+        for attribute, column in self.columns.items():
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote(f'i_{self.name}_{attribute}')} ON {self.sql_table} "
+                f"({column}, {key_definition}) WHERE {column} IS NOT NULL"
+            )
+        for index in self.indexes.values():
+            columns = [self.column(name) for name in (index.hash_name, index.range_name) if name is not None]
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote(f'g_{self.name}_{index.name}')} ON {self.sql_table} "
+                f"({', '.join(columns)}, {key_definition}) WHERE {' AND '.join(f'{c} IS NOT NULL' for c in columns)}"
+            )
+
+    def _backfill(self, missing: Dict[str, str]) -> None:
+        """Fill columns added to an existing file from the stored items"""
+        assignments = ', '.join(f"{column} = ?" for column in missing.values())
+        keys = ' AND '.join(f"{column} = ?" for column in self.key_columns)
+        rows = self.connection.execute(f"SELECT {', '.join(self.key_columns)}, item FROM {self.sql_table}").fetchall()
+        for row in rows:
+            item = pickle.loads(row[-1])
+            values = [_sql_value(item.get(attribute)) for attribute in missing]
+            self.connection.execute(f"UPDATE {self.sql_table} SET {assignments} WHERE {keys}", values + list(row[:-1]))
+
+    def _key_params(self, table_key: Tuple) -> List:
+        return [_sql_value(value) for value in table_key]
+
+    def get(self, table_key: Tuple) -> Optional[Dict]:
+        where = ' AND '.join(f"{column} = ?" for column in self.key_columns)
+        row = self.connection.execute(f"SELECT item FROM {self.sql_table} WHERE {where}",
+                                      self._key_params(table_key)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def __len__(self):
+        return self.connection.execute(f"SELECT count(*) FROM {self.sql_table}").fetchone()[0]
+
+    def distinct(self, attribute: str) -> List:
+        if attribute not in self.columns:
+            return super().distinct(attribute)
+        column = self.columns[attribute]
+        rows = self.connection.execute(
+            f"SELECT DISTINCT {column} FROM {self.sql_table} WHERE {column} IS NOT NULL ORDER BY {column}"
+        )
+        return [Decimal(str(value)) if isinstance(value, (int, float)) else value for value, in rows]
+
+    @property
+    def items(self) -> Dict[Tuple, Dict]:
+        """Every item by key; used only by the in-memory fallbacks"""
+        return {self.key_from(item): item for item in self.rows(f"SELECT item FROM {self.sql_table}", [])}
+
+    def key_from(self, item: Dict) -> Tuple:
+        return tuple(item[name] for name in self.key_names)
+
+    def rows(self, sql: str, params: Sequence) -> Iterator[Dict]:
+        for blob, in self.connection.execute(sql, params):
+            yield pickle.loads(blob)
+
+    def store(self, table_key: Tuple, item: Optional[Dict], operation: str) -> None:
+        if item is None:
+            where = ' AND '.join(f"{column} = ?" for column in self.key_columns)
+            self.connection.execute(f"DELETE FROM {self.sql_table} WHERE {where}", self._key_params(table_key))
+            return
+
+        for index in self.indexes.values():
+            if index.entry(item, table_key) is not None:
+                for name in (index.hash_name, index.range_name):
+                    if name is not None:
+                        self.checked_key_value(name, item[name], operation)
+        columns = list(self.key_columns) + ['item'] + list(self.columns.values())
+        params = self._key_params(table_key) + [pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)]
+        params.extend(_sql_value(item.get(attribute)) for attribute in self.columns)
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO {self.sql_table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            params
+        )
+
+
+class SqliteResource(MemoryResource):
+    """Stand-in for boto3.resource('dynamodb') keeping its tables in a SQLite file"""
+
+    def __init__(self, path: str, tables: Iterable[Tuple] = (), indexed_attributes: Optional[Dict[str, Sequence[str]]] = None):
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        for pragma in ('journal_mode=WAL', 'synchronous=NORMAL', 'busy_timeout=10000', 'temp_store=MEMORY',
+                       'cache_size=-65536', 'mmap_size=268435456'):
+            self._connection.execute(f"PRAGMA {pragma}")
+        self._connection.create_function('dynamo_segment', 2, _segment, deterministic=True)
+        self._indexed_attributes = indexed_attributes or {}
+        super().__init__(tables)
+
+    def _new_table(self, name: str, keys: Sequence[Tuple[str, str]], indexes: Iterable[Tuple]) -> _SqliteTable:
+        return _SqliteTable(self._connection, name, keys, indexes, self._indexed_attributes.get(name, ()))
+
+    @contextmanager
+    def _writing(self):
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    # reads
+
+    def _query_entries(self, table, index, key_condition, values, start, forward, operation) -> Iterator[Tuple[Tuple, Dict]]:
+        hash_name = index.hash_name if index else table.key_names[0]
+        range_name = index.range_name if index else (table.key_names[1] if len(table.key_names) > 1 else None)
+        hash_value, sort_condition = _key_bounds(key_condition, hash_name, range_name, values, operation)
+
+        where, params = [f"{table.column(hash_name)} = ?"], [_sql_value(hash_value)]
+        if range_name is not None:
+            range_column = table.column(range_name)
+            where.append(f"{range_column} IS NOT NULL")
+            if sort_condition is not None:
+                term, term_params = _range_term(range_column, *sort_condition)
+                where.append(term)
+                params.extend(term_params)
+        elif sort_condition is not None:
+            raise _validation("Query key condition not supported", operation)
+
+        order = self._order_columns(table, index, scan=False)
+        if start is not None:
+            term, term_params = _after(order, self._order_values(table, index, start, operation, scan=False), forward)
+            where.append(term)
+            params.extend(term_params)
+        direction = '' if forward else ' DESC'
+        sql = (f"SELECT item FROM {table.sql_table} WHERE {' AND '.join(where)} "
+               f"ORDER BY {', '.join(column + direction for column in order)}")
+        for item in table.rows(sql, params):
+            yield table.key_from(item), item
+
+    def _scan_entries(self, table, index, request, expressions, operation) -> Iterator[Tuple[Tuple, Dict]]:
+        start, segment, total_segments = request.get('ExclusiveStartKey'), request.get('Segment'), request.get('TotalSegments')
+        if (segment is None) != (total_segments is None):
+            raise _validation("The TotalSegments and Segment parameters must be specified together", operation)
+
+        where, params = [], []
+        if index is not None:
+            where.extend(f"{table.column(name)} IS NOT NULL" for name in (index.hash_name, index.range_name) if name)
+        if segment is not None:
+            where.append(f"dynamo_segment({table.key_columns[0]}, ?) = ?")
+            params.extend((total_segments, segment))
+        tree = expressions.parse('key', request.get('FilterExpression'))
+        if tree is not None:
+            for term, term_params in _pushdown(table, tree, expressions.values):
+                where.append(term)
+                params.extend(term_params)
+
+        order = self._order_columns(table, index, scan=True)
+        if start:
+            term, term_params = _after(order, self._order_values(table, index, start, operation, scan=True), True)
+            where.append(term)
+            params.extend(term_params)
+        sql = f"SELECT item FROM {table.sql_table}"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        sql += f" ORDER BY {', '.join(order)}"
+        for item in table.rows(sql, params):
+            yield table.key_from(item), item
+
+    def _order_columns(self, table: _SqliteTable, index: Optional[_Index], scan: bool) -> List[str]:
+        """Columns giving the order of a query (within one hash value) or a scan"""
+        if index is None:
+            return list(table.key_columns if scan else table.key_columns[1:] or table.key_columns)
+        names = ([index.hash_name] if scan else []) + ([index.range_name] if index.range_name else [])
+        return [table.column(name) for name in names] + list(table.key_columns)
+
+    def _order_values(self, table: _SqliteTable, index: Optional[_Index], start: Dict, operation: str, scan: bool) -> List:
+        table_key = table.key_of({name: start[name] for name in table.key_names if name in start}, operation)
+        if index is None:
+            values = table_key if scan else (table_key[1:] or table_key)
+            return [_sql_value(value) for value in values]
+        names = ([index.hash_name] if scan else []) + ([index.range_name] if index.range_name else [])
+        return [_sql_value(to_store(start[name], operation)) for name in names] + table._key_params(table_key)
+
+
+def _after(columns: Sequence[str], values: Sequence, forward: bool) -> Tuple[str, List]:
+    operator = '>' if forward else '<'
+    if len(columns) == 1:
+        return f"{columns[0]} {operator} ?", list(values)
+    return f"({', '.join(columns)}) {operator} ({', '.join('?' * len(values))})", list(values)
+
+
+def _range_term(column: str, op: str, first: Any, second: Any) -> Tuple[str, List]:
+    if op == 'between':
+        return f"{column} BETWEEN ? AND ?", [_sql_value(first), _sql_value(second)]
+    if op == 'begins_with':
+        ceiling = _STRING_CEILING if isinstance(first, str) else _BYTES_CEILING
+        return f"{column} >= ? AND {column} < ?", [first, first + ceiling]
+    return f"{column} {op} ?", [_sql_value(first)]
+
+
+def _pushdown(table: _SqliteTable, tree: Tuple, values: Dict) -> Iterator[Tuple[str, List]]:
+    """SQL terms for the top-level AND terms of a filter that indexed columns can answer.
+
+    The full filter still runs on every row returned, so terms are only a
+    narrowing: anything not understood here is simply left to it.
+    """
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        kind = node[0]
+        if kind == 'and':
+            pending.extend((node[1], node[2]))
+            continue
+
+        if kind == 'compare' and node[1] in _PUSHDOWN_COMPARATORS and node[2][0] == 'path' and node[3][0] == 'value':
+            path, op, operands = node[2][1], node[1], (values.get(node[3][1], MISSING), None)
+        elif kind == 'between' and node[1][0] == 'path' and node[2][0] == 'value' and node[3][0] == 'value':
+            path, op, operands = node[1][1], 'between', (values.get(node[2][1], MISSING), values.get(node[3][1], MISSING))
+        elif kind == 'begins_with' and node[2][0] == 'value':
+            path, op, operands = node[1][1], 'begins_with', (values.get(node[2][1], MISSING), None)
+        else:
+            continue
+
+        if len(path) != 1 or path[0] not in table.columns and path[0] not in table.key_names:
+            continue
+        if any(operand is not None and type_of(operand) not in ('S', 'N', 'B') for operand in operands):
+            continue
+        if op == 'begins_with' and type_of(operands[0]) == 'N':
+            continue
+        yield _range_term(table.column(path[0]), op, *operands)
@@ -0,0 +1,257 @@
+"""Write-behind buffer for attributes derived from other writes.
+
+Price change events set DiscountPercentage, IsDiscounted and
+LastPriceChangeTimestamp on the ticket they touched. A bulk repricing sends
+many events for the same seats, and writing each as it arrives costs one
+UpdateItem per event. stage() records the attributes in memory instead,
+merged with anything still pending for the same key (later values win), and
+a background thread writes them every WRITE_BEHIND_FLUSH_SECONDS, or as soon
+as WRITE_BEHIND_MAX_PENDING keys are waiting.
+
+DynamoDB has no batched UpdateItem, and BatchWriteItem replaces whole items,
+so a flush sends one UpdateItem per key, WRITE_BEHIND_CONCURRENCY at a time.
+Each is conditional on the item existing, so a ticket deleted meanwhile is
+not recreated with only its derived attributes.
+
+Pending writes live in process memory. close() flushes them and runs at
+exit; the FastAPI lifespan calls it on shutdown, and Lambda handlers call
+flush(strict=True) before returning, so an acknowledged SQS message means
+its write is stored.
+
+ServerlesswithPayroll/utils/write_behind.py is a symlink to this file.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from utils.metrics import WRITE_BEHIND_LAG, WRITE_BEHIND_OLDEST, WRITE_BEHIND_PENDING, WRITE_BEHIND_WRITES
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = float(os.environ.get('WRITE_BEHIND_FLUSH_SECONDS', '1.0'))
+MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '500'))
+CONCURRENCY = int(os.environ.get('WRITE_BEHIND_CONCURRENCY', '8'))
+# A key whose write keeps failing is dropped after this many flushes
+MAX_ATTEMPTS = 5
+
+WRITTEN, MISSING, FAILED = 'written', 'missing', 'failed'
+
+
+class WriteBehindError(Exception):
+    """Raised by flush(strict=True) when some writes failed; they stay pending"""
+
+
+class WriteBehindBuffer:
+    """Coalesces attribute updates per key and writes them in the background.
+
+    `on_flushed` is called after each flush with the new item of every key
+    written, keyed by key value; it runs on the flushing thread.
+    """
+
+    def __init__(self, table, key_name: str,
+                 on_flushed: Optional[Callable[[Dict[str, Dict[str, Any]]], None]] = None,
+                 flush_seconds: float = FLUSH_SECONDS, max_pending: int = MAX_PENDING,
+                 concurrency: int = CONCURRENCY):
+        self.table = table
+        self.key_name = key_name
+        self.on_flushed = on_flushed
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._labels = (table.name,)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='write-behind')
+        self._lock = threading.Lock()
+        # Only one flush at a time, so a key's writes cannot reorder
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._staged_at: Dict[Any, float] = {}
+        self._attempts: Dict[Any, int] = {}
+        self._counts = {'staged': 0, 'coalesced': 0, WRITTEN: 0, MISSING: 0, FAILED: 0, 'dropped': 0, 'flushes': 0}
+        self._last_flush: Dict[str, Any] = {'at': None, 'seconds': 0.0, 'keys': 0, 'maxLagSeconds': 0.0}
+        atexit.register(self.close)
+
+    def stage(self, key: Any, attributes: Dict[str, Any]) -> None:
+        """Queue `attributes` to be SET on the item `key`"""
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = dict(attributes)
+                self._staged_at[key] = time.monotonic()
+            else:
+                pending.update(attributes)
+                self._counts['coalesced'] += 1
+                WRITE_BEHIND_WRITES.inc(self._labels + ('coalesced',))
+            self._counts['staged'] += 1
+            size = len(self._pending)
+            closed = self._closed
+            if self._thread is None and not closed:
+                self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+                self._thread.start()
+        WRITE_BEHIND_WRITES.inc(self._labels + ('staged',))
+        WRITE_BEHIND_PENDING.set(self._labels, size)
+
+        if closed or size >= 2 * self.max_pending:
+            # Nothing flushes after close(); past twice the threshold the flusher is not keeping up
+            self.flush()
+        elif size >= self.max_pending:
+            self._wake.set()
+
+    def flush(self, strict: bool = False) -> Dict[Any, Dict[str, Any]]:
+        """Write everything pending now; returns the new item of each key written.
+
+        Failed writes go back in the buffer for the next flush. With `strict`,
+        they also raise WriteBehindError, for callers that acknowledge work on
+        return.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, staged_at = self._pending, self._staged_at
+                self._pending, self._staged_at = {}, {}
+            if not batch:
+                return {}
+
+            started = time.monotonic()
+            results = self._write_all(batch)
+            finished = time.monotonic()
+
+            written: Dict[Any, Dict[str, Any]] = {}
+            failed: Dict[Any, Dict[str, Any]] = {}
+            max_lag = 0.0
+            for (key, attributes), (outcome, item) in zip(batch.items(), results):
+                WRITE_BEHIND_WRITES.inc(self._labels + (outcome,))
+                if outcome == FAILED:
+                    failed[key] = attributes
+                    continue
+                lag = finished - staged_at[key]
+                max_lag = max(max_lag, lag)
+                WRITE_BEHIND_LAG.observe(self._labels, lag)
+                if outcome == WRITTEN:
+                    written[key] = item
+
+            dropped = self._requeue(failed, staged_at) if failed else 0
+            with self._lock:
+                for key in batch:
+                    if key not in failed:
+                        self._attempts.pop(key, None)
+                self._counts[WRITTEN] += len(written)
+                self._counts[MISSING] += len(batch) - len(written) - len(failed)
+                self._counts[FAILED] += len(failed)
+                self._counts['dropped'] += dropped
+                self._counts['flushes'] += 1
+                self._last_flush = {'at': time.time(), 'seconds': round(finished - started, 4),
+                                    'keys': len(batch), 'maxLagSeconds': round(max_lag, 4)}
+                size, oldest = len(self._pending), self._oldest_age(finished)
+            WRITE_BEHIND_PENDING.set(self._labels, size)
+            WRITE_BEHIND_OLDEST.set(self._labels, oldest)
+            logger.info(f"Flushed {len(written)} of {len(batch)} keys to {self.table.name} "
+                        f"in {finished - started:.3f}s (max lag {max_lag:.3f}s)")
+
+            if written and self.on_flushed:
+                try:
+                    self.on_flushed(written)
+                except Exception as e:
+                    logger.error(f"Post-flush callback failed for {self.table.name}: {e}")
+
+        if failed and strict:
+            raise WriteBehindError(f"{len(failed)} of {len(batch)} writes to {self.table.name} failed")
+        return written
+
+    def close(self) -> None:
+        """Stop the flusher and write everything still pending"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffer depth, flush lag and write outcomes so far"""
+        with self._lock:
+            return {
+                'table': self.table.name,
+                'pending': len(self._pending),
+                'oldestPendingSeconds': round(self._oldest_age(time.monotonic()), 4),
+                'flushIntervalSeconds': self.flush_seconds,
+                'maxPending': self.max_pending,
+                'lastFlush': dict(self._last_flush),
+                **self._counts,
+            }
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush to {self.table.name} failed: {e}")
+
+    def _write_all(self, batch: Dict[Any, Dict[str, Any]]):
+        try:
+            return list(self._executor.map(self._write, batch.items()))
+        except RuntimeError:
+            # Executors refuse new work once the interpreter is exiting, which is when atexit runs close()
+            return [self._write(entry) for entry in batch.items()]
+
+    def _write(self, entry: Tuple[Any, Dict[str, Any]]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        key, attributes = entry
+        names = {'#key': self.key_name}
+        values = {}
+        assignments = []
+        for index, (name, value) in enumerate(attributes.items()):
+            names[f'#a{index}'] = name
+            values[f':a{index}'] = value
+            assignments.append(f'#a{index} = :a{index}')
+        try:
+            response = self.table.update_item(
+                Key={self.key_name: key},
+                UpdateExpression='SET ' + ', '.join(assignments),
+                ConditionExpression='attribute_exists(#key)',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_NEW'
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                logger.warning(f"Skipped derived attributes for missing item {key}")
+                return MISSING, None
+            logger.error(f"Failed to write derived attributes for {key}: {e}")
+            return FAILED, None
+        except Exception as e:
+            logger.error(f"Failed to write derived attributes for {key}: {e}")
+            return FAILED, None
+        return WRITTEN, response.get('Attributes', {})
+
+    def _requeue(self, failed: Dict[Any, Dict[str, Any]], staged_at: Dict[Any, float]) -> int:
+        """Put failed writes back under anything staged since; returns how many were given up on"""
+        dropped = 0
+        with self._lock:
+            for key, attributes in failed.items():
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts >= MAX_ATTEMPTS:
+                    self._attempts.pop(key, None)
+                    dropped += 1
+                    logger.error(f"Dropped derived attributes for {key} after {attempts} failed writes")
+                    continue
+                self._attempts[key] = attempts
+                # Values staged after this flush began are newer and win
+                self._pending[key] = {**attributes, **self._pending.get(key, {})}
+                self._staged_at[key] = staged_at[key]
+        if dropped:
+            WRITE_BEHIND_WRITES.inc(self._labels + ('dropped',), dropped)
+        return dropped
+
+    def _oldest_age(self, now: float) -> float:
+        return now - min(self._staged_at.values()) if self._staged_at else 0.0